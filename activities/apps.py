@@ -5,3 +5,8 @@ class ActivitiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'activities'
     verbose_name = 'Atividades dos Beneficiários'
+
+    def ready(self):
+        from . import metrics
+
+        metrics.connect_signals()
@@ -17,6 +17,7 @@ from activities.models import (
     ActivityFeedback,
     ActivityNote
 )
+from activities.metrics import recompute_metrics
 
 User = get_user_model()
 
@@ -190,8 +191,7 @@ class Command(BaseCommand):
                     self.create_notes_for_activity(activity, users)
         
         # Calcular impact score para todas as atividades
-        for activity in created_activities:
-            activity.calculate_impact_score()
+        recompute_metrics(BeneficiaryActivity.objects.filter(pk__in=[a.pk for a in created_activities]))
         
         self.stdout.write(
             self.style.SUCCESS(
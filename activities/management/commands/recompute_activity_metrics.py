@@ -0,0 +1,26 @@
+"""
+Comando de recálculo das métricas das atividades (activities.metrics).
+
+Recalcula taxa de presença e pontuação de impacto das atividades pendentes
+(ou de todas com --all). Agendar periodicamente, por exemplo via cron:
+
+    */15 * * * * python manage.py recompute_activity_metrics
+"""
+from django.core.management.base import BaseCommand
+
+from activities.metrics import recompute_metrics, stale_activities
+
+
+class Command(BaseCommand):
+    help = 'Recalcular as métricas pré-calculadas das atividades das beneficiárias'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recalcular todas as atividades, não só as pendentes',
+        )
+
+    def handle(self, *args, **options):
+        total = recompute_metrics(None if options['all'] else stale_activities())
+        self.stdout.write(self.style.SUCCESS(f'{total} atividades recalculadas'))
@@ -0,0 +1,183 @@
+"""
+Recálculo em conjunto das métricas das atividades.
+
+Para um lote de BeneficiaryActivity, uma única consulta com subconsultas
+correlacionadas agrupadas traz, por atividade:
+
+- sessões e sessões com presença registrada (taxa de presença)
+- feedbacks e feedbacks positivos (nota >= 4)
+- evoluções da anamnese vinculada desde o início da atividade
+
+``impact_score`` é calculado em Python com essas contagens e gravado com
+bulk_update junto de ``attendance_percentage`` e ``metrics_updated_at``,
+sem save()/full_clean() por atividade.
+
+Recálculo incremental: uma atividade está pendente quando
+``metrics_updated_at`` é nulo ou anterior a ``updated_at``. Sessões,
+presenças, feedbacks e evoluções da anamnese atualizam o ``updated_at`` das
+atividades afetadas (sinais) e o job ``recompute_activity_metrics`` processa
+só as pendentes. ``metrics_updated_at`` recebe o instante anterior à
+leitura, de modo que alterações durante o recálculo continuam pendentes.
+"""
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from core.background_jobs import register_job, report_progress
+
+BATCH_SIZE = 500
+POSITIVE_RATING = 4
+HIGH_IMPACT_TYPES = {'THERAPY', 'COUNSELING', 'VOCATIONAL', 'LEGAL'}
+
+
+def impact_score(attendance, completion, activity_type, positive_feedback, total_feedback, evolutions):
+    """Pontuação de impacto (0-100) a partir das métricas da atividade"""
+    score = 0
+
+    # Presença
+    if attendance >= 80:
+        score += 30
+    elif attendance >= 60:
+        score += 20
+    elif attendance >= 40:
+        score += 10
+
+    # Conclusão
+    if completion >= 90:
+        score += 25
+    elif completion >= 70:
+        score += 20
+    elif completion >= 50:
+        score += 15
+
+    # Tipos de atividade com mais impacto
+    if activity_type in HIGH_IMPACT_TYPES:
+        score += 15
+
+    # Feedback positivo
+    if total_feedback > 0:
+        feedback_rate = positive_feedback / total_feedback * 100
+        if feedback_rate >= 80:
+            score += 15
+        elif feedback_rate >= 60:
+            score += 10
+
+    # Evolução social
+    if evolutions > 0:
+        score += 15
+
+    return min(score, 100)
+
+
+def _count(queryset, group):
+    counts = queryset.order_by().values(group).annotate(total=Count('pk', distinct=True)).values('total')
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def _with_metrics(queryset):
+    from social.models import SocialAnamnesisEvolution
+
+    from .models import ActivityFeedback, ActivitySession
+
+    sessions = ActivitySession.objects.filter(activity=OuterRef('pk'))
+    feedback = ActivityFeedback.objects.filter(activity=OuterRef('pk'))
+    evolutions = SocialAnamnesisEvolution.objects.filter(
+        anamnesis=OuterRef('social_anamnesis'), evolution_date__date__gte=OuterRef('start_date')
+    )
+    return queryset.annotate(
+        session_total=_count(sessions, 'activity'),
+        session_attended=_count(sessions.filter(attendance__attended=True), 'activity'),
+        feedback_total=_count(feedback, 'activity'),
+        feedback_positive=_count(feedback.filter(rating__gte=POSITIVE_RATING), 'activity'),
+        evolution_total=_count(evolutions, 'anamnesis'),
+    )
+
+
+def recompute_metrics(queryset=None, batch_size=BATCH_SIZE):
+    """
+    Recalcular e gravar as métricas das atividades de ``queryset`` (todas
+    por padrão); retorna quantas foram atualizadas.
+    """
+    from .models import BeneficiaryActivity
+
+    if queryset is None:
+        queryset = BeneficiaryActivity.objects.all()
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+
+    for start in range(0, len(ids), batch_size):
+        computed_at = timezone.now()
+        batch = BeneficiaryActivity.objects.filter(pk__in=ids[start:start + batch_size]).order_by()
+        rows = _with_metrics(batch).values_list(
+            'pk', 'activity_type', 'completion_percentage', 'session_total', 'session_attended',
+            'feedback_total', 'feedback_positive', 'evolution_total',
+        )
+        activities = []
+        for pk, activity_type, completion, sessions, attended, feedback, positive, evolutions in rows:
+            attendance = attended / sessions * 100 if sessions else 0
+            activities.append(BeneficiaryActivity(
+                pk=pk,
+                attendance_percentage=attendance,
+                impact_score=impact_score(attendance, completion, activity_type, positive, feedback, evolutions),
+                metrics_updated_at=computed_at,
+            ))
+        BeneficiaryActivity.objects.bulk_update(
+            activities, ['attendance_percentage', 'impact_score', 'metrics_updated_at']
+        )
+        report_progress(min(start + batch_size, len(ids)), len(ids))
+    return len(ids)
+
+
+def stale_activities():
+    """Atividades com métricas pendentes de recálculo"""
+    from .models import BeneficiaryActivity
+
+    return BeneficiaryActivity.objects.filter(
+        Q(metrics_updated_at__isnull=True) | Q(updated_at__gt=F('metrics_updated_at'))
+    )
+
+
+@register_job
+def recompute_activity_metrics(full=False):
+    """Job de recálculo das métricas das atividades (só as pendentes, ou todas com ``full``)"""
+    return recompute_metrics(None if full else stale_activities())
+
+
+def touch_activities(**lookup):
+    """Marcar como pendentes as atividades de ``lookup`` (update() não altera outros campos)"""
+    from .models import BeneficiaryActivity
+
+    BeneficiaryActivity.objects.filter(**lookup).update(updated_at=timezone.now())
+
+
+def _activity_child_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_activities(pk=instance.activity_id)
+
+
+def _attendance_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_activities(sessions__pk=instance.session_id)
+
+
+def _evolution_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_activities(social_anamnesis_id=instance.anamnesis_id)
+
+
+def connect_signals():
+    """Conectar a marcação de métricas pendentes (ActivitiesConfig.ready)"""
+    from social.models import SocialAnamnesisEvolution
+
+    from .models import ActivityAttendance, ActivityFeedback, ActivitySession
+
+    handlers = (
+        (ActivitySession, _activity_child_changed),
+        (ActivityFeedback, _activity_child_changed),
+        (ActivityAttendance, _attendance_changed),
+        (SocialAnamnesisEvolution, _evolution_changed),
+    )
+    for model, handler in handlers:
+        uid = f'activity_metrics_{model._meta.label_lower}'
+        post_save.connect(handler, sender=model, dispatch_uid=uid)
+        post_delete.connect(handler, sender=model, dispatch_uid=uid)
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.13 on 2026-10-17 01:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='beneficiaryactivity',
+            name='attendance_percentage',
+            field=models.FloatField(default=0, editable=False, verbose_name='Taxa de Presença (%)'),
+        ),
+        migrations.AddField(
+            model_name='beneficiaryactivity',
+            name='metrics_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Métricas atualizadas em'),
+        ),
+    ]
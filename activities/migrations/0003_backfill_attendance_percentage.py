@@ -0,0 +1,38 @@
+from django.db import migrations
+from django.db.models import Count, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def backfill_attendance(apps, schema_editor):
+    """
+    Taxa de presença das atividades existentes em um único UPDATE (o
+    metrics_updated_at continua nulo: o job recompute_activity_metrics
+    recalcula o impact_score dessas atividades como pendentes).
+    """
+    BeneficiaryActivity = apps.get_model('activities', 'BeneficiaryActivity')
+    ActivitySession = apps.get_model('activities', 'ActivitySession')
+
+    sessions = ActivitySession.objects.filter(activity=OuterRef('pk')).order_by()
+
+    def count(queryset):
+        return Cast(
+            Subquery(queryset.values('activity').annotate(total=Count('pk', distinct=True)).values('total')),
+            FloatField(),
+        )
+
+    total = count(sessions)
+    attended = count(sessions.filter(attendance__attended=True))
+    BeneficiaryActivity.objects.update(
+        attendance_percentage=Coalesce(attended * Value(100.0) / NullIf(total, Value(0.0)), Value(0.0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0002_activity_metrics'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_attendance, migrations.RunPython.noop),
+    ]
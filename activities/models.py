@@ -144,6 +144,18 @@ class BeneficiaryActivity(models.Model):
         default=0,
         help_text='Percentual de conclusão da atividade'
     )
+    # Pré-calculados em conjunto por activities.metrics
+    attendance_percentage = models.FloatField(
+        'Taxa de Presença (%)',
+        default=0,
+        editable=False
+    )
+    metrics_updated_at = models.DateTimeField(
+        'Métricas atualizadas em',
+        null=True,
+        blank=True,
+        editable=False
+    )
     
     class Meta:
         ordering = ['-created_at']
@@ -250,50 +262,11 @@ class BeneficiaryActivity(models.Model):
         return reverse('activities:detail', kwargs={'pk': self.pk})
     
     def calculate_impact_score(self):
-        """Calcula pontuação de impacto baseada em métricas"""
-        score = 0
-        
-        # Pontuação por presença
-        if self.attendance_rate >= 80:
-            score += 30
-        elif self.attendance_rate >= 60:
-            score += 20
-        elif self.attendance_rate >= 40:
-            score += 10
-        
-        # Pontuação por conclusão
-        if self.completion_percentage >= 90:
-            score += 25
-        elif self.completion_percentage >= 70:
-            score += 20
-        elif self.completion_percentage >= 50:
-            score += 15
-        
-        # Pontuação por tipo de atividade (algumas têm mais impacto)
-        high_impact_types = ['THERAPY', 'COUNSELING', 'VOCATIONAL', 'LEGAL']
-        if self.activity_type in high_impact_types:
-            score += 15
-        
-        # Pontuação por feedback positivo
-        positive_feedback = self.feedback_entries.filter(rating__gte=4).count()
-        total_feedback = self.feedback_entries.count()
-        if total_feedback > 0:
-            feedback_rate = (positive_feedback / total_feedback) * 100
-            if feedback_rate >= 80:
-                score += 15
-            elif feedback_rate >= 60:
-                score += 10
-        
-        # Pontuação por evolução social
-        if self.social_anamnesis:
-            evolutions = self.social_anamnesis.evolutions.filter(
-                evolution_date__gte=self.start_date
-            ).count()
-            if evolutions > 0:
-                score += 15
-        
-        self.impact_score = min(score, 100)  # Máximo 100
-        self.save(update_fields=['impact_score'])
+        """Recalcula e grava as métricas desta atividade (activities.metrics)"""
+        from .metrics import recompute_metrics
+
+        recompute_metrics(BeneficiaryActivity.objects.filter(pk=self.pk))
+        self.refresh_from_db(fields=['attendance_percentage', 'impact_score', 'metrics_updated_at'])
         return self.impact_score
 
 
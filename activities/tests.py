@@ -0,0 +1,98 @@
+from datetime import date, time
+from importlib import import_module
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from activities.metrics import recompute_activity_metrics, recompute_metrics, stale_activities
+from activities.models import ActivityAttendance, ActivityFeedback, ActivitySession, BeneficiaryActivity
+from members.models import Beneficiary
+
+
+class ActivityMetricsTests(TestCase):
+    """Recálculo em conjunto de presença e impact_score"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='tecnica', email='tecnica@example.com', password='senha-segura-123'
+        )
+        self.beneficiary = Beneficiary.objects.create(
+            full_name='Maria Silva', dob='1990-01-01', phone_1='11987654321',
+            address='Rua A', neighbourhood='Centro',
+        )
+
+    def _activity(self, attended=(), activity_type='THERAPY', title='Terapia'):
+        activity = BeneficiaryActivity.objects.create(
+            beneficiary=self.beneficiary, title=title, activity_type=activity_type,
+            start_date=date(2024, 1, 1), facilitator='Ana', location='Sala 1',
+            objectives='Objetivos', expected_outcomes='Resultados', created_by=self.user,
+        )
+        for number, present in enumerate(attended, start=1):
+            session = ActivitySession.objects.create(
+                activity=activity, session_number=number, title=f'Sessão {number}',
+                session_date=date(2024, 1, number), start_time=time(9), end_time=time(10),
+                facilitator='Ana', location='Sala 1',
+            )
+            ActivityAttendance.objects.create(session=session, attended=present, recorded_by=self.user)
+        return activity
+
+    def test_recompute_applies_impact_rules(self):
+        activity = self._activity(attended=(True, True, False))
+
+        self.assertEqual(recompute_metrics(BeneficiaryActivity.objects.filter(pk=activity.pk)), 1)
+        activity.refresh_from_db()
+        self.assertAlmostEqual(activity.attendance_percentage, 200 / 3)
+        # 20 (presença >= 60%) + 15 (tipo de alto impacto)
+        self.assertEqual(activity.impact_score, 35)
+
+        ActivityFeedback.objects.create(activity=activity, rating=4)
+        recompute_metrics(BeneficiaryActivity.objects.filter(pk=activity.pk))
+        activity.refresh_from_db()
+        # + 15 (feedback positivo)
+        self.assertEqual(activity.impact_score, 50)
+        self.assertIsNotNone(activity.metrics_updated_at)
+
+    def test_query_count_independent_of_activity_count(self):
+        self._activity(attended=(True,), title='A')
+
+        with self.assertNumQueries(3):
+            recompute_metrics()
+
+        for index in range(10):
+            self._activity(attended=(True, False), title=f'B{index}')
+        with self.assertNumQueries(3):
+            self.assertEqual(recompute_metrics(), 11)
+
+    def test_attendance_change_marks_activity_stale(self):
+        activity = self._activity(attended=(True, True))
+        other = self._activity(attended=(True,), title='Outra')
+        recompute_metrics()
+        self.assertFalse(stale_activities().exists())
+
+        attendance = ActivityAttendance.objects.get(session__activity=activity, session__session_number=2)
+        attendance.attended = False
+        attendance.save()
+        self.assertEqual(list(stale_activities()), [activity])
+
+        self.assertEqual(recompute_activity_metrics(), 1)
+        activity.refresh_from_db()
+        self.assertEqual(activity.attendance_percentage, 50)
+        self.assertFalse(stale_activities().exists())
+        other.refresh_from_db()
+        self.assertEqual(other.attendance_percentage, 100)
+
+    def test_backfill_migration_fills_attendance(self):
+        backfill = import_module('activities.migrations.0003_backfill_attendance_percentage').backfill_attendance
+        partial = self._activity(attended=(True, True, False, True), title='Parcial')
+        empty = self._activity(attended=(), title='Sem sessões')
+        BeneficiaryActivity.objects.update(attendance_percentage=0, metrics_updated_at=None)
+
+        with self.assertNumQueries(1):
+            backfill(apps, None)
+
+        partial.refresh_from_db()
+        empty.refresh_from_db()
+        self.assertEqual(partial.attendance_percentage, 75)
+        self.assertEqual(empty.attendance_percentage, 0)
+        self.assertIsNone(partial.metrics_updated_at)
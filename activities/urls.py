@@ -25,6 +25,7 @@ urlpatterns = [
     # Sessões
     path('<uuid:activity_id>/session/create/', views.activity_session_create, name='session_create'),
     path('session/<uuid:session_id>/attendance/', views.attendance_record, name='attendance_record'),
+    path('<uuid:activity_id>/attendance/', views.attendance_bulk, name='attendance_bulk'),
     
     # Feedback e notas
     path('<uuid:activity_id>/feedback/', views.activity_feedback, name='activity_feedback'),
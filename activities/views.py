@@ -10,6 +10,7 @@ from django.contrib import messages
 from django.db.models import Count, Q, Avg, Max, Min
 from django.db.models.functions import TruncMonth
 from django.http import JsonResponse, HttpResponse
+from django.views.decorators.http import require_POST
 from django.views.generic import (
     ListView, DetailView, CreateView, UpdateView, DeleteView
 )
@@ -20,6 +21,7 @@ from django.core.cache import cache
 from datetime import date, timedelta, datetime
 
 from core.decorators import CreateConfirmationMixin, EditConfirmationMixin, DeleteConfirmationMixin
+from core.attendance import AttendanceError, record_activity_attendance
 from core.export_utils import export_universal, DataFormatter, ExportManager
 
 @login_required
@@ -426,6 +428,29 @@ def attendance_record(request, session_id):
     return render(request, 'activities/attendance_form.html', context)
 
 
+@login_required
+@require_POST
+def attendance_bulk(request, activity_id):
+    """
+    Presenças de várias sessões da atividade em JSON (tablet):
+    {"attendances": [{"session_id", "attended", "notes", "excuse_reason", ...}]}
+    """
+    activity = get_object_or_404(BeneficiaryActivity, id=activity_id)
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    try:
+        result = record_activity_attendance(
+            activity,
+            payload.get('attendances') if isinstance(payload, dict) else None,
+            recorded_by=request.user,
+        )
+    except AttendanceError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(result)
+
+
 @login_required
 def activity_feedback(request, activity_id):
     """
@@ -545,10 +570,16 @@ def activities_metrics_api(request):
     """
     API para métricas gerais das atividades.
     """
-    # Métricas gerais
-    total_activities = BeneficiaryActivity.objects.count()
-    active_activities = BeneficiaryActivity.objects.filter(status='ACTIVE').count()
-    completed_activities = BeneficiaryActivity.objects.filter(status='COMPLETED').count()
+    # Métricas gerais e presença pré-calculada (activities.metrics), em uma consulta
+    totals = BeneficiaryActivity.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='ACTIVE')),
+        completed=Count('id', filter=Q(status='COMPLETED')),
+        attendance=Avg('attendance_percentage', filter=Q(attendance_percentage__gt=0)),
+    )
+    total_activities = totals['total']
+    active_activities = totals['active']
+    completed_activities = totals['completed']
     
     # Métricas por tipo
     activities_by_type = BeneficiaryActivity.objects.values(
@@ -567,16 +598,8 @@ def activities_metrics_api(request):
         completed=Count('id', filter=Q(status='COMPLETED'))
     ).order_by('month')
     
-    # Taxa de presença geral
-    all_activities = BeneficiaryActivity.objects.all()
-    attendance_rates = [
-        activity.attendance_rate for activity in all_activities
-        if activity.attendance_rate > 0
-    ]
-    overall_attendance = (
-        sum(attendance_rates) / len(attendance_rates)
-        if attendance_rates else 0
-    )
+    # Taxa de presença geral (atividades com alguma presença)
+    overall_attendance = totals['attendance'] or 0
     
     data = {
         'total_activities': total_activities,
@@ -702,47 +725,34 @@ def activities_export(request):
     """
     Exporta lista de atividades em CSV, Excel ou PDF
     """
-    # Função personalizada para formatar dados de atividades
-    def format_activity_data_custom(activities):
-        headers = [
-            'Nome da Atividade', 'Tipo', 'Data', 'Beneficiária', 'Responsável',
-            'Status', 'Total de Sessões', 'Frequência (%)', 'Observações', 'Data de Criação'
-        ]
-        
-        data = []
-        for activity in activities:
-            # Calcular estatísticas da atividade
-            total_sessions = activity.sessions.count() if hasattr(activity, 'sessions') else 0
-            attended_sessions = ActivityAttendance.objects.filter(
-                session__activity=activity, present=True
-            ).count()
-            attendance_rate = (attended_sessions / total_sessions * 100) if total_sessions > 0 else 0
-            
-            data.append([
-                activity.name,
-                activity.get_activity_type_display() if hasattr(activity, 'get_activity_type_display') else activity.activity_type,
-                activity.date.strftime('%d/%m/%Y') if hasattr(activity, 'date') and activity.date else '',
-                str(activity.beneficiary) if hasattr(activity, 'beneficiary') else '',
-                str(activity.responsible) if hasattr(activity, 'responsible') else '',
-                activity.get_status_display() if hasattr(activity, 'get_status_display') else activity.status,
-                total_sessions,
-                f"{attendance_rate:.1f}%",
-                activity.notes[:100] + '...' if hasattr(activity, 'notes') and activity.notes and len(activity.notes) > 100 else (activity.notes if hasattr(activity, 'notes') else ''),
-                activity.created_at.strftime('%d/%m/%Y %H:%M') if activity.created_at else ''
-            ])
-        
-        return data, headers
+    # Estatísticas de sessões agregadas na própria consulta (sem N+1);
+    # CSV/Excel são gerados em streaming
+    queryset = BeneficiaryActivity.objects.annotate(
+        total_sessions=Count('sessions', distinct=True),
+        attended_sessions=Count(
+            'sessions__attendance',
+            filter=Q(sessions__attendance__attended=True),
+            distinct=True
+        ),
+    )
+    columns = DataFormatter.ACTIVITY_COLUMNS + [
+        ('Total de Sessões', 'total_sessions', None),
+        ('Presenças Registradas', 'attended_sessions', None),
+    ]
     
     return export_universal(
         request=request,
         model_class=BeneficiaryActivity,
-        formatter_method=format_activity_data_custom,
+        formatter_method=None,
         filename_prefix="activities",
         template_name="core/exports/pdf_report.html",
         extra_context={
             'report_type': 'Atividades',
             'user': request.user
-        }
+        },
+        columns=columns,
+        queryset=queryset,
+        search_field='title',
     )
 
 
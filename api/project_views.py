@@ -11,6 +11,8 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.shortcuts import get_object_or_404
 
+from core.attendance import AttendanceError, record_project_attendance
+
 from projects.models import (
     Project, ProjectEnrollment, ProjectSession, 
     ProjectAttendance, ProjectEvaluation, ProjectResource
@@ -221,43 +223,12 @@ class ProjectSessionViewSet(viewsets.ModelViewSet):
             )
         
         session = self.get_object()
-        attendances_data = request.data.get('attendances', [])
-        
-        created_count = 0
-        updated_count = 0
+        try:
+            result = record_project_attendance(session, request.data.get('attendances', []))
+        except AttendanceError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        for attendance_data in attendances_data:
-            enrollment_id = attendance_data.get('enrollment_id')
-            attended = attendance_data.get('attended', False)
-            notes = attendance_data.get('notes', '')
-            
-            try:
-                enrollment = ProjectEnrollment.objects.get(id=enrollment_id)
-                attendance, created = ProjectAttendance.objects.get_or_create(
-                    session=session,
-                    enrollment=enrollment,
-                    defaults={
-                        'attended': attended,
-                        'notes': notes
-                    }
-                )
-                
-                if not created:
-                    attendance.attended = attended
-                    attendance.notes = notes
-                    attendance.save()
-                    updated_count += 1
-                else:
-                    created_count += 1
-                    
-            except ProjectEnrollment.DoesNotExist:
-                continue
-        
-        return Response({
-            'message': 'Presença registrada com sucesso',
-            'created': created_count,
-            'updated': updated_count
-        })
+        return Response({'message': 'Presença registrada com sucesso', **result})
 
 
 class ProjectAttendanceViewSet(viewsets.ModelViewSet):
@@ -504,52 +475,13 @@ class TakeAttendanceAPIView(APIView):
     def post(self, request, session_id):
         """Registrar presença em uma sessão específica"""
         session = get_object_or_404(ProjectSession, id=session_id)
-        attendances_data = request.data.get('attendances', [])
-        
-        created_count = 0
-        updated_count = 0
-        errors = []
-        
-        for attendance_data in attendances_data:
-            enrollment_id = attendance_data.get('enrollment_id')
-            attended = attendance_data.get('attended', False)
-            notes = attendance_data.get('notes', '')
-            
-            try:
-                enrollment = ProjectEnrollment.objects.get(
-                    id=enrollment_id,
-                    project=session.project
-                )
-                
-                attendance, created = ProjectAttendance.objects.get_or_create(
-                    session=session,
-                    enrollment=enrollment,
-                    defaults={
-                        'attended': attended,
-                        'notes': notes
-                    }
-                )
-                
-                if not created:
-                    attendance.attended = attended
-                    attendance.notes = notes
-                    attendance.save()
-                    updated_count += 1
-                else:
-                    created_count += 1
-                    
-            except ProjectEnrollment.DoesNotExist:
-                errors.append(f'Inscrição {enrollment_id} não encontrada')
-            except Exception as e:
-                errors.append(f'Erro na inscrição {enrollment_id}: {str(e)}')
-        
-        response_data = {
-            'message': 'Presença registrada',
-            'created': created_count,
-            'updated': updated_count
-        }
-        
-        if errors:
-            response_data['errors'] = errors
+        try:
+            result = record_project_attendance(session, request.data.get('attendances', []))
+        except AttendanceError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response_data = {'message': 'Presença registrada', **result}
+        if result['invalid']:
+            response_data['errors'] = [f'Inscrição {pk} não encontrada' for pk in result['invalid']]
         
         return Response(response_data)
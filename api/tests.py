@@ -1,3 +1,98 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+from datetime import date
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from evolution.models import EvolutionRecord
+from members.models import Beneficiary, Consent
+from members.portability import DATASETS
+
+
+class BeneficiaryDataExportTests(TestCase):
+    """ZIP de portabilidade de dados gerado em streaming"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        User = get_user_model()
+        self.admin = User.objects.create_user(
+            username='export_admin', email='export_admin@test.com', password='testpass123', is_staff=True
+        )
+        self.beneficiaries = [
+            Beneficiary.objects.create(
+                full_name=name, dob='1990-01-01', phone_1='11987654321', address='Rua A', neighbourhood='Centro',
+            )
+            for name in ('Maria Exportação', 'Ana Exportação')
+        ]
+        record = EvolutionRecord.objects.create(
+            beneficiary=self.beneficiaries[0], date=date(2024, 5, 1), description='Evolução', author=self.admin,
+        )
+        record.evidence.save('laudo.pdf', ContentFile(b'%PDF-1.4 laudo' * 10000))
+        # Termo com PDF registrado mas ausente do storage
+        Consent.objects.create(
+            beneficiary=self.beneficiaries[1], lgpd_agreement=True, signed_ip='127.0.0.1', pdf='consents/sumiu.pdf',
+        )
+        self.client.force_login(self.admin)
+
+    def download(self, url, params=None):
+        response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.has_header('Content-Length'))
+        return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_single_export_includes_all_datasets_and_files(self):
+        maria = self.beneficiaries[0]
+        archive = self.download(reverse('api:beneficiary-export', args=[maria.pk]))
+
+        folder = f'beneficiaria_{maria.pk}'
+        names = set(archive.namelist())
+        for dataset, _, _ in DATASETS:
+            self.assertIn(f'{folder}/{dataset}.json', names)
+        self.assertEqual(json.loads(archive.read(f'{folder}/beneficiaria.json'))[0]['fields']['full_name'],
+                         'Maria Exportação')
+        evolution = json.loads(archive.read(f'{folder}/evolucoes.json'))
+        self.assertEqual(len(evolution), 1)
+        self.assertEqual(evolution[0]['fields']['workshops'], [])
+        evidence = [name for name in names if name.startswith(f'{folder}/arquivos/evolucoes/')]
+        self.assertEqual(len(evidence), 1)
+        self.assertEqual(archive.read(evidence[0]), b'%PDF-1.4 laudo' * 10000)
+        self.assertIsNone(archive.testzip())
+
+    def test_bulk_export_lists_missing_files_in_manifest(self):
+        ids = ','.join(str(beneficiary.pk) for beneficiary in self.beneficiaries)
+        archive = self.download(reverse('api:beneficiary-bulk-export'), {'ids': ids})
+
+        manifest = json.loads(archive.read('manifesto.json'))
+        self.assertEqual(manifest['beneficiaries'], sorted(b.pk for b in self.beneficiaries))
+        self.assertEqual(manifest['missing_files'], ['consents/sumiu.pdf'])
+        consents = json.loads(archive.read(f'beneficiaria_{self.beneficiaries[1].pk}/consentimentos.json'))
+        self.assertEqual(len(consents), 1)
+
+    def test_bulk_export_validates_ids(self):
+        url = reverse('api:beneficiary-bulk-export')
+
+        self.assertEqual(self.client.get(url, {'ids': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(url, {'ids': '999999'}).status_code, 404)
+
+    def test_export_requires_admin(self):
+        user = get_user_model().objects.create_user(
+            username='export_user', email='export_user@test.com', password='testpass123'
+        )
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('api:beneficiary-export', args=[self.beneficiaries[0].pk]))
+
+        self.assertEqual(response.status_code, 403)
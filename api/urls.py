@@ -19,6 +19,8 @@ router.register(r'action-plans', views.ActionPlanViewSet)
 router.register(r'wheel-of-life', views.WheelOfLifeViewSet)
 
 urlpatterns = [
+    # Antes do router, cuja rota de detalhe capturaria 'export' como pk
+    path('beneficiaries/export/', views.BeneficiaryBulkExportView.as_view(), name='beneficiary-bulk-export'),
     path('', include(router.urls)),
     path('beneficiaries/<int:pk>/export/', views.BeneficiaryExportView.as_view(), name='beneficiary-export'),
     
@@ -7,12 +7,9 @@ from rest_framework import viewsets, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import FileResponse
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-import zipfile
-import tempfile
-import json
-import os
+from django.utils import timezone
 
 from .serializers import (
     BeneficiarySerializer,
@@ -23,7 +20,9 @@ from .serializers import (
     WheelOfLifeSerializer
 )
 
+from core.unified_permissions import is_admin
 from members.models import Beneficiary
+from members.portability import MAX_BULK_EXPORT, stream_archive
 from social.models import SocialAnamnesis
 from projects.models import ProjectEnrollment
 from evolution.models import EvolutionRecord
@@ -85,98 +84,65 @@ class WheelOfLifeViewSet(viewsets.ModelViewSet):
     ordering = ['-date']
 
 
+def _archive_response(beneficiaries, filename):
+    response = StreamingHttpResponse(stream_archive(beneficiaries), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    response['X-Accel-Buffering'] = 'no'  # nginx: não bufferizar o stream
+    return response
+
+
 class BeneficiaryExportView(APIView):
     """
-    Copilot: endpoint /api/beneficiaries/{id}/export/ (APIView).
-    Gera ZIP com PDFs + JSON dump dos registros,
-    devolve FileResponse; permitido a própria beneficiária ou staff.
+    Endpoint /api/beneficiaries/{id}/export/: ZIP com todos os dados da
+    beneficiária (JSON por conjunto + arquivos), gerado em streaming por
+    members.portability. Restrito à administração.
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, pk):
         """Exporta dados da beneficiária em formato ZIP"""
+        if not is_admin(request.user):
+            return Response(
+                {'error': 'Você não tem permissão para exportar estes dados'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        beneficiary = get_object_or_404(Beneficiary.objects.only('pk'), pk=pk)
+        return _archive_response([beneficiary], f'dados_beneficiaria_{beneficiary.pk}.zip')
+
+
+class BeneficiaryBulkExportView(APIView):
+    """
+    Endpoint /api/beneficiaries/export/?ids=1,2,3: várias beneficiárias em um
+    único ZIP (pedidos de portabilidade da LGPD), até MAX_BULK_EXPORT.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if not is_admin(request.user):
+            return Response(
+                {'error': 'Você não tem permissão para exportar estes dados'},
+                status=status.HTTP_403_FORBIDDEN
+            )
         try:
-            beneficiary = get_object_or_404(Beneficiary, pk=pk)
-            
-            # Verificar permissões - só staff ou a própria beneficiária
-            if not (request.user.is_staff or request.user == beneficiary.user):
-                return Response(
-                    {'error': 'Você não tem permissão para exportar estes dados'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            
-            # Criar arquivo temporário
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_file:
-                with zipfile.ZipFile(temp_file.name, 'w') as zip_file:
-                    
-                    # Dados da beneficiária em JSON
-                    beneficiary_data = {
-                        'id': beneficiary.id,
-                        'full_name': beneficiary.full_name,
-                        'nis': beneficiary.nis,
-                        'cpf': beneficiary.cpf,
-                        'phone': beneficiary.phone,
-                        'neighbourhood': beneficiary.neighbourhood,
-                        'created_at': beneficiary.created_at.isoformat() if beneficiary.created_at else None,
-                    }
-                    
-                    zip_file.writestr(
-                        'beneficiaria.json',
-                        json.dumps(beneficiary_data, indent=2, ensure_ascii=False)
-                    )
-                    
-                    # Anamnese social se existir
-                    try:
-                        anamnesis = beneficiary.socialanamnesis
-                        anamnesis_data = {
-                            'housing_situation': anamnesis.housing_situation,
-                            'marital_status': anamnesis.marital_status,
-                            'family_income': str(anamnesis.family_income) if anamnesis.family_income else None,
-                            'created_at': anamnesis.created_at.isoformat() if anamnesis.created_at else None,
-                        }
-                        zip_file.writestr(
-                            'anamnese_social.json',
-                            json.dumps(anamnesis_data, indent=2, ensure_ascii=False)
-                        )
-                    except SocialAnamnesis.DoesNotExist:
-                        pass
-                    
-                    # Registros de evolução
-                    evolution_records = EvolutionRecord.objects.filter(beneficiary=beneficiary)
-                    if evolution_records.exists():
-                        evolution_data = []
-                        for record in evolution_records:
-                            evolution_data.append({
-                                'id': record.id,
-                                'notes': record.notes,
-                                'status': record.status,
-                                'created_at': record.created_at.isoformat() if record.created_at else None,
-                            })
-                        
-                        zip_file.writestr(
-                            'registros_evolucao.json',
-                            json.dumps(evolution_data, indent=2, ensure_ascii=False)
-                        )
-            
-            # Retornar arquivo
-            response = FileResponse(
-                open(temp_file.name, 'rb'),
-                as_attachment=True,
-                filename=f'dados_beneficiaria_{beneficiary.id}.zip'
+            ids = {
+                int(value)
+                for param in request.query_params.getlist('ids')
+                for value in param.split(',') if value.strip()
+            }
+        except ValueError:
+            return Response({'error': 'ids inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids or len(ids) > MAX_BULK_EXPORT:
+            return Response(
+                {'error': f'Informe de 1 a {MAX_BULK_EXPORT} beneficiárias em ids'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-            # Limpar arquivo temporário após envio
-            def cleanup():
-                try:
-                    os.unlink(temp_file.name)
-                except OSError:
-                    pass
-            
-            response.close = cleanup
-            return response
-            
-        except Exception as e:
+        beneficiaries = list(Beneficiary.objects.filter(pk__in=ids).only('pk').order_by('pk'))
+        missing = ids - {beneficiary.pk for beneficiary in beneficiaries}
+        if missing:
             return Response(
-                {'error': f'Erro ao exportar dados: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': f'Beneficiárias não encontradas: {sorted(missing)}'},
+                status=status.HTTP_404_NOT_FOUND
             )
+        filename = f"dados_beneficiarias_{timezone.localdate():%Y%m%d}.zip"
+        return _archive_response(beneficiaries, filename)
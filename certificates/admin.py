@@ -102,22 +102,20 @@ class CertificateAdmin(admin.ModelAdmin):
     
     def generate_pdf(self, request, queryset):
         """Gerar PDF para certificados selecionados"""
-        count = 0
-        for certificate in queryset:
-            try:
-                certificate.generate_pdf()
-                count += 1
-            except Exception as e:
-                self.message_user(
-                    request,
-                    f"Erro ao gerar PDF para {certificate}: {e}",
-                    level='ERROR'
-                )
+        from .generation import generate_certificates
+
+        result = generate_certificates(queryset)
+        for certificate_id, error in result.errors.items():
+            self.message_user(
+                request,
+                f"Erro ao gerar PDF do certificado {certificate_id}: {error}",
+                level='ERROR'
+            )
         
-        if count > 0:
+        if result.generated > 0:
             self.message_user(
                 request,
-                f"{count} certificados gerados com sucesso.",
+                f"{result.generated} certificados gerados com sucesso.",
                 level='SUCCESS'
             )
     
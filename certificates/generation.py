@@ -0,0 +1,305 @@
+"""
+Geração de PDFs de certificados em lote.
+
+Substitui o ``generate_pdf`` um a um (template Django + WeasyPrint síncronos)
+no encerramento de workshops:
+
+1. cada CertificateTemplate é compilado uma única vez por versão
+   (``updated_at``); os blocos ``<style>`` estáticos são separados do HTML
+2. o HTML de cada certificado é renderizado no processo principal
+3. o WeasyPrint roda em um pool de processos (CERTIFICATE_GENERATION_WORKERS,
+   ver ``pdf_rendering``), em blocos de certificados do mesmo template; cada
+   processo mantém a FontConfiguration e o CSS já interpretado por template
+4. cada bloco concluído é gravado no storage e os status atualizados com um
+   único ``bulk_update``; o progresso é reportado ao job em execução
+"""
+import logging
+import multiprocessing
+import re
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.template import engines
+from django.template.loader import get_template
+from django.utils import timezone
+
+from core.background_jobs import register_job, report_progress, schedule_job
+
+from .pdf_rendering import forget_versions, render_chunk, write_pdf
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE = 'certificates/certificate_template.html'
+PDF_PATH = 'certificates/generated/certificate_{}.pdf'
+
+# Blocos <style> sem tags de template podem ser interpretados uma única vez
+STYLE_BLOCK = re.compile(r'<style[^>]*>(.*?)</style>', re.IGNORECASE | re.DOTALL)
+
+# chave do template -> (template compilado, CSS estáticos)
+_compiled_templates = {}
+
+
+class GenerationResult:
+    """Resultado de uma geração em lote"""
+
+    def __init__(self, total=0):
+        self.total = total
+        self.generated = 0
+        self.failed = 0
+        self.errors = {}
+
+    @property
+    def processed(self):
+        return self.generated + self.failed
+
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'processed': self.processed,
+            'generated': self.generated,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
+
+
+def template_key(template):
+    """Chave de cache de uma versão do CertificateTemplate"""
+    updated_at = template.updated_at.isoformat() if template.updated_at else ''
+    return f'{template.pk}:{updated_at}'
+
+
+def _split_static_styles(source):
+    """Separar os blocos <style> estáticos do restante do HTML"""
+    styles = []
+
+    def extract(match):
+        css = match.group(1)
+        if '{{' in css or '{%' in css:
+            return match.group(0)
+        styles.append(css)
+        return ''
+
+    return STYLE_BLOCK.sub(extract, source), styles
+
+
+def compile_template(template):
+    """(template Django, CSS estáticos) do CertificateTemplate, compilados uma vez por versão"""
+    key = template_key(template)
+    compiled = _compiled_templates.get(key)
+    if compiled is not None:
+        return compiled
+
+    source = None
+    if template.template_file:
+        try:
+            with template.template_file.open('rb') as f:
+                source = f.read().decode('utf-8')
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"Template de certificado {template.pk} ilegível, usando o padrão: {e}")
+    if source is None:
+        source = get_template(DEFAULT_TEMPLATE).template.source
+
+    html, styles = _split_static_styles(source)
+    compiled = (engines['django'].from_string(html), styles)
+    forget_versions(_compiled_templates, key)
+    _compiled_templates[key] = compiled
+    return compiled
+
+
+def _asset_url(field):
+    """URL de uma imagem do template acessível ao WeasyPrint"""
+    if not field:
+        return ''
+    try:
+        return Path(field.path).as_uri()
+    except NotImplementedError:
+        # Storage remoto: sem caminho local
+        return field.url
+
+
+def render_html(certificate, compiled=None):
+    """HTML do certificado"""
+    template = certificate.template
+    html_template, _ = compiled or compile_template(template)
+    return html_template.render({
+        'certificate': certificate,
+        'member': certificate.member,
+        'workshop': certificate.workshop,
+        'template': template,
+        'background_url': _asset_url(template.background_image),
+        'logo_url': _asset_url(template.logo),
+        'signature_url': _asset_url(template.signature_image),
+        'verification_url': certificate.get_verification_url(),
+        'current_date': timezone.now().date(),
+    })
+
+
+def render_certificate_pdf(certificate):
+    """PDF de um único certificado, no processo atual"""
+    compiled = compile_template(certificate.template)
+    return write_pdf(
+        template_key(certificate.template), compiled[1], str(settings.BASE_DIR),
+        render_html(certificate, compiled)
+    )
+
+
+def store_pdf(certificate, pdf):
+    """Gravar o PDF no storage, substituindo o anterior; retorna o caminho"""
+    path = PDF_PATH.format(certificate.pk)
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    return default_storage.save(path, ContentFile(pdf))
+
+
+class _InlineExecutor:
+    """Executor no próprio processo (um worker ou lotes pequenos)"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, func, *args):
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class CertificateBatchGenerator:
+    """Pipeline de geração de PDFs em blocos, com renderização em paralelo"""
+
+    def __init__(self, workers=None, chunk_size=None, progress_callback=None):
+        self.workers = getattr(settings, 'CERTIFICATE_GENERATION_WORKERS', 2) if workers is None else workers
+        self.chunk_size = chunk_size or getattr(settings, 'CERTIFICATE_GENERATION_CHUNK_SIZE', 10)
+        self.progress_callback = progress_callback
+        self.base_url = str(settings.BASE_DIR)
+
+    def generate(self, certificates):
+        """Gerar os PDFs de ``certificates`` (queryset ou lista)"""
+        if hasattr(certificates, 'select_related'):
+            certificates = certificates.select_related('member', 'workshop', 'template')
+        certificates = list(certificates)
+        result = GenerationResult(total=len(certificates))
+        by_id = {str(certificate.pk): certificate for certificate in certificates}
+
+        chunks = self._chunks(certificates, result)
+        with self._executor(len(chunks)) as executor:
+            futures = [executor.submit(render_chunk, *chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                try:
+                    rendered = future.result()
+                except Exception as e:
+                    # Processo do pool encerrado: o bloco inteiro falha
+                    logger.error(f"Erro no processo de geração de certificados: {e}")
+                    index = futures.index(future)
+                    rendered = [(certificate_id, None, str(e)) for certificate_id, _ in chunks[index][3]]
+                self._store(rendered, by_id, result)
+        return result
+
+    def _chunks(self, certificates, result):
+        """Blocos (chave, CSS, base_url, [(id, html)]) agrupados por template"""
+        by_template = {}
+        for certificate in certificates:
+            by_template.setdefault(certificate.template_id, []).append(certificate)
+
+        chunks = []
+        for group in by_template.values():
+            template = group[0].template
+            compiled = compile_template(template)
+            key = template_key(template)
+            documents = []
+            for certificate in group:
+                try:
+                    documents.append((str(certificate.pk), render_html(certificate, compiled)))
+                except Exception as e:
+                    logger.error(f"Erro ao renderizar o certificado {certificate.pk}: {e}")
+                    result.failed += 1
+                    result.errors[str(certificate.pk)] = str(e)
+            for start in range(0, len(documents), self.chunk_size):
+                chunks.append((key, compiled[1], self.base_url, documents[start:start + self.chunk_size]))
+        return chunks
+
+    def _executor(self, chunk_count):
+        workers = min(self.workers, chunk_count)
+        if workers <= 1:
+            return _InlineExecutor()
+        # spawn: o job pode estar rodando em uma thread do agendador, e fork
+        # com outras threads ativas pode deixar locks travados no filho
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _store(self, rendered, by_id, result):
+        from dashboard.stats import record_bulk_change
+
+        from .models import Certificate
+
+        generated = []
+        for certificate_id, pdf, error in rendered:
+            certificate = by_id[certificate_id]
+            if error is None:
+                try:
+                    generated.append((certificate, store_pdf(certificate, pdf)))
+                    continue
+                except Exception as e:
+                    error = str(e)
+            logger.error(f"Erro ao gerar o PDF do certificado {certificate_id}: {error}")
+            result.failed += 1
+            result.errors[certificate_id] = error
+
+        if generated:
+            now = timezone.now()
+            with transaction.atomic():
+                # bulk_update não dispara sinais: ajustar as estatísticas do dashboard
+                record_bulk_change('certificates.Certificate', [c for c, _ in generated], 'status', 'generated')
+                for certificate, path in generated:
+                    certificate.pdf_file = path
+                    certificate.status = 'generated'
+                    certificate.updated_at = now
+                Certificate.objects.bulk_update(
+                    [certificate for certificate, _ in generated], ['pdf_file', 'status', 'updated_at']
+                )
+            result.generated += len(generated)
+
+        self._report(result)
+
+    def _report(self, result):
+        report_progress(result.processed, result.total, generated=result.generated, failed=result.failed)
+        if self.progress_callback:
+            self.progress_callback(result)
+
+
+def generate_certificates(certificates, **options):
+    """Gerar os PDFs de ``certificates``; retorna um GenerationResult"""
+    return CertificateBatchGenerator(**options).generate(certificates)
+
+
+def pending_certificates(workshop):
+    """Certificados pendentes do workshop, criando os das inscrições elegíveis"""
+    from .models import Certificate, create_pending_certificates
+
+    create_pending_certificates(workshop=workshop)
+    return Certificate.objects.filter(workshop=workshop, status='pending')
+
+
+@register_job
+def generate_workshop_certificates(workshop_id):
+    """Job: gerar todos os certificados pendentes do workshop"""
+    from workshops.models import Workshop
+
+    workshop = Workshop.objects.get(pk=workshop_id)
+    return generate_certificates(pending_certificates(workshop)).as_dict()
+
+
+def schedule_workshop_certificates(workshop):
+    """Agendar a geração em background; retorna o id do job"""
+    job_id = f'workshop_certificates_{workshop.pk}_{uuid.uuid4().hex[:8]}'
+    schedule_job(job_id, generate_workshop_certificates, args=(workshop.pk,), priority=2)
+    return job_id
@@ -0,0 +1,54 @@
+"""
+Comando para gerar todos os certificados pendentes de um workshop.
+
+Cria os certificados das inscrições elegíveis que ainda não os têm e gera os
+PDFs pendentes em lote (certificates.generation). Com --background o trabalho
+é enfileirado como job e o comando retorna o id para acompanhamento.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from certificates.generation import (
+    generate_certificates, pending_certificates, schedule_workshop_certificates
+)
+from workshops.models import Workshop
+
+
+class Command(BaseCommand):
+    help = 'Gerar os certificados pendentes de um workshop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workshop', type=int, required=True, help='ID do workshop')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Processos de renderização (padrão: CERTIFICATE_GENERATION_WORKERS)',
+        )
+        parser.add_argument(
+            '--background',
+            action='store_true',
+            help='Enfileirar como job em background em vez de gerar agora',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            workshop = Workshop.objects.get(pk=options['workshop'])
+        except Workshop.DoesNotExist:
+            raise CommandError(f"Workshop {options['workshop']} não encontrado")
+
+        if options['background']:
+            job_id = schedule_workshop_certificates(workshop)
+            self.stdout.write(self.style.SUCCESS(f'Geração enfileirada: job {job_id}'))
+            return
+
+        def progress(result):
+            self.stdout.write(f'{result.processed}/{result.total} certificados processados')
+
+        result = generate_certificates(
+            pending_certificates(workshop), workers=options['workers'], progress_callback=progress
+        )
+        for certificate_id, error in result.errors.items():
+            self.stdout.write(self.style.ERROR(f'{certificate_id}: {error}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.generated} certificados gerados, {result.failed} com erro ({workshop.name})'
+        ))
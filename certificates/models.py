@@ -19,10 +19,10 @@ Gera certificados PDF p    member = models.ForeignKey(
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.core.files.storage import default_storage
 from django.template.loader import render_to_string
 from django.http import HttpResponse
 from django.conf import settings
+import logging
 import os
 import uuid
 from datetime import datetime, timedelta
@@ -30,6 +30,7 @@ from members.models import Beneficiary
 from workshops.models import Workshop, WorkshopEnrollment
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 class CertificateTemplate(models.Model):
@@ -205,34 +206,10 @@ class Certificate(models.Model):
     
     def generate_pdf(self):
         """Gera o arquivo PDF do certificado"""
-        from weasyprint import HTML, CSS
-        from django.template.loader import render_to_string
-        
-        # Contexto para o template
-        context = {
-            'certificate': self,
-            'member': self.member,
-            'workshop': self.workshop,
-            'template': self.template,
-            'verification_url': self.get_verification_url(),
-            'current_date': timezone.now().date(),
-        }
-        
-        # Renderizar HTML
-        html_string = render_to_string('certificates/certificate_template.html', context)
-        
-        # Gerar PDF
-        html = HTML(string=html_string, base_url=settings.BASE_DIR)
-        pdf = html.write_pdf()
-        
-        # Salvar arquivo
-        filename = f"certificate_{self.id}.pdf"
-        file_path = f"certificates/generated/{filename}"
-        
-        with default_storage.open(file_path, 'wb') as f:
-            f.write(pdf)
-        
-        self.pdf_file = file_path
+        from .generation import render_certificate_pdf, store_pdf
+
+        pdf = render_certificate_pdf(self)
+        self.pdf_file = store_pdf(self, pdf)
         self.status = 'generated'
         self.save()
         
@@ -274,8 +251,13 @@ class CertificateRequest(models.Model):
     def __str__(self):
         return f"Solicitação: {self.member.full_name} - {self.workshop.name}"
     
-    def approve(self, template=None):
-        """Aprova a solicitação e gera o certificado"""
+    def approve(self, template=None, generate_pdf=True):
+        """
+        Aprova a solicitação e gera o certificado.
+
+        Com ``generate_pdf=False`` o certificado fica pendente, para geração
+        em lote (``certificates.generation``).
+        """
         if not template:
             template = CertificateTemplate.objects.filter(
                 type='workshop',
@@ -290,15 +272,16 @@ class CertificateRequest(models.Model):
             member=self.member,
             workshop=self.workshop,
             template=template,
-            title=f"Certificado de Participação - {self.workshop.title}",
+            title=f"Certificado de Participação - {self.workshop.name}",
             description=f"Certifica que {self.member.full_name} participou do workshop {self.workshop.name}",
             completion_date=timezone.now().date(),
             hours_completed=getattr(self.workshop, 'duration_hours', 0),
-            instructor=self.workshop.instructor
+            instructor=self.workshop.facilitator
         )
         
         # Gerar PDF
-        certificate.generate_pdf()
+        if generate_pdf:
+            certificate.generate_pdf()
         
         # Atualizar solicitação
         self.approved = True
@@ -348,34 +331,48 @@ class CertificateDelivery(models.Model):
 
 
 # Funções auxiliares para automação
-def auto_generate_certificates():
-    """Gera certificados automaticamente para workshops completados"""
-    
-    # Buscar inscrições concluídas sem certificado
-    completed_enrollments = WorkshopEnrollment.objects.filter(
-        status='concluido',
-        certificate_requests__isnull=True
+def create_pending_certificates(workshop=None):
+    """
+    Cria solicitações aprovadas e certificados pendentes (sem PDF) para as
+    inscrições concluídas com 75% de presença mínima que ainda não têm
+    solicitação. Retorna os certificados criados.
+    """
+    from django.db.models import Exists, OuterRef
+
+    # Taxa de presença calculada na mesma consulta das inscrições
+    requested = CertificateRequest.objects.filter(
+        member=OuterRef('beneficiary'), workshop=OuterRef('workshop')
     )
+    completed_enrollments = WorkshopEnrollment.objects.filter(
+        status='concluido'
+    ).exclude(Exists(requested)).with_min_attendance(75).select_related('beneficiary', 'workshop')
+    if workshop is not None:
+        completed_enrollments = completed_enrollments.filter(workshop=workshop)
     
-    certificates_created = 0
+    certificates = []
     
     for enrollment in completed_enrollments:
-        # Verificar se atende aos critérios
-        if enrollment.attendance_rate >= 75:  # 75% de presença mínima
-            # Criar solicitação de certificado
-            request = CertificateRequest.objects.create(
-                member=enrollment.beneficiary,
-                workshop=enrollment.workshop
-            )
-            
-            # Aprovar automaticamente se atende aos critérios
-            try:
-                request.approve()
-                certificates_created += 1
-            except Exception as e:
-                print(f"Erro ao gerar certificado para {enrollment}: {e}")
-    
-    return certificates_created
+        # Criar solicitação de certificado
+        request = CertificateRequest.objects.create(
+            member=enrollment.beneficiary,
+            workshop=enrollment.workshop
+        )
+
+        # Aprovar automaticamente se atende aos critérios
+        try:
+            certificates.append(request.approve(generate_pdf=False))
+        except Exception as e:
+            logger.error(f"Erro ao criar certificado para {enrollment}: {e}")
+
+    return certificates
+
+
+def auto_generate_certificates(workshop=None):
+    """Gera certificados automaticamente para workshops completados"""
+    from .generation import generate_certificates
+
+    result = generate_certificates(create_pending_certificates(workshop))
+    return result.generated
 
 
 def send_certificate_email(certificate):
@@ -0,0 +1,55 @@
+"""
+Renderização de PDFs executada nos processos do pool de geração.
+
+Este módulo não importa Django nem os modelos: os processos são criados com
+``spawn`` e recebem apenas HTML já renderizado e o CSS estático do template.
+Cada processo mantém a FontConfiguration e o CSS interpretado por versão de
+template, reaproveitados por todos os certificados do lote.
+"""
+
+# chave do template -> (FontConfiguration, [CSS])
+_styles = {}
+
+
+def forget_versions(cache, key):
+    """Descartar de ``cache`` as versões anteriores do template de ``key`` ('pk:versão')"""
+    prefix = key.split(':', 1)[0] + ':'
+    for stale in [k for k in cache if k.startswith(prefix) and k != key]:
+        del cache[stale]
+
+
+def _stylesheets(key, css_sources, base_url):
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
+    cached = _styles.get(key)
+    if cached is None:
+        font_config = FontConfiguration()
+        stylesheets = [
+            CSS(string=css, base_url=base_url, font_config=font_config) for css in css_sources
+        ]
+        cached = (font_config, stylesheets)
+        forget_versions(_styles, key)
+        _styles[key] = cached
+    return cached
+
+
+def write_pdf(key, css_sources, base_url, html):
+    """PDF de um HTML já renderizado, reaproveitando fontes e CSS do template"""
+    from weasyprint import HTML
+
+    font_config, stylesheets = _stylesheets(key, css_sources, base_url)
+    return HTML(string=html, base_url=base_url).write_pdf(
+        stylesheets=stylesheets, font_config=font_config
+    )
+
+
+def render_chunk(key, css_sources, base_url, documents):
+    """[(id, html)] -> [(id, pdf, erro)]; um erro não interrompe o bloco"""
+    results = []
+    for document_id, html in documents:
+        try:
+            results.append((document_id, write_pdf(key, css_sources, base_url, html), None))
+        except Exception as e:
+            results.append((document_id, None, str(e)))
+    return results
@@ -56,15 +56,13 @@ def certificates_dashboard(request):
     eligible_workshops = []
     if beneficiary:
         enrollments = WorkshopEnrollment.objects.filter(
-            member=beneficiary,
-            status='completed'
+            beneficiary=beneficiary,
+            status='concluido'
         ).exclude(
             workshop__in=certificates.values_list('workshop', flat=True)
-        )
+        ).with_min_attendance(75).select_related('workshop')  # 75% de presença mínima
         
-        for enrollment in enrollments:
-            if enrollment.attendance_percentage >= 75:  # 75% de presença mínima
-                eligible_workshops.append(enrollment.workshop)
+        eligible_workshops = [enrollment.workshop for enrollment in enrollments]
     
     # Se o usuário for admin/técnica, mostrar todos os certificados
     if hasattr(request.user, 'role') and request.user.role in ['admin', 'tecnica']:
@@ -173,12 +171,12 @@ def request_certificate(request, workshop_id):
     
     # Verificar se pode solicitar certificado
     try:
-        enrollment = WorkshopEnrollment.objects.get(member=beneficiary, workshop=workshop)
-        if enrollment.status != 'completed':
+        enrollment = WorkshopEnrollment.objects.with_attendance().get(beneficiary=beneficiary, workshop=workshop)
+        if enrollment.status != 'concluido':
             messages.error(request, "Você precisa concluir o workshop para solicitar certificado.")
             return redirect('workshops:detail', workshop_id=workshop.id)
         
-        if enrollment.attendance_percentage < 75:
+        if enrollment.attendance_rate < 75:
             messages.error(request, "Você precisa ter pelo menos 75% de presença para solicitar certificado.")
             return redirect('workshops:detail', workshop_id=workshop.id)
     except WorkshopEnrollment.DoesNotExist:
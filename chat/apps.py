@@ -0,0 +1,15 @@
+"""
+Configuração do app de chat
+"""
+from django.apps import AppConfig
+
+
+class ChatConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'chat'
+    verbose_name = 'Chat'
+
+    def ready(self):
+        from . import unread
+
+        unread.connect_signals()
@@ -4,6 +4,7 @@
 
 import json
 import logging
+import uuid
 from datetime import datetime
 from typing import Dict, Set
 
@@ -13,7 +14,9 @@ from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils import timezone
 
-from .models import ChatChannel, ChatMessage, ChatChannelMembership, ChatReaction
+from .models import ChatMessage, ChatChannelMembership, ChatReaction
+from .sync import DEFAULT_PAGE_SIZE, message_page
+from .write_behind import message_buffer
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -22,6 +25,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
     """
     Consumidor WebSocket para chat em tempo real
     Gerencia conexões, mensagens, reações e indicadores de digitação
+
+    A associação ao canal e os dados do remetente são carregados uma vez na
+    conexão; mensagens são difundidas imediatamente e gravadas em lote pelo
+    buffer write-behind (chat.write_behind), sem consultas por mensagem.
     """
     
     def __init__(self, *args, **kwargs):
@@ -29,13 +36,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
         self.channel_id = None
         self.channel_group_name = None
         self.user = None
+        self.sender_data = None
         self.typing_users: Set[int] = set()
 
     async def connect(self):
         """Conectar usuário ao canal de chat"""
         try:
             # Obter ID do canal da URL
-            self.channel_id = self.scope['url_route']['kwargs']['channel_id']
+            self.channel_id = uuid.UUID(self.scope['url_route']['kwargs']['channel_id'])
             self.channel_group_name = f'chat_{self.channel_id}'
             self.user = self.scope['user']
 
@@ -45,7 +53,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 await self.close()
                 return
 
-            # Verificar se usuário tem acesso ao canal
+            # Verificar se usuário tem acesso ao canal (válido durante a conexão)
             has_access = await self.check_channel_access()
             if not has_access:
                 logger.warning(f"Usuário {self.user.id} sem acesso ao canal {self.channel_id}")
@@ -118,6 +126,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 await self.handle_typing_indicator(data)
             elif message_type == 'reaction':
                 await self.handle_message_reaction(data)
+            elif message_type == 'history':
+                await self.handle_history(data)
             elif message_type == 'ping':
                 await self.handle_ping()
             else:
@@ -146,11 +156,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 await self.send_error("Mensagem muito longa (máximo 2000 caracteres)")
                 return
 
-            # Salvar mensagem no banco
-            message = await self.save_message(content)
-            if not message:
-                await self.send_error("Erro ao salvar mensagem")
-                return
+            message = ChatMessage(
+                id=uuid.uuid4(),
+                channel_id=self.channel_id,
+                sender_id=self.user.id,
+                content=content,
+                message_type='text',
+                created_at=timezone.now(),
+            )
 
             # Preparar dados da mensagem para broadcast
             message_data = {
@@ -158,12 +171,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 'temp_id': temp_id,
                 'content': message.content,
                 'message_type': message.message_type,
-                'channel_id': str(message.channel.id),
-                'sender': {
-                    'id': message.sender.id,
-                    'full_name': message.sender.get_full_name(),
-                    'avatar': message.sender.profile.avatar.url if hasattr(message.sender, 'profile') and message.sender.profile.avatar else None
-                },
+                'channel_id': str(self.channel_id),
+                'sender': self.sender_data,
                 'created_at': message.created_at.isoformat(),
                 'edited': False,
                 'attachments': [],
@@ -179,8 +188,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 }
             )
 
-            # Atualizar analytics
-            await self.update_analytics(message)
+            # Gravação, última leitura e analytics em lote
+            message_buffer.add(message)
 
         except Exception as e:
             logger.error(f"Erro ao processar mensagem de chat: {e}")
@@ -241,6 +250,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
             logger.error(f"Erro ao processar reação: {e}")
             await self.send_error("Erro ao processar reação")
 
+    async def handle_history(self, data):
+        """Enviar uma página do histórico (before) ou das mensagens perdidas (after)"""
+        try:
+            page = await self.load_history(data.get('before'), data.get('after'), data.get('limit', DEFAULT_PAGE_SIZE))
+        except (TypeError, ValueError):
+            await self.send_error("Cursor de histórico inválido")
+            return
+
+        await self.send(text_data=json.dumps({'type': 'history', **page}))
+
     async def handle_ping(self):
         """Responder a ping com pong"""
         await self.send(text_data=json.dumps({
@@ -304,46 +323,23 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def check_channel_access(self):
-        """Verificar se usuário tem acesso ao canal"""
-        try:
-            channel = ChatChannel.objects.get(id=self.channel_id)
-            return channel.members.filter(id=self.user.id).exists()
-        except ChatChannel.DoesNotExist:
+        """Verificar se usuário tem acesso ao canal e carregar os dados do remetente"""
+        if not ChatChannelMembership.objects.filter(channel_id=self.channel_id, user_id=self.user.id).exists():
             return False
 
-    @database_sync_to_async
-    def save_message(self, content):
-        """Salvar mensagem no banco de dados"""
-        try:
-            channel = ChatChannel.objects.get(id=self.channel_id)
-            
-            # Verificar se usuário ainda tem acesso
-            if not channel.members.filter(id=self.user.id).exists():
-                return None
-
-            message = ChatMessage.objects.create(
-                channel=channel,
-                sender=self.user,
-                content=content,
-                message_type='text'
-            )
-
-            # Atualizar timestamp de última leitura do remetente
-            try:
-                membership = ChatChannelMembership.objects.get(
-                    user=self.user,
-                    channel=channel
-                )
-                membership.last_read_at = timezone.now()
-                membership.save(update_fields=['last_read_at'])
-            except ChatChannelMembership.DoesNotExist:
-                pass
-
-            return message
+        profile = getattr(self.user, 'profile', None)
+        avatar = getattr(profile, 'avatar', None)
+        self.sender_data = {
+            'id': self.user.id,
+            'full_name': self.user.get_full_name(),
+            'avatar': avatar.url if avatar else None
+        }
+        return True
 
-        except Exception as e:
-            logger.error(f"Erro ao salvar mensagem: {e}")
-            return None
+    @database_sync_to_async
+    def load_history(self, before, after, limit):
+        """Página de mensagens do canal (chat.sync); o acesso foi verificado na conexão"""
+        return message_page(self.channel_id, self.user, after=after, before=before, limit=limit)
 
     @database_sync_to_async
     def toggle_reaction(self, message_id, emoji):
@@ -395,27 +391,6 @@ class ChatConsumer(AsyncWebsocketConsumer):
             logger.error(f"Erro ao alternar reação: {e}")
             return None
 
-    @database_sync_to_async
-    def update_analytics(self, message):
-        """Atualizar analytics do chat"""
-        try:
-            from .models import ChatAnalytics
-            
-            analytics, created = ChatAnalytics.objects.get_or_create(
-                channel=message.channel,
-                date=timezone.now().date(),
-                defaults={
-                    'messages_count': 0,
-                    'active_users_count': 0
-                }
-            )
-            
-            analytics.messages_count += 1
-            analytics.save(update_fields=['messages_count'])
-            
-        except Exception as e:
-            logger.error(f"Erro ao atualizar analytics: {e}")
-
     # ===================================
     # MÉTODOS UTILITÁRIOS
     # ===================================
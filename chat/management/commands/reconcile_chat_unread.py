@@ -0,0 +1,32 @@
+"""
+Comando de reconciliação dos contadores de mensagens não lidas do chat.
+
+Recalcula ChatChannelMembership.unread_count e ChatChannel.last_message_at a
+partir das mensagens, corrigindo desvios de escritas que não passam por
+chat.unread (update() em is_deleted, importações). Agendar periodicamente,
+por exemplo via cron:
+
+    30 3 * * * python manage.py reconcile_chat_unread
+"""
+from django.core.management.base import BaseCommand
+
+from chat.unread import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    help = 'Reconciliar os contadores de mensagens não lidas do chat com as mensagens'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--channel',
+            action='append',
+            help='Reconciliar apenas o canal informado (UUID, pode ser repetido)',
+        )
+
+    def handle(self, *args, **options):
+        changed = reconcile_unread_counts(options['channel'])
+        if changed['memberships'] or changed['channels']:
+            self.stdout.write(self.style.WARNING(
+                f"{changed['memberships']} associações e {changed['channels']} canais corrigidos"
+            ))
+        self.stdout.write(self.style.SUCCESS('Reconciliação concluída'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-17 01:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['channel', 'created_at', 'id'], name='chat_chatme_channel_543d5f_idx'),
+        ),
+    ]
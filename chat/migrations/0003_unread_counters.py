@@ -0,0 +1,46 @@
+# Generated by Django 4.2.13 on 2026-10-17 01:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    ChatChannel = apps.get_model('chat', 'ChatChannel')
+    ChatChannelMembership = apps.get_model('chat', 'ChatChannelMembership')
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+
+    newest = ChatMessage.objects.filter(
+        channel_id=OuterRef('pk'), is_deleted=False
+    ).order_by('-created_at').values('created_at')[:1]
+    ChatChannel.objects.update(last_message_at=Subquery(newest))
+
+    unread = ChatMessage.objects.filter(
+        channel_id=OuterRef('channel_id'),
+        is_deleted=False,
+        created_at__gt=Coalesce(OuterRef('last_read_at'), OuterRef('joined_at')),
+    ).exclude(sender_id=OuterRef('user_id')).order_by().values('channel_id').annotate(
+        total=Count('pk')
+    ).values('total')
+    ChatChannelMembership.objects.update(unread_count=Coalesce(Subquery(unread), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_chatmessage_sync_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatchannel',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Última mensagem'),
+        ),
+        migrations.AddField(
+            model_name='chatchannelmembership',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Não lidas'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
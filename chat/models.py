@@ -67,6 +67,8 @@ class ChatChannel(models.Model):
     
     created_at = models.DateTimeField('Criado em', auto_now_add=True)
     updated_at = models.DateTimeField('Atualizado em', auto_now=True)
+    # Mantido por chat.unread: ordena a lista de canais sem agregar mensagens
+    last_message_at = models.DateTimeField('Última mensagem', null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = 'Canal de Chat'
@@ -83,16 +85,10 @@ class ChatChannel(models.Model):
         return self.messages.order_by('-created_at').first()
 
     def get_unread_count(self, user):
-        last_read = ChatChannelMembership.objects.filter(
+        unread = ChatChannelMembership.objects.filter(
             channel=self, user=user
-        ).first()
-        
-        if last_read and last_read.last_read_at:
-            return self.messages.filter(
-                created_at__gt=last_read.last_read_at
-            ).exclude(sender=user).count()
-        
-        return self.messages.exclude(sender=user).count()
+        ).values_list('unread_count', flat=True).first()
+        return unread or 0
 
     def get_online_members(self):
         """Retorna membros online"""
@@ -125,6 +121,8 @@ class ChatChannelMembership(models.Model):
     role = models.CharField('Papel', max_length=20, choices=MEMBER_ROLES, default='member')
     joined_at = models.DateTimeField('Entrou em', auto_now_add=True)
     last_read_at = models.DateTimeField('Última leitura', null=True, blank=True)
+    # Mensagens de outros membros após last_read_at (mantido por chat.unread)
+    unread_count = models.PositiveIntegerField('Não lidas', default=0, editable=False)
     is_muted = models.BooleanField('Silenciado', default=False)
     is_pinned = models.BooleanField('Fixado', default=False)
     notification_level = models.CharField(
@@ -212,6 +210,10 @@ class ChatMessage(models.Model):
         verbose_name = 'Mensagem'
         verbose_name_plural = 'Mensagens'
         ordering = ['created_at']
+        indexes = [
+            # Paginação por keyset (chat.sync)
+            models.Index(fields=['channel', 'created_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.sender.get_full_name()} - {self.content[:50]}..."
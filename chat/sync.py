@@ -0,0 +1,180 @@
+"""
+Sincronização incremental de mensagens do chat.
+
+Páginas limitadas por keyset (created_at, id) nas duas direções:
+
+- ``after``: mensagens posteriores ao cursor, para sincronização incremental
+- ``before``: mensagens anteriores ao cursor, para carregar o histórico
+- sem cursor: a página mais recente
+
+Cada página custa um número constante de consultas: mensagens com remetente
+e prévia da resposta (select_related) e as reações agregadas por emoji.
+
+A versão do canal (mensagem visível mais recente) é obtida junto com a
+verificação de acesso em uma única consulta indexada e vira o ETag: polls
+sem novidades respondem 304 sem carregar mensagens. Edições e reações são
+entregues pelo WebSocket e não alteram o ETag.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import uuid
+from datetime import datetime
+
+from django.db.models import Count, OuterRef, Q, Subquery
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+REPLY_PREVIEW = 100
+
+
+class InvalidCursor(ValueError):
+    """Cursor de sincronização malformado"""
+
+
+def encode_cursor(created_at, message_id):
+    raw = json.dumps([created_at.isoformat(), str(message_id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, message_id = json.loads(raw)
+        created_at = datetime.fromisoformat(created_at)
+        message_id = uuid.UUID(message_id)
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
+    if created_at.tzinfo is None:
+        raise InvalidCursor(cursor)
+    return created_at, message_id
+
+
+def _visible_messages(channel_id):
+    from .models import ChatMessage
+
+    return ChatMessage.objects.filter(channel_id=channel_id, is_deleted=False)
+
+
+def channel_version(channel_id, user):
+    """
+    (tem acesso, versão) em uma consulta: a associação do usuário com a
+    mensagem visível mais recente do canal anotada.
+    """
+    from .models import ChatChannelMembership
+
+    newest = _visible_messages(OuterRef('channel_id')).order_by('-created_at', '-id')
+    rows = ChatChannelMembership.objects.filter(channel_id=channel_id, user=user).annotate(
+        newest_at=Subquery(newest.values('created_at')[:1]),
+        newest_id=Subquery(newest.values('id')[:1]),
+    ).values_list('newest_at', 'newest_id')[:1]
+    if not rows:
+        return False, None
+    newest_at, newest_id = rows[0]
+    return True, encode_cursor(newest_at, newest_id) if newest_id else ''
+
+
+def make_etag(version, *params):
+    digest = hashlib.md5(json.dumps([version, *params], default=str).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _reactions(message_ids, user):
+    """{id da mensagem: [{'emoji', 'count', 'reacted'}]} em uma consulta"""
+    from .models import ChatReaction
+
+    reactions = {}
+    rows = ChatReaction.objects.filter(message_id__in=message_ids).values(
+        'message_id', 'reaction'
+    ).annotate(
+        total=Count('id'), mine=Count('id', filter=Q(user=user))
+    ).order_by('message_id', '-total', 'reaction')
+    for row in rows:
+        reactions.setdefault(row['message_id'], []).append({
+            'emoji': row['reaction'],
+            'count': row['total'],
+            'reacted': bool(row['mine']),
+        })
+    return reactions
+
+
+def _reply_preview(message):
+    if message.reply_to_id is None:
+        return None
+    reply = message.reply_to
+    content = reply.content if not reply.is_deleted else ''
+    if len(content) > REPLY_PREVIEW:
+        content = content[:REPLY_PREVIEW] + '...'
+    return {
+        'id': str(reply.id),
+        'sender': reply.sender.get_full_name(),
+        'content': content,
+        'is_deleted': reply.is_deleted,
+    }
+
+
+def serialize_message(message, user, reactions=()):
+    return {
+        'id': str(message.id),
+        'content': message.content,
+        'sender': message.sender.get_full_name(),
+        'sender_id': message.sender_id,
+        'created_at': message.created_at.isoformat(),
+        'message_type': message.message_type,
+        'is_edited': message.is_edited,
+        'is_current_user': message.sender_id == user.id,
+        'reply_to': _reply_preview(message),
+        'reactions': list(reactions),
+    }
+
+
+def message_page(channel_id, user, after=None, before=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Página de mensagens em ordem cronológica.
+
+    ``after``/``before`` são cursores (strings de ``encode_cursor``). Retorna
+    {'messages', 'before_cursor', 'after_cursor', 'has_more'}: ``before_cursor``
+    carrega o histórico anterior (None quando não há mais), ``after_cursor`` é
+    o ponto de partida da próxima sincronização incremental e ``has_more``
+    indica que há mais mensagens na direção pedida.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    queryset = _visible_messages(channel_id).select_related('sender', 'reply_to__sender')
+
+    if after:
+        created_at, message_id = decode_cursor(after)
+        queryset = queryset.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+        ).order_by('created_at', 'id')
+    else:
+        if before:
+            created_at, message_id = decode_cursor(before)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+            )
+        queryset = queryset.order_by('-created_at', '-id')
+
+    rows = list(queryset[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not after:
+        rows.reverse()
+
+    reactions = _reactions([message.id for message in rows], user) if rows else {}
+    messages = [serialize_message(message, user, reactions.get(message.id, ())) for message in rows]
+
+    if rows:
+        before_cursor = encode_cursor(rows[0].created_at, rows[0].id)
+        after_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    else:
+        before_cursor, after_cursor = before, after
+    if not after and not has_more:
+        # Início do histórico
+        before_cursor = None
+    return {
+        'messages': messages,
+        'before_cursor': before_cursor,
+        'after_cursor': after_cursor,
+        'has_more': has_more,
+    }
@@ -0,0 +1,239 @@
+import asyncio
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from chat.models import ChatAnalytics, ChatChannel, ChatChannelMembership, ChatMessage, ChatReaction
+from chat.sync import message_page
+from chat.unread import mark_read, reconcile_unread_counts
+from chat.write_behind import MessageWriteBuffer
+
+User = get_user_model()
+
+
+class MessageWriteBufferTests(TestCase):
+    """Gravação em lote das mensagens do ChatConsumer"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pass123')
+        self.bia = User.objects.create_user(username='bia', email='bia@example.com', password='pass123')
+        self.outsider = User.objects.create_user(username='fora', email='fora@example.com', password='pass123')
+        self.channel = ChatChannel.objects.create(name='Equipe', created_by=self.alice)
+        self.other_channel = ChatChannel.objects.create(name='Projetos', created_by=self.alice)
+        for channel in (self.channel, self.other_channel):
+            for user in (self.alice, self.bia):
+                ChatChannelMembership.objects.create(channel=channel, user=user)
+
+    def message(self, sender, channel=None, content='Oi'):
+        return ChatMessage(
+            id=uuid.uuid4(), channel_id=str((channel or self.channel).pk), sender_id=sender.pk,
+            content=content, created_at=timezone.now(),
+        )
+
+    def test_add_outside_event_loop_writes_immediately(self):
+        MessageWriteBuffer().add(self.message(self.alice))
+
+        self.assertEqual(ChatMessage.objects.count(), 1)
+
+    def test_flush_persists_batch(self):
+        buffer = MessageWriteBuffer(max_batch=100)
+        buffer._messages = [self.message(self.alice) for _ in range(3)]
+        buffer._messages += [self.message(self.bia, self.other_channel), self.message(self.outsider)]
+        ChatAnalytics.objects.create(channel=self.channel, date=timezone.localdate(), message_count=2)
+
+        with CaptureQueriesContext(connection) as queries:
+            saved = buffer.flush()
+
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "chat_chatmessage"')]
+        self.assertEqual(len(inserts), 1)
+
+        self.assertEqual(saved, 4)
+        self.assertEqual(len(buffer), 0)
+        self.assertFalse(ChatMessage.objects.filter(sender=self.outsider).exists())
+        counts = dict(ChatAnalytics.objects.values_list('channel_id', 'message_count'))
+        self.assertEqual(counts, {self.channel.pk: 5, self.other_channel.pk: 1})
+        membership = ChatChannelMembership.objects.get(channel=self.channel, user=self.alice)
+        self.assertIsNotNone(membership.last_read_at)
+        self.assertIsNone(ChatChannelMembership.objects.get(channel=self.channel, user=self.bia).last_read_at)
+
+    def test_last_read_never_moves_backwards(self):
+        future = timezone.now() + timedelta(hours=1)
+        ChatChannelMembership.objects.filter(user=self.alice).update(last_read_at=future)
+        buffer = MessageWriteBuffer()
+        buffer._messages = [self.message(self.alice)]
+
+        buffer.flush()
+
+        self.assertEqual(ChatChannelMembership.objects.get(channel=self.channel, user=self.alice).last_read_at, future)
+
+    def test_event_loop_flushes_after_interval_or_full_batch(self):
+        buffer = MessageWriteBuffer(interval_ms=10_000, max_batch=2)
+        flushed = []
+        buffer.flush = lambda: flushed.append(len(buffer._messages))
+
+        async def send():
+            buffer.add(self.message(self.alice))
+            self.assertIsNotNone(buffer._timer)
+            buffer.add(self.message(self.alice))
+            self.assertIsNone(buffer._timer)
+            await asyncio.gather(*buffer._tasks)
+
+        asyncio.run(send())
+        self.assertEqual(flushed, [2])
+
+
+class MessageSyncTests(TestCase):
+    """Sincronização de mensagens por cursor (chat.sync e get_messages)"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pass123')
+        self.bia = User.objects.create_user(username='bia', email='bia@example.com', password='pass123')
+        self.channel = ChatChannel.objects.create(name='Equipe', created_by=self.alice)
+        ChatChannelMembership.objects.create(channel=self.channel, user=self.alice)
+        ChatChannelMembership.objects.create(channel=self.channel, user=self.bia)
+        start = timezone.now() - timedelta(hours=1)
+        self.messages = []
+        for index in range(5):
+            message = ChatMessage.objects.create(channel=self.channel, sender=self.bia, content=f'Mensagem {index}')
+            ChatMessage.objects.filter(pk=message.pk).update(created_at=start + timedelta(minutes=index))
+            self.messages.append(message)
+        self.messages[4].reply_to = self.messages[0]
+        self.messages[4].save()
+        ChatReaction.objects.create(message=self.messages[4], user=self.alice, reaction='👍')
+        ChatReaction.objects.create(message=self.messages[4], user=self.bia, reaction='👍')
+
+    def contents(self, page):
+        return [message['content'] for message in page['messages']]
+
+    def test_pages_backwards_and_forwards_in_constant_queries(self):
+        with self.assertNumQueries(2):
+            latest = message_page(self.channel.pk, self.alice, limit=2)
+        self.assertEqual(self.contents(latest), ['Mensagem 3', 'Mensagem 4'])
+        self.assertTrue(latest['has_more'])
+        newest = latest['messages'][-1]
+        self.assertEqual(newest['reply_to']['content'], 'Mensagem 0')
+        self.assertEqual(newest['reactions'], [{'emoji': '👍', 'count': 2, 'reacted': True}])
+
+        older = message_page(self.channel.pk, self.alice, before=latest['before_cursor'], limit=2)
+        self.assertEqual(self.contents(older), ['Mensagem 1', 'Mensagem 2'])
+        oldest = message_page(self.channel.pk, self.alice, before=older['before_cursor'], limit=2)
+        self.assertEqual(self.contents(oldest), ['Mensagem 0'])
+        self.assertIsNone(oldest['before_cursor'])
+
+        self.assertEqual(message_page(self.channel.pk, self.alice, after=latest['after_cursor'])['messages'], [])
+        ChatMessage.objects.create(channel=self.channel, sender=self.alice, content='Nova')
+        newer = message_page(self.channel.pk, self.alice, after=latest['after_cursor'])
+        self.assertEqual(self.contents(newer), ['Nova'])
+
+    def test_get_messages_etag(self):
+        self.client.force_login(self.alice)
+        url = reverse('chat:get_messages', args=[self.channel.pk])
+
+        response = self.client.get(url, {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['messages']), 2)
+
+        # sessão, usuário e acesso/versão do canal (+ SAVEPOINT/RELEASE de ATOMIC_REQUESTS)
+        with self.assertNumQueries(5):
+            idle = self.client.get(url, {'limit': 2}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(idle.status_code, 304)
+
+        ChatMessage.objects.create(channel=self.channel, sender=self.bia, content='Nova')
+        changed = self.client.get(url, {'limit': 2}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['messages'][-1]['content'], 'Nova')
+
+    def test_invalid_cursor_and_access(self):
+        self.client.force_login(self.alice)
+        url = reverse('chat:get_messages', args=[self.channel.pk])
+        self.assertEqual(self.client.get(url, {'after': 'lixo'}).status_code, 400)
+
+        outsider = User.objects.create_user(username='fora', email='fora@example.com', password='pass123')
+        self.client.force_login(outsider)
+        self.assertFalse(self.client.get(url).json()['success'])
+
+
+class UnreadCounterTests(TestCase):
+    """Contadores de não lidas por associação (chat.unread) e lista de canais"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pass123')
+        self.bia = User.objects.create_user(username='bia', email='bia@example.com', password='pass123')
+        self.channel = ChatChannel.objects.create(name='Equipe', created_by=self.alice)
+        self.dm = ChatChannel.objects.create(name='Alice & Bia', created_by=self.bia, channel_type='direct')
+        for channel in (self.channel, self.dm):
+            for user in (self.alice, self.bia):
+                ChatChannelMembership.objects.create(channel=channel, user=user)
+
+    def unread(self, user, channel=None):
+        return ChatChannelMembership.objects.get(channel=channel or self.channel, user=user).unread_count
+
+    def test_counts_maintained_on_insert_read_and_delete(self):
+        first = ChatMessage.objects.create(channel=self.channel, sender=self.bia, content='Oi')
+        ChatMessage.objects.create(channel=self.channel, sender=self.bia, content='Tudo bem?')
+        self.assertEqual((self.unread(self.alice), self.unread(self.bia)), (2, 0))
+        self.channel.refresh_from_db()
+        self.assertIsNotNone(self.channel.last_message_at)
+
+        first.delete()
+        self.assertEqual(self.channel.get_unread_count(self.alice), 1)
+
+        # Lote gravado pelo write-behind: bulk_create não dispara sinais
+        buffer = MessageWriteBuffer()
+        buffer._messages = [
+            ChatMessage(id=uuid.uuid4(), channel_id=str(self.channel.pk), sender_id=sender.pk, content='Lote')
+            for sender in (self.alice, self.alice)
+        ]
+        buffer.flush()
+        # O envio marca o canal como lido para a remetente
+        self.assertEqual((self.unread(self.alice), self.unread(self.bia)), (0, 2))
+
+        mark_read(self.channel.pk, [self.bia.pk])
+        self.assertEqual(self.unread(self.bia), 0)
+
+    def test_reconcile_fixes_drift(self):
+        message = ChatMessage.objects.create(channel=self.channel, sender=self.bia, content='Oi')
+        ChatMessage.objects.create(channel=self.dm, sender=self.alice, content='Oi')
+        ChatMessage.objects.filter(pk=message.pk).update(is_deleted=True)
+        ChatChannelMembership.objects.filter(channel=self.dm, user=self.bia).update(unread_count=7)
+
+        self.assertEqual(reconcile_unread_counts(), {'memberships': 2, 'channels': 1})
+        self.assertEqual(self.unread(self.alice), 0)
+        self.assertEqual(self.unread(self.bia, self.dm), 1)
+        self.channel.refresh_from_db()
+        self.assertIsNone(self.channel.last_message_at)
+        self.assertEqual(reconcile_unread_counts(), {'memberships': 0, 'channels': 0})
+
+    def test_chat_home_sidebar_cost_independent_of_message_count(self):
+        self.client.force_login(self.alice)
+        url = reverse('chat:home')
+
+        def sidebar_queries():
+            # Apenas o contexto: o layout depende de URLs fora deste app
+            with mock.patch('chat.views.render', return_value=HttpResponse()) as render, \
+                    CaptureQueriesContext(connection) as queries:
+                self.client.get(url, {'channel': str(self.channel.pk)})
+            context = render.call_args[0][2]
+            return context, [q['sql'] for q in queries if 'chat_chatchannelmembership' in q['sql']]
+
+        ChatMessage.objects.create(channel=self.dm, sender=self.bia, content='Oi')
+        context, few = sidebar_queries()
+        self.assertEqual([dm.unread_count for dm in context['direct_messages']], [1])
+        self.assertEqual(context['direct_messages'][0].other_user, self.bia)
+        self.assertEqual(context['selected_channel'], self.channel)
+
+        ChatMessage.objects.bulk_create([
+            ChatMessage(channel=self.dm, sender=self.bia, content=f'Mensagem {index}') for index in range(50)
+        ])
+        context, many = sidebar_queries()
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(context['public_channels'], [self.channel])
+        self.assertEqual(context['direct_messages'][0].unread_count, 1)
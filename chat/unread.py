@@ -0,0 +1,153 @@
+"""
+Contadores de mensagens não lidas por associação ao canal.
+
+``ChatChannelMembership.unread_count`` e ``ChatChannel.last_message_at`` são
+mantidos na escrita, para que a lista de canais não precise varrer as
+mensagens:
+
+- inserção: ``F('unread_count') + n`` nos demais membros do canal, um UPDATE
+  por canal (mais um por remetente quando o lote tem vários), e
+  ``last_message_at`` avançado
+- leitura: ``unread_count`` zerado junto com ``last_read_at``
+- exclusão: decrementado para quem ainda não tinha lido a mensagem
+
+Escritas que não passam por aqui (update() em ``is_deleted``, importações)
+são corrigidas pela reconciliação periódica (``reconcile_unread_counts``,
+job e comando ``reconcile_chat_unread``). Mensagens anteriores à entrada no
+canal não contam como não lidas.
+"""
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from core import sidebar_counters
+from core.background_jobs import register_job
+
+
+def record_messages(messages):
+    """Contabilizar mensagens recém-inseridas (save() ou bulk_create)"""
+    from .models import ChatChannel, ChatChannelMembership
+
+    by_channel = defaultdict(list)
+    for message in messages:
+        if not message.is_deleted:
+            by_channel[message.channel_id].append(message)
+
+    for channel_id, batch in by_channel.items():
+        total = len(batch)
+        senders = Counter(message.sender_id for message in batch)
+        memberships = ChatChannelMembership.objects.filter(channel_id=channel_id)
+        memberships.exclude(user_id__in=list(senders)).update(unread_count=F('unread_count') + total)
+        for sender_id, sent in senders.items():
+            # Remetente com lote misto: conta apenas as mensagens dos outros
+            if sent < total:
+                memberships.filter(user_id=sender_id).update(unread_count=F('unread_count') + total - sent)
+
+        newest = max(message.created_at for message in batch)
+        ChatChannel.objects.filter(
+            Q(last_message_at__isnull=True) | Q(last_message_at__lt=newest), pk=channel_id
+        ).update(last_message_at=newest)
+
+
+def mark_read(channel_id, user_ids, read_at=None):
+    """Marcar o canal como lido pelos usuários; ``last_read_at`` só avança"""
+    from .models import ChatChannelMembership
+
+    read_at = read_at or timezone.now()
+    updated = ChatChannelMembership.objects.filter(
+        Q(last_read_at__isnull=True) | Q(last_read_at__lt=read_at),
+        channel_id=channel_id, user_id__in=user_ids,
+    ).update(last_read_at=read_at, unread_count=0)
+    # update() não dispara sinais
+    sidebar_counters.invalidate(user_ids, ['messages'])
+    return updated
+
+
+def _expected_unread():
+    """Subconsulta: mensagens de outros membros após a última leitura (ou a entrada)"""
+    from .models import ChatMessage
+
+    unread = ChatMessage.objects.filter(
+        channel_id=OuterRef('channel_id'),
+        is_deleted=False,
+        created_at__gt=Coalesce(OuterRef('last_read_at'), OuterRef('joined_at')),
+    ).exclude(sender_id=OuterRef('user_id')).order_by().values('channel_id').annotate(
+        total=Count('pk')
+    ).values('total')
+    return Coalesce(Subquery(unread), Value(0))
+
+
+def reconcile_unread_counts(channel_ids=None):
+    """
+    Recalcular ``unread_count`` e ``last_message_at`` a partir das mensagens.
+
+    Retorna {'memberships': corrigidas, 'channels': corrigidos}.
+    """
+    from .models import ChatChannel, ChatChannelMembership, ChatMessage
+
+    memberships = ChatChannelMembership.objects.all()
+    channels = ChatChannel.objects.all()
+    if channel_ids is not None:
+        memberships = memberships.filter(channel_id__in=channel_ids)
+        channels = channels.filter(pk__in=channel_ids)
+
+    drifted = list(
+        memberships.annotate(expected=_expected_unread()).exclude(
+            unread_count=F('expected')
+        ).values_list('pk', 'user_id', 'expected')
+    )
+    for pk, _, expected in drifted:
+        ChatChannelMembership.objects.filter(pk=pk).update(unread_count=expected)
+    if drifted:
+        sidebar_counters.invalidate([user_id for _, user_id, _ in drifted], ['messages'])
+
+    newest = ChatMessage.objects.filter(
+        channel_id=OuterRef('pk'), is_deleted=False
+    ).order_by('-created_at').values('created_at')[:1]
+    stale = [
+        (pk, expected)
+        for pk, current, expected in channels.annotate(expected=Subquery(newest)).values_list(
+            'pk', 'last_message_at', 'expected'
+        )
+        if current != expected
+    ]
+    for pk, expected in stale:
+        ChatChannel.objects.filter(pk=pk).update(last_message_at=expected)
+
+    return {'memberships': len(drifted), 'channels': len(stale)}
+
+
+@register_job
+def reconcile_chat_unread(channel_ids=None):
+    """Job de reconciliação dos contadores de mensagens não lidas"""
+    return reconcile_unread_counts(channel_ids)
+
+
+def message_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.channel_id is not None:
+        record_messages([instance])
+
+
+def message_deleted(sender, instance, **kwargs):
+    from .models import ChatChannelMembership
+
+    if instance.is_deleted or instance.channel_id is None:
+        return
+    ChatChannelMembership.objects.filter(
+        Q(last_read_at__isnull=True) | Q(last_read_at__lt=instance.created_at),
+        channel_id=instance.channel_id,
+        joined_at__lt=instance.created_at,
+        unread_count__gt=0,
+    ).exclude(user_id=instance.sender_id).update(unread_count=F('unread_count') - 1)
+
+
+def connect_signals():
+    """Conectar os sinais de manutenção dos contadores (ChatConfig.ready)"""
+    message_model = apps.get_model('chat.ChatMessage')
+    uid = 'chat_unread_counts'
+    post_save.connect(message_saved, sender=message_model, dispatch_uid=uid)
+    post_delete.connect(message_deleted, sender=message_model, dispatch_uid=uid)
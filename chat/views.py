@@ -1,15 +1,22 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.exceptions import ValidationError
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
-from django.db.models import Q, Count, Max
+from django.db.models import Q, Count, F, Max
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from core.search import search
+
 from .models import ChatChannel, ChatMessage, ChatChannelMembership, ChatAnalytics
 from .forms import ChatRoomForm, ChatMessageForm
+from .sync import DEFAULT_PAGE_SIZE, channel_version, encode_cursor, make_etag, message_page
+from .unread import mark_read
 import json
 
 User = get_user_model()
@@ -23,83 +30,44 @@ ChatRoomMembership = ChatChannelMembership
 def chat_home(request):
     """Página principal do chat completa com interface moderna"""
     
-    # Canais públicos
-    public_channels = ChatChannel.objects.filter(
-        members=request.user,
-        is_active=True,
-        channel_type='public'
-    ).annotate(
-        last_message_time=Max('messages__created_at'),
-        unread_count=Count('messages', filter=Q(
-            messages__created_at__gt=request.user.profile.last_seen_at if hasattr(request.user, 'profile') else timezone.now()
-        ))
-    ).order_by('-last_message_time')
-    
-    # Canais privados
-    private_channels = ChatChannel.objects.filter(
-        members=request.user,
-        is_active=True,
-        channel_type='private'
-    ).annotate(
-        last_message_time=Max('messages__created_at'),
-        unread_count=Count('messages', filter=Q(
-            messages__created_at__gt=request.user.profile.last_seen_at if hasattr(request.user, 'profile') else timezone.now()
-        ))
-    ).order_by('-last_message_time')
-    
-    # Canais de departamento
-    department_channels = ChatChannel.objects.filter(
-        members=request.user,
-        is_active=True,
-        channel_type='department'
-    ).annotate(
-        last_message_time=Max('messages__created_at'),
-        unread_count=Count('messages', filter=Q(
-            messages__created_at__gt=request.user.profile.last_seen_at if hasattr(request.user, 'profile') else timezone.now()
-        ))
-    ).order_by('-last_message_time')
-    
-    # Canais de projeto
-    project_channels = ChatChannel.objects.filter(
-        members=request.user,
-        is_active=True,
-        channel_type='project'
-    ).annotate(
-        last_message_time=Max('messages__created_at'),
-        unread_count=Count('messages', filter=Q(
-            messages__created_at__gt=request.user.profile.last_seen_at if hasattr(request.user, 'profile') else timezone.now()
-        ))
-    ).order_by('-last_message_time')
-    
-    # Canais favoritos
-    favorite_channels = ChatChannel.objects.filter(
-        members=request.user,
-        is_active=True,
-        memberships__is_pinned=True,
-        memberships__user=request.user
-    ).annotate(
-        last_message_time=Max('messages__created_at'),
-        unread_count=Count('messages', filter=Q(
-            messages__created_at__gt=request.user.profile.last_seen_at if hasattr(request.user, 'profile') else timezone.now()
-        ))
-    ).order_by('-last_message_time')
-    
-    # Conversas diretas (DMs)
-    direct_messages = ChatChannel.objects.filter(
-        members=request.user,
-        is_active=True,
-        channel_type='direct'
-    ).annotate(
-        last_message_time=Max('messages__created_at'),
-        unread_count=Count('messages', filter=Q(
-            messages__created_at__gt=request.user.profile.last_seen_at if hasattr(request.user, 'profile') else timezone.now()
-        ))
-    ).order_by('-last_message_time')
+    # Lista de canais em uma consulta: associações do usuário com o canal,
+    # ordenadas pela última mensagem e agrupadas por tipo. Não lidas e
+    # última mensagem são mantidas na escrita (chat.unread), sem varrer mensagens.
+    memberships = ChatChannelMembership.objects.filter(
+        user=request.user,
+        channel__is_active=True
+    ).select_related('channel').order_by(
+        F('channel__last_message_at').desc(nulls_last=True), '-channel__created_at'
+    )
     
-    # Adicionar informação do outro usuário para DMs
+    channels_by_type = {channel_type: [] for channel_type, _ in ChatChannel.CHANNEL_TYPES}
+    favorite_channels = []
+    for membership in memberships:
+        channel = membership.channel
+        channel.unread_count = membership.unread_count
+        channel.last_message_time = channel.last_message_at
+        channels_by_type[channel.channel_type].append(channel)
+        if membership.is_pinned:
+            favorite_channels.append(channel)
+
+    public_channels = channels_by_type['public']
+    private_channels = channels_by_type['private']
+    department_channels = channels_by_type['department']
+    project_channels = channels_by_type['project']
+    direct_messages = channels_by_type['direct']
+
+    # Outro participante de cada DM, em uma consulta
+    other_members = {
+        membership.channel_id: membership.user
+        for membership in ChatChannelMembership.objects.filter(
+            channel_id__in=[dm.id for dm in direct_messages]
+        ).exclude(user=request.user).select_related('user__profile')
+    } if direct_messages else {}
     for dm in direct_messages:
-        other_user = dm.members.exclude(id=request.user.id).first()
+        other_user = other_members.get(dm.id)
         dm.other_user = other_user
+        if other_user is None:
+            continue
         
         # Verificar se usuário está online (implementar lógica de presença)
         if hasattr(other_user, 'profile'):
@@ -115,28 +83,16 @@ def chat_home(request):
     
     if channel_id:
         # Buscar canal específico em todas as listas
-        all_channels = list(public_channels) + list(private_channels) + list(department_channels) + list(project_channels) + list(direct_messages)
+        all_channels = public_channels + private_channels + department_channels + project_channels + direct_messages
         selected_channel = next((ch for ch in all_channels if str(ch.id) == channel_id), None)
     
     if not selected_channel:
         # Selecionar primeiro canal disponível
-        if public_channels.exists():
-            selected_channel = public_channels.first()
-        elif favorite_channels.exists():
-            selected_channel = favorite_channels.first()
-        elif direct_messages.exists():
-            selected_channel = direct_messages.first()
-        elif private_channels.exists():
-            selected_channel = private_channels.first()
-        elif department_channels.exists():
-            selected_channel = department_channels.first()
-        elif project_channels.exists():
-            selected_channel = project_channels.first()
-
-    # Adicionar informações do outro usuário se for DM
-    if selected_channel and selected_channel.channel_type == 'direct':
-        other_user = selected_channel.members.exclude(id=request.user.id).first()
-        selected_channel.other_user = other_user
+        for channels in (public_channels, favorite_channels, direct_messages,
+                         private_channels, department_channels, project_channels):
+            if channels:
+                selected_channel = channels[0]
+                break
 
     # Mensagens do canal selecionado
     messages_list = []
@@ -146,15 +102,8 @@ def chat_home(request):
         ).select_related('sender').order_by('-created_at')[:50]
         
         # Marcar como lida
-        try:
-            membership = ChatChannelMembership.objects.get(
-                user=request.user,
-                channel=selected_channel
-            )
-            membership.last_read_at = timezone.now()
-            membership.save()
-        except ChatChannelMembership.DoesNotExist:
-            pass
+        mark_read(selected_channel.id, [request.user.id])
+        selected_channel.unread_count = 0
 
     # Usuários online (implementar lógica de presença)
     online_users = User.objects.filter(
@@ -172,10 +121,7 @@ def chat_home(request):
 
     # Estatísticas
     # Obter todos os canais do usuário para calcular mensagens
-    user_channels = ChatChannel.objects.filter(
-        members=request.user,
-        is_active=True
-    ).values_list('id', flat=True)
+    user_channels = [membership.channel_id for membership in memberships]
     
     total_messages = ChatMessage.objects.filter(
         channel_id__in=user_channels,
@@ -431,32 +377,23 @@ def mark_notification_read(request, notification_id):
 
 @login_required
 def search_messages(request):
-    """Buscar mensagens"""
+    """Buscar mensagens no índice textual (core.search), por relevância"""
     query = request.GET.get('q', '')
     room_id = request.GET.get('room')
     
-    if not query:
-        messages = ChatMessage.objects.none()
-    else:
-        # Buscar apenas em salas do usuário
-        user_rooms = ChatRoom.objects.filter(members=request.user)
-        
-        messages = ChatMessage.objects.filter(
-            room__in=user_rooms,
-            content__icontains=query,
-            is_deleted=False
-        ).order_by('-created_at')
-        
-        if room_id:
-            messages = messages.filter(room_id=room_id)
-    
-    # Paginação
-    paginator = Paginator(messages, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Apenas canais do usuário: a permissão é aplicada pela busca
+    scope = {'chat.ChatMessage': Q(channel_id=room_id)} if room_id else None
+    try:
+        page = search(
+            request.user, query, sources=['chat.ChatMessage'],
+            cursor=request.GET.get('cursor') or None, scope=scope
+        )
+    except (ValidationError, ValueError):
+        page = {'results': [], 'next_cursor': None, 'has_more': False}
     
     context = {
-        'messages': page_obj,
+        'messages': page['results'],
+        'next_cursor': page['next_cursor'],
         'query': query,
         'room_id': room_id,
         'user_rooms': ChatRoom.objects.filter(members=request.user),
@@ -466,35 +403,47 @@ def search_messages(request):
 
 
 @login_required
-@csrf_exempt
-def get_messages(request, room_id):
-    """API para obter mensagens (AJAX)"""
-    room = get_object_or_404(ChatRoom, id=room_id)
-    
-    # Verificar acesso
-    if not room.members.filter(id=request.user.id).exists():
+def get_messages(request, channel_id=None):
+    """
+    API de sincronização de mensagens (AJAX), paginada por cursor.
+
+    Parâmetros: ``after`` (novas mensagens), ``before`` (histórico) e
+    ``limit``. Responde 304 quando o ETag enviado em If-None-Match ainda é
+    válido, com uma única consulta.
+    """
+    channel_id = channel_id or request.GET.get('channel_id')
+    try:
+        has_access, version = channel_version(channel_id, request.user)
+    except ValidationError:
+        return JsonResponse({'success': False, 'message': 'Canal inválido'}, status=400)
+    if not has_access:
         return JsonResponse({'success': False, 'message': 'Acesso negado'})
-    
+
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    limit = request.GET.get('limit', DEFAULT_PAGE_SIZE)
     last_message_id = request.GET.get('last_id')
-    
-    messages = room.messages.filter(is_deleted=False).order_by('created_at')
-    
-    if last_message_id:
-        messages = messages.filter(created_at__gt=ChatMessage.objects.get(id=last_message_id).created_at)
-    
-    messages_data = []
-    for message in messages:
-        messages_data.append({
-            'id': str(message.id),
-            'content': message.content,
-            'sender': message.sender.get_full_name(),
-            'sender_id': message.sender.id,
-            'created_at': message.created_at.isoformat(),
-            'message_type': message.message_type,
-            'is_current_user': message.sender == request.user,
-        })
-    
-    return JsonResponse({'success': True, 'messages': messages_data})
+
+    etag = make_etag(version, request.user.id, after, before, limit, last_message_id)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    try:
+        if last_message_id and not after:
+            # Compatibilidade: id da última mensagem recebida
+            last = ChatMessage.objects.filter(id=last_message_id, channel_id=channel_id).values_list('created_at', 'id').first()
+            if last:
+                after = encode_cursor(*last)
+        page = message_page(channel_id, request.user, after=after, before=before, limit=limit)
+    except (ValueError, ValidationError):
+        return JsonResponse({'success': False, 'message': 'Parâmetros de paginação inválidos'}, status=400)
+
+    response = JsonResponse({'success': True, **page})
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 @login_required
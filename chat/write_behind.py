@@ -0,0 +1,189 @@
+"""
+Persistência write-behind das mensagens do chat em tempo real.
+
+O ChatConsumer faz o broadcast imediatamente e entrega a mensagem ao buffer
+do processo, que grava em lote a cada CHAT_WRITE_BEHIND_INTERVAL_MS
+milissegundos ou CHAT_WRITE_BEHIND_MAX_BATCH mensagens:
+
+1. membros dos canais do lote carregados em uma consulta; mensagens de quem
+   saiu do canal antes do flush são descartadas
+2. mensagens inseridas com um único bulk_create; contadores de não lidas
+   das associações somados por canal (``chat.unread``)
+3. last_read_at dos remetentes com um UPDATE por canal, que só avança e
+   zera o unread_count
+4. ChatAnalytics.message_count com ``F('message_count') + n`` por canal e
+   dia, sem a corrida de leitura-modificação-escrita do get_or_create + save
+5. bulk_create/update() não disparam sinais: os contadores de mensagens não
+   lidas do sidebar e o índice de busca são atualizados explicitamente
+
+Os flushes rodam na thread de banco do channels (database_sync_to_async),
+em ordem. O ``created_at`` gravado é o do flush (auto_now_add), no máximo um
+intervalo depois do enviado no broadcast.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core import sidebar_counters
+from core.search import index_instances
+
+from .unread import mark_read, record_messages
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriteBuffer:
+    """Buffer de mensagens pendentes de gravação (um por processo)"""
+
+    def __init__(self, interval_ms=None, max_batch=None):
+        if interval_ms is None:
+            interval_ms = getattr(settings, 'CHAT_WRITE_BEHIND_INTERVAL_MS', 100)
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch or getattr(settings, 'CHAT_WRITE_BEHIND_MAX_BATCH', 200)
+        self._lock = threading.Lock()
+        self._messages = []
+        self._timer = None
+        self._tasks = set()
+
+    def __len__(self):
+        return len(self._messages)
+
+    def add(self, message):
+        """Enfileirar uma ChatMessage ainda não salva"""
+        with self._lock:
+            self._messages.append(message)
+            full = len(self._messages) >= self.max_batch
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Fora de um event loop (shell, comandos): gravar na hora
+            self.flush()
+            return
+        if full:
+            self._cancel_timer()
+            self._start_flush(loop)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.interval, self._start_flush, loop)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _start_flush(self, loop):
+        self._timer = None
+        task = loop.create_task(database_sync_to_async(self.flush)())
+        # Manter a referência até o fim para a task não ser coletada
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def flush(self):
+        """Gravar as mensagens pendentes; retorna quantas foram salvas"""
+        from .models import ChatChannelMembership
+
+        with self._lock:
+            messages, self._messages = self._messages, []
+        if not messages:
+            return 0
+
+        members = defaultdict(set)
+        for channel_id, user_id in ChatChannelMembership.objects.filter(
+            channel_id__in={message.channel_id for message in messages}
+        ).values_list('channel_id', 'user_id'):
+            members[str(channel_id)].add(user_id)
+
+        accepted = [message for message in messages if message.sender_id in members[str(message.channel_id)]]
+        if len(accepted) < len(messages):
+            logger.warning(f"{len(messages) - len(accepted)} mensagens descartadas: remetente fora do canal")
+        if not accepted:
+            return 0
+
+        saved = self._insert(accepted, members)
+        if saved:
+            try:
+                with transaction.atomic():
+                    self._mark_read(saved)
+                    self._count_analytics(saved)
+            except Exception as e:
+                logger.error(f"Erro ao atualizar leitura/analytics do chat: {e}")
+        return len(saved)
+
+    def _insert(self, messages, members):
+        from .models import ChatMessage
+
+        try:
+            with transaction.atomic():
+                ChatMessage.objects.bulk_create(messages, batch_size=self.max_batch)
+                record_messages(messages)
+        except Exception as e:
+            # Isolar a mensagem problemática gravando o lote uma a uma
+            # (save() dispara os sinais, inclusive os contadores do sidebar)
+            logger.warning(f"Falha na gravação em lote de mensagens, gravando individualmente: {e}")
+            saved = []
+            for message in messages:
+                try:
+                    with transaction.atomic():
+                        message.save(force_insert=True)
+                    saved.append(message)
+                except Exception as error:
+                    logger.error(f"Erro ao salvar mensagem {message.pk}: {error}")
+            return saved
+
+        try:
+            index_instances(messages)
+        except Exception as e:
+            logger.error(f"Erro ao indexar mensagens do chat para a busca: {e}")
+
+        unread = Counter()
+        for message in messages:
+            for user_id in members[str(message.channel_id)]:
+                if user_id != message.sender_id:
+                    unread[user_id] += 1
+        by_delta = defaultdict(list)
+        for user_id, delta in unread.items():
+            by_delta[delta].append(user_id)
+        for delta, user_ids in by_delta.items():
+            sidebar_counters.adjust(user_ids, 'messages', delta)
+        return messages
+
+    def _mark_read(self, messages):
+        """Avançar last_read_at dos remetentes, um UPDATE por canal"""
+        now = timezone.now()
+        senders = defaultdict(set)
+        for message in messages:
+            senders[str(message.channel_id)].add(message.sender_id)
+        for channel_id, user_ids in senders.items():
+            mark_read(channel_id, user_ids, read_at=now)
+
+    def _count_analytics(self, messages):
+        """Somar as mensagens do lote em ChatAnalytics.message_count"""
+        from .models import ChatAnalytics
+
+        counts = Counter(
+            (str(message.channel_id), timezone.localdate(message.created_at))
+            for message in messages if message.message_type != 'system'
+        )
+        for (channel_id, day), count in counts.items():
+            lookup = dict(channel_id=channel_id, date=day)
+            if ChatAnalytics.objects.filter(**lookup).update(message_count=F('message_count') + count):
+                continue
+            try:
+                with transaction.atomic():
+                    ChatAnalytics.objects.create(message_count=count, **lookup)
+            except IntegrityError:
+                # Criado por outro processo entre o UPDATE e o INSERT
+                ChatAnalytics.objects.filter(**lookup).update(message_count=F('message_count') + count)
+
+
+message_buffer = MessageWriteBuffer()
+
+# Não perder o último lote ao encerrar o processo
+atexit.register(message_buffer.flush)
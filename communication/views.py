@@ -13,6 +13,7 @@ from django.views.decorators.http import require_http_methods
 from django.contrib.auth import get_user_model
 from datetime import datetime, timedelta
 from core.export_utils import export_universal, DataFormatter, ExportManager
+from core.search import search
 
 from .models import (
     Announcement, InternalMemo, Newsletter, 
@@ -386,27 +387,24 @@ def metrics_api(request):
 @login_required
 @require_http_methods(["GET"])
 def search_api(request):
-    """API de busca"""
+    """API de busca em comunicados e mensagens (índice textual, core.search)"""
     
     query = request.GET.get('q', '').strip()
     if not query:
         return JsonResponse({'results': []})
     
-    results = []
-    
-    # Buscar em comunicados
-    announcements = Announcement.objects.filter(
-        Q(title__icontains=query) | Q(content__icontains=query),
-        is_active=True
-    )[:5]
-    
-    for announcement in announcements:
-        results.append({
-            'type': 'announcement',
-            'title': announcement.title,
-            'url': f'/communication/announcements/{announcement.id}/',
-            'excerpt': announcement.summary or announcement.content[:150]
-        })
+    types = {
+        'communication.Announcement': 'announcement',
+        'communication.CommunicationMessage': 'message',
+    }
+    page = search(request.user, query, sources=list(types), limit=10)
+    
+    results = [{
+        'type': types[hit.type],
+        'title': hit.instance.title,
+        'url': hit.source.url(hit.instance),
+        'excerpt': hit.snippet,
+    } for hit in page['results']]
     
     return JsonResponse({'results': results})
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FileUpload, SystemConfig, SystemLog
+from .models import BackgroundJobRecord, FileUpload, SystemConfig, SystemLog
 
 
 @admin.register(FileUpload)
@@ -57,3 +57,12 @@ class SystemLogAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('user')
+
+
+@admin.register(BackgroundJobRecord)
+class BackgroundJobRecordAdmin(admin.ModelAdmin):
+    """Admin para a fila persistente de jobs em background"""
+    list_display = ['job_id', 'func_path', 'status', 'priority', 'retry_count', 'run_at', 'locked_by']
+    list_filter = ['status', 'func_path']
+    search_fields = ['job_id', 'func_path', 'error']
+    readonly_fields = ['created_at', 'started_at', 'completed_at', 'locked_by', 'pinned_to']
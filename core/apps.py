@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import search, sidebar_counters
+        from .unified_cache import connect_model_invalidators
+
+        connect_model_invalidators()
+        sidebar_counters.connect_signals()
+        search.connect_signals()
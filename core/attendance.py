@@ -0,0 +1,213 @@
+"""
+Registro de presenças em lote (chamadas pelo tablet) para projetos, oficinas
+e atividades.
+
+Uma chamada com N linhas custa um número constante de consultas:
+
+1. chaves das linhas (inscrições ou sessões) validadas em uma consulta
+2. presenças já registradas carregadas em uma consulta
+3. bulk_update das existentes e bulk_create das novas na mesma transação;
+   ``update_conflicts`` cobre a mesma chave inserida por outra chamada
+   entre a leitura e o INSERT
+4. taxas de presença das inscrições afetadas em uma consulta agrupada; nas
+   atividades, ``impact_score`` recalculado uma vez
+
+Linhas: ``{'<chave>_id': ..., 'attended': bool, <demais campos>}``. Campos
+omitidos mantêm o valor gravado; ``attended`` omitido vale False. Chaves
+fora da sessão/atividade são devolvidas em ``invalid``.
+
+bulk_create/bulk_update não disparam sinais: os contadores do dashboard
+(``dashboard.stats``) são ajustados explicitamente.
+"""
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Q
+
+TRUE_VALUES = {'1', 'true', 'on', 'yes', 'sim'}
+
+
+class AttendanceError(ValueError):
+    """Lista de presenças malformada"""
+
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in TRUE_VALUES
+    return bool(value)
+
+
+def _parse_rows(model, key, rows, fields):
+    """({chave: valores}, chaves inválidas); a última linha de cada chave prevalece"""
+    if not isinstance(rows, (list, tuple)):
+        raise AttendanceError('attendances deve ser uma lista')
+    to_key = model._meta.get_field(key).target_field.to_python
+    parsed, invalid = {}, []
+    for row in rows:
+        if not isinstance(row, dict):
+            raise AttendanceError('Cada presença deve ser um objeto')
+        raw = row.get(f'{key}_id')
+        try:
+            pk = to_key(raw)
+        except ValidationError:
+            pk = None
+        if pk in (None, ''):
+            invalid.append(str(raw))
+            continue
+
+        values = {'attended': _as_bool(row.get('attended', False))}
+        for name in fields:
+            if name not in row:
+                continue
+            field = model._meta.get_field(name)
+            try:
+                value = field.to_python(row[name])
+            except ValidationError as e:
+                raise AttendanceError(f'{name}: {"; ".join(e.messages)}')
+            if value is None and not field.null:
+                value = field.get_default()
+            values[name] = value
+        parsed[pk] = values
+    return parsed, invalid
+
+
+def _touch(model, instance):
+    """Campos auto_now (bulk_update não os atualiza); retorna seus nomes"""
+    touched = []
+    for field in model._meta.concrete_fields:
+        if getattr(field, 'auto_now', False):
+            field.pre_save(instance, add=False)
+            touched.append(field.name)
+    return touched
+
+
+def _record_stats(model, updates=(), created=()):
+    """
+    Ajustar os contadores do dashboard: ``updates`` antes de alterar as
+    instâncias em memória, ``created`` depois do bulk_create (created_at)
+    """
+    from dashboard.stats import TRACKED_MODELS, record_bulk_change, record_bulk_create
+
+    label = model._meta.label
+    if label not in TRACKED_MODELS:
+        return
+    by_value = defaultdict(list)
+    for attendance, values in updates:
+        by_value[values['attended']].append(attendance)
+    for attended, instances in by_value.items():
+        record_bulk_change(label, instances, 'attended', attended)
+    if created:
+        record_bulk_create(label, created)
+
+
+def record_attendance(model, parent, key, rows, allowed, fields=(), create_defaults=None):
+    """
+    Gravar as presenças de ``rows`` em ``model``.
+
+    ``parent`` são os campos fixos ({'session': session}), ``key`` o FK
+    variado por linha e ``allowed`` o queryset das chaves aceitas. Retorna
+    {'created', 'updated', 'invalid', 'keys'}; ``keys`` são as chaves gravadas.
+    """
+    parsed, invalid = _parse_rows(model, key, rows, fields)
+    valid = set(allowed.filter(pk__in=list(parsed)).values_list('pk', flat=True))
+    invalid += [str(pk) for pk in parsed if pk not in valid]
+    keys = [pk for pk in parsed if pk in valid]
+    if not keys:
+        return {'created': 0, 'updated': 0, 'invalid': invalid, 'keys': []}
+
+    attname = model._meta.get_field(key).attname
+    existing = {
+        getattr(attendance, attname): attendance
+        for attendance in model._default_manager.filter(**parent, **{f'{key}__in': keys})
+    }
+    updates, created = [], []
+    update_fields = set()
+    for pk in keys:
+        values = parsed[pk]
+        update_fields.update(values)
+        if pk in existing:
+            updates.append((existing[pk], values))
+        else:
+            created.append(model(**parent, **{attname: pk}, **(create_defaults or {}), **values))
+
+    with transaction.atomic():
+        _record_stats(model, updates=updates)
+        touched = set()
+        for attendance, values in updates:
+            for name, value in values.items():
+                setattr(attendance, name, value)
+            touched.update(_touch(model, attendance))
+        if updates:
+            model._default_manager.bulk_update(
+                [attendance for attendance, _ in updates], sorted(update_fields | touched)
+            )
+        if created:
+            model._default_manager.bulk_create(
+                created,
+                update_conflicts=True,
+                unique_fields=[*parent, key],
+                update_fields=sorted(update_fields),
+            )
+            _record_stats(model, created=created)
+
+    return {'created': len(created), 'updated': len(updates), 'invalid': invalid, 'keys': keys}
+
+
+def attendance_rates(model, key, keys):
+    """{chave: % de presença} das chaves em uma consulta agrupada"""
+    rows = model._default_manager.filter(**{f'{key}__in': keys}).order_by().values(key).annotate(
+        total=Count('pk'), present=Count('pk', filter=Q(attended=True))
+    )
+    return {row[key]: round(row['present'] / row['total'] * 100, 1) for row in rows if row['total']}
+
+
+def _with_rates(result, model, key):
+    result['attendance_rates'] = {
+        str(pk): rate for pk, rate in attendance_rates(model, key, result.pop('keys')).items()
+    }
+    return result
+
+
+def record_project_attendance(session, rows):
+    """Chamada de uma ProjectSession: linhas com ``enrollment_id``"""
+    from projects.models import ProjectAttendance, ProjectEnrollment
+
+    result = record_attendance(
+        ProjectAttendance, {'session': session}, 'enrollment', rows,
+        allowed=ProjectEnrollment.objects.filter(project_id=session.project_id),
+        fields=('notes', 'arrival_time', 'departure_time'),
+    )
+    return _with_rates(result, ProjectAttendance, 'enrollment')
+
+
+def record_workshop_attendance(session, rows):
+    """Chamada de uma WorkshopSession: linhas com ``enrollment_id``"""
+    from workshops.models import SessionAttendance, WorkshopEnrollment
+
+    result = record_attendance(
+        SessionAttendance, {'session': session}, 'enrollment', rows,
+        allowed=WorkshopEnrollment.objects.filter(workshop_id=session.workshop_id),
+        fields=('notes',),
+    )
+    return _with_rates(result, SessionAttendance, 'enrollment')
+
+
+def record_activity_attendance(activity, rows, recorded_by):
+    """
+    Presenças de várias sessões de uma BeneficiaryActivity (um registro por
+    sessão): linhas com ``session_id``. Recalcula o impact_score uma vez.
+    """
+    from activities.models import ActivityAttendance, ActivitySession
+
+    result = record_attendance(
+        ActivityAttendance, {}, 'session', rows,
+        allowed=ActivitySession.objects.filter(activity=activity),
+        fields=('notes', 'excuse_reason', 'arrival_time', 'departure_time'),
+        create_defaults={'recorded_by': recorded_by},
+    )
+    result.pop('keys')
+    if result['created'] or result['updated']:
+        result['impact_score'] = activity.calculate_impact_score()
+    result['attendance_rate'] = activity.attendance_rate
+    return result
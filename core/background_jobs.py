@@ -5,28 +5,106 @@ Advanced task management and scheduling system
 import threading
 import time
 import logging
+import socket
+import uuid
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor
 from django.conf import settings
 from django.core.mail import send_mass_mail
+from django.db import close_old_connections
 from django.utils import timezone
+from django.utils.module_loading import import_string
 from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from typing import Dict, List, Callable, Any
 import json
 import os
-from pathlib import Path
+
+from . import job_backends
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
 class JobStatus:
     """Job status constants"""
-    PENDING = 'pending'
-    RUNNING = 'running'
-    COMPLETED = 'completed'
-    FAILED = 'failed'
-    CANCELLED = 'cancelled'
+    PENDING = job_backends.PENDING
+    RUNNING = job_backends.RUNNING
+    COMPLETED = job_backends.COMPLETED
+    FAILED = job_backends.FAILED
+    CANCELLED = job_backends.CANCELLED
+
+# Progress reported by running jobs, readable from any process sharing the cache
+PROGRESS_KEY_PREFIX = 'job_progress'
+PROGRESS_TIMEOUT = 60 * 60 * 24
+
+# Job executing in the current thread (set by JobScheduler._execute_job)
+_job_context = threading.local()
+
+def current_job_id():
+    """Id of the job running in this thread, or None outside a job"""
+    return getattr(_job_context, 'job_id', None)
+
+def report_progress(processed: int, total: int = None, **details):
+    """
+    Record the progress of the running job.
+
+    No-op outside a job, so long-running helpers can call it unconditionally.
+    """
+    job_id = current_job_id()
+    if job_id is None:
+        return
+    progress = {
+        'processed': processed,
+        'total': total,
+        'percent': round(processed / total * 100, 1) if total else None,
+        'updated_at': timezone.now().isoformat(),
+        **details,
+    }
+    cache.set(f"{PROGRESS_KEY_PREFIX}:{job_id}", progress, PROGRESS_TIMEOUT)
+
+def get_job_progress(job_id: str):
+    """Last progress reported by a job, or None"""
+    return cache.get(f"{PROGRESS_KEY_PREFIX}:{job_id}")
+
+# Jobs registered by name, resolvable from any worker process
+JOB_REGISTRY: Dict[str, Callable] = {}
+
+def register_job(func: Callable = None, *, name: str = None):
+    """
+    Register a job function under its dotted path (or ``name``).
+
+    Registered/importable functions can be persisted and resumed by any
+    worker after a restart. Usable as ``@register_job`` or ``@register_job(name=...)``.
+    """
+    def decorator(f):
+        JOB_REGISTRY[name or f"{f.__module__}.{f.__qualname__}"] = f
+        return f
+    return decorator(func) if func is not None else decorator
+
+def func_path_for(func: Callable) -> str:
+    """Dotted path of a job function"""
+    for name, registered in JOB_REGISTRY.items():
+        if registered is func:
+            return name
+    if hasattr(func, '__qualname__'):
+        return f"{func.__module__}.{func.__qualname__}"
+    return str(func)
+
+def resolve_job(func_path: str) -> Callable:
+    """Resolve a dotted path to a job function (registry first, then import)"""
+    if func_path in JOB_REGISTRY:
+        return JOB_REGISTRY[func_path]
+    return import_string(func_path)
+
+def _is_portable(func: Callable, func_path: str, args: tuple, kwargs: dict) -> bool:
+    """A job is portable when another process can rebuild it from its record"""
+    try:
+        if resolve_job(func_path) is not func:
+            return False
+        json.dumps([list(args), kwargs])
+    except (ImportError, TypeError, ValueError):
+        return False
+    return True
 
 class BackgroundJob:
     """Individual background job"""
@@ -35,6 +113,7 @@ class BackgroundJob:
                  priority: int = 1, retry_count: int = 0, max_retries: int = 3):
         self.job_id = job_id
         self.func = func
+        self.func_path = func_path_for(func) if func is not None else ''
         self.args = args
         self.kwargs = kwargs or {}
         self.priority = priority
@@ -42,16 +121,19 @@ class BackgroundJob:
         self.max_retries = max_retries
         self.status = JobStatus.PENDING
         self.created_at = timezone.now()
+        self.run_at = self.created_at
         self.started_at = None
         self.completed_at = None
         self.error = None
         self.result = None
+        self.locked_by = ''
+        self.pinned_to = ''
         
     def to_dict(self):
         """Convert job to dictionary for serialization"""
         return {
             'job_id': self.job_id,
-            'func_name': f"{self.func.__module__}.{self.func.__name__}" if hasattr(self.func, '__name__') else str(self.func),
+            'func_name': self.func_path,
             'args': self.args,
             'kwargs': self.kwargs,
             'priority': self.priority,
@@ -59,54 +141,123 @@ class BackgroundJob:
             'max_retries': self.max_retries,
             'status': self.status,
             'created_at': self.created_at.isoformat(),
+            'run_at': self.run_at.isoformat() if self.run_at else None,
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
             'error': self.error,
             'result': str(self.result) if self.result else None
         }
 
+    def to_record(self) -> dict:
+        """Convert job to a storage backend record"""
+        return job_backends.empty_record(
+            job_id=self.job_id,
+            func_path=self.func_path,
+            args=list(self.args),
+            kwargs=self.kwargs,
+            priority=self.priority,
+            retry_count=self.retry_count,
+            max_retries=self.max_retries,
+            status=self.status,
+            created_at=self.created_at,
+            run_at=self.run_at,
+            pinned_to=self.pinned_to,
+            heartbeat_at=self.created_at,
+        )
+
+    @classmethod
+    def from_record(cls, record: dict, func: Callable = None) -> 'BackgroundJob':
+        """Rebuild a job from a storage backend record"""
+        job = cls(record['job_id'], func, tuple(record['args'] or ()), record['kwargs'] or {},
+                  record['priority'], record['retry_count'], record['max_retries'])
+        job.func_path = record['func_path']
+        for field in ('status', 'created_at', 'run_at', 'started_at', 'completed_at',
+                      'error', 'result', 'locked_by', 'pinned_to'):
+            setattr(job, field, record[field])
+        return job
+
+class _LeaseRenewal:
+    """Renew a scheduler's leases from a helper thread while the block runs"""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.scheduler.HEARTBEAT_INTERVAL):
+            try:
+                self.scheduler._renew_leases(force=True)
+            except Exception as e:
+                logger.error(f"Error renewing job leases: {e}")
+            finally:
+                close_old_connections()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join(timeout=5)
+        return False
+
 class JobScheduler:
-    """Job scheduler and executor"""
+    """
+    Job scheduler and executor
+
+    Jobs are stored in a pluggable backend (see core.job_backends), so pending
+    and retrying jobs survive restarts and several worker processes can drain
+    the same queue: each job is claimed atomically by exactly one worker.
+    """
+
+    # Seconds before a failed job is retried
+    RETRY_DELAY = 30
+    # Leases of this worker's jobs are renewed every HEARTBEAT_INTERVAL seconds;
+    # a lease not renewed for LEASE_TIMEOUT means the worker died
+    HEARTBEAT_INTERVAL = getattr(settings, 'BACKGROUND_JOBS_HEARTBEAT_INTERVAL', 60)
+    LEASE_TIMEOUT = timedelta(seconds=getattr(settings, 'BACKGROUND_JOBS_LEASE_TIMEOUT', 300))
     
-    def __init__(self, max_workers: int = 4):
+    def __init__(self, max_workers: int = 4, backend: job_backends.BaseJobBackend = None):
         self.max_workers = max_workers
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.backend = backend or job_backends.get_job_backend()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Jobs submitted or executed by this process
         self.jobs: Dict[str, BackgroundJob] = {}
-        self.job_queue: List[BackgroundJob] = []
-        self.running_jobs: Dict[str, threading.Thread] = {}
+        # Callables/arguments of jobs that cannot be rebuilt from their record
+        self._local_payloads: Dict[str, tuple] = {}
+        self.running_jobs: Dict[str, Future] = {}
+        self._last_stale_check = 0.0
+        self._last_heartbeat = 0.0
         self.shutdown = False
         self.worker_thread = None
         
-        # Job persistence
-        self.job_file = Path(settings.BASE_DIR) / 'logs' / 'background_jobs.json'
-        self.job_file.parent.mkdir(exist_ok=True)
-        
-        # Load existing jobs
-        self._load_jobs()
-        
     def add_job(self, job_id: str, func: Callable, args: tuple = (), kwargs: dict = None, 
                 priority: int = 1, delay: int = 0, max_retries: int = 3) -> BackgroundJob:
         """Add a new job to the queue"""
-        
-        # Check if job already exists
-        if job_id in self.jobs:
-            logger.warning(f"Job {job_id} already exists")
-            return self.jobs[job_id]
-        
         job = BackgroundJob(job_id, func, args, kwargs, priority, max_retries=max_retries)
         
         # Add delay if specified
         if delay > 0:
-            job.created_at = timezone.now() + timedelta(seconds=delay)
+            job.run_at = job.created_at + timedelta(seconds=delay)
+
+        if not _is_portable(func, job.func_path, job.args, job.kwargs):
+            job.pinned_to = self.worker_id
+            self._local_payloads[job_id] = (func, job.args, job.kwargs)
+
+        if not self.backend.enqueue(job.to_record()):
+            logger.warning(f"Job {job_id} already exists")
+            if job.pinned_to:
+                self._local_payloads.pop(job_id, None)
+            if job_id not in self.jobs:
+                record = self.backend.get(job_id)
+                if record:
+                    self.jobs[job_id] = BackgroundJob.from_record(record, func)
+            return self.jobs.get(job_id, job)
         
         self.jobs[job_id] = job
-        self.job_queue.append(job)
-        
-        # Sort by priority (higher priority first)
-        self.job_queue.sort(key=lambda x: x.priority, reverse=True)
-        
         logger.info(f"Added job {job_id} with priority {priority}")
-        self._save_jobs()
         
         return job
     
@@ -133,41 +284,88 @@ class JobScheduler:
         """Main worker loop"""
         while not self.shutdown:
             try:
-                # Process next job
-                job = self._get_next_job()
-                if job:
-                    self._execute_job(job)
-                else:
+                self._renew_leases()
+                self._requeue_stale_jobs()
+                jobs = self._claim_jobs()
+                for job in jobs:
+                    future = self.executor.submit(self._execute_job, job)
+                    self.running_jobs[job.job_id] = future
+                    future.add_done_callback(lambda f, job_id=job.job_id: self.running_jobs.pop(job_id, None))
+                if not jobs:
                     time.sleep(1)  # No jobs available, wait
                     
             except Exception as e:
                 logger.error(f"Error in worker loop: {e}")
                 time.sleep(5)  # Wait before retrying
+            finally:
+                close_old_connections()
     
+    def _claim_jobs(self) -> List[BackgroundJob]:
+        """Claim as many due jobs as there are free workers"""
+        free_slots = self.max_workers - len(self.running_jobs)
+        if free_slots <= 0:
+            return []
+
+        jobs = []
+        for record in self.backend.claim(self.worker_id, limit=free_slots):
+            job = self._job_from_record(record)
+            if job is not None:
+                jobs.append(job)
+        return jobs
+
     def _get_next_job(self) -> BackgroundJob:
         """Get the next job to execute"""
-        if not self.job_queue:
+        if len(self.running_jobs) >= self.max_workers:
             return None
-        
-        # Find next job that's ready to run
-        current_time = timezone.now()
-        for i, job in enumerate(self.job_queue):
-            if (job.status == JobStatus.PENDING and 
-                job.created_at <= current_time and
-                len(self.running_jobs) < self.max_workers):
-                
-                # Remove from queue
-                self.job_queue.pop(i)
-                return job
-        
-        return None
+        records = self.backend.claim(self.worker_id, limit=1)
+        return self._job_from_record(records[0]) if records else None
+
+    def _job_from_record(self, record: dict) -> BackgroundJob:
+        """Attach the callable to a claimed record"""
+        job_id = record['job_id']
+        if job_id in self._local_payloads:
+            func, args, kwargs = self._local_payloads[job_id]
+        else:
+            try:
+                func = resolve_job(record['func_path'])
+            except ImportError as e:
+                logger.error(f"Job {job_id}: cannot resolve {record['func_path']}: {e}")
+                self.backend.fail(job_id, f"Cannot resolve job function: {e}")
+                return None
+            args, kwargs = tuple(record['args'] or ()), record['kwargs'] or {}
+
+        job = self.jobs.get(job_id)
+        if job is None:
+            job = BackgroundJob.from_record(record, func)
+            self.jobs[job_id] = job
+        job.func, job.args, job.kwargs = func, args, kwargs
+        job.status = JobStatus.RUNNING
+        job.started_at = record['started_at']
+        job.locked_by = self.worker_id
+        return job
+
+    def _renew_leases(self, force: bool = False):
+        """Periodically renew the leases of the jobs this worker holds"""
+        if not force and time.monotonic() - self._last_heartbeat < self.HEARTBEAT_INTERVAL:
+            return
+        self._last_heartbeat = time.monotonic()
+        self.backend.heartbeat(self.worker_id)
+
+    def _requeue_stale_jobs(self):
+        """Periodically hand jobs of crashed workers back to the queue"""
+        if time.monotonic() - self._last_stale_check < 60:
+            return
+        self._last_stale_check = time.monotonic()
+        expired = self.backend.requeue_stale(timezone.now() - self.LEASE_TIMEOUT)
+        if expired:
+            logger.warning(f"Expired the leases of {expired} jobs held by dead workers")
     
     def _execute_job(self, job: BackgroundJob):
         """Execute a job"""
+        _job_context.job_id = job.job_id
         try:
             job.status = JobStatus.RUNNING
-            job.started_at = timezone.now()
-            self.running_jobs[job.job_id] = threading.current_thread()
+            job.started_at = job.started_at or timezone.now()
             
             logger.info(f"Executing job {job.job_id}")
             
@@ -175,9 +373,11 @@ class JobScheduler:
             result = job.func(*job.args, **job.kwargs)
             
             # Job completed successfully
-            job.status = JobStatus.COMPLETED
             job.completed_at = timezone.now()
             job.result = result
+            self.backend.complete(job.job_id, str(result) if result else None)
+            job.status = JobStatus.COMPLETED
+            self._local_payloads.pop(job.job_id, None)
             
             logger.info(f"Job {job.job_id} completed successfully")
             
@@ -188,65 +388,77 @@ class JobScheduler:
             
             if job.retry_count < job.max_retries:
                 # Retry the job
+                job.run_at = timezone.now() + timedelta(seconds=self.RETRY_DELAY)
+                self.backend.fail(job.job_id, job.error, retry_at=job.run_at)
                 job.status = JobStatus.PENDING
-                job.created_at = timezone.now() + timedelta(seconds=30)  # Retry after 30 seconds
-                self.job_queue.append(job)
                 logger.warning(f"Job {job.job_id} failed, retrying ({job.retry_count}/{job.max_retries})")
             else:
                 # Max retries exceeded
-                job.status = JobStatus.FAILED
                 job.completed_at = timezone.now()
+                self.backend.fail(job.job_id, job.error)
+                job.status = JobStatus.FAILED
+                self._local_payloads.pop(job.job_id, None)
                 logger.error(f"Job {job.job_id} failed permanently: {e}")
         
         finally:
-            # Remove from running jobs
-            if job.job_id in self.running_jobs:
-                del self.running_jobs[job.job_id]
-            
-            # Save job state
-            self._save_jobs()
+            _job_context.job_id = None
+            close_old_connections()
+
+    def run_pending(self, limit: int = None) -> int:
+        """
+        Claim and execute due jobs synchronously in the calling thread.
+
+        Used by management commands/cron-style workers and tests. Returns the
+        number of jobs executed.
+        """
+        executed = 0
+        while limit is None or executed < limit:
+            job = self._get_next_job()
+            if job is None:
+                break
+            # No worker loop here: a helper thread keeps the lease alive
+            with _LeaseRenewal(self):
+                self._execute_job(job)
+            executed += 1
+        return executed
     
     def get_job_status(self, job_id: str) -> dict:
         """Get the status of a job"""
-        if job_id not in self.jobs:
+        record = self.backend.get(job_id)
+        if record is None:
             return {'error': 'Job not found'}
         
-        return self.jobs[job_id].to_dict()
+        job = self.jobs.get(job_id) or BackgroundJob.from_record(record)
+        job.status = record['status']
+        status = job.to_dict()
+        status['progress'] = get_job_progress(job_id)
+        return status
     
     def cancel_job(self, job_id: str) -> bool:
         """Cancel a job"""
-        if job_id not in self.jobs:
+        if not self.backend.cancel(job_id):
             return False
-        
-        job = self.jobs[job_id]
-        
-        if job.status == JobStatus.RUNNING:
-            # Can't cancel running job easily, mark as cancelled
-            job.status = JobStatus.CANCELLED
-            return True
-        elif job.status == JobStatus.PENDING:
-            # Remove from queue
-            if job in self.job_queue:
-                self.job_queue.remove(job)
-            job.status = JobStatus.CANCELLED
-            return True
-        
-        return False
+        # A running job cannot be interrupted; it is only marked as cancelled
+        if job_id in self.jobs:
+            self.jobs[job_id].status = JobStatus.CANCELLED
+        self._local_payloads.pop(job_id, None)
+        return True
+
+    def recent_jobs(self, limit: int = 10) -> List[dict]:
+        """Most recently created jobs across all workers"""
+        return [BackgroundJob.from_record(record).to_dict() for record in self.backend.recent(limit)]
     
     def get_job_statistics(self) -> dict:
         """Get job statistics"""
-        total_jobs = len(self.jobs)
+        status_counts = self.backend.stats()
+        total_jobs = sum(status_counts.values())
         if total_jobs == 0:
             return {'total_jobs': 0}
         
-        status_counts = {}
-        for job in self.jobs.values():
-            status_counts[job.status] = status_counts.get(job.status, 0) + 1
-        
         return {
             'total_jobs': total_jobs,
             'status_counts': status_counts,
-            'queue_size': len(self.job_queue),
+            'queue_size': status_counts.get(JobStatus.PENDING, 0),
             'running_jobs': len(self.running_jobs),
             'max_workers': self.max_workers
         }
@@ -254,48 +466,18 @@ class JobScheduler:
     def cleanup_old_jobs(self, days: int = 7):
         """Clean up old completed/failed jobs"""
         cutoff_date = timezone.now() - timedelta(days=days)
-        jobs_to_remove = []
-        
-        for job_id, job in self.jobs.items():
-            if (job.status in [JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED] and 
-                job.created_at < cutoff_date):
-                jobs_to_remove.append(job_id)
-        
-        for job_id in jobs_to_remove:
-            del self.jobs[job_id]
+        removed = self.backend.cleanup(cutoff_date)
+
+        for job_id, job in list(self.jobs.items()):
+            if job.status in job_backends.TERMINAL_STATES and job.created_at < cutoff_date:
+                del self.jobs[job_id]
         
-        logger.info(f"Cleaned up {len(jobs_to_remove)} old jobs")
-        self._save_jobs()
+        logger.info(f"Cleaned up {removed} old jobs")
         
-        return len(jobs_to_remove)
-    
-    def _save_jobs(self):
-        """Save jobs to file"""
-        try:
-            jobs_data = {job_id: job.to_dict() for job_id, job in self.jobs.items()}
-            with open(self.job_file, 'w') as f:
-                json.dump(jobs_data, f, indent=2, default=str)
-        except Exception as e:
-            logger.error(f"Failed to save jobs: {e}")
-    
-    def _load_jobs(self):
-        """Load jobs from file"""
-        try:
-            if self.job_file.exists():
-                with open(self.job_file, 'r') as f:
-                    jobs_data = json.load(f)
-                
-                # Only load pending jobs (others are historical)
-                for job_id, job_data in jobs_data.items():
-                    if job_data.get('status') == JobStatus.PENDING:
-                        # Would need to reconstruct function references
-                        # For now, just load the data
-                        logger.info(f"Found pending job {job_id} - manual restart required")
-                        
-        except Exception as e:
-            logger.error(f"Failed to load jobs: {e}")
+        return removed
 
 # Common job functions
+@register_job
 def send_bulk_email(subject: str, message: str, recipient_list: List[str], from_email: str = None):
     """Send bulk email job"""
     try:
@@ -321,6 +503,7 @@ def send_bulk_email(subject: str, message: str, recipient_list: List[str], from_
         logger.error(f"Bulk email job failed: {e}")
         raise
 
+@register_job
 def cleanup_cache():
     """Cache cleanup job"""
     try:
@@ -331,6 +514,7 @@ def cleanup_cache():
         logger.error(f"Cache cleanup failed: {e}")
         raise
 
+@register_job
 def generate_report(report_type: str, **kwargs):
     """Generate report job"""
     try:
@@ -351,6 +535,7 @@ def generate_report(report_type: str, **kwargs):
         logger.error(f"Report generation failed: {e}")
         raise
 
+@register_job
 def process_uploaded_file(file_path: str, user_id: int):
     """Process uploaded file job"""
     try:
@@ -5,17 +5,42 @@ MoveMarias - Cache adaptativo para melhor performance
 
 import hashlib
 import json
+import re
 from functools import wraps
-from django.core.cache import cache
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 import logging
 
+from .unified_cache import UnifiedCache, invalidate_tags, make_key_hash
+
 logger = logging.getLogger(__name__)
 
+# Chaves geradas por cache_key_user/cache_key_model recebem a tag do dono
+_USER_KEY = re.compile(r'^user_(?P<id>[^:]+):')
+_MODEL_KEY = re.compile(r'^model_(?P<label>[^:]+):')
+
+
+def _tags_for_key(key):
+    """Tags derivadas do formato da chave (``user_<id>:...``, ``model_<label>:...``)"""
+    key = str(key)
+    match = _USER_KEY.match(key)
+    if match:
+        return [f"user:{match.group('id')}"]
+    match = _MODEL_KEY.match(key)
+    if match:
+        return [f"model:{match.group('label')}"]
+    return []
+
+
 class SmartCache:
-    """Sistema de cache inteligente com invalidação automática"""
+    """
+    Sistema de cache inteligente com invalidação automática
+
+    Fachada sobre core.unified_cache.UnifiedCache: o prefixo é o namespace,
+    a invalidação é feita por tags versionadas e get_or_set/cached_method
+    recalculam em voo único.
+    """
     
     def __init__(self, prefix='mm_cache'):
         self.prefix = prefix
@@ -32,6 +57,7 @@ class SmartCache:
                 'LONG': 3600,
                 'VERY_LONG': 86400
             }
+        self.cache = UnifiedCache(prefix, default_timeout=self.default_timeout)
     
     def _make_key(self, key):
         """Cria uma chave única para o cache"""
@@ -39,69 +65,64 @@ class SmartCache:
     
     def _serialize_args(self, args, kwargs):
         """Serializa argumentos para criar chave única"""
-        try:
-            serialized = json.dumps({
-                'args': args,
-                'kwargs': sorted(kwargs.items())
-            }, sort_keys=True)
-            return hashlib.md5(serialized.encode()).hexdigest()
-        except (TypeError, ValueError):
-            # Se não conseguir serializar, usa hash dos objetos
-            return hashlib.md5(str(args + tuple(sorted(kwargs.items()))).encode()).hexdigest()
+        return make_key_hash(args, sorted(kwargs.items()))
     
-    def get(self, key, default=None):
-        """Recupera valor do cache"""
-        cache_key = self._make_key(key)
-        return cache.get(cache_key, default)
-    
-    def set(self, key, value, timeout=None):
-        """Armazena valor no cache"""
-        cache_key = self._make_key(key)
+    def _timeout(self, timeout):
         timeout = timeout or self.default_timeout
-        
         # Ensure timeout is an integer
         if isinstance(timeout, dict):
             timeout = timeout.get('MEDIUM', 300)
-        
-        # Adiciona metadados
-        cached_data = {
+        return timeout
+    
+    def _wrap(self, value, timeout):
+        # Metadados mantidos no formato histórico {'value', 'timestamp', 'timeout'}
+        return {
             'value': value,
             'timestamp': timezone.now().isoformat(),
             'timeout': timeout
         }
-        
-        cache.set(cache_key, cached_data, timeout)
-        logger.debug(f"Cache set: {cache_key} (timeout: {timeout}s)")
+    
+    def get(self, key, default=None):
+        """Recupera valor do cache"""
+        return self.cache.get(key, default, tags=_tags_for_key(key))
+    
+    def set(self, key, value, timeout=None, tags=None):
+        """Armazena valor no cache"""
+        timeout = self._timeout(timeout)
+        self.cache.set(key, self._wrap(value, timeout), timeout, tags=_tags_for_key(key) + list(tags or ()))
+        logger.debug(f"Cache set: {self._make_key(key)} (timeout: {timeout}s)")
     
     def delete(self, key):
         """Remove valor do cache"""
-        cache_key = self._make_key(key)
-        cache.delete(cache_key)
-        logger.debug(f"Cache deleted: {cache_key}")
+        self.cache.delete(key)
+        logger.debug(f"Cache deleted: {self._make_key(key)}")
     
     def clear_pattern(self, pattern):
-        """Remove todos os valores que correspondem ao padrão"""
-        # Nota: Esta funcionalidade depende do backend de cache
-        # Redis suporta, mas memcached não
-        try:
-            if hasattr(cache, 'delete_pattern'):
-                cache.delete_pattern(f"{self.prefix}:{pattern}")
-            else:
-                logger.warning("Cache backend doesn't support pattern deletion")
-        except Exception as e:
-            logger.error(f"Error clearing cache pattern {pattern}: {e}")
+        """
+        Invalida os valores que correspondem ao padrão.
+
+        Sem varrer chaves: ``*`` invalida o namespace inteiro e padrões
+        ``user_<id>:*``/``model_<label>:*`` invalidam a tag correspondente.
+        """
+        tags = _tags_for_key(pattern)
+        if tags:
+            invalidate_tags(*tags)
+        elif pattern == '*':
+            self.cache.clear()
+        else:
+            logger.warning(f"Padrão de cache sem tag correspondente, invalidando namespace {self.prefix}: {pattern}")
+            self.cache.clear()
     
-    def get_or_set(self, key, callable_func, timeout=None):
-        """Recupera do cache ou executa função e armazena resultado"""
-        cached_data = self.get(key)
-        
-        if cached_data is not None:
-            return cached_data['value']
-        
-        # Executa função e armazena resultado
-        result = callable_func()
-        self.set(key, result, timeout)
-        return result
+    def get_or_set(self, key, callable_func, timeout=None, tags=None):
+        """Recupera do cache ou executa função (em voo único) e armazena resultado"""
+        timeout = self._timeout(timeout)
+        cached_data = self.cache.get_or_set(
+            key,
+            lambda: self._wrap(callable_func(), timeout),
+            timeout,
+            tags=_tags_for_key(key) + list(tags or ()),
+        )
+        return cached_data['value']
     
     def cached_method(self, timeout=None, key_func=None):
         """Decorator para cache de métodos"""
@@ -112,19 +133,8 @@ class SmartCache:
                 if key_func:
                     cache_key = key_func(*args, **kwargs)
                 else:
-                    cache_key = self._serialize_args(args, kwargs)
-                
-                # Verifica se valor está em cache
-                cached_value = self.get(cache_key)
-                if cached_value is not None:
-                    logger.debug(f"Cache hit: {cache_key}")
-                    return cached_value['value']
-                
-                # Executa função e armazena no cache
-                result = func(*args, **kwargs)
-                self.set(cache_key, result, timeout)
-                logger.debug(f"Cache miss: {cache_key}")
-                return result
+                    cache_key = f"{func.__module__}.{func.__qualname__}:{self._serialize_args(args, kwargs)}"
+                return self.get_or_set(cache_key, lambda: func(*args, **kwargs), timeout)
             
             return wrapper
         return decorator
@@ -226,11 +236,11 @@ def cache_key_model(model_class, key):
 
 def invalidate_user_cache(user_id):
     """Invalida cache específico de um usuário"""
-    smart_cache.clear_pattern(f"user_{user_id}:*")
+    invalidate_tags(f"user:{user_id}")
 
 def invalidate_model_cache(model_class):
     """Invalida cache específico de um modelo"""
-    smart_cache.clear_pattern(f"model_{model_class._meta.label_lower}:*")
+    invalidate_tags(f"model:{model_class._meta.label_lower}")
 
 # Decorators
 def cached(timeout=300, key_func=None):
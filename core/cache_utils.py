@@ -1,5 +1,8 @@
 """
 Cache decorators and utilities for Move Marias system.
+
+Built on core.unified_cache: entries carry versioned tags and are
+invalidated by bumping a tag instead of scanning for key patterns.
 """
 
 from functools import wraps
@@ -8,8 +11,19 @@ from django.conf import settings
 import hashlib
 import json
 
+from .unified_cache import UnifiedCache, invalidate_tags, model_tag
+
+view_cache = UnifiedCache('view')
+model_method_cache = UnifiedCache('model')
+
 
-def cache_view(timeout=300, key_prefix='view', vary_on_user=True, vary_on_params=None):
+def path_tag(path):
+    """Tag for the site section of a path ('/members/12/' -> 'path:/members')"""
+    section = path.strip('/').split('/', 1)[0]
+    return f'path:/{section}'
+
+
+def cache_view(timeout=300, key_prefix='view', vary_on_user=True, vary_on_params=None, tags=None):
     """
     Decorator to cache view results.
     
@@ -18,6 +32,10 @@ def cache_view(timeout=300, key_prefix='view', vary_on_user=True, vary_on_params
         key_prefix: Prefix for cache key
         vary_on_user: Include user ID in cache key
         vary_on_params: List of GET parameters to include in cache key
+        tags: Extra invalidation tags (list, or callable receiving the view arguments)
+    
+    Entries are tagged with the path section (``path:/members``) and, when
+    varying on user, ``user:<id>``.
     """
     def decorator(func):
         @wraps(func)
@@ -43,15 +61,16 @@ def cache_view(timeout=300, key_prefix='view', vary_on_user=True, vary_on_params
             
             cache_key = '_'.join(key_parts)
             
-            # Try to get from cache
-            result = cache.get(cache_key)
-            if result is not None:
-                return result
+            entry_tags = [path_tag(request.path)]
+            if vary_on_user and hasattr(request, 'user') and request.user.is_authenticated:
+                entry_tags.append(f'user:{request.user.id}')
+            if tags:
+                entry_tags.extend(tags(request, *args, **kwargs) if callable(tags) else tags)
             
-            # Generate result and cache it
-            result = func(request, *args, **kwargs)
-            cache.set(cache_key, result, timeout)
-            return result
+            # Get from cache or generate once (single-flight) and cache it
+            return view_cache.get_or_set(
+                cache_key, lambda: func(request, *args, **kwargs), timeout, tags=entry_tags
+            )
         
         return wrapper
     return decorator
@@ -71,15 +90,11 @@ def cache_model_method(timeout=300, key_prefix='model'):
             
             cache_key = f"{key_prefix}_{model_name}_{instance_id}_{func.__name__}_{args_hash}"
             
-            # Try to get from cache
-            result = cache.get(cache_key)
-            if result is not None:
-                return result
-            
-            # Generate result and cache it
-            result = func(self, *args, **kwargs)
-            cache.set(cache_key, result, timeout)
-            return result
+            # Tagged with the instance (e.g. 'beneficiary:42') so saving the
+            # object invalidates every cached method result at once
+            return model_method_cache.get_or_set(
+                cache_key, lambda: func(self, *args, **kwargs), timeout, tags=[model_tag(self)]
+            )
         
         return wrapper
     return decorator
@@ -88,6 +103,8 @@ def cache_model_method(timeout=300, key_prefix='model'):
 def invalidate_cache_pattern(pattern):
     """
     Invalidate all cache keys matching a pattern.
+    
+    Legacy helper (Redis only, O(keyspace)); prefer invalidate_tags.
     """
     from django.core.cache.backends.base import InvalidCacheKey
     
@@ -111,37 +128,17 @@ class CacheInvalidator:
     @staticmethod
     def invalidate_beneficiary_cache(beneficiary_id):
         """Invalidate all cache related to a specific beneficiary."""
-        patterns = [
-            f'view_*beneficiary*{beneficiary_id}*',
-            f'model_Beneficiary_{beneficiary_id}_*',
-            'view_*/members/*',
-            'view_*/dashboard/*',
-        ]
-        
-        for pattern in patterns:
-            invalidate_cache_pattern(pattern)
+        invalidate_tags(f'beneficiary:{beneficiary_id}', 'path:/members', 'path:/dashboard')
     
     @staticmethod
     def invalidate_dashboard_cache():
         """Invalidate dashboard-related cache."""
-        patterns = [
-            'view_*/dashboard/*',
-            'view_dashboard_*',
-        ]
-        
-        for pattern in patterns:
-            invalidate_cache_pattern(pattern)
+        invalidate_tags('dashboard', 'path:/dashboard')
     
     @staticmethod
     def invalidate_user_cache(user_id):
         """Invalidate user-specific cache."""
-        patterns = [
-            f'view_*user_{user_id}*',
-            f'model_CustomUser_{user_id}_*',
-        ]
-        
-        for pattern in patterns:
-            invalidate_cache_pattern(pattern)
+        invalidate_tags(f'user:{user_id}', f'customuser:{user_id}')
 
 
 # Cache timeout constants
@@ -1,6 +1,6 @@
 from django.middleware.csrf import get_token
 from django.conf import settings
-from .unified_permissions import get_user_permissions
+from .user_context import get_user_context
 
 def csrf_token_processor(request):
     """
@@ -25,26 +25,17 @@ def global_context(request):
 def unified_permissions(request):
     """
     Adiciona permissões unificadas ao contexto dos templates
+    (request.user_context: papéis e contadores resolvidos uma vez por requisição)
     """
     if request.user.is_authenticated:
-        # Obter permissões do usuário
-        permissions = get_user_permissions(request.user)
-        
-        # Contar notificações não lidas
-        unread_notifications = 0
-        try:
-            from notifications.models import Notification
-            unread_notifications = Notification.objects.filter(
-                recipient=request.user, 
-                status='pending'
-            ).count()
-        except:
-            pass
+        context = get_user_context(request)
+        permissions = context.permissions
         
         return {
             'perms': permissions['modules'],
             'user_permissions': permissions,
-            'unread_notifications_count': unread_notifications,
+            # Mesmo contador do badge do sidebar (core.sidebar_counters)
+            'unread_notifications_count': context.counters['notifications'],
         }
     
     return {
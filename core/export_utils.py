@@ -5,14 +5,31 @@
 
 import csv
 import io
+import tempfile
 from datetime import datetime
-from django.http import HttpResponse
+from itertools import islice
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
 from django.utils import timezone
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Linhas lidas do banco por vez nas exportações em streaming
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+# Linhas usadas para estimar a largura das colunas do Excel em streaming
+EXPORT_EXCEL_WIDTH_SAMPLE = getattr(settings, 'EXPORT_EXCEL_WIDTH_SAMPLE', 200)
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class _EchoBuffer:
+    """Pseudo-buffer para csv.writer: devolve a linha escrita em vez de guardá-la"""
+
+    def write(self, value):
+        return value
+
 class ExportManager:
     """Gerenciador centralizado de exportação"""
     
@@ -100,6 +117,90 @@ class ExportManager:
             logger.error(f"Erro ao exportar Excel: {str(e)}")
             raise
     
+    @staticmethod
+    def stream_csv(rows, filename, headers=None):
+        """
+        Exporta CSV em streaming: cada linha é escrita na resposta assim que
+        produzida por ``rows`` (iterável/gerador), sem montar o arquivo em memória
+        """
+        writer = csv.writer(_EchoBuffer())
+
+        def generate():
+            # BOM para o Excel reconhecer UTF-8 ao abrir o CSV
+            yield '\ufeff'
+            if headers:
+                yield writer.writerow(headers)
+            for row in rows:
+                yield writer.writerow(row)
+
+        response = StreamingHttpResponse(generate(), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        return response
+
+    @staticmethod
+    def stream_excel(rows, filename, headers=None, sheet_name="Dados",
+                     width_sample_size=EXPORT_EXCEL_WIDTH_SAMPLE):
+        """
+        Exporta Excel com workbook write-only (memória constante).
+
+        A largura das colunas é estimada pelas primeiras ``width_sample_size``
+        linhas, já que no modo write-only as dimensões precisam ser definidas
+        antes da escrita e as células não podem ser relidas. O arquivo é
+        gravado em disco temporário e enviado com FileResponse.
+        """
+        try:
+            import openpyxl
+            from openpyxl.cell import WriteOnlyCell
+            from openpyxl.styles import Font, PatternFill, Alignment
+            from openpyxl.utils import get_column_letter
+        except ImportError:
+            logger.warning("openpyxl não disponível, usando CSV como fallback")
+            return ExportManager.stream_csv(rows, filename, headers)
+
+        rows = iter(rows)
+        sample = list(islice(rows, width_sample_size))
+
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet(title=sheet_name[:31])
+
+        widths = {}
+        for row in ([headers] if headers else []) + sample:
+            for col, value in enumerate(row, 1):
+                length = len(str(value)) if value is not None else 0
+                if length > widths.get(col, 0):
+                    widths[col] = length
+        for col, length in widths.items():
+            ws.column_dimensions[get_column_letter(col)].width = min(length + 2, 50)
+
+        if headers:
+            header_font = Font(bold=True, color="FFFFFF")
+            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+            header_alignment = Alignment(horizontal="center")
+            header_cells = []
+            for header in headers:
+                cell = WriteOnlyCell(ws, value=header)
+                cell.font = header_font
+                cell.fill = header_fill
+                cell.alignment = header_alignment
+                header_cells.append(cell)
+            ws.append(header_cells)
+
+        for row in sample:
+            ws.append(list(row))
+        for row in rows:
+            ws.append(list(row))
+
+        output = tempfile.TemporaryFile()
+        wb.save(output)
+        output.seek(0)
+
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=f"{filename}.xlsx",
+            content_type=XLSX_CONTENT_TYPE,
+        )
+
     @staticmethod
     def export_to_pdf(template_name, context, filename):
         """
@@ -140,8 +241,81 @@ class ExportManager:
             logger.error(f"Erro ao exportar PDF: {str(e)}")
             raise
 
+def format_date(value):
+    return value.strftime('%d/%m/%Y') if value else ''
+
+
+def format_datetime(value):
+    if not value:
+        return ''
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.strftime('%d/%m/%Y %H:%M')
+
+
 class DataFormatter:
     """Formatador de dados para exportação"""
+
+    # Colunas para exportação em streaming: (cabeçalho, lookup do values_list,
+    # formatador opcional). Campos com choices saem com o rótulo de exibição.
+    BENEFICIARY_COLUMNS = [
+        ('Nome Completo', 'full_name', None),
+        ('Data de Nascimento', 'dob', format_date),
+        ('NIS', 'nis', None),
+        ('Telefone 1', 'phone_1', None),
+        ('Telefone 2', 'phone_2', None),
+        ('Bairro', 'neighbourhood', None),
+        ('Endereço', 'address', None),
+        ('Referência', 'reference', None),
+        ('Status', 'status', None),
+        ('Data de Cadastro', 'created_at', format_datetime),
+    ]
+
+    ACTIVITY_COLUMNS = [
+        ('Título', 'title', None),
+        ('Tipo', 'activity_type', None),
+        ('Status', 'status', None),
+        ('Prioridade', 'priority', None),
+        ('Beneficiária', 'beneficiary__full_name', None),
+        ('Facilitador(a)', 'facilitator', None),
+        ('Local', 'location', None),
+        ('Data de Início', 'start_date', format_date),
+        ('Data de Término', 'end_date', format_date),
+        ('Conclusão (%)', 'completion_percentage', None),
+        ('Impacto', 'impact_score', None),
+        ('Data de Criação', 'created_at', format_datetime),
+    ]
+
+    @staticmethod
+    def column_headers(columns):
+        return [header for header, _, _ in columns]
+
+    @staticmethod
+    def iter_rows(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+        """
+        Gerar as linhas de ``queryset`` segundo ``columns`` sem carregar a
+        tabela inteira: ``values_list`` + ``iterator(chunk_size)`` trazem
+        apenas as colunas exportadas, em blocos, sem instanciar modelos.
+        """
+        lookups = [lookup for _, lookup, _ in columns]
+        formatters = []
+        for _, lookup, formatter in columns:
+            if formatter is None and '__' not in lookup and lookup not in queryset.query.annotations:
+                field = queryset.model._meta.get_field(lookup)
+                if field.choices:
+                    formatter = DataFormatter._choices_formatter(field)
+            formatters.append(formatter)
+
+        for values in queryset.values_list(*lookups).iterator(chunk_size=chunk_size):
+            yield [
+                formatter(value) if formatter else ('' if value is None else value)
+                for formatter, value in zip(formatters, values)
+            ]
+
+    @staticmethod
+    def _choices_formatter(field):
+        labels = {key: str(label) for key, label in field.flatchoices}
+        return lambda value: labels.get(value, '' if value is None else value)
     
     @staticmethod
     def format_beneficiary_data(beneficiaries):
@@ -240,27 +414,47 @@ class DataFormatter:
         return data, headers
 
 def export_universal(request, model_class, formatter_method, filename_prefix, 
-                    template_name=None, extra_context=None):
+                    template_name=None, extra_context=None, columns=None,
+                    queryset=None, search_field='name'):
     """
     Função universal de exportação para qualquer modelo
+
+    Com ``columns`` (ver DataFormatter.BENEFICIARY_COLUMNS) CSV e Excel são
+    gerados em streaming direto do banco, com memória constante
+    independentemente do tamanho da tabela; ``formatter_method`` pode então
+    ser None. PDF sempre materializa os dados para renderizar o template.
     """
     export_format = request.GET.get('format', 'csv')
     
     # Obter dados
-    queryset = model_class.objects.all().order_by('-created_at')
+    if queryset is None:
+        queryset = model_class.objects.all()
+    queryset = queryset.order_by('-created_at')
     
     # Aplicar filtros se fornecidos
     search = request.GET.get('search')
     if search:
         # Busca genérica (pode ser refinada por modelo)
-        queryset = queryset.filter(name__icontains=search)
-    
-    # Formatar dados
-    data, headers = formatter_method(queryset)
+        queryset = queryset.filter(**{f'{search_field}__icontains': search})
     
     # Gerar nome do arquivo
     timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
     filename = f"{filename_prefix}_{timestamp}"
+
+    if columns is not None:
+        headers = DataFormatter.column_headers(columns)
+        if export_format == 'excel':
+            return ExportManager.stream_excel(
+                DataFormatter.iter_rows(queryset, columns), filename, headers, filename_prefix.title()
+            )
+        if export_format != 'pdf' or not template_name:
+            return ExportManager.stream_csv(DataFormatter.iter_rows(queryset, columns), filename, headers)
+
+    # Formatar dados
+    if columns is not None:
+        data = list(DataFormatter.iter_rows(queryset, columns))
+    else:
+        data, headers = formatter_method(queryset)
     
     try:
         if export_format == 'csv':
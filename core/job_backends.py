@@ -0,0 +1,596 @@
+"""
+Storage backends for the background job system (core.background_jobs)
+
+Each backend persists job records and hands them out to workers through
+``claim()``, so several processes can drain the same queue without running
+a job twice.
+
+A claimed job holds a lease: its worker renews ``heartbeat_at`` while the
+job runs (``heartbeat``), and ``requeue_stale`` only hands back RUNNING jobs
+whose lease expired. Jobs pinned to a worker (non-importable callables) are
+covered by the same lease while pending; once it expires nobody else can run
+them, so they are failed instead of waiting forever.
+
+- MemoryJobBackend: in-process heap queue, used by tests and single-process runs
+- SQLiteJobBackend: local SQLite file, durable and shared by the processes of one host
+- DatabaseJobBackend: Django table (core.BackgroundJobRecord) with row-level claiming
+"""
+import heapq
+import itertools
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Job states (mirrors core.background_jobs.JobStatus)
+PENDING = 'pending'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+TERMINAL_STATES = (COMPLETED, FAILED, CANCELLED)
+
+RECORD_FIELDS = (
+    'job_id', 'func_path', 'args', 'kwargs', 'priority', 'retry_count',
+    'max_retries', 'status', 'created_at', 'run_at', 'started_at',
+    'completed_at', 'error', 'result', 'locked_by', 'pinned_to', 'heartbeat_at',
+)
+
+WORKER_LOST = 'Worker lost: job lease expired'
+
+
+def empty_record(**values) -> dict:
+    """Build a job record with every field present"""
+    record = {field: None for field in RECORD_FIELDS}
+    record.update({
+        'args': [],
+        'kwargs': {},
+        'priority': 1,
+        'retry_count': 0,
+        'max_retries': 3,
+        'status': PENDING,
+        'locked_by': '',
+        'pinned_to': '',
+    })
+    record.update(values)
+    return record
+
+
+class BaseJobBackend:
+    """Interface shared by all job storage backends"""
+
+    def enqueue(self, record: dict) -> bool:
+        """Store a new job. Returns False if the job_id already exists."""
+        raise NotImplementedError
+
+    def claim(self, worker_id: str, limit: int = 1, now: datetime = None) -> List[dict]:
+        """Atomically move up to ``limit`` due jobs to RUNNING for ``worker_id``"""
+        raise NotImplementedError
+
+    def complete(self, job_id: str, result: Optional[str] = None):
+        raise NotImplementedError
+
+    def fail(self, job_id: str, error: str, retry_at: Optional[datetime] = None):
+        """Record a failure; reschedule the job if ``retry_at`` is given"""
+        raise NotImplementedError
+
+    def cancel(self, job_id: str) -> bool:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def recent(self, limit: int = 10) -> List[dict]:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        """Job counts grouped by status"""
+        raise NotImplementedError
+
+    def cleanup(self, before: datetime) -> int:
+        """Delete finished jobs created before ``before``"""
+        raise NotImplementedError
+
+    def heartbeat(self, worker_id: str, now: datetime = None) -> int:
+        """Renew the lease of the jobs held by ``worker_id`` (running, or pending and pinned to it)"""
+        raise NotImplementedError
+
+    def requeue_stale(self, before: datetime) -> int:
+        """
+        Expire leases last renewed before ``before``: RUNNING jobs go back to
+        the queue, jobs pinned to the vanished worker fail. Returns how many.
+        """
+        raise NotImplementedError
+
+    def ready_count(self) -> int:
+        return self.stats().get(PENDING, 0)
+
+
+class MemoryJobBackend(BaseJobBackend):
+    """
+    In-process backend.
+
+    Due jobs live in a heap ordered by (-priority, run_at, seq); jobs with a
+    future ``run_at`` wait in a second heap (the delayed index) and are moved
+    over when they become due, so ``claim`` is O(log n) instead of a scan.
+    Heap entries are invalidated lazily: a popped entry whose record is no
+    longer pending (cancelled, re-enqueued) is simply skipped.
+    """
+
+    def __init__(self, **options):
+        self._records: Dict[str, dict] = {}
+        self._ready = []
+        self._delayed = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _push(self, record, now):
+        entry_seq = next(self._seq)
+        record['_seq'] = entry_seq
+        if record['run_at'] and record['run_at'] > now:
+            heapq.heappush(self._delayed, (record['run_at'], entry_seq, record['job_id']))
+        else:
+            heapq.heappush(self._ready, (-record['priority'], record['run_at'] or now, entry_seq, record['job_id']))
+
+    def _promote_due(self, now):
+        while self._delayed and self._delayed[0][0] <= now:
+            run_at, entry_seq, job_id = heapq.heappop(self._delayed)
+            record = self._records.get(job_id)
+            if record and record['status'] == PENDING and record.get('_seq') == entry_seq:
+                heapq.heappush(self._ready, (-record['priority'], run_at, entry_seq, job_id))
+
+    def _public(self, record):
+        return {key: value for key, value in record.items() if not key.startswith('_')}
+
+    def enqueue(self, record):
+        with self._lock:
+            if record['job_id'] in self._records:
+                return False
+            record = dict(record)
+            self._records[record['job_id']] = record
+            self._push(record, timezone.now())
+            return True
+
+    def claim(self, worker_id, limit=1, now=None):
+        now = now or timezone.now()
+        claimed = []
+        skipped = []
+        with self._lock:
+            self._promote_due(now)
+            while self._ready and len(claimed) < limit:
+                entry = heapq.heappop(self._ready)
+                record = self._records.get(entry[3])
+                if not record or record['status'] != PENDING or record.get('_seq') != entry[2]:
+                    continue
+                if record['pinned_to'] and record['pinned_to'] != worker_id:
+                    skipped.append(entry)
+                    continue
+                record.update(status=RUNNING, locked_by=worker_id, started_at=now, heartbeat_at=now)
+                claimed.append(self._public(record))
+            for entry in skipped:
+                heapq.heappush(self._ready, entry)
+        return claimed
+
+    def complete(self, job_id, result=None):
+        with self._lock:
+            record = self._records.get(job_id)
+            if record and record['status'] == RUNNING:
+                record.update(status=COMPLETED, completed_at=timezone.now(), result=result, locked_by='')
+
+    def fail(self, job_id, error, retry_at=None):
+        with self._lock:
+            record = self._records.get(job_id)
+            if not record or record['status'] != RUNNING:
+                return
+            record['error'] = error
+            record['retry_count'] += 1
+            record['locked_by'] = ''
+            if retry_at is not None:
+                record.update(status=PENDING, run_at=retry_at)
+                self._push(record, timezone.now())
+            else:
+                record.update(status=FAILED, completed_at=timezone.now())
+
+    def cancel(self, job_id):
+        with self._lock:
+            record = self._records.get(job_id)
+            if not record or record['status'] not in (PENDING, RUNNING):
+                return False
+            record['status'] = CANCELLED
+            return True
+
+    def get(self, job_id):
+        with self._lock:
+            record = self._records.get(job_id)
+            return self._public(record) if record else None
+
+    def recent(self, limit=10):
+        with self._lock:
+            records = sorted(self._records.values(), key=lambda r: r['created_at'], reverse=True)
+            return [self._public(record) for record in records[:limit]]
+
+    def stats(self):
+        counts = {}
+        with self._lock:
+            for record in self._records.values():
+                counts[record['status']] = counts.get(record['status'], 0) + 1
+        return counts
+
+    def cleanup(self, before):
+        with self._lock:
+            stale = [job_id for job_id, record in self._records.items()
+                     if record['status'] in TERMINAL_STATES and record['created_at'] < before]
+            for job_id in stale:
+                del self._records[job_id]
+        return len(stale)
+
+    def heartbeat(self, worker_id, now=None):
+        now = now or timezone.now()
+        renewed = 0
+        with self._lock:
+            for record in self._records.values():
+                if (record['status'] == RUNNING and record['locked_by'] == worker_id) or \
+                        (record['status'] == PENDING and record['pinned_to'] == worker_id):
+                    record['heartbeat_at'] = now
+                    renewed += 1
+        return renewed
+
+    def requeue_stale(self, before):
+        expired = 0
+        with self._lock:
+            now = timezone.now()
+            for record in self._records.values():
+                if record['status'] not in (PENDING, RUNNING):
+                    continue
+                lease = record['heartbeat_at'] or record['started_at'] or record['created_at']
+                if not lease or lease >= before:
+                    continue
+                if record['pinned_to']:
+                    record.update(status=FAILED, completed_at=now, error=WORKER_LOST, locked_by='')
+                elif record['status'] == RUNNING:
+                    record.update(status=PENDING, locked_by='', run_at=now)
+                    self._push(record, now)
+                else:
+                    continue
+                expired += 1
+        return expired
+
+
+def _to_epoch(value):
+    return value.timestamp() if value else None
+
+
+def _from_epoch(value):
+    return datetime.fromtimestamp(value, tz=dt_timezone.utc) if value is not None else None
+
+
+class SQLiteJobBackend(BaseJobBackend):
+    """
+    Backend stored in a local SQLite file.
+
+    Claims run inside ``BEGIN IMMEDIATE`` so concurrent worker processes on
+    the same host serialise on the write lock and never pick the same row.
+    The (status, priority, run_at) index plays the role of the ready queue.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            func_path TEXT NOT NULL,
+            args TEXT NOT NULL,
+            kwargs TEXT NOT NULL,
+            priority INTEGER NOT NULL,
+            retry_count INTEGER NOT NULL,
+            max_retries INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            run_at REAL NOT NULL,
+            started_at REAL,
+            completed_at REAL,
+            error TEXT,
+            result TEXT,
+            locked_by TEXT NOT NULL DEFAULT '',
+            pinned_to TEXT NOT NULL DEFAULT '',
+            heartbeat_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_ready_idx ON jobs (status, priority DESC, run_at);
+    """
+
+    def __init__(self, path=None, **options):
+        self.path = str(path or Path(settings.BASE_DIR) / 'logs' / 'background_jobs.sqlite3')
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+            # Files created before job leases existed
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+            if 'heartbeat_at' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN heartbeat_at REAL')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def _row_to_record(self, row):
+        record = dict(row)
+        record['args'] = json.loads(record['args'])
+        record['kwargs'] = json.loads(record['kwargs'])
+        for field in ('created_at', 'run_at', 'started_at', 'completed_at', 'heartbeat_at'):
+            record[field] = _from_epoch(record[field])
+        return record
+
+    def enqueue(self, record):
+        with self._connection() as conn:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO jobs (job_id, func_path, args, kwargs, priority, retry_count, '
+                'max_retries, status, created_at, run_at, pinned_to, heartbeat_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    record['job_id'], record['func_path'], json.dumps(record['args']),
+                    json.dumps(record['kwargs']), record['priority'], record['retry_count'],
+                    record['max_retries'], record['status'], _to_epoch(record['created_at']),
+                    _to_epoch(record['run_at'] or record['created_at']), record['pinned_to'],
+                    _to_epoch(record['heartbeat_at'] or record['created_at']),
+                ),
+            )
+            return cursor.rowcount == 1
+
+    def claim(self, worker_id, limit=1, now=None):
+        now = _to_epoch(now or timezone.now())
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? AND run_at <= ? AND (pinned_to = '' OR pinned_to = ?) "
+                'ORDER BY priority DESC, run_at LIMIT ?',
+                (PENDING, now, worker_id, limit),
+            ).fetchall()
+            conn.executemany(
+                'UPDATE jobs SET status = ?, locked_by = ?, started_at = ?, heartbeat_at = ? WHERE job_id = ?',
+                [(RUNNING, worker_id, now, now, row['job_id']) for row in rows],
+            )
+        claimed = []
+        for row in rows:
+            record = self._row_to_record(row)
+            record.update(status=RUNNING, locked_by=worker_id, started_at=_from_epoch(now),
+                          heartbeat_at=_from_epoch(now))
+            claimed.append(record)
+        return claimed
+
+    def complete(self, job_id, result=None):
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, completed_at = ?, result = ?, locked_by = '' "
+                'WHERE job_id = ? AND status = ?',
+                (COMPLETED, _to_epoch(timezone.now()), result, job_id, RUNNING),
+            )
+
+    def fail(self, job_id, error, retry_at=None):
+        with self._connection() as conn:
+            if retry_at is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, run_at = ?, error = ?, retry_count = retry_count + 1, "
+                    "locked_by = '' WHERE job_id = ? AND status = ?",
+                    (PENDING, _to_epoch(retry_at), error, job_id, RUNNING),
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, completed_at = ?, error = ?, retry_count = retry_count + 1, "
+                    "locked_by = '' WHERE job_id = ? AND status = ?",
+                    (FAILED, _to_epoch(timezone.now()), error, job_id, RUNNING),
+                )
+
+    def cancel(self, job_id):
+        with self._connection() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET status = ? WHERE job_id = ? AND status IN (?, ?)',
+                (CANCELLED, job_id, PENDING, RUNNING),
+            )
+            return cursor.rowcount == 1
+
+    def get(self, job_id):
+        with self._connection() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def recent(self, limit=10):
+        with self._connection() as conn:
+            rows = conn.execute('SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def stats(self):
+        with self._connection() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def cleanup(self, before):
+        with self._connection() as conn:
+            cursor = conn.execute(
+                'DELETE FROM jobs WHERE status IN (?, ?, ?) AND created_at < ?',
+                (*TERMINAL_STATES, _to_epoch(before)),
+            )
+            return cursor.rowcount
+
+    def heartbeat(self, worker_id, now=None):
+        with self._connection() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET heartbeat_at = ? '
+                'WHERE (status = ? AND locked_by = ?) OR (status = ? AND pinned_to = ?)',
+                (_to_epoch(now or timezone.now()), RUNNING, worker_id, PENDING, worker_id),
+            )
+            return cursor.rowcount
+
+    def requeue_stale(self, before):
+        now, before = _to_epoch(timezone.now()), _to_epoch(before)
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            failed = conn.execute(
+                "UPDATE jobs SET status = ?, completed_at = ?, error = ?, locked_by = '' "
+                "WHERE status IN (?, ?) AND pinned_to != '' "
+                'AND COALESCE(heartbeat_at, started_at, created_at) < ?',
+                (FAILED, now, WORKER_LOST, PENDING, RUNNING, before),
+            ).rowcount
+            requeued = conn.execute(
+                "UPDATE jobs SET status = ?, locked_by = '', run_at = ? "
+                'WHERE status = ? AND COALESCE(heartbeat_at, started_at) < ?',
+                (PENDING, now, RUNNING, before),
+            ).rowcount
+            return failed + requeued
+
+
+class _Transaction:
+    """Context manager committing (or rolling back) an autocommit sqlite3 connection"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.conn.in_transaction:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+class DatabaseJobBackend(BaseJobBackend):
+    """
+    Backend stored in the project database (core.BackgroundJobRecord).
+
+    Claiming uses ``SELECT ... FOR UPDATE SKIP LOCKED`` where the database
+    supports it; elsewhere (SQLite) each candidate row is claimed with a
+    conditional ``UPDATE ... WHERE status = 'pending'`` and only the worker
+    whose update touched the row gets to run it.
+    """
+
+    def __init__(self, using='default', **options):
+        self.using = using
+
+    @property
+    def model(self):
+        from .models import BackgroundJobRecord
+        return BackgroundJobRecord
+
+    def _queryset(self):
+        return self.model.objects.using(self.using)
+
+    def _to_record(self, obj):
+        return empty_record(**{field: getattr(obj, field) for field in RECORD_FIELDS})
+
+    def enqueue(self, record):
+        from django.db import IntegrityError, transaction
+
+        values = {field: record[field] for field in RECORD_FIELDS if record.get(field) is not None}
+        values.setdefault('run_at', record['created_at'])
+        try:
+            with transaction.atomic(using=self.using):
+                self._queryset().create(**values)
+        except IntegrityError:
+            return False
+        return True
+
+    def claim(self, worker_id, limit=1, now=None):
+        from django.db import connections, transaction
+        from django.db.models import Q
+
+        now = now or timezone.now()
+        due = self._queryset().filter(
+            Q(pinned_to='') | Q(pinned_to=worker_id),
+            status=PENDING,
+            run_at__lte=now,
+        ).order_by('-priority', 'run_at')
+
+        if connections[self.using].features.has_select_for_update_skip_locked:
+            with transaction.atomic(using=self.using):
+                ids = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+                self._queryset().filter(pk__in=ids).update(
+                    status=RUNNING, locked_by=worker_id, started_at=now, heartbeat_at=now,
+                )
+        else:
+            ids = []
+            # Over-fetch so losing a race for one row does not leave the worker idle
+            for pk in due.values_list('pk', flat=True)[:limit * 2]:
+                if len(ids) >= limit:
+                    break
+                if self._queryset().filter(pk=pk, status=PENDING).update(
+                        status=RUNNING, locked_by=worker_id, started_at=now, heartbeat_at=now):
+                    ids.append(pk)
+
+        return [self._to_record(obj) for obj in self._queryset().filter(pk__in=ids, locked_by=worker_id)]
+
+    def complete(self, job_id, result=None):
+        self._queryset().filter(job_id=job_id, status=RUNNING).update(
+            status=COMPLETED, completed_at=timezone.now(), result=result, locked_by='',
+        )
+
+    def fail(self, job_id, error, retry_at=None):
+        from django.db.models import F
+
+        updates = {'error': error, 'retry_count': F('retry_count') + 1, 'locked_by': ''}
+        if retry_at is not None:
+            updates.update(status=PENDING, run_at=retry_at)
+        else:
+            updates.update(status=FAILED, completed_at=timezone.now())
+        self._queryset().filter(job_id=job_id, status=RUNNING).update(**updates)
+
+    def cancel(self, job_id):
+        return bool(self._queryset().filter(job_id=job_id, status__in=[PENDING, RUNNING]).update(status=CANCELLED))
+
+    def get(self, job_id):
+        obj = self._queryset().filter(job_id=job_id).first()
+        return self._to_record(obj) if obj else None
+
+    def recent(self, limit=10):
+        return [self._to_record(obj) for obj in self._queryset().order_by('-created_at')[:limit]]
+
+    def stats(self):
+        from django.db.models import Count
+
+        rows = self._queryset().order_by().values('status').annotate(total=Count('pk'))
+        return {row['status']: row['total'] for row in rows}
+
+    def cleanup(self, before):
+        deleted, _ = self._queryset().filter(status__in=TERMINAL_STATES, created_at__lt=before).delete()
+        return deleted
+
+    def heartbeat(self, worker_id, now=None):
+        from django.db.models import Q
+
+        return self._queryset().filter(
+            Q(status=RUNNING, locked_by=worker_id) | Q(status=PENDING, pinned_to=worker_id)
+        ).update(heartbeat_at=now or timezone.now())
+
+    def requeue_stale(self, before):
+        from django.db.models import Q
+
+        now = timezone.now()
+        expired = Q(heartbeat_at__lt=before) | Q(heartbeat_at__isnull=True, started_at__lt=before)
+        failed = self._queryset().filter(expired, status__in=[PENDING, RUNNING]).exclude(pinned_to='').update(
+            status=FAILED, completed_at=now, error=WORKER_LOST, locked_by='',
+        )
+        requeued = self._queryset().filter(expired, status=RUNNING).update(
+            status=PENDING, locked_by='', run_at=now,
+        )
+        return failed + requeued
+
+
+def get_job_backend(path: str = None, **options) -> BaseJobBackend:
+    """Instantiate the backend configured in settings.BACKGROUND_JOBS_BACKEND"""
+    path = path or getattr(settings, 'BACKGROUND_JOBS_BACKEND', 'core.job_backends.SQLiteJobBackend')
+    options = {**getattr(settings, 'BACKGROUND_JOBS_BACKEND_OPTIONS', {}), **options}
+    return import_string(path)(**options)
@@ -0,0 +1,29 @@
+"""
+Comando de reconstrução do índice de busca textual (core.search).
+
+Recria os SearchDocument a partir das tabelas de origem; necessário na
+implantação do índice e após importações em lote que não disparam sinais:
+
+    python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+
+from core.search import SOURCES, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Reconstruir o índice de busca textual de chat, tarefas e comunicação'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            action='append',
+            choices=sorted(SOURCES),
+            help='Reconstruir apenas a fonte informada (pode ser repetido)',
+        )
+
+    def handle(self, *args, **options):
+        counts = rebuild_index(options['source'])
+        for label, total in counts.items():
+            self.stdout.write(f'{label}: {total} documentos')
+        self.stdout.write(self.style.SUCCESS('Índice de busca reconstruído'))
@@ -0,0 +1,44 @@
+"""
+Comando para executar um worker dedicado da fila de jobs em background
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.background_jobs import job_scheduler
+
+
+class Command(BaseCommand):
+    help = 'Executar um worker que consome a fila persistente de jobs em background'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Executar os jobs pendentes e sair',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Número máximo de jobs a executar com --once',
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            executed = job_scheduler.run_pending(limit=options['limit'])
+            self.stdout.write(self.style.SUCCESS(f'{executed} jobs executados'))
+            return
+
+        self.stdout.write(f'Worker {job_scheduler.worker_id} iniciado ({job_scheduler.max_workers} threads)')
+        signal.signal(signal.SIGTERM, lambda *_: setattr(job_scheduler, 'shutdown', True))
+        job_scheduler.start_scheduler()
+        try:
+            while not job_scheduler.shutdown:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            job_scheduler.stop_scheduler()
+            self.stdout.write(self.style.SUCCESS('Worker finalizado'))
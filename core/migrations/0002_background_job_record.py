@@ -0,0 +1,42 @@
+# Generated by Django 4.2.13 on 2026-10-17 00:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundJobRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.CharField(max_length=255, unique=True, verbose_name='ID do Job')),
+                ('func_path', models.CharField(max_length=255, verbose_name='Função')),
+                ('args', models.JSONField(blank=True, default=list, verbose_name='Argumentos')),
+                ('kwargs', models.JSONField(blank=True, default=dict, verbose_name='Argumentos Nomeados')),
+                ('priority', models.IntegerField(default=1, verbose_name='Prioridade')),
+                ('retry_count', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('max_retries', models.PositiveIntegerField(default=3, verbose_name='Máximo de Tentativas')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Executando'), ('completed', 'Concluído'), ('failed', 'Falhou'), ('cancelled', 'Cancelado')], default='pending', max_length=20, verbose_name='Status')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Criado em')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Executar em')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Finalizado em')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Erro')),
+                ('result', models.TextField(blank=True, null=True, verbose_name='Resultado')),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100, verbose_name='Worker')),
+                ('pinned_to', models.CharField(blank=True, default='', help_text='Jobs com função não importável só podem rodar no processo que os criou', max_length=100, verbose_name='Restrito ao Worker')),
+            ],
+            options={
+                'verbose_name': 'Job em Background',
+                'verbose_name_plural': 'Jobs em Background',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', '-priority', 'run_at'], name='core_job_ready_idx'), models.Index(fields=['status', 'started_at'], name='core_job_running_idx')],
+            },
+        ),
+    ]
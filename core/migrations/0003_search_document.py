@@ -0,0 +1,121 @@
+# Generated by Django 4.2.13 on 2026-10-17 01:22
+
+from django.db import migrations, models
+
+# Índice textual fora do ORM: FTS5 (SQLite) ou tsvector + GIN (PostgreSQL),
+# mantido por triggers a partir de core_searchdocument (ver core.search)
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE core_search_fts USING fts5(
+        title, body,
+        content='core_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER core_search_fts_ai AFTER INSERT ON core_searchdocument BEGIN
+        INSERT INTO core_search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER core_search_fts_ad AFTER DELETE ON core_searchdocument BEGIN
+        INSERT INTO core_search_fts(core_search_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER core_search_fts_au AFTER UPDATE ON core_searchdocument BEGIN
+        INSERT INTO core_search_fts(core_search_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO core_search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS core_search_fts_au',
+    'DROP TRIGGER IF EXISTS core_search_fts_ad',
+    'DROP TRIGGER IF EXISTS core_search_fts_ai',
+    'DROP TABLE IF EXISTS core_search_fts',
+]
+
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'pt_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION pt_unaccent (COPY = portuguese);
+            ALTER TEXT SEARCH CONFIGURATION pt_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+        END IF;
+    END $$
+    """,
+    'ALTER TABLE core_searchdocument ADD COLUMN search_vector tsvector',
+    'CREATE INDEX core_search_vector_idx ON core_searchdocument USING GIN (search_vector)',
+    """
+    CREATE FUNCTION core_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('pt_unaccent', coalesce(NEW.title, '')), 'A')
+            || setweight(to_tsvector('pt_unaccent', coalesce(NEW.body, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER core_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF title, body ON core_searchdocument
+        FOR EACH ROW EXECUTE FUNCTION core_search_vector_update()
+    """,
+]
+POSTGRES_REVERSE = [
+    'DROP TRIGGER IF EXISTS core_search_vector_trigger ON core_searchdocument',
+    'DROP FUNCTION IF EXISTS core_search_vector_update()',
+    'DROP INDEX IF EXISTS core_search_vector_idx',
+    'ALTER TABLE core_searchdocument DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(sql, params=None)
+    return run
+
+
+create_text_index = _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD})
+drop_text_index = _run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_background_job_record'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50, verbose_name='Origem')),
+                ('object_uuid', models.UUIDField(blank=True, null=True, verbose_name='UUID do Objeto')),
+                ('object_int', models.BigIntegerField(blank=True, null=True, verbose_name='ID do Objeto')),
+                ('title', models.CharField(blank=True, max_length=300, verbose_name='Título')),
+                ('body', models.TextField(blank=True, verbose_name='Conteúdo')),
+                ('created_at', models.DateTimeField(blank=True, null=True, verbose_name='Criado em')),
+            ],
+            options={
+                'verbose_name': 'Documento de Busca',
+                'verbose_name_plural': 'Documentos de Busca',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('source', 'object_uuid'), name='core_search_uuid_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('source', 'object_int'), name='core_search_int_uniq'),
+        ),
+        migrations.RunPython(create_text_index, drop_text_index),
+    ]
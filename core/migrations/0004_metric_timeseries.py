@@ -0,0 +1,60 @@
+# Generated by Django 4.2.13 on 2026-10-17 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50, verbose_name='Métrica')),
+                ('resolution', models.CharField(choices=[('minute', 'Minuto'), ('hour', 'Hora')], max_length=10, verbose_name='Resolução')),
+                ('bucket_start', models.DateTimeField(verbose_name='Início do Período')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Amostras')),
+                ('total', models.FloatField(default=0, verbose_name='Soma')),
+                ('total_squares', models.FloatField(default=0, verbose_name='Soma dos Quadrados')),
+                ('minimum', models.FloatField(null=True, verbose_name='Mínimo')),
+                ('maximum', models.FloatField(null=True, verbose_name='Máximo')),
+                ('p95', models.FloatField(null=True, verbose_name='Percentil 95')),
+                ('sketch', models.JSONField(default=dict, verbose_name='Distribuição')),
+            ],
+            options={
+                'verbose_name': 'Agregado de Métrica',
+                'verbose_name_plural': 'Agregados de Métricas',
+            },
+        ),
+        migrations.CreateModel(
+            name='MetricSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50, verbose_name='Métrica')),
+                ('slot', models.PositiveIntegerField(verbose_name='Posição no Anel')),
+                ('timestamp', models.DateTimeField(verbose_name='Coletada em')),
+                ('value', models.FloatField(verbose_name='Valor')),
+            ],
+            options={
+                'verbose_name': 'Amostra de Métrica',
+                'verbose_name_plural': 'Amostras de Métricas',
+                'indexes': [models.Index(fields=['timestamp'], name='core_metric_sample_ts_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='metricsample',
+            constraint=models.UniqueConstraint(fields=('metric', 'slot'), name='core_metric_sample_slot_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='metricrollup',
+            index=models.Index(fields=['resolution', 'bucket_start'], name='core_metric_rollup_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='metricrollup',
+            constraint=models.UniqueConstraint(fields=('metric', 'resolution', 'bucket_start'), name='core_metric_rollup_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-17 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_metric_timeseries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundjobrecord',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Renovado pelo worker enquanto o job roda; lease expirado devolve o job à fila', null=True, verbose_name='Lease Renovado em'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import FileExtensionValidator
+from django.utils import timezone
 import os
 import uuid
 
@@ -119,3 +120,132 @@ class FileUpload(models.Model):
             if not self.original_name:
                 self.original_name = self.file.name
         super().save(*args, **kwargs)
+
+
+class BackgroundJobRecord(models.Model):
+    """Fila persistente de jobs em background (core.job_backends.DatabaseJobBackend)"""
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('running', 'Executando'),
+        ('completed', 'Concluído'),
+        ('failed', 'Falhou'),
+        ('cancelled', 'Cancelado'),
+    ]
+
+    job_id = models.CharField('ID do Job', max_length=255, unique=True)
+    func_path = models.CharField('Função', max_length=255)
+    args = models.JSONField('Argumentos', default=list, blank=True)
+    kwargs = models.JSONField('Argumentos Nomeados', default=dict, blank=True)
+    priority = models.IntegerField('Prioridade', default=1)
+    retry_count = models.PositiveIntegerField('Tentativas', default=0)
+    max_retries = models.PositiveIntegerField('Máximo de Tentativas', default=3)
+    status = models.CharField('Status', max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField('Criado em', default=timezone.now)
+    run_at = models.DateTimeField('Executar em', default=timezone.now)
+    started_at = models.DateTimeField('Iniciado em', null=True, blank=True)
+    completed_at = models.DateTimeField('Finalizado em', null=True, blank=True)
+    error = models.TextField('Erro', null=True, blank=True)
+    result = models.TextField('Resultado', null=True, blank=True)
+    locked_by = models.CharField('Worker', max_length=100, blank=True, default='')
+    pinned_to = models.CharField(
+        'Restrito ao Worker', max_length=100, blank=True, default='',
+        help_text='Jobs com função não importável só podem rodar no processo que os criou'
+    )
+    heartbeat_at = models.DateTimeField(
+        'Lease Renovado em', null=True, blank=True,
+        help_text='Renovado pelo worker enquanto o job roda; lease expirado devolve o job à fila'
+    )
+
+    class Meta:
+        verbose_name = 'Job em Background'
+        verbose_name_plural = 'Jobs em Background'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'], name='core_job_ready_idx'),
+            models.Index(fields=['status', 'started_at'], name='core_job_running_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id} ({self.status})"
+
+
+class SearchDocument(models.Model):
+    """Documento do índice de busca textual (core.search)"""
+    source = models.CharField('Origem', max_length=50)
+    # Chave do objeto de origem: UUID ou inteiro, conforme o modelo
+    object_uuid = models.UUIDField('UUID do Objeto', null=True, blank=True)
+    object_int = models.BigIntegerField('ID do Objeto', null=True, blank=True)
+    title = models.CharField('Título', max_length=300, blank=True)
+    body = models.TextField('Conteúdo', blank=True)
+    created_at = models.DateTimeField('Criado em', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Documento de Busca'
+        verbose_name_plural = 'Documentos de Busca'
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'object_uuid'], name='core_search_uuid_uniq'),
+            models.UniqueConstraint(fields=['source', 'object_int'], name='core_search_int_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.source}:{self.object_uuid or self.object_int}"
+
+
+class MetricSample(models.Model):
+    """Amostra de métrica de performance no anel de tamanho fixo (core.timeseries)"""
+    metric = models.CharField('Métrica', max_length=50)
+    slot = models.PositiveIntegerField('Posição no Anel')
+    timestamp = models.DateTimeField('Coletada em')
+    value = models.FloatField('Valor')
+
+    class Meta:
+        verbose_name = 'Amostra de Métrica'
+        verbose_name_plural = 'Amostras de Métricas'
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'slot'], name='core_metric_sample_slot_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['timestamp'], name='core_metric_sample_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.metric}@{self.timestamp}: {self.value}"
+
+
+class MetricRollup(models.Model):
+    """Agregado por minuto/hora de uma métrica de performance (core.timeseries)"""
+    RESOLUTION_CHOICES = [
+        ('minute', 'Minuto'),
+        ('hour', 'Hora'),
+    ]
+
+    metric = models.CharField('Métrica', max_length=50)
+    resolution = models.CharField('Resolução', max_length=10, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField('Início do Período')
+    count = models.PositiveIntegerField('Amostras', default=0)
+    total = models.FloatField('Soma', default=0)
+    total_squares = models.FloatField('Soma dos Quadrados', default=0)
+    minimum = models.FloatField('Mínimo', null=True)
+    maximum = models.FloatField('Máximo', null=True)
+    p95 = models.FloatField('Percentil 95', null=True)
+    # Histograma logarítmico esparso {índice: amostras}
+    sketch = models.JSONField('Distribuição', default=dict)
+
+    class Meta:
+        verbose_name = 'Agregado de Métrica'
+        verbose_name_plural = 'Agregados de Métricas'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['metric', 'resolution', 'bucket_start'], name='core_metric_rollup_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket_start'], name='core_metric_rollup_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} {self.resolution} {self.bucket_start}"
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
@@ -21,6 +21,7 @@ import time
 import logging
 
 from .monitoring import get_system_health, get_database_health, get_full_system_status, system_monitor, database_monitor
+from .unified_cache import cache_stats
 
 # Try to import background jobs
 try:
@@ -148,6 +149,7 @@ class SystemStatsAPIView(View):
             return JsonResponse({
                 'system': system_stats,
                 'database': db_stats,
+                'cache': cache_stats(),
                 'timestamp': timezone.now()
             }, encoder=DjangoJSONEncoder)
         except Exception as e:
@@ -165,10 +167,8 @@ class BackgroundJobsAPIView(View):
         try:
             job_stats = get_job_stats()
             
-            # Get recent jobs
-            recent_jobs = []
-            for job_id, job in list(job_scheduler.jobs.items())[-10:]:  # Last 10 jobs
-                recent_jobs.append(job.to_dict())
+            # Get recent jobs (from the shared backend, across all workers)
+            recent_jobs = job_scheduler.recent_jobs(10)
             
             return JsonResponse({
                 'stats': job_stats,
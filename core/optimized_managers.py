@@ -1,7 +1,8 @@
 # Otimizações de Performance - Models com Managers Inteligentes
 
 from django.db import models
-from django.db.models import Count, Q, F, Case, When, Avg, Sum
+from django.db.models import Count, Q, F, Case, When, Avg, Sum, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import timedelta, date
 
@@ -145,51 +146,123 @@ class ProjectManager(OptimizedManager):
         )
 
 
-class WorkshopManager(OptimizedManager):
-    """Manager otimizado para Workshops"""
-    
+def count_subquery(queryset, outer_field, **filters):
+    """
+    COUNT correlacionado (``outer_field`` = OuterRef('pk')), sem JOIN na
+    consulta externa: pode ser combinado com outras anotações sem
+    multiplicar linhas.
+    """
+    return aggregate_subquery(queryset, outer_field, Count('pk'), default=0, **filters)
+
+
+def aggregate_subquery(queryset, outer_field, aggregate, default=None, **filters):
+    """Agregado correlacionado de ``queryset`` por ``outer_field``"""
+    subquery = queryset.filter(**{outer_field: OuterRef('pk')}, **filters).order_by().values(
+        outer_field
+    ).annotate(value=aggregate).values('value')[:1]
+    if default is None:
+        return Subquery(subquery)
+    return Coalesce(Subquery(subquery), Value(default))
+
+
+def _attendance_model():
+    from django.apps import apps
+    return apps.get_model('workshops', 'SessionAttendance')
+
+
+class WorkshopQuerySet(models.QuerySet):
+    """Anotações de oficinas calculadas no banco"""
+
+    def with_counts(self):
+        """Participantes ativos (``participant_count``) e sessões (``session_count``)"""
+        from django.apps import apps
+        enrollments = apps.get_model('workshops', 'WorkshopEnrollment').objects
+        sessions = apps.get_model('workshops', 'WorkshopSession').objects
+        return self.annotate(
+            participant_count=count_subquery(enrollments, 'workshop', status='ativo'),
+            session_count=count_subquery(sessions, 'workshop'),
+        )
+
+    def with_attendance(self):
+        """Presenças registradas e presentes em todas as sessões (Workshop.attendance_rate)"""
+        attendances = _attendance_model().objects
+        return self.annotate(
+            attendance_total=count_subquery(attendances, 'session__workshop'),
+            attendance_present=count_subquery(attendances, 'session__workshop', attended=True),
+        )
+
     def with_statistics(self):
         """Carrega workshops com estatísticas calculadas"""
-        return self.annotate(
-            # Participantes inscritos
-            total_participants=Count('enrollments'),
-            # Participantes ativos
-            active_participants=Count(
-                'enrollments',
-                filter=Q(enrollments__status='ATIVO')
-            ),
+        from django.apps import apps
+        today = timezone.now().date()
+        enrollments = apps.get_model('workshops', 'WorkshopEnrollment').objects
+        sessions = apps.get_model('workshops', 'WorkshopSession').objects
+        evaluations = apps.get_model('workshops', 'WorkshopEvaluation').objects
+        return self.with_counts().with_attendance().annotate(
+            # Inscrições em qualquer status
+            enrollment_count=count_subquery(enrollments, 'workshop'),
             # Sessões realizadas
-            completed_sessions=Count(
-                'sessions',
-                filter=Q(sessions__session_date__lt=timezone.now().date())
-            ),
+            completed_sessions=count_subquery(sessions, 'workshop', session_date__lt=today),
             # Avaliação média
-            average_rating=Avg('evaluations__rating'),
+            average_rating=aggregate_subquery(evaluations, 'enrollment__workshop', Avg('rating')),
             # Taxa de ocupação
             occupancy_rate=Case(
-                When(max_participants=0, then=0),
-                default=F('active_participants') * 100.0 / F('max_participants')
+                When(max_participants=0, then=Value(0.0)),
+                default=F('participant_count') * 100.0 / F('max_participants'),
+                output_field=models.FloatField(),
             ),
             # Próxima sessão
-            next_session=models.Min(
-                'sessions__session_date',
-                filter=Q(sessions__session_date__gte=timezone.now().date())
-            )
-        ).select_related('facilitator').prefetch_related('sessions', 'enrollments')
+            next_session=aggregate_subquery(
+                sessions, 'workshop', models.Min('session_date'), session_date__gte=today
+            ),
+        )
+
+
+class WorkshopSessionQuerySet(models.QuerySet):
+
+    def with_attendance(self):
+        """Presenças registradas e presentes da sessão (WorkshopSession.attendance_percentage)"""
+        attendances = _attendance_model().objects
+        return self.annotate(
+            attendance_total=count_subquery(attendances, 'session'),
+            attendance_present=count_subquery(attendances, 'session', attended=True),
+        )
+
+
+class WorkshopEnrollmentQuerySet(models.QuerySet):
+
+    def with_attendance(self):
+        """Sessões registradas e presentes da inscrição (WorkshopEnrollment.attendance_rate)"""
+        attendances = _attendance_model().objects
+        return self.annotate(
+            attendance_total=count_subquery(attendances, 'enrollment'),
+            attendance_present=count_subquery(attendances, 'enrollment', attended=True),
+        )
+
+    def with_min_attendance(self, rate):
+        """Inscrições com taxa de presença >= ``rate`` (%)"""
+        return self.with_attendance().filter(
+            attendance_total__gt=0,
+            attendance_present__gte=F('attendance_total') * rate / 100.0,
+        )
+
+
+class WorkshopManager(OptimizedManager.from_queryset(WorkshopQuerySet)):
+    """Manager otimizado para Workshops"""
     
     def need_evaluation(self):
         """Workshops que precisam de avaliação"""
         return self.filter(
             status='concluido'
         ).annotate(
-            evaluation_count=Count('evaluations')
+            evaluation_count=Count('enrollments__evaluations')
         ).filter(evaluation_count=0)
     
     def popular_workshops(self):
         """Workshops mais populares por número de inscrições"""
         return self.with_statistics().filter(
-            active_participants__gte=1
-        ).order_by('-active_participants', '-average_rating')
+            participant_count__gte=1
+        ).order_by('-participant_count', '-average_rating')
 
 
 class EvolutionManager(OptimizedManager):
@@ -312,7 +385,7 @@ class OptimizedViewExamples:
         stats = Workshop.objects.with_statistics().aggregate(
             total_active=Count('id', filter=Q(status='ativo')),
             avg_rating=Avg('average_rating'),
-            total_participants=Sum('active_participants'),
+            total_participants=Sum('participant_count'),
             avg_occupancy=Avg('occupancy_rate')
         )
         
@@ -2,9 +2,10 @@
 Otimizações de performance para queries do Django
 """
 from django.db.models import Prefetch, Q, Count, Avg, Sum, Max
-from django.core.cache import cache
 from django.conf import settings
 
+from .unified_cache import UnifiedCache, invalidate_tags
+
 
 class QueryOptimizer:
     """
@@ -145,20 +146,17 @@ class CacheManager:
     Gerenciador de cache para operações frequentes
     """
     
+    cache = UnifiedCache('optimizers')
+    
     @staticmethod
-    def get_or_set_cache(key, callable_func, timeout=None):
+    def get_or_set_cache(key, callable_func, timeout=None, tags=None):
         """
-        Utilitário genérico para cache
+        Utilitário genérico para cache (recalculado em voo único)
         """
         if timeout is None:
             timeout = getattr(settings, 'CACHE_TIMEOUT', {}).get('MEDIUM', 1800)
         
-        data = cache.get(key)
-        if data is None:
-            data = callable_func()
-            cache.set(key, data, timeout)
-        
-        return data
+        return CacheManager.cache.get_or_set(key, callable_func, timeout, tags=tags)
     
     @staticmethod
     def get_dashboard_stats(user_id):
@@ -179,15 +177,16 @@ class CacheManager:
                     status='ATIVO'
                 ).count(),
                 'total_workshops': Workshop.objects.count(),
-                'recent_activities': UserActivity.objects.order_by(
+                'recent_activities': list(UserActivity.objects.order_by(
                     '-timestamp'
-                )[:5]
+                )[:5])
             }
         
         return CacheManager.get_or_set_cache(
             cache_key, 
             _get_stats,
-            timeout=settings.CACHE_TIMEOUT.get('SHORT', 300)
+            timeout=settings.CACHE_TIMEOUT.get('SHORT', 300),
+            tags=['dashboard', f'user:{user_id}']
         )
     
     @staticmethod
@@ -195,32 +194,10 @@ class CacheManager:
         """
         Invalidar caches relacionados quando um modelo é atualizado
         """
-        patterns = {
-            'beneficiary': [
-                'dashboard_stats_*',
-                'beneficiaries_list_*',
-                f'beneficiary_{instance_id}' if instance_id else 'beneficiary_*'
-            ],
-            'project': [
-                'dashboard_stats_*',
-                'projects_list_*',
-                f'project_enrollment_{instance_id}' if instance_id else 'project_*'
-            ],
-            'workshop': [
-                'dashboard_stats_*',
-                'workshops_list_*',
-                f'workshop_{instance_id}' if instance_id else 'workshop_*'
-            ]
-        }
-        
-        if model_name.lower() in patterns:
-            for pattern in patterns[model_name.lower()]:
-                if '*' in pattern:
-                    # Para padrões com wildcard, seria necessário usar Redis
-                    # Por enquanto, limpar cache específico
-                    cache.delete(pattern.replace('*', ''))
-                else:
-                    cache.delete(pattern)
+        tags = [model_name.lower(), 'dashboard']
+        if instance_id is not None:
+            tags.append(f'{model_name.lower()}:{instance_id}')
+        invalidate_tags(*tags)
 
 
 class PaginationOptimizer:
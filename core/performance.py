@@ -9,6 +9,8 @@ from django.db import connection
 from django.http import JsonResponse
 import logging
 
+from .unified_cache import UnifiedCache, invalidate_tags
+
 logger = logging.getLogger('movemarias')
 
 def cached_property_with_timeout(timeout=300):
@@ -148,18 +150,12 @@ class CacheManager:
         'very_long': 86400 # 24 hours
     }
     
+    cache = UnifiedCache('performance', default_timeout=TIMEOUTS['medium'])
+    
     @classmethod
     def invalidate_user_cache(cls, user_id):
-        """Invalidate all cache keys for a specific user"""
-        patterns = [
-            f"user_{user_id}_*",
-            f"beneficiaries_user_{user_id}_*",
-            f"dashboard_user_{user_id}_*"
-        ]
-        
-        # This would require django-redis or similar
-        # for pattern-based cache deletion
-        pass
+        """Invalidate all cache entries tagged for a specific user"""
+        invalidate_tags(f"user:{user_id}")
     
     @classmethod
     def warm_cache_for_user(cls, user):
@@ -171,22 +167,11 @@ class CacheManager:
                      cls.TIMEOUTS['long'])
     
     @classmethod
-    def get_or_set_with_lock(cls, key, callable_func, timeout=None):
+    def get_or_set_with_lock(cls, key, callable_func, timeout=None, tags=None):
         """
-        Get or set cache with distributed lock to prevent cache stampede
+        Get or set cache with single-flight recomputation to prevent cache stampede
         """
-        lock_key = f"lock_{key}"
-        if cache.add(lock_key, "locked", 30):  # 30 second lock
-            try:
-                result = callable_func()
-                cache.set(key, result, timeout or cls.TIMEOUTS['medium'])
-                return result
-            finally:
-                cache.delete(lock_key)
-        else:
-            # Wait for lock to be released and try to get cached value
-            time.sleep(0.1)
-            return cache.get(key)
+        return cls.cache.get_or_set(key, callable_func, timeout or cls.TIMEOUTS['medium'], tags=tags)
 
 # Database connection pooling helper
 def get_db_pool_status():
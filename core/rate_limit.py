@@ -0,0 +1,249 @@
+"""
+Rate limiting atômico compartilhado pelo SecurityMiddleware e pelo decorator
+``ratelimit``.
+
+Cada verificação é uma única operação no cache, escolhida pelo backend:
+
+- Redis (django_redis ou o backend nativo do Django): janela deslizante com
+  log em sorted set, executada por um script Lua (um EVALSHA)
+- LocMem: janela deslizante com log em memória do processo, sob lock (o
+  LocMem já é por processo)
+- outros backends: janela fixa com ``cache.incr``; a chave inclui o número
+  da janela, então o tempo de vida nunca é renovado (``add`` só na primeira
+  requisição de cada janela)
+
+Políticas em ``settings.RATE_LIMIT_POLICIES`` ({nome: {'rate': '30/m',
+'paths': [...], 'methods': [...]}}): o middleware aplica a primeira com
+``paths``/``methods`` compatíveis; as demais são usadas pelo decorator.
+Respostas recebem X-RateLimit-Limit/Remaining/Reset e, quando bloqueadas,
+status 429 com Retry-After.
+"""
+import functools
+import math
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import JsonResponse
+
+DEFAULT_POLICIES = {
+    'api': {'rate': '60/m', 'paths': ['/api/']},
+    'login': {'rate': '5/5m', 'paths': ['/accounts/login/']},
+    'post': {'rate': '30/m', 'methods': ['POST']},
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+RATE_PATTERN = re.compile(r'^(\d+)/(\d*)([smhd])$')
+
+KEY_PREFIX = 'rate_limit'
+# Chaves mantidas pelo fallback em memória (as menos usadas saem primeiro)
+MAX_LOCAL_KEYS = 10000
+
+LIMITED_MESSAGE = 'Muitas tentativas. Tente novamente em alguns minutos.'
+
+# Janela deslizante: remove o que saiu da janela, registra o hit se couber
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+local allowed = 0
+if count < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[4])
+    count = count + 1
+    allowed = 1
+end
+redis.call('PEXPIRE', KEYS[1], window)
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+local reset = window
+if oldest[2] then
+    reset = tonumber(oldest[2]) + window - now
+end
+return {allowed, count, reset}
+"""
+
+RateLimitResult = namedtuple('RateLimitResult', 'allowed limit remaining reset')
+
+
+def parse_rate(rate):
+    """'30/m', '5/5m', '100/h' -> (limite, segundos)"""
+    match = RATE_PATTERN.match(str(rate).strip())
+    if not match:
+        raise ValueError(f"Invalid rate: {rate!r}")
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * PERIODS[unit]
+
+
+def get_policies():
+    return getattr(settings, 'RATE_LIMIT_POLICIES', DEFAULT_POLICIES)
+
+
+def is_enabled():
+    return getattr(settings, 'RATELIMIT_ENABLE', True)
+
+
+class RateLimiter:
+    """Motor de rate limiting sobre o cache ``RATELIMIT_USE_CACHE``"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+        self._scripts = {}
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'RATELIMIT_USE_CACHE', 'default')]
+
+    def hit(self, key, rate):
+        """Registrar uma requisição de ``key``; retorna RateLimitResult"""
+        limit, period = parse_rate(rate)
+        cache = self.cache
+        key = f'{KEY_PREFIX}:{key}'
+        client = self._redis_client(cache, key)
+        if client is not None:
+            return self._hit_redis(client, cache.make_key(key), limit, period)
+        if isinstance(cache, LocMemCache):
+            return self._hit_local(key, limit, period)
+        return self._hit_counter(cache, key, limit, period)
+
+    def reset(self):
+        """Esquecer as janelas em memória (testes)"""
+        with self._lock:
+            self._local.clear()
+
+    def _redis_client(self, cache, key):
+        if hasattr(cache, 'client') and hasattr(cache.client, 'get_client'):
+            # django_redis
+            return cache.client.get_client(write=True)
+        backend = getattr(cache, '_cache', None)
+        if backend is not None and hasattr(backend, 'get_client') and hasattr(backend, '_pools'):
+            # django.core.cache.backends.redis.RedisCache
+            return backend.get_client(cache.make_key(key), write=True)
+        return None
+
+    def _hit_redis(self, client, key, limit, period):
+        script = self._scripts.get(id(client))
+        if script is None:
+            script = self._scripts[id(client)] = client.register_script(SLIDING_WINDOW_SCRIPT)
+        now = int(time.time() * 1000)
+        allowed, count, reset = script(
+            keys=[key], args=[now, period * 1000, limit, f'{now}-{uuid.uuid4().hex[:8]}']
+        )
+        return RateLimitResult(bool(allowed), limit, max(limit - int(count), 0), math.ceil(int(reset) / 1000))
+
+    def _hit_local(self, key, limit, period):
+        now = time.monotonic()
+        with self._lock:
+            hits = self._local.get(key)
+            if hits is None:
+                hits = self._local[key] = deque()
+                if len(self._local) > MAX_LOCAL_KEYS:
+                    self._local.popitem(last=False)
+            else:
+                self._local.move_to_end(key)
+            while hits and hits[0] <= now - period:
+                hits.popleft()
+            allowed = len(hits) < limit
+            if allowed:
+                hits.append(now)
+            reset = hits[0] + period - now if hits else period
+            return RateLimitResult(allowed, limit, limit - len(hits), math.ceil(reset))
+
+    def _hit_counter(self, cache, key, limit, period):
+        now = time.time()
+        window = int(now // period)
+        key = f'{key}:{window}'
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            # Primeira requisição da janela (ou outro processo criou a chave antes)
+            count = 1 if cache.add(key, 1, period) else cache.incr(key)
+        reset = (window + 1) * period - now
+        return RateLimitResult(count <= limit, limit, max(limit - count, 0), math.ceil(reset))
+
+
+limiter = RateLimiter()
+
+
+def match_policy(request):
+    """(nome, política) do middleware para a requisição, ou (None, None)"""
+    for name, policy in get_policies().items():
+        paths, methods = policy.get('paths'), policy.get('methods')
+        if not paths and not methods:
+            continue
+        if paths and not any(request.path.startswith(path) for path in paths):
+            continue
+        if methods and request.method not in methods:
+            continue
+        return name, policy
+    return None, None
+
+
+def apply_headers(response, result):
+    """Headers X-RateLimit-* (e Retry-After quando bloqueada)"""
+    response['X-RateLimit-Limit'] = str(result.limit)
+    response['X-RateLimit-Remaining'] = str(result.remaining)
+    response['X-RateLimit-Reset'] = str(result.reset)
+    if not result.allowed:
+        response['Retry-After'] = str(result.reset)
+    return response
+
+
+def limited_response(result):
+    """Resposta 429 com os headers de rate limit"""
+    return apply_headers(JsonResponse({'error': LIMITED_MESSAGE}, status=429), result)
+
+
+def client_ip(request):
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+def _request_key(request, key):
+    if callable(key):
+        return key(request)
+    user = getattr(request, 'user', None)
+    if key == 'user' and user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f'ip:{client_ip(request)}'
+
+
+def ratelimit(key='user', rate=None, policy=None, method=None, block=True):
+    """
+    Decorator de views com o mesmo motor do middleware.
+
+    ``rate`` ('20/m') ou ``policy`` (nome em RATE_LIMIT_POLICIES); ``key``
+    'user' (usuária autenticada, senão IP), 'ip' ou função(request);
+    ``method`` restringe os métodos contados. Com ``block=False`` a view
+    roda com ``request.limited = True``.
+    """
+    scope = policy or rate
+    methods = [method] if isinstance(method, str) else method
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            request.limited = getattr(request, 'limited', False)
+            if not is_enabled() or (methods and request.method not in methods):
+                return view(request, *args, **kwargs)
+
+            name = f'{view.__module__}.{view.__qualname__}:{scope}'
+            # Política lida a cada requisição (settings podem mudar nos testes)
+            result = limiter.hit(
+                f'{name}:{_request_key(request, key)}', rate or get_policies()[policy]['rate']
+            )
+            if not result.allowed:
+                if block:
+                    return limited_response(result)
+                request.limited = True
+            return apply_headers(view(request, *args, **kwargs), result)
+        return wrapper
+    return decorator
@@ -0,0 +1,489 @@
+"""
+Busca textual unificada: mensagens do chat, tarefas, comunicados e mensagens
+de comunicação.
+
+Cada fonte (SOURCES) é copiada para SearchDocument (título, corpo, data) na
+mesma transação da escrita, por sinais; gravações em lote que não disparam
+sinais (write-behind do chat) chamam ``index_instances`` e o comando
+``rebuild_search_index`` recria o índice. O índice textual é mantido por
+triggers no banco (migração core 0003):
+
+- SQLite: tabela FTS5 com tokenizador unicode61 sem acentos; termos buscados
+  por prefixo e ordenados por bm25
+- PostgreSQL: tsvector na configuração ``pt_unaccent`` (português com
+  unaccent) com índice GIN, ordenado por ts_rank_cd
+- demais bancos: LIKE sem índice, em ordem de indexação
+
+A permissão não é copiada para o índice: cada fonte declara o queryset do que
+o usuário pode ver e os documentos são filtrados por ele na mesma consulta,
+então mudanças de membros e destinatários valem imediatamente. A paginação é
+por cursor (pontuação, id do documento).
+"""
+import base64
+import binascii
+import json
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import escape
+
+from core.background_jobs import register_job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_TERMS = 8
+SNIPPET_TOKENS = 16
+TITLE_WEIGHT = 4.0
+
+# Marcadores de destaque (uso privado do Unicode), trocados por <mark> depois
+# de escapar o HTML do conteúdo
+MARK_START = '\ue000'
+MARK_END = '\ue001'
+
+TOKEN = re.compile(r'\w+')
+
+
+class InvalidCursor(ValueError):
+    """Cursor de busca malformado"""
+
+
+class SearchSource:
+    """Modelo indexado: o que entra no índice e quem pode ver cada objeto"""
+    label = None
+    title_fields = ()
+    body_fields = ()
+    date_field = 'created_at'
+    related = ()
+
+    @property
+    def model(self):
+        return apps.get_model(self.label)
+
+    @property
+    def indexed_fields(self):
+        return {*self.title_fields, *self.body_fields, self.date_field}
+
+    def indexable(self, instance):
+        return True
+
+    def permitted(self, user):
+        """Queryset dos objetos visíveis ao usuário"""
+        raise NotImplementedError
+
+    def heading(self, instance):
+        return str(instance)
+
+    def url(self, instance):
+        return instance.get_absolute_url()
+
+    def document(self, instance):
+        from core.models import SearchDocument
+
+        def text(fields):
+            return '\n'.join(str(getattr(instance, field) or '') for field in fields).strip()
+
+        return SearchDocument(
+            source=self.label,
+            title=text(self.title_fields)[:300],
+            body=text(self.body_fields),
+            created_at=getattr(instance, self.date_field),
+            **{_key_field(self.model): instance.pk},
+        )
+
+
+class ChatMessageSource(SearchSource):
+    label = 'chat.ChatMessage'
+    body_fields = ('content',)
+    related = ('channel', 'sender')
+
+    def indexable(self, instance):
+        return instance.channel_id is not None and not instance.is_deleted
+
+    def permitted(self, user):
+        return self.model.objects.filter(channel__memberships__user=user, is_deleted=False)
+
+    def heading(self, instance):
+        return f"{instance.channel.name} · {instance.sender.get_full_name()}"
+
+    def url(self, instance):
+        return f"{reverse('chat:home')}?channel={instance.channel_id}"
+
+
+class TaskSource(SearchSource):
+    label = 'tasks.Task'
+    title_fields = ('title',)
+    body_fields = ('description',)
+    related = ('board',)
+
+    def permitted(self, user):
+        return self.model.objects.filter(Q(board__owner=user) | Q(board__members=user))
+
+    def heading(self, instance):
+        return f"{instance.title} ({instance.board.name})"
+
+    def url(self, instance):
+        return reverse('tasks:task_detail', args=[instance.pk])
+
+
+class AnnouncementSource(SearchSource):
+    label = 'communication.Announcement'
+    title_fields = ('title',)
+    body_fields = ('summary', 'content')
+
+    def permitted(self, user):
+        now = timezone.now()
+        # Mesmas regras de Announcement.user_can_read, para comunicados publicados
+        audience = Q(is_global=True) | Q(target_users=user) | Q(departments__employees__user=user)
+        published = Q(is_active=True, publish_date__lte=now) & (
+            Q(expire_date__isnull=True) | Q(expire_date__gt=now)
+        )
+        return self.model.objects.filter(Q(author=user) | (published & audience))
+
+    def url(self, instance):
+        return reverse('communication:announcement_detail', args=[instance.pk])
+
+
+class CommunicationMessageSource(SearchSource):
+    label = 'communication.CommunicationMessage'
+    title_fields = ('title',)
+    body_fields = ('summary', 'content', 'tags')
+
+    def permitted(self, user):
+        return self.model.objects.filter(Q(status='published') | Q(author=user))
+
+
+SOURCES = {
+    source.label: source
+    for source in (ChatMessageSource(), TaskSource(), AnnouncementSource(), CommunicationMessageSource())
+}
+
+
+def _key_field(model):
+    """Coluna de SearchDocument que guarda a chave primária do modelo"""
+    return 'object_uuid' if model._meta.pk.get_internal_type() == 'UUIDField' else 'object_int'
+
+
+# =============================================================================
+# Indexação
+# =============================================================================
+
+def index_instances(instances):
+    """(Re)indexar instâncias de um mesmo modelo; retorna quantas foram indexadas"""
+    from core.models import SearchDocument
+
+    instances = list(instances)
+    if not instances:
+        return 0
+    source = SOURCES.get(instances[0]._meta.label)
+    if source is None:
+        return 0
+
+    documents = [source.document(instance) for instance in instances if source.indexable(instance)]
+    key = _key_field(source.model)
+    with transaction.atomic():
+        SearchDocument.objects.filter(
+            source=source.label, **{f'{key}__in': [instance.pk for instance in instances]}
+        ).delete()
+        SearchDocument.objects.bulk_create(documents)
+    return len(documents)
+
+
+def remove_instances(model, pks):
+    """Retirar objetos do índice"""
+    from core.models import SearchDocument
+
+    SearchDocument.objects.filter(
+        source=model._meta.label, **{f'{_key_field(model)}__in': list(pks)}
+    ).delete()
+
+
+def rebuild_index(labels=None, batch_size=500):
+    """Recriar o índice das fontes informadas (todas por padrão); retorna {fonte: documentos}"""
+    from core.models import SearchDocument
+
+    counts = {}
+    for label in labels or SOURCES:
+        source = SOURCES[label]
+        total = 0
+        with transaction.atomic():
+            SearchDocument.objects.filter(source=label).delete()
+            batch = []
+            for instance in source.model.objects.iterator(chunk_size=batch_size):
+                if source.indexable(instance):
+                    batch.append(source.document(instance))
+                if len(batch) >= batch_size:
+                    SearchDocument.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+            SearchDocument.objects.bulk_create(batch)
+            total += len(batch)
+        counts[label] = total
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO core_search_fts(core_search_fts) VALUES ('optimize')")
+    return counts
+
+
+@register_job
+def rebuild_search_index(labels=None):
+    """Job de reconstrução do índice de busca"""
+    return rebuild_index(labels)
+
+
+def _instance_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    source = SOURCES[sender._meta.label]
+    if update_fields is not None and not source.indexed_fields & set(update_fields):
+        return
+    try:
+        index_instances([instance])
+    except Exception as e:
+        # O índice é reconstruível: não impedir a gravação do objeto
+        logger.error(f"Erro ao indexar {sender._meta.label} {instance.pk}: {e}")
+
+
+def _instance_deleted(sender, instance, **kwargs):
+    remove_instances(sender, [instance.pk])
+
+
+def connect_signals():
+    """Conectar os sinais de indexação (CoreConfig.ready)"""
+    for label in SOURCES:
+        try:
+            model = apps.get_model(label)
+        except LookupError as e:
+            logger.warning(f"Fonte de busca {label} não indexada: {e}")
+            continue
+        uid = f'search_index_{label}'
+        post_save.connect(_instance_saved, sender=model, dispatch_uid=uid)
+        post_delete.connect(_instance_deleted, sender=model, dispatch_uid=uid)
+
+
+# =============================================================================
+# Consulta
+# =============================================================================
+
+def encode_cursor(score, document_id):
+    raw = json.dumps([score, document_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        score, document_id = json.loads(raw)
+        return float(score), int(document_id)
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def query_terms(query):
+    """Termos da busca, minúsculos e sem acentos"""
+    text = unicodedata.normalize('NFKD', query.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return TOKEN.findall(text)[:MAX_TERMS]
+
+
+def highlight(text):
+    """HTML do trecho com os termos encontrados entre <mark>"""
+    return escape(text or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+class _SQLiteBackend:
+    def select(self, terms, permitted, after, limit):
+        permitted_sql, permitted_params = permitted.query.sql_with_params()
+        match = ' '.join(f'"{term}"*' for term in terms)
+        cursor_sql, cursor_params = '', []
+        if after is not None:
+            cursor_sql = 'WHERE score > %s OR (score = %s AND id > %s)'
+            cursor_params = [after[0], after[0], after[1]]
+        sql = f"""
+            SELECT id, source, object_uuid, object_int, title, snippet, score FROM (
+                SELECT d.id AS id, d.source AS source, d.object_uuid AS object_uuid,
+                       d.object_int AS object_int,
+                       highlight(core_search_fts, 0, %s, %s) AS title,
+                       snippet(core_search_fts, 1, %s, %s, '…', {SNIPPET_TOKENS}) AS snippet,
+                       bm25(core_search_fts, {TITLE_WEIGHT}, 1.0) AS score
+                FROM core_search_fts
+                JOIN core_searchdocument d ON d.id = core_search_fts.rowid
+                WHERE core_search_fts MATCH %s AND d.id IN ({permitted_sql})
+            ) {cursor_sql}
+            ORDER BY score, id
+            LIMIT %s
+        """
+        params = [MARK_START, MARK_END, MARK_START, MARK_END, match, *permitted_params, *cursor_params, limit]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class _PostgresBackend:
+    HEADLINE = (
+        f'StartSel={MARK_START}, StopSel={MARK_END}, '
+        f'MaxWords={SNIPPET_TOKENS}, MinWords={SNIPPET_TOKENS // 2}, MaxFragments=1'
+    )
+
+    def select(self, terms, permitted, after, limit):
+        permitted_sql, permitted_params = permitted.query.sql_with_params()
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        cursor_sql, cursor_params = '', []
+        if after is not None:
+            cursor_sql = 'WHERE ranked.score > %s OR (ranked.score = %s AND ranked.id > %s)'
+            cursor_params = [after[0], after[0], after[1]]
+        # ts_headline é caro: calculado apenas para a página já limitada
+        sql = f"""
+            SELECT page.id, page.source, page.object_uuid, page.object_int,
+                   ts_headline('pt_unaccent', page.title, page.query, %s),
+                   ts_headline('pt_unaccent', page.body, page.query, %s),
+                   page.score
+            FROM (
+                SELECT * FROM (
+                    SELECT d.id, d.source, d.object_uuid, d.object_int, d.title, d.body, q AS query,
+                           -ts_rank_cd(d.search_vector, q) AS score
+                    FROM core_searchdocument d, to_tsquery('pt_unaccent', %s) q
+                    WHERE d.search_vector @@ q AND d.id IN ({permitted_sql})
+                ) ranked {cursor_sql}
+                ORDER BY ranked.score, ranked.id
+                LIMIT %s
+            ) page
+            ORDER BY page.score, page.id
+        """
+        params = [self.HEADLINE, self.HEADLINE, tsquery, *permitted_params, *cursor_params, limit]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class _LikeBackend:
+    """Bancos sem índice textual configurado: LIKE em ordem de indexação"""
+
+    def select(self, terms, permitted, after, limit):
+        from core.models import SearchDocument
+
+        documents = SearchDocument.objects.filter(id__in=permitted)
+        for term in terms:
+            documents = documents.filter(Q(title__icontains=term) | Q(body__icontains=term))
+        if after is not None:
+            documents = documents.filter(id__gt=after[1])
+        return [
+            (document_id, source, object_uuid, object_int, title, body[:200], 0.0)
+            for document_id, source, object_uuid, object_int, title, body in documents.order_by('id').values_list(
+                'id', 'source', 'object_uuid', 'object_int', 'title', 'body'
+            )[:limit]
+        ]
+
+
+def _backend():
+    if connection.vendor == 'sqlite':
+        return _SQLiteBackend()
+    if connection.vendor == 'postgresql':
+        return _PostgresBackend()
+    return _LikeBackend()
+
+
+class SearchHit:
+    """Resultado da busca com o objeto de origem"""
+
+    def __init__(self, source, instance, title, snippet, score):
+        self.source = source
+        self.instance = instance
+        self.title = title
+        self.snippet = snippet
+        self.score = score
+
+    @property
+    def type(self):
+        return self.source.label
+
+    def as_dict(self):
+        created_at = getattr(self.instance, self.source.date_field)
+        return {
+            'type': self.source.label,
+            'id': str(self.instance.pk),
+            'heading': self.source.heading(self.instance),
+            'title': self.title,
+            'snippet': self.snippet,
+            'url': self.source.url(self.instance),
+            'created_at': created_at.isoformat() if created_at else None,
+            'score': self.score,
+        }
+
+
+def _hydrate(rows):
+    """SearchHits na ordem das linhas, com uma consulta por fonte"""
+    from core.models import SearchDocument
+
+    to_uuid = SearchDocument._meta.get_field('object_uuid').to_python
+    keys = []
+    by_source = defaultdict(list)
+    for _, label, object_uuid, object_int, *_ in rows:
+        pk = to_uuid(object_uuid) if object_uuid is not None else object_int
+        keys.append((label, pk))
+        by_source[label].append(pk)
+
+    instances = {}
+    for label, pks in by_source.items():
+        source = SOURCES[label]
+        for instance in source.model.objects.filter(pk__in=pks).select_related(*source.related):
+            instances[(label, instance.pk)] = instance
+
+    hits = []
+    for key, (_, label, _, _, title, snippet, score) in zip(keys, rows):
+        instance = instances.get(key)
+        if instance is None:
+            # Documento órfão (objeto removido sem sinal): corrigido no próximo rebuild
+            continue
+        source = SOURCES[label]
+        hits.append(SearchHit(source, instance, highlight(title), highlight(snippet), score))
+    return hits
+
+
+def search(user, query, sources=None, cursor=None, limit=DEFAULT_PAGE_SIZE, scope=None):
+    """
+    Página de resultados visíveis ao usuário, por relevância.
+
+    ``sources`` restringe as fontes (rótulos de SOURCES), ``scope`` mapeia
+    fonte -> Q aplicado ao queryset de permissão (por exemplo, um canal) e
+    ``cursor`` é o ``next_cursor`` da página anterior. Retorna
+    {'results': [SearchHit], 'next_cursor', 'has_more'}.
+    """
+    from core.models import SearchDocument
+
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    unknown = set(sources or ()) - set(SOURCES)
+    if unknown:
+        raise ValueError(f"Fontes de busca desconhecidas: {', '.join(sorted(unknown))}")
+    after = decode_cursor(cursor) if cursor else None
+    terms = query_terms(query or '')
+    if not terms:
+        return {'results': [], 'next_cursor': None, 'has_more': False}
+
+    visible = Q(pk__in=[])
+    for label in sources or SOURCES:
+        source = SOURCES[label]
+        permitted = source.permitted(user)
+        if scope and label in scope:
+            permitted = permitted.filter(scope[label])
+        visible |= Q(source=label, **{f'{_key_field(source.model)}__in': permitted.values('pk')})
+    permitted = SearchDocument.objects.filter(visible).values('id')
+
+    rows = _backend().select(terms, permitted, after, limit + 1)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'results': _hydrate(rows),
+        'next_cursor': encode_cursor(rows[-1][6], rows[-1][0]) if has_more else None,
+        'has_more': has_more,
+    }
@@ -4,11 +4,13 @@ Middleware de segurança personalizado para o Move Marias
 import logging
 import time
 from django.core.cache import cache
-from django.http import HttpResponseForbidden, JsonResponse
+from django.http import HttpResponseForbidden
 from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.models import AnonymousUser
 
+from core import rate_limit
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,11 +28,10 @@ class SecurityMiddleware(MiddlewareMixin):
         Processar request antes das views
         """
         # Rate limiting
-        if self._is_rate_limited(request):
+        result = self._check_rate_limit(request)
+        if result is not None and not result.allowed:
             logger.warning(f"Rate limit exceeded for IP: {self._get_client_ip(request)}")
-            return JsonResponse({
-                'error': 'Muitas tentativas. Tente novamente em alguns minutos.'
-            }, status=429)
+            return rate_limit.limited_response(result)
         
         # Validar headers suspeitos
         if self._has_suspicious_headers(request):
@@ -43,6 +44,11 @@ class SecurityMiddleware(MiddlewareMixin):
         """
         Adicionar headers de segurança
         """
+        # Headers de rate limit (respostas 429 já os trazem)
+        result = getattr(request, 'rate_limit', None)
+        if result is not None and result.allowed:
+            rate_limit.apply_headers(response, result)
+        
         # Headers de segurança básicos
         response['X-Content-Type-Options'] = 'nosniff'
         response['X-Frame-Options'] = 'DENY'
@@ -66,60 +72,21 @@ class SecurityMiddleware(MiddlewareMixin):
             ip = request.META.get('REMOTE_ADDR')
         return ip
     
-    def _is_rate_limited(self, request):
-        """
-        Verificar rate limiting
-        """
-        ip = self._get_client_ip(request)
-        
-        # Rate limits diferentes por tipo de endpoint
-        if request.path.startswith('/api/'):
-            return self._check_api_rate_limit(ip)
-        elif request.path.startswith('/accounts/login/'):
-            return self._check_login_rate_limit(ip)
-        elif request.method == 'POST':
-            return self._check_post_rate_limit(ip)
-        
-        return False
-    
-    def _check_api_rate_limit(self, ip):
-        """
-        Rate limit para API (60 requests por minuto)
-        """
-        cache_key = f'api_rate_limit_{ip}'
-        current_requests = cache.get(cache_key, 0)
-        
-        if current_requests >= 60:
-            return True
-        
-        cache.set(cache_key, current_requests + 1, 60)
-        return False
-    
-    def _check_login_rate_limit(self, ip):
+    def _check_rate_limit(self, request):
         """
-        Rate limit para login (5 tentativas por 5 minutos)
+        Verificar rate limiting pela política da rota (settings.RATE_LIMIT_POLICIES);
+        retorna o RateLimitResult, ou None sem política aplicável
         """
-        cache_key = f'login_rate_limit_{ip}'
-        current_attempts = cache.get(cache_key, 0)
+        if not rate_limit.is_enabled():
+            return None
         
-        if current_attempts >= 5:
-            return True
+        name, policy = rate_limit.match_policy(request)
+        if policy is None:
+            return None
         
-        cache.set(cache_key, current_attempts + 1, 300)
-        return False
-    
-    def _check_post_rate_limit(self, ip):
-        """
-        Rate limit para POSTs em geral (30 por minuto)
-        """
-        cache_key = f'post_rate_limit_{ip}'
-        current_requests = cache.get(cache_key, 0)
-        
-        if current_requests >= 30:
-            return True
-        
-        cache.set(cache_key, current_requests + 1, 60)
-        return False
+        ip = self._get_client_ip(request)
+        request.rate_limit = rate_limit.limiter.hit(f'{name}:{ip}', policy['rate'])
+        return request.rate_limit
     
     def _has_suspicious_headers(self, request):
         """
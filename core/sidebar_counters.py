@@ -0,0 +1,241 @@
+"""
+Contadores por usuário dos badges do sidebar.
+
+Notificações não lidas, tarefas em aberto e mensagens de chat não lidas
+ficam no cache (uma chave por usuário e contador) e são atualizadas pelos
+sinais dos modelos, em vez de três COUNTs a cada página renderizada:
+
+- post_init guarda (dono, conta?) da instância carregada; post_save e
+  post_delete aplicam +1/-1 com ``cache.incr`` depois do commit
+- mensagens novas incrementam o contador de todos os membros do canal, exceto
+  o remetente; leitura do canal (last_read_at), entrada/saída de membros e
+  mensagens apagadas descartam os contadores afetados
+- operações em massa que não disparam sinais (``update()``, ``bulk_create``)
+  chamam ``adjust``/``invalidate`` explicitamente
+- contador ausente é recalculado com uma consulta e gravado com ``add``; o
+  tempo de vida (SIDEBAR_COUNTERS_TIMEOUT) limita qualquer desvio
+
+Em regime, a leitura é um único ``get_many`` no cache, sem consultas.
+"""
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'sidebar_counter'
+TIMEOUT = getattr(settings, 'SIDEBAR_COUNTERS_TIMEOUT', 3600)
+
+UNREAD_NOTIFICATION_STATUSES = ('pending', 'sent', 'delivered')
+OPEN_TASK_STATUSES = ('todo', 'in_progress', 'review')
+
+_SNAPSHOT_ATTR = '_sidebar_counter_state'
+_MISSING = object()
+
+
+def _key(user_id, name):
+    return f'{KEY_PREFIX}:{user_id}:{name}'
+
+
+def count_notifications(user_id):
+    from notifications.models import Notification
+
+    return Notification.objects.filter(
+        recipient_id=user_id, status__in=UNREAD_NOTIFICATION_STATUSES
+    ).count()
+
+
+def count_tasks(user_id):
+    from tasks.models import Task
+
+    return Task.objects.filter(assignee_id=user_id, status__in=OPEN_TASK_STATUSES).count()
+
+
+def count_messages(user_id):
+    """Mensagens de outros usuários posteriores à última leitura de cada canal do usuário"""
+    from chat.models import ChatMessage
+
+    # Condições da associação no mesmo filter() para usarem o mesmo JOIN
+    return ChatMessage.objects.filter(
+        Q(channel__memberships__last_read_at__isnull=True)
+        | Q(created_at__gt=F('channel__memberships__last_read_at')),
+        channel__memberships__user_id=user_id,
+        is_deleted=False,
+    ).exclude(sender_id=user_id).count()
+
+
+COUNTERS = {
+    'notifications': count_notifications,
+    'tasks': count_tasks,
+    'messages': count_messages,
+}
+
+
+def counter_keys(user_id):
+    """{contador: chave de cache} do usuário"""
+    return {name: _key(user_id, name) for name in COUNTERS}
+
+
+def get_counters(user, cached=None):
+    """
+    {contador: valor} do usuário; consulta o banco apenas para contadores
+    ausentes. ``cached``: resultado de um get_many que já incluiu as chaves
+    de ``counter_keys`` (core.user_context).
+    """
+    keys = counter_keys(user.pk)
+    if cached is None:
+        cached = cache.get_many(list(keys.values()))
+    counters = {}
+    for name, key in keys.items():
+        value = cached.get(key)
+        if value is None:
+            try:
+                value = COUNTERS[name](user.pk)
+            except Exception as e:
+                logger.error(f"Erro ao calcular contador {name} do sidebar: {e}")
+                counters[name] = 0
+                continue
+            # add: não sobrescreve um contador gravado por outra requisição
+            cache.add(key, value, TIMEOUT)
+        counters[name] = max(value, 0)
+    return counters
+
+
+def _incr(keys, delta):
+    for key in keys:
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Contador fora do cache: será recalculado na próxima leitura
+            pass
+
+
+def adjust(user_ids, name, delta):
+    """Somar ``delta`` ao contador ``name`` dos usuários, após o commit"""
+    keys = [_key(user_id, name) for user_id in set(user_ids) if user_id is not None]
+    if keys and delta:
+        transaction.on_commit(lambda: _incr(keys, delta))
+
+
+def invalidate(user_ids, names=None):
+    """Descartar contadores (recalculados na próxima leitura), após o commit"""
+    keys = [
+        _key(user_id, name)
+        for user_id in set(user_ids) if user_id is not None
+        for name in (names or COUNTERS)
+    ]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class _OwnedCounter:
+    """
+    Contador de objetos com dono (``owner_field``) cujo ``status`` está em
+    ``statuses`` (notificações não lidas, tarefas abertas).
+    """
+
+    def __init__(self, model, name, owner_field, statuses):
+        self.model = model
+        self.name = name
+        self.owner_attr = f'{owner_field}_id'
+        self.fields = {owner_field, 'status'}
+        self.statuses = statuses
+
+    def connect(self):
+        uid = f'sidebar_counter_{self.name}'
+        post_init.connect(self.post_init, sender=self.model, weak=False, dispatch_uid=uid)
+        pre_save.connect(self.pre_save, sender=self.model, weak=False, dispatch_uid=uid)
+        post_save.connect(self.post_save, sender=self.model, weak=False, dispatch_uid=uid)
+        post_delete.connect(self.post_delete, sender=self.model, weak=False, dispatch_uid=uid)
+
+    def state(self, instance):
+        """Dono que a instância conta, ou None"""
+        if instance.status in self.statuses:
+            return getattr(instance, self.owner_attr)
+        return None
+
+    def post_init(self, sender, instance, **kwargs):
+        if instance.pk is None or self.fields & instance.get_deferred_fields():
+            setattr(instance, _SNAPSHOT_ATTR, _MISSING)
+        else:
+            setattr(instance, _SNAPSHOT_ATTR, self.state(instance))
+
+    def pre_save(self, sender, instance, raw=False, **kwargs):
+        if raw or instance._state.adding or getattr(instance, _SNAPSHOT_ATTR, _MISSING) is not _MISSING:
+            return
+        # Instância com campos diferidos ou criada sem carregar: buscar o estado anterior
+        previous = sender._default_manager.filter(pk=instance.pk).only(*self.fields).first()
+        setattr(instance, _SNAPSHOT_ATTR, self.state(previous) if previous else None)
+
+    def post_save(self, sender, instance, created, raw=False, **kwargs):
+        if raw:
+            return
+        previous = None if created else getattr(instance, _SNAPSHOT_ATTR, None)
+        current = self.state(instance)
+        if previous != current:
+            adjust([previous], self.name, -1)
+            adjust([current], self.name, 1)
+        setattr(instance, _SNAPSHOT_ATTR, current)
+
+    def post_delete(self, sender, instance, **kwargs):
+        previous = getattr(instance, _SNAPSHOT_ATTR, _MISSING)
+        adjust([self.state(instance) if previous is _MISSING else previous], self.name, -1)
+
+
+class _ChatCounter:
+    """Contador de mensagens não lidas, distribuído aos membros do canal"""
+
+    def __init__(self, message_model, membership_model):
+        self.message_model = message_model
+        self.membership_model = membership_model
+
+    def connect(self):
+        uid = 'sidebar_counter_messages'
+        post_init.connect(self.message_init, sender=self.message_model, weak=False, dispatch_uid=uid)
+        post_save.connect(self.message_saved, sender=self.message_model, weak=False, dispatch_uid=uid)
+        post_delete.connect(self.message_deleted, sender=self.message_model, weak=False, dispatch_uid=uid)
+        post_save.connect(self.membership_changed, sender=self.membership_model, weak=False, dispatch_uid=uid)
+        post_delete.connect(self.membership_changed, sender=self.membership_model, weak=False, dispatch_uid=uid)
+
+    def member_ids(self, message):
+        return self.membership_model.objects.filter(
+            channel_id=message.channel_id
+        ).exclude(user_id=message.sender_id).values_list('user_id', flat=True)
+
+    def message_init(self, sender, instance, **kwargs):
+        if 'is_deleted' not in instance.get_deferred_fields():
+            setattr(instance, _SNAPSHOT_ATTR, instance.is_deleted)
+
+    def message_saved(self, sender, instance, created, raw=False, **kwargs):
+        if raw or instance.channel_id is None:
+            return
+        if created:
+            if not instance.is_deleted:
+                adjust(self.member_ids(instance), 'messages', 1)
+        elif getattr(instance, _SNAPSHOT_ATTR, None) != instance.is_deleted:
+            invalidate(self.member_ids(instance), ['messages'])
+        setattr(instance, _SNAPSHOT_ATTR, instance.is_deleted)
+
+    def message_deleted(self, sender, instance, **kwargs):
+        if instance.channel_id is not None:
+            invalidate(self.member_ids(instance), ['messages'])
+
+    def membership_changed(self, sender, instance, **kwargs):
+        # Leitura do canal (last_read_at), entrada ou saída de membro
+        invalidate([instance.user_id], ['messages'])
+
+
+def connect_signals():
+    """Conectar os sinais dos contadores (CoreConfig.ready)"""
+    try:
+        _OwnedCounter(apps.get_model('notifications.Notification'), 'notifications',
+                      'recipient', UNREAD_NOTIFICATION_STATUSES).connect()
+        _OwnedCounter(apps.get_model('tasks.Task'), 'tasks', 'assignee', OPEN_TASK_STATUSES).connect()
+        _ChatCounter(apps.get_model('chat.ChatMessage'), apps.get_model('chat.ChatChannelMembership')).connect()
+    except LookupError as e:
+        logger.warning(f"Contadores do sidebar não conectados: {e}")
@@ -1,20 +1,24 @@
 """
 Sistema de cache inteligente para performance otimizada
+
+A invalidação automática por sinais de Beneficiary/Workshop fica em
+core.unified_cache.connect_model_invalidators (conectado em CoreConfig.ready).
 """
-from django.core.cache import cache
 from django.conf import settings
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
 import logging
 from functools import wraps
-import hashlib
-import json
+
+from .unified_cache import UnifiedCache, invalidate_tags, make_key_hash, watch_model
 
 logger = logging.getLogger('performance')
 
 class SmartCacheManager:
     """
     Gerenciador de cache inteligente com invalidação automática
+
+    Fachada sobre core.unified_cache: cada chave recebe a tag do seu módulo
+    (ex.: ``ben:...`` → ``beneficiaries``) e a invalidação incrementa tags
+    em vez de varrer chaves.
     """
     
     # Configurações de timeout por tipo de dados
@@ -36,6 +40,8 @@ class SmartCacheManager:
         'stats': 'stats'
     }
     
+    cache = UnifiedCache('smart')
+    
     @classmethod
     def get_cache_key(cls, prefix, identifier, suffix=''):
         """Gera chave de cache padronizada"""
@@ -45,56 +51,43 @@ class SmartCacheManager:
         return ':'.join(key_parts)
     
     @classmethod
-    def set_cache(cls, key, value, timeout_type='medium'):
+    def module_tag(cls, key_or_prefix):
+        """Tag do módulo dona da chave (``ben:42`` → ``beneficiaries``)"""
+        prefix = str(key_or_prefix).split(':', 1)[0]
+        modules = {short: module for module, short in cls.CACHE_PREFIXES.items()}
+        return modules.get(prefix, prefix)
+    
+    @classmethod
+    def set_cache(cls, key, value, timeout_type='medium', tags=None):
         """Define valor no cache com timeout apropriado"""
         timeout = cls.CACHE_TIMEOUTS.get(timeout_type, 1800)
-        cache.set(key, value, timeout)
+        cls.cache.set(key, value, timeout, tags=[cls.module_tag(key), *(tags or ())])
         logger.info(f"Cache set: {key} (timeout: {timeout}s)")
     
     @classmethod
-    def get_cache(cls, key, default=None):
+    def get_cache(cls, key, default=None, tags=None):
         """Obtém valor do cache com log"""
-        value = cache.get(key, default)
+        value = cls.cache.get(key, default, tags=[cls.module_tag(key), *(tags or ())])
         status = 'hit' if value is not None else 'miss'
         logger.info(f"Cache {status}: {key}")
         return value
     
     @classmethod
     def invalidate_pattern(cls, pattern):
-        """Invalida chaves que correspondem ao padrão"""
-        # Em produção, usar Redis KEYS ou SCAN
-        # Para desenvolvimento, invalidação manual
-        if hasattr(cache, 'delete_pattern'):
-            cache.delete_pattern(pattern)
-        else:
-            # Fallback para cache local
-            cache.clear()
+        """Invalida as chaves do módulo do padrão (ex.: ``ben:*``) via tag"""
+        invalidate_tags(cls.module_tag(pattern))
         logger.info(f"Cache invalidated: {pattern}")
     
     @classmethod
     def invalidate_beneficiary(cls, beneficiary_id):
         """Invalida cache relacionado a beneficiária"""
-        patterns = [
-            cls.get_cache_key('beneficiaries', beneficiary_id),
-            cls.get_cache_key('beneficiaries', 'list'),
-            cls.get_cache_key('dashboard', 'stats'),
-            cls.get_cache_key('stats', 'beneficiaries')
-        ]
-        for pattern in patterns:
-            cache.delete(pattern)
+        invalidate_tags(f'beneficiary:{beneficiary_id}', 'beneficiaries', 'dashboard', 'stats')
         logger.info(f"Beneficiary cache invalidated: {beneficiary_id}")
     
     @classmethod
     def invalidate_workshop(cls, workshop_id):
         """Invalida cache relacionado a workshop"""
-        patterns = [
-            cls.get_cache_key('workshops', workshop_id),
-            cls.get_cache_key('workshops', 'list'),
-            cls.get_cache_key('dashboard', 'stats'),
-            cls.get_cache_key('stats', 'workshops')
-        ]
-        for pattern in patterns:
-            cache.delete(pattern)
+        invalidate_tags(f'workshop:{workshop_id}', 'workshops', 'dashboard', 'stats')
         logger.info(f"Workshop cache invalidated: {workshop_id}")
 
 
@@ -105,26 +98,26 @@ def smart_cache(timeout_type='medium', key_prefix='', invalidate_on=None):
     Args:
         timeout_type: Tipo de timeout ('critical', 'short', 'medium', 'long', 'very_long')
         key_prefix: Prefixo da chave de cache
-        invalidate_on: Lista de sinais que invalidam o cache
+        invalidate_on: Modelos ('app.Model') cujo save/delete invalida o cache
     """
+    timeout = SmartCacheManager.CACHE_TIMEOUTS.get(timeout_type, 1800)
+    tags = [SmartCacheManager.module_tag(key_prefix)] if key_prefix else []
+    for label in invalidate_on or ():
+        tags.append(label.split('.')[-1].lower())
+        watch_model(label)
+    
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
             # Gerar chave única baseada na função e argumentos
             func_name = f"{func.__module__}.{func.__name__}"
-            args_key = hashlib.md5(str(args).encode() + str(kwargs).encode()).hexdigest()[:8]
+            args_key = make_key_hash(args, kwargs)[:16]
             cache_key = f"{key_prefix}:{func_name}:{args_key}" if key_prefix else f"{func_name}:{args_key}"
             
-            # Tentar obter do cache
-            result = SmartCacheManager.get_cache(cache_key)
-            if result is not None:
-                return result
-            
-            # Executar função e cachear resultado
-            result = func(*args, **kwargs)
-            SmartCacheManager.set_cache(cache_key, result, timeout_type)
-            
-            return result
+            # Obter do cache ou calcular em voo único
+            return SmartCacheManager.cache.get_or_set(
+                cache_key, lambda: func(*args, **kwargs), timeout, tags=tags
+            )
         return wrapper
     return decorator
 
@@ -205,31 +198,6 @@ detail_cache = smart_cache(timeout_type='long', key_prefix='detail')
 stats_cache = smart_cache(timeout_type='short', key_prefix='stats')
 
 
-# Signal receivers para invalidação automática
-@receiver(post_save, sender='members.Beneficiary')
-def invalidate_beneficiary_cache(sender, instance, **kwargs):
-    """Invalida cache quando beneficiária é modificada"""
-    SmartCacheManager.invalidate_beneficiary(instance.id)
-
-
-@receiver(post_save, sender='workshops.Workshop')
-def invalidate_workshop_cache(sender, instance, **kwargs):
-    """Invalida cache quando workshop é modificado"""
-    SmartCacheManager.invalidate_workshop(instance.id)
-
-
-@receiver(post_delete, sender='members.Beneficiary')
-def invalidate_beneficiary_cache_on_delete(sender, instance, **kwargs):
-    """Invalida cache quando beneficiária é deletada"""
-    SmartCacheManager.invalidate_beneficiary(instance.id)
-
-
-@receiver(post_delete, sender='workshops.Workshop')
-def invalidate_workshop_cache_on_delete(sender, instance, **kwargs):
-    """Invalida cache quando workshop é deletado"""
-    SmartCacheManager.invalidate_workshop(instance.id)
-
-
 class PerformanceMonitor:
     """
     Monitor de performance para queries e cache
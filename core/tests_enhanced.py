@@ -1,19 +1,27 @@
 """
 Automated Testing System for Enhanced Features
 """
+import os
+import shutil
+import statistics
+import tempfile
 import unittest
 import time
-from django.test import TestCase, Client
+from django.test import TestCase, Client, RequestFactory
+from django.http import HttpResponse
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.core.cache import cache
 from django.utils import timezone
+from datetime import timedelta
 from unittest.mock import patch, MagicMock
 
 from core.monitoring import SystemMonitor, DatabaseMonitor, get_system_health, get_database_health
 from core.background_jobs import BackgroundJob, JobScheduler, schedule_job, cleanup_cache
+from core.job_backends import MemoryJobBackend, SQLiteJobBackend, DatabaseJobBackend
 from core.validation import CPFValidator, CNPJValidator, PhoneValidator, CEPValidator
 from core.cache_system import smart_cache, SmartCache
+from core.unified_cache import UnifiedCache, cache_statistics, invalidate_tags
 
 User = get_user_model()
 
@@ -172,6 +180,104 @@ class BackgroundJobsTests(TestCase):
         self.assertIn('queue_size', stats)
         self.assertEqual(stats['total_jobs'], 5)
 
+class JobBackendTests(TestCase):
+    """Test persistent job storage backends"""
+    
+    def _backends(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, ignore_errors=True)
+        return [
+            MemoryJobBackend(),
+            SQLiteJobBackend(path=os.path.join(tmp_dir, 'jobs.sqlite3')),
+            DatabaseJobBackend(),
+        ]
+        
+    def test_claim_orders_by_priority_and_skips_delayed(self):
+        """Higher priority runs first; delayed jobs wait in the delayed index"""
+        for backend in self._backends():
+            with self.subTest(backend=type(backend).__name__):
+                scheduler = JobScheduler(max_workers=1, backend=backend)
+                scheduler.add_job('low', cleanup_cache, priority=1)
+                scheduler.add_job('high', cleanup_cache, priority=5)
+                scheduler.add_job('later', cleanup_cache, priority=9, delay=3600)
+                
+                claimed = backend.claim('worker-a', limit=3)
+                self.assertEqual([record['job_id'] for record in claimed], ['high', 'low'])
+                self.assertEqual(backend.claim('worker-b', limit=3), [])
+                
+    def test_job_claimed_by_single_worker(self):
+        """Two workers draining one queue never get the same job"""
+        for backend in self._backends():
+            with self.subTest(backend=type(backend).__name__):
+                scheduler = JobScheduler(max_workers=1, backend=backend)
+                for i in range(4):
+                    scheduler.add_job(f'job_{i}', cleanup_cache)
+                
+                first = {record['job_id'] for record in backend.claim('worker-a', limit=3)}
+                second = {record['job_id'] for record in backend.claim('worker-b', limit=3)}
+                self.assertEqual(len(first), 3)
+                self.assertEqual(len(second), 1)
+                self.assertFalse(first & second)
+                
+    def test_pending_job_survives_restart(self):
+        """A new scheduler on the same backend resumes registered jobs by dotted path"""
+        for backend in self._backends():
+            with self.subTest(backend=type(backend).__name__):
+                JobScheduler(max_workers=1, backend=backend).add_job('resume_me', cleanup_cache)
+                
+                restarted = JobScheduler(max_workers=1, backend=backend)
+                self.assertEqual(restarted.run_pending(), 1)
+                self.assertEqual(restarted.get_job_status('resume_me')['status'], 'completed')
+                
+    def test_only_expired_leases_are_requeued(self):
+        """Running jobs with a renewed lease stay put; expired ones are requeued, pinned ones fail"""
+        for backend in self._backends():
+            with self.subTest(backend=type(backend).__name__):
+                scheduler = JobScheduler(max_workers=1, backend=backend)
+                scheduler.add_job('alive', cleanup_cache, priority=2)
+                scheduler.add_job('orphaned', cleanup_cache, priority=1)
+                start = timezone.now()
+                claimed = backend.claim('worker-a', limit=1, now=start)
+                backend.claim('worker-b', limit=1, now=start)
+                self.assertEqual(claimed[0]['job_id'], 'alive')
+                scheduler.add_job('pinned', lambda: None)
+                backend.heartbeat('worker-a', now=start + timedelta(minutes=40))
+
+                expired = backend.requeue_stale(start + timedelta(minutes=30))
+
+                self.assertEqual(expired, 2)
+                self.assertEqual(backend.get('alive')['status'], 'running')
+                self.assertEqual(backend.get('orphaned')['status'], 'pending')
+                self.assertEqual(backend.get('pinned')['status'], 'failed')
+
+    def test_run_pending_renews_lease_while_job_runs(self):
+        """A synchronous run keeps renewing the lease of its job"""
+        backend = MemoryJobBackend()
+        scheduler = JobScheduler(max_workers=1, backend=backend)
+        scheduler.HEARTBEAT_INTERVAL = 0.01
+        renewed = []
+
+        def slow_job():
+            time.sleep(0.1)
+            renewed.append(backend.get('slow')['heartbeat_at'])
+
+        scheduler.add_job('slow', slow_job)
+        self.assertEqual(scheduler.run_pending(), 1)
+        self.assertGreater(renewed[0], backend.get('slow')['started_at'])
+
+    def test_failed_job_is_rescheduled(self):
+        """Failures are retried later and fail permanently after max_retries"""
+        def failing_function():
+            raise Exception("Test error")
+        
+        scheduler = JobScheduler(max_workers=1, backend=MemoryJobBackend())
+        scheduler.add_job('flaky', failing_function, max_retries=2)
+        self.assertEqual(scheduler.run_pending(), 1)
+        self.assertEqual(scheduler.get_job_status('flaky')['status'], 'pending')
+        
+        scheduler.backend.claim('nobody', limit=1, now=timezone.now())
+        self.assertEqual(scheduler.backend.stats(), {'pending': 1})
+
 class ValidationSystemTests(TestCase):
     """Test validation system"""
     
@@ -298,6 +404,467 @@ class CacheSystemTests(TestCase):
         cached_result = self.cache_service.get('warm_key')
         self.assertEqual(cached_result['value'], "warmed_data")
 
+class UnifiedCacheTests(TestCase):
+    """Tag invalidation, single-flight and stats of core.unified_cache"""
+    
+    def setUp(self):
+        cache.clear()
+        cache_statistics.reset()
+        self.cache = UnifiedCache('tests', default_timeout=60)
+    
+    def test_tag_invalidation_without_key_scan(self):
+        self.cache.set('summary:1', 'one', tags=['beneficiary:1'])
+        self.cache.set('summary:2', 'two', tags=['beneficiary:2'])
+        
+        invalidate_tags('beneficiary:1')
+        
+        self.assertIsNone(self.cache.get('summary:1', tags=['beneficiary:1']))
+        self.assertEqual(self.cache.get('summary:2', tags=['beneficiary:2']), 'two')
+    
+    def test_namespace_clear(self):
+        self.cache.set('a', 1)
+        other = UnifiedCache('other')
+        other.set('a', 2)
+        
+        self.cache.clear()
+        
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(other.get('a'), 2)
+    
+    def test_single_flight_recomputation(self):
+        import threading
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get_or_set('hot', compute)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 5)
+    
+    def test_stale_value_served_while_locked(self):
+        self.cache.set('report', 'old', timeout=0)
+        cache.add('cachelock:tests:report', 1, 30)  # outro processo recalculando
+        
+        value = self.cache.get_or_set('report', lambda: 'new')
+        
+        self.assertEqual(value, 'old')
+        self.assertEqual(cache_statistics.snapshot()['tests']['stale'], 1)
+    
+    def test_hit_miss_counters_per_namespace(self):
+        self.cache.get_or_set('k', lambda: 1)
+        self.cache.get_or_set('k', lambda: 1)
+        
+        stats = cache_statistics.snapshot()['tests']
+        self.assertEqual(stats['miss'], 1)
+        self.assertEqual(stats['hit'], 1)
+        self.assertEqual(stats['hit_rate'], 50.0)
+    
+    def test_model_signal_invalidates_instance_tag(self):
+        from members.models import Beneficiary
+        beneficiary = Beneficiary.objects.create(
+            full_name='Maria Silva', dob='1990-01-01', phone_1='11987654321',
+            address='Rua A', neighbourhood='Centro'
+        )
+        self.cache.set('detail', 'cached', tags=[f'beneficiary:{beneficiary.pk}'])
+        
+        beneficiary.save()
+        
+        self.assertIsNone(self.cache.get('detail', tags=[f'beneficiary:{beneficiary.pk}']))
+
+
+class SidebarCountersTests(TestCase):
+    """Badges do sidebar mantidos em cache pelos sinais (core.sidebar_counters)"""
+    
+    def setUp(self):
+        from notifications.models import NotificationChannel
+        cache.clear()
+        self.user = User.objects.create_user(username='sidebar', email='sidebar@example.com', password='pass123')
+        self.other = User.objects.create_user(username='colega', email='colega@example.com', password='pass123')
+        self.channel = NotificationChannel.objects.create(name='in_app', display_name='In App')
+    
+    def _notify(self, **kwargs):
+        from notifications.models import Notification
+        return Notification.objects.create(
+            recipient=self.user, title='Aviso', message='Mensagem', type='general',
+            channel=self.channel, **kwargs
+        )
+    
+    def test_steady_state_render_runs_no_counter_queries(self):
+        from core.context_processors_enhanced import enhanced_sidebar_context
+        request = MagicMock(user=self.user)
+        first = enhanced_sidebar_context(request)
+        
+        request = MagicMock(user=User.objects.get(pk=self.user.pk))
+        # Permissões do usuário e grupos; nenhum COUNT de badge
+        with self.assertNumQueries(3):
+            second = enhanced_sidebar_context(request)
+        
+        self.assertEqual(first['sidebar_counters'], second['sidebar_counters'])
+        self.assertIs(first['sidebar_modules'], second['sidebar_modules'])
+    
+    def test_notification_signals_update_cached_counter(self):
+        from core.sidebar_counters import get_counters
+        self.assertEqual(get_counters(self.user)['notifications'], 0)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = self._notify()
+            self._notify(status='read')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_counters(self.user)['notifications'], 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            notification.mark_as_read()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_counters(self.user)['notifications'], 0)
+    
+    def test_task_reassignment_moves_counter(self):
+        from core.sidebar_counters import get_counters
+        from tasks.models import Task, TaskBoard
+        board = TaskBoard.objects.create(name='Quadro', owner=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(
+                title='Tarefa', board=board, column=board.columns.first(),
+                reporter=self.user, assignee=self.user
+            )
+        self.assertEqual(get_counters(self.user)['tasks'], 1)
+        self.assertEqual(get_counters(self.other)['tasks'], 0)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            task.assignee = self.other
+            task.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_counters(self.user)['tasks'], 0)
+            self.assertEqual(get_counters(self.other)['tasks'], 1)
+    
+    def test_chat_messages_counted_until_channel_read(self):
+        from chat.models import ChatChannel, ChatChannelMembership, ChatMessage
+        from core.sidebar_counters import get_counters
+        channel = ChatChannel.objects.create(name='Geral', created_by=self.other)
+        ChatChannelMembership.objects.create(channel=channel, user=self.other)
+        membership = ChatChannelMembership.objects.create(channel=channel, user=self.user)
+        self.assertEqual(get_counters(self.user)['messages'], 0)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            ChatMessage.objects.create(channel=channel, sender=self.other, content='Olá')
+            ChatMessage.objects.create(channel=channel, sender=self.user, content='Oi')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_counters(self.user)['messages'], 1)
+        self.assertEqual(get_counters(self.other)['messages'], 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            membership.last_read_at = timezone.now()
+            membership.save(update_fields=['last_read_at'])
+        self.assertEqual(get_counters(self.user)['messages'], 0)
+
+
+class SearchIndexTests(TestCase):
+    """Busca textual unificada com permissões (core.search)"""
+    
+    def setUp(self):
+        from chat.models import ChatChannel, ChatChannelMembership
+        from tasks.models import TaskBoard, TaskColumn
+        self.user = User.objects.create_user(username='busca', email='busca@example.com', password='pass123')
+        self.other = User.objects.create_user(username='colega', email='colega@example.com', password='pass123')
+        self.channel = ChatChannel.objects.create(name='Equipe', created_by=self.user)
+        ChatChannelMembership.objects.create(channel=self.channel, user=self.user)
+        self.private = ChatChannel.objects.create(name='Privado', created_by=self.other)
+        ChatChannelMembership.objects.create(channel=self.private, user=self.other)
+        self.board = TaskBoard.objects.create(name='Oficinas', owner=self.user)
+        self.column = TaskColumn.objects.create(name='A fazer', board=self.board)
+    
+    def _message(self, content, channel=None):
+        from chat.models import ChatMessage
+        return ChatMessage.objects.create(channel=channel or self.channel, sender=self.user, content=content)
+    
+    def _task(self, title, description='', board=None):
+        from tasks.models import Task
+        board = board or self.board
+        return Task.objects.create(
+            title=title, description=description, board=board,
+            column=board.columns.first() or self.column, reporter=self.user
+        )
+    
+    def test_accent_insensitive_ranked_and_highlighted(self):
+        from core.search import search
+        self._message('Reunião de planejamento amanhã')
+        task = self._task('Planejamento da oficina', 'Definir a reuniao com as participantes')
+        
+        page = search(self.user, 'reuniao planej')
+        
+        self.assertEqual(len(page['results']), 2)
+        # Termo no título pesa mais
+        self.assertEqual(page['results'][0].instance, task)
+        self.assertIn('<mark>Planejamento</mark>', page['results'][0].title)
+        self.assertIn('<mark>Reunião</mark>', page['results'][1].snippet)
+    
+    def test_results_filtered_by_permission(self):
+        from core.search import search
+        from tasks.models import TaskBoard, TaskColumn
+        other_board = TaskBoard.objects.create(name='RH', owner=self.other)
+        TaskColumn.objects.create(name='A fazer', board=other_board)
+        self._message('orçamento aprovado')
+        self._message('orçamento secreto', channel=self.private)
+        self._task('Orçamento anual', board=other_board)
+        
+        page = search(self.user, 'orcamento')
+        self.assertEqual([hit.snippet for hit in page['results']], ['<mark>orçamento</mark> aprovado'])
+        
+        # Entrar no quadro vale imediatamente, sem reindexar
+        other_board.members.add(self.user)
+        self.assertEqual(len(search(self.user, 'orcamento')['results']), 2)
+    
+    def test_index_follows_edits_and_deletes(self):
+        from core.search import search
+        message = self._message('primeira versão')
+        message.content = '<b>segunda</b> versão'
+        message.save()
+        
+        self.assertEqual(search(self.user, 'primeira')['results'], [])
+        hit = search(self.user, 'segunda')['results'][0]
+        self.assertEqual(hit.snippet, '&lt;b&gt;<mark>segunda</mark>&lt;/b&gt; versão')
+        
+        message.delete()
+        self.assertEqual(search(self.user, 'segunda')['results'], [])
+    
+    def test_cursor_pagination_and_api(self):
+        for index in range(5):
+            self._task(f'Relatório {index}')
+        self.client.force_login(self.user)
+        url = reverse('core:search-api')
+        
+        seen = []
+        cursor = ''
+        while True:
+            data = self.client.get(url, {'q': 'relatorio', 'limit': 2, 'cursor': cursor}).json()
+            seen += [result['id'] for result in data['results']]
+            if not data['has_more']:
+                break
+            cursor = data['next_cursor']
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+        
+        self.assertEqual(self.client.get(url, {'q': 'x', 'types': 'users.Nada'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'q': 'x', 'cursor': 'lixo'}).status_code, 400)
+    
+    def test_rebuild_restores_bulk_created_rows(self):
+        from chat.models import ChatMessage
+        from core.search import rebuild_index, search
+        ChatMessage.objects.bulk_create([
+            ChatMessage(channel=self.channel, sender=self.user, content='importada do sistema antigo')
+        ])
+        self.assertEqual(search(self.user, 'importada')['results'], [])
+        
+        self.assertEqual(rebuild_index(['chat.ChatMessage']), {'chat.ChatMessage': 1})
+        self.assertEqual(len(search(self.user, 'importada')['results']), 1)
+
+
+class MetricTimeSeriesTests(TestCase):
+    """Séries temporais das métricas de performance (core.timeseries)"""
+    
+    def setUp(self):
+        # 20 minutos de amostras a partir de hh:50 cobrem dois baldes por hora
+        self.start = timezone.now().replace(minute=50, second=0, microsecond=0) - timedelta(hours=3)
+    
+    def _record(self, values, metric='response_time'):
+        from core import timeseries
+        for i, value in enumerate(values):
+            timeseries.record({metric: value}, self.start + timedelta(seconds=timeseries.SAMPLE_SECONDS * i))
+    
+    def test_ring_buffer_has_fixed_size(self):
+        from core import timeseries
+        from core.models import MetricSample
+        span = timedelta(seconds=timeseries.SAMPLE_SECONDS * timeseries.RING_SIZE)
+        for lap in range(3):
+            timeseries.record({'cpu_usage': lap, 'memory_usage': None}, self.start + span * lap)
+        
+        sample = MetricSample.objects.get()
+        self.assertEqual(sample.metric, 'cpu_usage')
+        self.assertEqual(sample.value, 2)
+    
+    def test_rollups_are_idempotent_and_mergeable(self):
+        from core import timeseries
+        from core.models import MetricRollup
+        values = list(range(1, 121))
+        self._record(values)
+        
+        self.assertEqual(timeseries.rollup(), 20)
+        timeseries.rollup()
+        minutes = MetricRollup.objects.filter(resolution='minute')
+        self.assertEqual(minutes.count(), 20)
+        self.assertEqual(minutes.order_by('bucket_start').first().maximum, 6)
+        
+        summary = timeseries.summarize(['response_time'], self.start)['response_time']
+        self.assertEqual(summary.count, 120)
+        self.assertAlmostEqual(summary.mean, 60.5)
+        self.assertAlmostEqual(summary.stdev, statistics.stdev(values))
+        self.assertAlmostEqual(summary.quantile(95), 114, delta=114 * 0.02)
+        self.assertGreater(summary.slope, 0)
+    
+    def test_threshold_analysis_reads_rollups(self):
+        from core.threshold_manager import PerformanceThresholdManager
+        self._record([100] * 59 + [2000])
+        
+        manager = PerformanceThresholdManager()
+        analysis = manager.analyze_performance_patterns()
+        
+        self.assertEqual(analysis['response_time']['samples'], 60)
+        self.assertAlmostEqual(analysis['response_time']['median'], 100, delta=2)
+        self.assertEqual(analysis['memory_usage']['status'], 'insufficient_data')
+        anomaly = analysis['anomalies'][0]
+        self.assertEqual(anomaly['metric'], 'response_time')
+        self.assertEqual(anomaly['outliers'][0]['value'], 2000)
+
+
+class RateLimitTests(TestCase):
+    """Rate limiting atômico do middleware e do decorator (core.rate_limit)"""
+    
+    def setUp(self):
+        from core.rate_limit import limiter
+        limiter.reset()
+        self.addCleanup(limiter.reset)
+        self.factory = RequestFactory()
+    
+    def test_parse_rate(self):
+        from core.rate_limit import parse_rate
+        self.assertEqual(parse_rate('30/m'), (30, 60))
+        self.assertEqual(parse_rate('5/5m'), (5, 300))
+        with self.assertRaises(ValueError):
+            parse_rate('10 por minuto')
+    
+    def test_sliding_window_blocks_with_headers(self):
+        from core.security_middleware import SecurityMiddleware
+        middleware = SecurityMiddleware(lambda request: HttpResponse())
+        policies = {'api': {'rate': '2/m', 'paths': ['/api/']}}
+        
+        with self.settings(RATE_LIMIT_POLICIES=policies, DEBUG=True):
+            responses = []
+            for _ in range(3):
+                responses.append(middleware(self.factory.get('/api/members/', REMOTE_ADDR='10.0.0.1')))
+            other_ip = middleware(self.factory.get('/api/members/', REMOTE_ADDR='10.0.0.2'))
+            unmatched = middleware(self.factory.get('/dashboard/', REMOTE_ADDR='10.0.0.1'))
+        
+        self.assertEqual([r.status_code for r in responses], [200, 200, 429])
+        self.assertEqual(responses[1]['X-RateLimit-Remaining'], '0')
+        self.assertLessEqual(int(responses[2]['Retry-After']), 60)
+        self.assertEqual(other_ip.status_code, 200)
+        self.assertNotIn('X-RateLimit-Limit', unmatched)
+    
+    def test_counter_backend_does_not_extend_window(self):
+        from core.rate_limit import limiter
+        from django.core.cache.backends.locmem import LocMemCache
+        backend = LocMemCache('rate-limit-test', {})
+        
+        results = [limiter._hit_counter(backend, 'k', 3, 60) for _ in range(4)]
+        
+        self.assertEqual([r.allowed for r in results], [True, True, True, False])
+        self.assertEqual(results[2].remaining, 0)
+        self.assertTrue(all(r.reset <= 60 for r in results))
+    
+    def test_decorator_shares_engine(self):
+        from core.rate_limit import ratelimit
+        
+        @ratelimit(key='user', rate='1/m', method='POST')
+        def view(request):
+            return HttpResponse('ok')
+        
+        user = User.objects.create_user(username='limite', email='limite@example.com', password='pass123')
+        first, second = self.factory.post('/upload/'), self.factory.post('/upload/')
+        first.user = second.user = user
+        get_request = self.factory.get('/upload/')
+        get_request.user = user
+        
+        self.assertEqual(view(first).status_code, 200)
+        self.assertEqual(view(second).status_code, 429)
+        self.assertEqual(view(get_request).status_code, 200)
+
+
+class UserContextTests(TestCase):
+    """Contexto do usuário resolvido uma vez por requisição (core.user_context)"""
+    
+    def setUp(self):
+        from django.contrib.auth.models import Group
+        cache.clear()
+        # Papéis ficam no cache por pk, e os ids de usuário se repetem entre testes
+        self.addCleanup(cache.clear)
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='tecnica', email='tecnica@example.com', password='pass123')
+        self.user.groups.add(Group.objects.create(name='Tecnica'))
+    
+    def _request(self):
+        request = self.factory.get('/dashboard/')
+        request.user = User.objects.get(pk=self.user.pk)
+        return request
+    
+    def test_roles_and_modules(self):
+        from core.unified_permissions import get_user_permissions, has_module_permission, is_admin, is_technician
+        self.assertTrue(is_technician(self.user))
+        self.assertFalse(is_admin(self.user))
+        self.assertTrue(has_module_permission(self.user, 'hr'))
+        
+        other = User.objects.create_user(username='visitante', email='visitante@example.com', password='pass123')
+        self.assertFalse(is_technician(other))
+        self.assertFalse(has_module_permission(other, 'members'))
+        self.assertEqual(get_user_permissions(other)['modules']['hr'], False)
+    
+    def test_single_cache_round_trip_per_request(self):
+        from core.context_processors import unified_permissions
+        from core.context_processors_enhanced import enhanced_sidebar_context
+        from core.unified_permissions import is_coordinator, is_technician, requires_technician
+        from core.user_context import UserContextMiddleware
+        from notifications.realtime import notification_context_processor
+        
+        @requires_technician
+        def view(request):
+            for _ in range(3):
+                is_technician(request.user)
+                is_coordinator(request.user)
+            unified_permissions(request)
+            enhanced_sidebar_context(request)
+            notification_context_processor(request)
+            return HttpResponse()
+        
+        middleware = UserContextMiddleware(view)
+        # Primeira requisição preenche o cache
+        middleware(self._request())
+        
+        with patch.object(cache, 'get_many', wraps=cache.get_many) as get_many, \
+                patch.object(cache, 'set_many', wraps=cache.set_many) as set_many:
+            response = middleware(self._request())
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(set_many.call_count, 0)
+    
+    def test_counts_shared_with_sidebar(self):
+        from core.context_processors import unified_permissions
+        from core.context_processors_enhanced import enhanced_sidebar_context
+        from notifications.models import Notification, NotificationChannel
+        channel = NotificationChannel.objects.create(name='in_app', display_name='In App')
+        Notification.objects.create(
+            recipient=self.user, title='Aviso', message='Oi', type='general', channel=channel, status='sent'
+        )
+        
+        request = self._request()
+        permissions = unified_permissions(request)
+        sidebar = enhanced_sidebar_context(request)
+        
+        self.assertEqual(permissions['unread_notifications_count'], 1)
+        self.assertEqual(sidebar['sidebar_counters']['notifications'], 1)
+        self.assertEqual(sidebar['sidebar_user_info']['groups'], ['Tecnica'])
+
+
 class IntegrationTests(TestCase):
     """Integration tests for all systems"""
     
@@ -3,7 +3,6 @@ Sistema de monitoramento e ajuste dinâmico de thresholds de performance
 """
 import time
 import logging
-import statistics
 from datetime import datetime, timedelta
 from django.core.cache import cache
 from django.utils import timezone
@@ -13,6 +12,8 @@ from collections import defaultdict, deque
 import json
 import psutil
 
+from core import timeseries
+
 logger = logging.getLogger(__name__)
 
 PSUTIL_AVAILABLE = True
@@ -28,7 +29,6 @@ class PerformanceThresholdManager:
     
     def __init__(self):
         self.thresholds_key = 'performance_thresholds'
-        self.metrics_history_key = 'performance_metrics_history'
         self.adjustments_key = 'threshold_adjustments'
         self.config_key = 'threshold_config'
         
@@ -141,16 +141,16 @@ class PerformanceThresholdManager:
         try:
             config = self._get_config()
             
-            # Obter histórico de métricas
-            historical_metrics = self._get_historical_metrics(
-                config['learning_window_days']
-            )
+            # Resumo da janela a partir dos agregados por hora
+            since = timezone.now() - timedelta(days=config['learning_window_days'])
+            summaries = self._get_historical_metrics(since)
+            samples = max((summary.count for summary in summaries.values()), default=0)
             
-            if len(historical_metrics) < config['min_samples_for_adjustment']:
+            if samples < config['min_samples_for_adjustment']:
                 return {
                     'status': 'insufficient_data',
                     'message': f'Necessário pelo menos {config["min_samples_for_adjustment"]} amostras',
-                    'current_samples': len(historical_metrics)
+                    'current_samples': samples
                 }
             
             analysis = {}
@@ -159,13 +159,13 @@ class PerformanceThresholdManager:
             for metric_name in self.default_thresholds.keys():
                 metric_analysis = self._analyze_metric_pattern(
                     metric_name,
-                    historical_metrics
+                    summaries.get(metric_name)
                 )
                 analysis[metric_name] = metric_analysis
             
             # Detectar anomalias
             if config['anomaly_detection_enabled']:
-                analysis['anomalies'] = self._detect_anomalies(historical_metrics)
+                analysis['anomalies'] = self._detect_anomalies(summaries, since)
             
             # Calcular confiança geral
             analysis['confidence'] = self._calculate_confidence(analysis)
@@ -434,29 +434,28 @@ class PerformanceThresholdManager:
             logger.error(f"Error getting queue length: {e}")
             return None
     
-    def _analyze_metric_pattern(self, metric_name, historical_metrics):
-        """Analisar padrão de uma métrica específica"""
+    def _analyze_metric_pattern(self, metric_name, summary):
+        """Analisar padrão de uma métrica específica (timeseries.MetricSummary)"""
         try:
-            # Extrair valores da métrica
-            values = [m[metric_name] for m in historical_metrics if metric_name in m and m[metric_name] is not None]
+            samples = summary.count if summary else 0
             
-            if len(values) < 10:
-                return {'status': 'insufficient_data', 'samples': len(values)}
+            if samples < 10:
+                return {'status': 'insufficient_data', 'samples': samples}
             
             # Estatísticas básicas
-            mean = statistics.mean(values)
-            median = statistics.median(values)
-            stdev = statistics.stdev(values) if len(values) > 1 else 0
+            mean = summary.mean
+            median = summary.quantile(50)
+            stdev = summary.stdev
             
             # Percentis
-            p95 = self._percentile(values, 95)
-            p99 = self._percentile(values, 99)
+            p95 = summary.quantile(95)
+            p99 = summary.quantile(99)
             
             # Detectar tendência
-            trend = self._calculate_trend(values)
+            trend = self._calculate_trend(summary.slope)
             
             # Detectar sazonalidade
-            seasonality = self._detect_seasonality(values)
+            seasonality = self._detect_seasonality(samples)
             
             # Sugerir ajustes
             current_thresholds = self.get_current_thresholds()
@@ -468,22 +467,22 @@ class PerformanceThresholdManager:
             # Calcular novos thresholds baseados nos padrões
             if is_inverted:
                 # Para métricas invertidas, usar percentis baixos
-                suggested_critical = self._percentile(values, 10)
-                suggested_warning = self._percentile(values, 25)
+                suggested_critical = summary.quantile(10)
+                suggested_warning = summary.quantile(25)
             else:
                 # Para métricas normais, usar percentis altos
                 suggested_critical = p95
-                suggested_warning = self._percentile(values, 80)
+                suggested_warning = summary.quantile(80)
             
             # Determinar se precisa ajustar
             threshold_deviation = abs(current_warning - suggested_warning) / current_warning
             needs_adjustment = threshold_deviation > 0.2  # 20% de diferença
             
-            confidence = min(1.0, len(values) / 100) * (1 - min(0.5, stdev / mean if mean > 0 else 0.5))
+            confidence = min(1.0, samples / 100) * (1 - min(0.5, stdev / mean if mean > 0 else 0.5))
             
             return {
                 'status': 'success',
-                'samples': len(values),
+                'samples': samples,
                 'mean': mean,
                 'median': median,
                 'stdev': stdev,
@@ -498,50 +497,44 @@ class PerformanceThresholdManager:
                 'needs_adjustment': needs_adjustment,
                 'confidence': confidence,
                 'threshold_deviation': threshold_deviation,
-                'adjustment_reason': f"Pattern analysis suggests adjustment based on {len(values)} samples"
+                'adjustment_reason': f"Pattern analysis suggests adjustment based on {samples} samples"
             }
             
         except Exception as e:
             logger.error(f"Error analyzing metric pattern for {metric_name}: {e}")
             return {'status': 'error', 'message': str(e)}
     
-    def _detect_anomalies(self, historical_metrics):
-        """Detectar anomalias nas métricas"""
+    def _detect_anomalies(self, summaries, since):
+        """Detectar anomalias nas métricas (baldes por minuto com Z-score > 3)"""
         try:
             anomalies = []
             
-            for metric_name in self.default_thresholds.keys():
-                values = [m[metric_name] for m in historical_metrics if metric_name in m and m[metric_name] is not None]
-                
-                if len(values) < 20:
-                    continue
-                
-                # Usar Z-score para detectar outliers
-                mean = statistics.mean(values)
-                stdev = statistics.stdev(values)
-                
-                if stdev == 0:
-                    continue
-                
-                # Encontrar valores com Z-score > 3
+            # Usar Z-score para detectar outliers
+            eligible = {
+                metric_name: summary for metric_name, summary in summaries.items()
+                if metric_name in self.default_thresholds and summary.count >= 20
+            }
+            outliers_by_metric = timeseries.outlier_buckets(eligible, since, z_score=3)
+            
+            for metric_name, buckets in outliers_by_metric.items():
+                summary = eligible[metric_name]
                 outliers = []
-                for i, value in enumerate(values):
-                    z_score = abs(value - mean) / stdev
-                    if z_score > 3:
-                        outliers.append({
-                            'index': i,
-                            'value': value,
-                            'z_score': z_score,
-                            'timestamp': historical_metrics[i].get('timestamp')
-                        })
-                
-                if outliers:
-                    anomalies.append({
-                        'metric': metric_name,
-                        'outliers': outliers,
-                        'total_outliers': len(outliers),
-                        'outlier_rate': len(outliers) / len(values)
+                for i, (bucket_start, minimum, maximum) in enumerate(buckets):
+                    # Valor mais distante da média no balde
+                    value = max((minimum, maximum), key=lambda v: abs(v - summary.mean))
+                    outliers.append({
+                        'index': i,
+                        'value': value,
+                        'z_score': abs(value - summary.mean) / summary.stdev,
+                        'timestamp': bucket_start.isoformat()
                     })
+                
+                anomalies.append({
+                    'metric': metric_name,
+                    'outliers': outliers,
+                    'total_outliers': len(outliers),
+                    'outlier_rate': len(outliers) / summary.count
+                })
             
             return anomalies
             
@@ -644,38 +637,27 @@ class PerformanceThresholdManager:
             return {}
     
     def _store_metrics_history(self, metrics):
-        """Armazenar histórico de métricas"""
+        """Armazenar histórico de métricas (core.timeseries)"""
         try:
-            history = cache.get(self.metrics_history_key, [])
-            history.append(metrics)
-            
-            # Manter apenas últimos 30 dias
-            cutoff_date = timezone.now() - timedelta(days=30)
-            history = [
-                m for m in history
-                if datetime.fromisoformat(m['timestamp']) > cutoff_date
-            ]
-            
-            cache.set(self.metrics_history_key, history, 60 * 60 * 24 * 30)
+            timestamp = datetime.fromisoformat(metrics['timestamp'])
+            timeseries.record(
+                {name: value for name, value in metrics.items() if name != 'timestamp'},
+                timestamp
+            )
             
         except Exception as e:
             logger.error(f"Error storing metrics history: {e}")
     
-    def _get_historical_metrics(self, days):
-        """Obter histórico de métricas"""
+    def _get_historical_metrics(self, since):
+        """Obter resumo das métricas desde ``since`` ({métrica: MetricSummary})"""
         try:
-            history = cache.get(self.metrics_history_key, [])
-            
-            cutoff_date = timezone.now() - timedelta(days=days)
-            
-            return [
-                m for m in history
-                if datetime.fromisoformat(m['timestamp']) > cutoff_date
-            ]
+            # Agregar amostras ainda não consolidadas antes de ler
+            timeseries.rollup()
+            return timeseries.summarize(self.default_thresholds, since)
             
         except Exception as e:
             logger.error(f"Error getting historical metrics: {e}")
-            return []
+            return {}
     
     def _store_adjustment_history(self, adjustment_result):
         """Armazenar histórico de ajustes"""
@@ -695,39 +677,8 @@ class PerformanceThresholdManager:
         except Exception as e:
             logger.error(f"Error storing adjustment history: {e}")
     
-    def _percentile(self, values, percentile):
-        """Calcular percentil"""
-        sorted_values = sorted(values)
-        k = (len(sorted_values) - 1) * percentile / 100
-        f = int(k)
-        c = k - f
-        
-        if f == len(sorted_values) - 1:
-            return sorted_values[f]
-        
-        return sorted_values[f] * (1 - c) + sorted_values[f + 1] * c
-    
-    def _calculate_trend(self, values):
-        """Calcular tendência"""
-        if len(values) < 2:
-            return 'stable'
-        
-        # Regressão linear simples
-        n = len(values)
-        x = list(range(n))
-        y = values
-        
-        x_mean = sum(x) / n
-        y_mean = sum(y) / n
-        
-        numerator = sum((x[i] - x_mean) * (y[i] - y_mean) for i in range(n))
-        denominator = sum((x[i] - x_mean) ** 2 for i in range(n))
-        
-        if denominator == 0:
-            return 'stable'
-        
-        slope = numerator / denominator
-        
+    def _calculate_trend(self, slope):
+        """Calcular tendência (inclinação por hora da regressão linear)"""
         # Classificar tendência
         if slope > 0.1:
             return 'increasing'
@@ -736,9 +687,9 @@ class PerformanceThresholdManager:
         else:
             return 'stable'
     
-    def _detect_seasonality(self, values):
+    def _detect_seasonality(self, samples):
         """Detectar sazonalidade simples"""
-        if len(values) < 24:  # Precisa de pelo menos 24 pontos
+        if samples < 24:  # Precisa de pelo menos 24 pontos
             return 'insufficient_data'
         
         # Análise simples baseada em padrões horários
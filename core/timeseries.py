@@ -0,0 +1,282 @@
+"""
+Séries temporais das métricas de performance (PerformanceThresholdManager).
+
+Três níveis, todos em tabelas:
+
+- MetricSample: anel de tamanho fixo por métrica. A posição é o intervalo
+  de SAMPLE_SECONDS da coleta módulo RING_SIZE, gravada com upsert: a tabela
+  não cresce e nada precisa ser podado. Duas coletas no mesmo intervalo
+  ficam com a última.
+- MetricRollup ``minute``/``hour``: contagem, soma, soma dos quadrados,
+  mínimo, máximo, p95 e um sketch (histograma logarítmico esparso com erro
+  relativo de SKETCH_ACCURACY) que pode ser somado entre baldes. Média,
+  desvio padrão e percentis de qualquer janela saem da fusão dos baldes,
+  sem ordenar amostras.
+- ``rollup()`` recalcula a partir das amostras os minutos desde o último
+  balde gravado e as horas correspondentes. É idempotente e grava com
+  upsert, então coletas e agregações de vários processos podem rodar ao
+  mesmo tempo sem leitura-modificação-escrita.
+
+O anel guarda RING_SIZE * SAMPLE_SECONDS (24h por padrão): ``rollup()`` deve
+rodar pelo menos uma vez nesse período (job ``rollup_performance_metrics``;
+a análise de thresholds também agrega antes de ler).
+"""
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from core.background_jobs import register_job
+
+SAMPLE_SECONDS = getattr(settings, 'PERFORMANCE_METRICS_SAMPLE_SECONDS', 10)
+RING_SIZE = getattr(settings, 'PERFORMANCE_METRICS_RING_SIZE', 8640)
+MINUTE_RETENTION = timedelta(days=2)
+HOUR_RETENTION = timedelta(days=30)
+
+SKETCH_ACCURACY = 0.01
+GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+# Valores até MIN_VALUE caem no balde de zero
+MIN_VALUE = 1e-9
+ZERO_KEY = 'z'
+
+ROLLUP_FIELDS = ['count', 'total', 'total_squares', 'minimum', 'maximum', 'p95', 'sketch']
+
+
+def _sketch_key(value):
+    if value <= MIN_VALUE:
+        return ZERO_KEY
+    return str(math.ceil(math.log(value, GAMMA)))
+
+
+def _sketch_value(key):
+    if key == ZERO_KEY:
+        return 0.0
+    index = int(key)
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+def _sketch_order(key):
+    return -math.inf if key == ZERO_KEY else int(key)
+
+
+def sketch_quantile(sketch, percentile, minimum=None, maximum=None):
+    """Percentil (0-100) estimado do sketch, limitado a [minimum, maximum]"""
+    total = sum(sketch.values())
+    if not total:
+        return None
+    rank = percentile / 100 * (total - 1)
+    seen = 0
+    for key in sorted(sketch, key=_sketch_order):
+        seen += sketch[key]
+        if seen > rank:
+            value = _sketch_value(key)
+            break
+    if minimum is not None:
+        value = max(value, minimum)
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
+
+
+class _Accumulator:
+    """Estatísticas de um balde: amostras com add(), baldes menores com merge()"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.sketch = defaultdict(int)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.total_squares += value * value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        self.sketch[_sketch_key(value)] += 1
+
+    def merge(self, count, total, total_squares, minimum, maximum, sketch):
+        self.count += count
+        self.total += total
+        self.total_squares += total_squares
+        self.minimum = minimum if self.minimum is None else min(self.minimum, minimum)
+        self.maximum = maximum if self.maximum is None else max(self.maximum, maximum)
+        for key, hits in sketch.items():
+            self.sketch[key] += hits
+
+    def quantile(self, percentile):
+        return sketch_quantile(self.sketch, percentile, self.minimum, self.maximum)
+
+    def as_fields(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'total_squares': self.total_squares,
+            'minimum': self.minimum,
+            'maximum': self.maximum,
+            'p95': self.quantile(95),
+            'sketch': dict(self.sketch),
+        }
+
+
+class MetricSummary(_Accumulator):
+    """Resumo de uma métrica numa janela, a partir dos baldes por hora"""
+
+    def __init__(self):
+        super().__init__()
+        # Regressão linear ponderada (x = horas desde o início da janela)
+        self._origin = None
+        self._sx = self._sy = self._sxx = self._sxy = 0.0
+
+    def add_bucket(self, bucket_start, count, total, total_squares, minimum, maximum, sketch):
+        self.merge(count, total, total_squares, minimum, maximum, sketch)
+        if self._origin is None:
+            self._origin = bucket_start
+        x = (bucket_start - self._origin).total_seconds() / 3600
+        self._sx += count * x
+        self._sy += total
+        self._sxx += count * x * x
+        self._sxy += x * total
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    @property
+    def stdev(self):
+        if self.count < 2:
+            return 0
+        variance = (self.total_squares - self.count * self.mean ** 2) / (self.count - 1)
+        return math.sqrt(max(variance, 0))
+
+    @property
+    def slope(self):
+        """Variação média por hora (mínimos quadrados sobre as amostras)"""
+        denominator = self.count * self._sxx - self._sx ** 2
+        if not self.count or denominator <= 0:
+            return 0
+        return (self.count * self._sxy - self._sx * self._sy) / denominator
+
+
+def _floor(moment, resolution):
+    moment = moment.replace(second=0, microsecond=0)
+    return moment.replace(minute=0) if resolution == 'hour' else moment
+
+
+def record(metrics, timestamp=None):
+    """Gravar um valor por métrica ({nome: valor}; None é ignorado) no anel"""
+    from .models import MetricSample
+
+    timestamp = timestamp or timezone.now()
+    slot = int(timestamp.timestamp() // SAMPLE_SECONDS) % RING_SIZE
+    samples = [
+        MetricSample(metric=name, slot=slot, timestamp=timestamp, value=float(value))
+        for name, value in metrics.items() if value is not None
+    ]
+    if samples:
+        MetricSample.objects.bulk_create(
+            samples, update_conflicts=True, unique_fields=['metric', 'slot'], update_fields=['timestamp', 'value']
+        )
+    return len(samples)
+
+
+def _save_rollups(resolution, buckets):
+    from .models import MetricRollup
+
+    MetricRollup.objects.bulk_create(
+        [
+            MetricRollup(metric=metric, resolution=resolution, bucket_start=start, **accumulator.as_fields())
+            for (metric, start), accumulator in buckets.items()
+        ],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['metric', 'resolution', 'bucket_start'],
+        update_fields=ROLLUP_FIELDS,
+    )
+
+
+def rollup(now=None):
+    """
+    Agregar as amostras em baldes por minuto e por hora e podar os baldes
+    antigos; retorna quantos baldes por minuto foram gravados.
+    """
+    from .models import MetricRollup, MetricSample
+
+    now = now or timezone.now()
+    # O último minuto gravado pode ter ficado parcial: recalculá-lo
+    start = MetricRollup.objects.filter(resolution='minute').aggregate(last=Max('bucket_start'))['last']
+    samples = MetricSample.objects.filter(timestamp__lte=now)
+    if start is not None:
+        samples = samples.filter(timestamp__gte=start)
+
+    minutes = defaultdict(_Accumulator)
+    for metric, timestamp, value in samples.values_list('metric', 'timestamp', 'value').iterator(chunk_size=2000):
+        minutes[(metric, _floor(timestamp, 'minute'))].add(value)
+    if minutes:
+        _save_rollups('minute', minutes)
+
+        hours = defaultdict(_Accumulator)
+        first_hour = _floor(min(bucket for _, bucket in minutes), 'hour')
+        for metric, bucket_start, *stats in MetricRollup.objects.filter(
+            resolution='minute', bucket_start__gte=first_hour
+        ).values_list('metric', 'bucket_start', 'count', 'total', 'total_squares', 'minimum', 'maximum', 'sketch'):
+            hours[(metric, _floor(bucket_start, 'hour'))].merge(*stats)
+        _save_rollups('hour', hours)
+
+    MetricRollup.objects.filter(
+        Q(resolution='minute', bucket_start__lt=now - MINUTE_RETENTION)
+        | Q(resolution='hour', bucket_start__lt=now - HOUR_RETENTION)
+    ).delete()
+    return len(minutes)
+
+
+@register_job
+def rollup_performance_metrics():
+    """Job de agregação das métricas de performance"""
+    return rollup()
+
+
+def summarize(metrics, since):
+    """{métrica: MetricSummary} dos baldes por hora desde ``since``, em uma consulta"""
+    from .models import MetricRollup
+
+    summaries = defaultdict(MetricSummary)
+    rows = MetricRollup.objects.filter(
+        resolution='hour', metric__in=list(metrics), bucket_start__gte=_floor(since, 'hour')
+    ).order_by('bucket_start').values_list(
+        'metric', 'bucket_start', 'count', 'total', 'total_squares', 'minimum', 'maximum', 'sketch'
+    )
+    for metric, *bucket in rows:
+        summaries[metric].add_bucket(*bucket)
+    return dict(summaries)
+
+
+def outlier_buckets(summaries, since, z_score=3):
+    """
+    Baldes por minuto desde ``since`` cujo mínimo ou máximo se afasta mais de
+    ``z_score`` desvios da média da janela, filtrados no banco em uma consulta.
+    Retorna {métrica: [(início, mínimo, máximo), ...]}.
+    """
+    from .models import MetricRollup
+
+    condition = Q()
+    for metric, summary in summaries.items():
+        if summary.stdev == 0:
+            continue
+        low = summary.mean - z_score * summary.stdev
+        high = summary.mean + z_score * summary.stdev
+        condition |= Q(metric=metric) & (Q(minimum__lt=low) | Q(maximum__gt=high))
+    if not condition:
+        return {}
+
+    outliers = defaultdict(list)
+    for metric, bucket_start, minimum, maximum in MetricRollup.objects.filter(
+        condition, resolution='minute', bucket_start__gte=since
+    ).order_by('bucket_start').values_list('metric', 'bucket_start', 'minimum', 'maximum'):
+        outliers[metric].append((bucket_start, minimum, maximum))
+    return dict(outliers)
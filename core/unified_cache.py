@@ -0,0 +1,318 @@
+"""
+Camada de cache unificada do sistema.
+
+Substitui a invalidação por padrão de chaves (``delete_pattern``, que não
+faz nada no LocMem e é um SCAN O(keyspace) no Redis) por tags versionadas:
+
+- cada entrada guarda a versão das tags de que depende (ex.:
+  ``beneficiary:42``, ``dashboard``) e a do próprio namespace
+- invalidar é incrementar o contador da tag (``cache.incr``), O(1); entradas
+  com versão antiga passam a ser tratadas como ausentes
+- leituras buscam entrada e versões em um único ``get_many``
+- recomputação em voo único (lock com ``cache.add``): durante o cálculo os
+  demais processos servem o valor anterior ainda dentro da carência ou
+  aguardam o resultado, em vez de todos recalcularem juntos
+- renovação antecipada probabilística (XFetch): perto da expiração uma
+  requisição ocasional recalcula antes do valor sair do cache
+- contadores de hit/miss por namespace (em processo), em ``cache_stats()``
+
+Os envelopes são listas/dicts simples para funcionar com o serializador JSON
+do django-redis usado em produção.
+"""
+import hashlib
+import json
+import logging
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.db.models.signals import post_delete, post_save
+
+logger = logging.getLogger(__name__)
+
+TAG_PREFIX = 'cachetag'
+LOCK_PREFIX = 'cachelock'
+
+# Tempo extra em que um valor expirado continua disponível para ser servido
+# enquanto outro processo o recalcula
+STALE_GRACE = getattr(settings, 'UNIFIED_CACHE_STALE_GRACE', 60)
+LOCK_TIMEOUT = getattr(settings, 'UNIFIED_CACHE_LOCK_TIMEOUT', 30)
+WAIT_TIMEOUT = getattr(settings, 'UNIFIED_CACHE_WAIT_TIMEOUT', 5)
+
+_MISSING = object()
+
+
+class CacheStats:
+    """Contadores de hit/miss por namespace (por processo)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: defaultdict(int))
+
+    def incr(self, namespace, event):
+        with self._lock:
+            self._counters[namespace][event] += 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for namespace, counters in self._counters.items():
+                requests = counters['hit'] + counters['miss']
+                result[namespace] = dict(
+                    counters,
+                    hit_rate=round(counters['hit'] / requests * 100, 2) if requests else 0,
+                )
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+cache_statistics = CacheStats()
+
+
+def cache_stats():
+    """Hit/miss, recomputações e valores servidos antigos por namespace"""
+    return cache_statistics.snapshot()
+
+
+def make_key_hash(*parts):
+    """Hash estável de argumentos arbitrários para compor chaves"""
+    try:
+        raw = json.dumps(parts, sort_keys=True, default=str)
+    except (TypeError, ValueError):
+        raw = repr(parts)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _tag_key(tag):
+    return f'{TAG_PREFIX}:{tag}'
+
+
+def _fresh_version():
+    # Versões iniciais baseadas no relógio: se o contador de uma tag for
+    # despejado do cache, a nova versão não coincide com as antigas
+    return int(time.time() * 1000)
+
+
+def _tag_versions(tags, backend=None, fetched=None):
+    """Versão atual de cada tag, criando as ausentes"""
+    backend = backend or default_cache
+    fetched = fetched if fetched is not None else backend.get_many([_tag_key(tag) for tag in tags])
+    versions = {}
+    for tag in tags:
+        version = fetched.get(_tag_key(tag))
+        if version is None:
+            version = _fresh_version()
+            if not backend.add(_tag_key(tag), version, None):
+                version = backend.get(_tag_key(tag), version)
+        versions[tag] = version
+    return versions
+
+
+def invalidate_tags(*tags, backend=None):
+    """Invalidar todas as entradas que dependem de ``tags`` (O(1) por tag)"""
+    backend = backend or default_cache
+    for tag in tags:
+        key = _tag_key(tag)
+        try:
+            backend.incr(key)
+        except ValueError:
+            # Tag ainda sem contador: qualquer versão nova invalida as entradas
+            if not backend.add(key, _fresh_version(), None):
+                backend.incr(key)
+
+
+class UnifiedCache:
+    """
+    Cache com namespace, tags versionadas e proteção contra stampede.
+
+    Uso::
+
+        beneficiary_cache = UnifiedCache('beneficiaries', default_timeout=1800)
+        data = beneficiary_cache.get_or_set(
+            f'summary:{pk}', lambda: build_summary(pk), tags=[f'beneficiary:{pk}']
+        )
+        invalidate_tags(f'beneficiary:{pk}')
+    """
+
+    def __init__(self, namespace, default_timeout=300, backend=None, beta=1.0):
+        self.namespace = namespace
+        self.default_timeout = default_timeout
+        self.backend = backend or default_cache
+        self.beta = beta
+
+    @property
+    def namespace_tag(self):
+        return f'ns:{self.namespace}'
+
+    def make_key(self, key):
+        return f'{self.namespace}:{key}'
+
+    def _all_tags(self, tags):
+        return [self.namespace_tag, *(tags or ())]
+
+    # ------------------------------------------------------------------
+    # leitura/escrita
+    # ------------------------------------------------------------------
+
+    def _read(self, key, tags):
+        """
+        Retorna (valor, estado) com estado em: 'fresh', 'early' (deve ser
+        renovado antecipadamente), 'stale' (expirado, dentro da carência),
+        'invalid' (tag invalidada) ou 'miss'.
+        """
+        cache_key = self.make_key(key)
+        tags = self._all_tags(tags)
+        fetched = self.backend.get_many([cache_key, *(_tag_key(tag) for tag in tags)])
+        envelope = fetched.get(cache_key)
+        if envelope is None:
+            return _MISSING, 'miss'
+
+        value, expires_at, delta, versions = envelope
+        current = _tag_versions(tags, self.backend, fetched)
+        if any(versions.get(tag) != version for tag, version in current.items()):
+            return value, 'invalid'
+
+        now = time.time()
+        if now >= expires_at:
+            return value, 'stale'
+        # XFetch: antecipa a renovação com probabilidade crescente perto do fim
+        if delta and now - delta * self.beta * math.log(random.random() or 1e-12) >= expires_at:
+            return value, 'early'
+        return value, 'fresh'
+
+    def get(self, key, default=None, tags=None):
+        value, state = self._read(key, tags)
+        if state in ('fresh', 'early'):
+            cache_statistics.incr(self.namespace, 'hit')
+            return value
+        cache_statistics.incr(self.namespace, 'miss')
+        return default
+
+    def set(self, key, value, timeout=None, tags=None, delta=0.0):
+        timeout = self.default_timeout if timeout is None else timeout
+        versions = _tag_versions(self._all_tags(tags), self.backend)
+        envelope = [value, time.time() + timeout, delta, versions]
+        self.backend.set(self.make_key(key), envelope, timeout + STALE_GRACE)
+
+    def delete(self, key):
+        self.backend.delete(self.make_key(key))
+
+    def clear(self):
+        """Invalidar todo o namespace"""
+        invalidate_tags(self.namespace_tag, backend=self.backend)
+
+    def get_or_set(self, key, func, timeout=None, tags=None):
+        """
+        Valor de ``key`` ou resultado de ``func()``, recalculado por um único
+        processo por vez.
+        """
+        value, state = self._read(key, tags)
+        if state == 'fresh':
+            cache_statistics.incr(self.namespace, 'hit')
+            return value
+
+        lock_key = f'{LOCK_PREFIX}:{self.make_key(key)}'
+        if self.backend.add(lock_key, 1, LOCK_TIMEOUT):
+            try:
+                cache_statistics.incr(self.namespace, 'hit' if state == 'early' else 'miss')
+                return self._compute(key, func, timeout, tags)
+            finally:
+                self.backend.delete(lock_key)
+
+        # Outro processo já está recalculando
+        if state in ('early', 'stale'):
+            cache_statistics.incr(self.namespace, 'hit' if state == 'early' else 'stale')
+            return value
+
+        deadline = time.time() + WAIT_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(0.05)
+            value, state = self._read(key, tags)
+            if state in ('fresh', 'early'):
+                cache_statistics.incr(self.namespace, 'hit')
+                return value
+            if self.backend.get(lock_key) is None:
+                break
+
+        cache_statistics.incr(self.namespace, 'miss')
+        return self._compute(key, func, timeout, tags)
+
+    def _compute(self, key, func, timeout, tags):
+        cache_statistics.incr(self.namespace, 'recompute')
+        started = time.time()
+        value = func()
+        self.set(key, value, timeout, tags, delta=time.time() - started)
+        return value
+
+    # ------------------------------------------------------------------
+    # decorator
+    # ------------------------------------------------------------------
+
+    def cached(self, timeout=None, key_func=None, tags=None):
+        """
+        Decorator de cache de função. ``tags`` pode ser uma lista ou uma
+        função que recebe os mesmos argumentos da função decorada.
+        """
+        def decorator(func):
+            func_name = f'{func.__module__}.{func.__qualname__}'
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if key_func:
+                    key = key_func(*args, **kwargs)
+                else:
+                    key = f'{func_name}:{make_key_hash(args, kwargs)}'
+                entry_tags = tags(*args, **kwargs) if callable(tags) else tags
+                return self.get_or_set(key, lambda: func(*args, **kwargs), timeout, entry_tags)
+
+            wrapper.cache = self
+            return wrapper
+        return decorator
+
+
+def model_tag(instance_or_model, pk=None):
+    """Tag de um objeto (``beneficiary:42``) ou de todo o modelo (``beneficiary``)"""
+    model_name = instance_or_model._meta.model_name
+    if pk is None and not isinstance(instance_or_model, type):
+        pk = instance_or_model.pk
+    return f'{model_name}:{pk}' if pk is not None else model_name
+
+
+# Tags extras invalidadas quando um modelo muda (além de ``<modelo>`` e
+# ``<modelo>:<pk>``)
+MODEL_INVALIDATION_TAGS = {
+    'members.Beneficiary': ['beneficiaries', 'stats', 'dashboard', 'path:/members', 'path:/dashboard'],
+    'workshops.Workshop': ['workshops', 'stats', 'dashboard', 'path:/workshops', 'path:/dashboard'],
+    'projects.Project': ['projects', 'dashboard', 'path:/projects', 'path:/dashboard'],
+    'projects.ProjectEnrollment': ['projects', 'dashboard', 'path:/projects'],
+}
+
+
+def invalidate_instance(sender, instance, **kwargs):
+    """Receiver de post_save/post_delete: invalida as tags do objeto e do modelo"""
+    extra = MODEL_INVALIDATION_TAGS.get(sender._meta.label, [])
+    invalidate_tags(model_tag(sender), model_tag(instance), *extra)
+
+
+def watch_model(label, extra_tags=()):
+    """Invalidar as tags de ``label`` ('app.Model') quando seus objetos mudarem"""
+    if extra_tags:
+        tags = MODEL_INVALIDATION_TAGS.setdefault(label, [])
+        tags.extend(tag for tag in extra_tags if tag not in tags)
+    uid = f'unified_cache_{label}'
+    post_save.connect(invalidate_instance, sender=label, dispatch_uid=uid)
+    post_delete.connect(invalidate_instance, sender=label, dispatch_uid=uid)
+
+
+def connect_model_invalidators():
+    """Conectar os invalidadores de MODEL_INVALIDATION_TAGS (CoreConfig.ready)"""
+    for label in list(MODEL_INVALIDATION_TAGS):
+        watch_model(label)
@@ -8,87 +8,42 @@ from django.http import HttpResponseForbidden
 from django.shortcuts import redirect
 from django.contrib import messages
 
+from .user_context import for_user, get_user_context, role_cache_keys
+
 
 def is_technician(user):
     """Verifica se o usuário pertence ao grupo Técnica"""
     if not user.is_authenticated:
         return False
-    
-    # Cache da verificação por 5 minutos
-    cache_key = f"user_is_technician_{user.id}"
-    result = cache.get(cache_key)
-    
-    if result is None:
-        result = user.groups.filter(name='Tecnica').exists() or user.is_superuser
-        cache.set(cache_key, result, 300)
-    
-    return result
+    return for_user(user).is_technician
 
 
 def is_coordinator(user):
     """Verifica se o usuário pertence ao grupo Coordenador"""
     if not user.is_authenticated:
         return False
-    
-    # Cache da verificação por 5 minutos
-    cache_key = f"user_is_coordinator_{user.id}"
-    result = cache.get(cache_key)
-    
-    if result is None:
-        result = (
-            user.groups.filter(name__in=['Coordenador', 'Tecnica']).exists() or
-            user.is_superuser or
-            getattr(user, 'role', None) in ['admin', 'coordenador']
-        )
-        cache.set(cache_key, result, 300)
-    
-    return result
+    return for_user(user).is_coordinator
 
 
 def is_admin(user):
     """Verifica se o usuário é administrador"""
     if not user.is_authenticated:
         return False
-    
-    cache_key = f"user_is_admin_{user.id}"
-    result = cache.get(cache_key)
-    
-    if result is None:
-        result = (
-            user.is_superuser or
-            user.is_staff or
-            getattr(user, 'role', None) == 'admin'
-        )
-        cache.set(cache_key, result, 300)
-    
-    return result
+    return for_user(user).is_admin
 
 
 def has_module_permission(user, module_name):
     """Verifica se o usuário tem permissão para acessar um módulo específico"""
     if not user.is_authenticated:
         return False
-    
-    # Admins e coordenadores têm acesso a tudo
-    if is_admin(user) or is_coordinator(user):
-        return True
-    
-    # Técnicas têm acesso a módulos específicos
-    if is_technician(user):
-        allowed_modules = [
-            'members', 'workshops', 'certificates', 'social', 
-            'evolution', 'coaching', 'projects'
-        ]
-        return module_name in allowed_modules
-    
-    return False
+    return for_user(user).has_module_permission(module_name)
 
 
 def requires_technician(view_func):
     """Decorator para views que requerem permissão de técnica"""
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if not is_technician(request.user):
+        if not get_user_context(request).is_technician:
             messages.error(request, 'Acesso negado. Você precisa ser técnica para acessar esta página.')
             return redirect('dashboard:home')
         return view_func(request, *args, **kwargs)
@@ -99,7 +54,7 @@ def requires_coordinator(view_func):
     """Decorator para views que requerem permissão de coordenador"""
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if not is_coordinator(request.user):
+        if not get_user_context(request).is_coordinator:
             messages.error(request, 'Acesso negado. Você precisa ser coordenador para acessar esta página.')
             return redirect('dashboard:home')
         return view_func(request, *args, **kwargs)
@@ -110,7 +65,7 @@ def requires_admin(view_func):
     """Decorator para views que requerem permissão de administrador"""
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if not is_admin(request.user):
+        if not get_user_context(request).is_admin:
             messages.error(request, 'Acesso negado. Você precisa ser administrador para acessar esta página.')
             return redirect('dashboard:home')
         return view_func(request, *args, **kwargs)
@@ -120,7 +75,7 @@ def requires_admin(view_func):
 class TechnicianRequiredMixin:
     """Mixin para CBVs que requerem permissão de técnica"""
     def test_func(self):
-        return is_technician(self.request.user)
+        return get_user_context(self.request).is_technician
     
     def handle_no_permission(self):
         messages.error(self.request, 'Acesso negado. Você precisa ser técnica para acessar esta página.')
@@ -130,7 +85,7 @@ class TechnicianRequiredMixin:
 class CoordinatorRequiredMixin:
     """Mixin para CBVs que requerem permissão de coordenador"""
     def test_func(self):
-        return is_coordinator(self.request.user)
+        return get_user_context(self.request).is_coordinator
     
     def handle_no_permission(self):
         messages.error(self.request, 'Acesso negado. Você precisa ser coordenador para acessar esta página.')
@@ -140,7 +95,7 @@ class CoordinatorRequiredMixin:
 class AdminRequiredMixin:
     """Mixin para CBVs que requerem permissão de administrador"""
     def test_func(self):
-        return is_admin(self.request.user)
+        return get_user_context(self.request).is_admin
     
     def handle_no_permission(self):
         messages.error(self.request, 'Acesso negado. Você precisa ser administrador para acessar esta página.')
@@ -149,30 +104,9 @@ class AdminRequiredMixin:
 
 def clear_user_permissions_cache(user_id):
     """Limpa o cache de permissões de um usuário"""
-    cache_keys = [
-        f"user_is_technician_{user_id}",
-        f"user_is_coordinator_{user_id}",
-        f"user_is_admin_{user_id}",
-    ]
-    cache.delete_many(cache_keys)
+    cache.delete_many(list(role_cache_keys(user_id).values()))
 
 
 def get_user_permissions(user):
     """Retorna um dicionário com todas as permissões do usuário"""
-    return {
-        'is_technician': is_technician(user),
-        'is_coordinator': is_coordinator(user),
-        'is_admin': is_admin(user),
-        'modules': {
-            'members': has_module_permission(user, 'members'),
-            'workshops': has_module_permission(user, 'workshops'),
-            'certificates': has_module_permission(user, 'certificates'),
-            'social': has_module_permission(user, 'social'),
-            'evolution': has_module_permission(user, 'evolution'),
-            'coaching': has_module_permission(user, 'coaching'),
-            'projects': has_module_permission(user, 'projects'),
-            'users': has_module_permission(user, 'users'),
-            'notifications': has_module_permission(user, 'notifications'),
-            'hr': has_module_permission(user, 'hr'),
-        }
-    }
+    return for_user(user).permissions
@@ -20,11 +20,11 @@ from django.core.paginator import Paginator
 from django.db.models import Q
 from django.views.generic import ListView, DetailView, DeleteView
 from django.urls import reverse_lazy
-from django_ratelimit.decorators import ratelimit  # ENHANCED: Rate limiting
 
 from .file_upload import SecureFileUploader
 from .integrated_upload import UploadedFile, IntegratedFileUploadHandler, process_file_upload
 from .logging_config import get_security_logger  # ENHANCED: Security logging
+from .rate_limit import ratelimit  # ENHANCED: Rate limiting
 
 logger = logging.getLogger(__name__)
 security_logger = get_security_logger()
@@ -36,7 +36,7 @@ class FileUploadView(View):
     View base para upload de arquivos
     """
     
-    @method_decorator(ratelimit(key='user', rate='5/m', method='POST', block=True))  # ENHANCED: Rate limit
+    @method_decorator(ratelimit(key='user', policy='upload', method='POST'))  # ENHANCED: Rate limit
     def post(self, request, *args, **kwargs):
         """Handle file upload"""
         try:
@@ -473,7 +473,7 @@ def upload_download_view(request, upload_id):
 
 @login_required
 @csrf_exempt
-@ratelimit(key='user', rate='20/m', method='POST')  # ENHANCED: Rate limiting for uploads
+@ratelimit(key='user', policy='upload_api', method='POST')  # ENHANCED: Rate limiting for uploads
 def upload_api_view(request):
     """API para upload via AJAX"""
     if request.method != 'POST':
@@ -8,6 +8,7 @@ app_name = 'core'
 urlpatterns = [
     path('', views.home, name='home'),
     path('search/', views.global_search, name='global-search'),
+    path('search/api/', views.search_api, name='search-api'),
     path('config/email/', views.email_config, name='email-config'),
     path('settings/', views.settings_view, name='settings'),
     path('audit-logs/', views.audit_logs, name='audit-logs'),
@@ -0,0 +1,215 @@
+"""
+Contexto do usuário da requisição.
+
+UserContextMiddleware anexa ``request.user_context``, um UserContext
+preguiçoso: papéis (técnica, coordenação, administração), permissões de
+módulo, contadores dos badges do sidebar e últimas notificações não lidas
+são resolvidos no primeiro acesso e no máximo uma vez por requisição.
+
+O primeiro acesso busca todas as chaves de cache do usuário (papéis,
+contadores de ``core.sidebar_counters`` e a lista de notificações) com um
+único ``get_many``; só o que faltar no cache é calculado (os papéis com uma
+consulta aos grupos) e gravado de volta com ``set_many``/``add``.
+
+``core.unified_permissions`` (is_technician/is_coordinator/is_admin,
+decorators e mixins), os context processors e o NotificationMiddleware leem
+deste objeto. Fora de uma requisição, ou para outro usuário, ``for_user``
+cria um contexto avulso.
+"""
+import contextvars
+import logging
+
+from django.core.cache import cache
+from django.utils.functional import cached_property
+
+from core import sidebar_counters
+
+logger = logging.getLogger(__name__)
+
+ROLE_CACHE_KEYS = {
+    'is_technician': 'user_is_technician_{}',
+    'is_coordinator': 'user_is_coordinator_{}',
+    'is_admin': 'user_is_admin_{}',
+}
+ROLE_CACHE_TIMEOUT = 300
+
+NOTIFICATIONS_CACHE_KEY = 'notifications_context_{}'
+NOTIFICATIONS_CACHE_TIMEOUT = 120
+LATEST_NOTIFICATIONS = 5
+
+MODULES = [
+    'members', 'workshops', 'certificates', 'social', 'evolution',
+    'coaching', 'projects', 'users', 'notifications', 'hr',
+]
+TECHNICIAN_MODULES = [
+    'members', 'workshops', 'certificates', 'social', 'evolution',
+    'coaching', 'projects',
+]
+
+_current = contextvars.ContextVar('user_context', default=None)
+
+
+def role_cache_keys(user_id):
+    return {role: key.format(user_id) for role, key in ROLE_CACHE_KEYS.items()}
+
+
+def compute_roles(user, group_names):
+    """Papéis do usuário a partir dos nomes dos seus grupos"""
+    role = getattr(user, 'role', None)
+    return {
+        'is_technician': 'Tecnica' in group_names or user.is_superuser,
+        'is_coordinator': (
+            bool({'Coordenador', 'Tecnica'} & set(group_names)) or
+            user.is_superuser or
+            role in ['admin', 'coordenador']
+        ),
+        'is_admin': user.is_superuser or user.is_staff or role == 'admin',
+    }
+
+
+def module_access(roles, module_name):
+    """Acesso a um módulo a partir dos papéis"""
+    # Admins e coordenadores têm acesso a tudo
+    if roles['is_admin'] or roles['is_coordinator']:
+        return True
+    # Técnicas têm acesso a módulos específicos
+    if roles['is_technician']:
+        return module_name in TECHNICIAN_MODULES
+    return False
+
+
+class UserContext:
+    """Dados do usuário calculados sob demanda, no máximo uma vez"""
+
+    def __init__(self, request=None, user=None):
+        self._request = request
+        self._user = user
+
+    @classmethod
+    def for_user(cls, user):
+        return cls(user=user)
+
+    @cached_property
+    def user(self):
+        return self._user if self._user is not None else self._request.user
+
+    @cached_property
+    def is_authenticated(self):
+        return bool(self.user and self.user.is_authenticated)
+
+    @cached_property
+    def _cached(self):
+        """Todas as chaves de cache do usuário, em um get_many"""
+        keys = [
+            *role_cache_keys(self.user.pk).values(),
+            *sidebar_counters.counter_keys(self.user.pk).values(),
+            NOTIFICATIONS_CACHE_KEY.format(self.user.pk),
+        ]
+        return cache.get_many(keys)
+
+    @cached_property
+    def group_names(self):
+        if not self.is_authenticated:
+            return []
+        return list(self.user.groups.values_list('name', flat=True))
+
+    @cached_property
+    def roles(self):
+        if not self.is_authenticated:
+            return dict.fromkeys(ROLE_CACHE_KEYS, False)
+        keys = role_cache_keys(self.user.pk)
+        roles = {role: self._cached.get(key) for role, key in keys.items()}
+        missing = [role for role, value in roles.items() if value is None]
+        if missing:
+            computed = compute_roles(self.user, self.group_names)
+            cache.set_many({keys[role]: computed[role] for role in missing}, ROLE_CACHE_TIMEOUT)
+            roles.update({role: computed[role] for role in missing})
+        return roles
+
+    @property
+    def is_technician(self):
+        return self.roles['is_technician']
+
+    @property
+    def is_coordinator(self):
+        return self.roles['is_coordinator']
+
+    @property
+    def is_admin(self):
+        return self.roles['is_admin']
+
+    @cached_property
+    def modules(self):
+        if not self.is_authenticated:
+            return {}
+        return {module: module_access(self.roles, module) for module in MODULES}
+
+    def has_module_permission(self, module_name):
+        if not self.is_authenticated:
+            return False
+        if module_name in self.modules:
+            return self.modules[module_name]
+        return module_access(self.roles, module_name)
+
+    @cached_property
+    def permissions(self):
+        """Formato de get_user_permissions: papéis + {'modules': {...}}"""
+        return {**self.roles, 'modules': self.modules}
+
+    @cached_property
+    def counters(self):
+        """Contadores dos badges do sidebar (core.sidebar_counters)"""
+        if not self.is_authenticated:
+            return dict.fromkeys(sidebar_counters.COUNTERS, 0)
+        return sidebar_counters.get_counters(self.user, cached=self._cached)
+
+    @cached_property
+    def notifications_data(self):
+        """Últimas notificações não lidas e total (badge do sidebar)"""
+        if not self.is_authenticated:
+            return {'unread_notifications': [], 'unread_notifications_count': 0}
+        key = NOTIFICATIONS_CACHE_KEY.format(self.user.pk)
+        latest = self._cached.get(key)
+        if latest is None:
+            from notifications.models import Notification
+
+            latest = list(Notification.objects.filter(
+                recipient=self.user,
+                status__in=sidebar_counters.UNREAD_NOTIFICATION_STATUSES
+            ).order_by('-created_at').values(
+                'id', 'title', 'message', 'type', 'created_at'
+            )[:LATEST_NOTIFICATIONS])
+            cache.set(key, latest, NOTIFICATIONS_CACHE_TIMEOUT)
+        return {
+            'unread_notifications': latest,
+            'unread_notifications_count': self.counters['notifications'],
+        }
+
+
+def for_user(user):
+    """Contexto da requisição corrente se for do mesmo usuário; senão um avulso"""
+    context = _current.get()
+    if context is not None and context.user.pk == user.pk:
+        return context
+    return UserContext.for_user(user)
+
+
+def get_user_context(request):
+    context = getattr(request, 'user_context', None)
+    if not isinstance(context, UserContext):
+        context = request.user_context = UserContext(request)
+    return context
+
+
+class UserContextMiddleware:
+    """Anexar ``request.user_context`` (depois do AuthenticationMiddleware)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _current.set(get_user_context(request))
+        try:
+            return self.get_response(request)
+        finally:
+            _current.reset(token)
@@ -370,6 +370,39 @@ def global_search(request):
     return render(request, 'core/global_search.html', results)
 
 
+
+@login_required
+def search_api(request):
+    """
+    Busca textual por relevância em mensagens do chat, tarefas e comunicação
+    (core.search), apenas no que o usuário pode ver.
+
+    Parâmetros: ``q``, ``types`` (fontes separadas por vírgula), ``cursor``
+    (``next_cursor`` da página anterior) e ``limit``.
+    """
+    from django.http import JsonResponse
+    from .search import DEFAULT_PAGE_SIZE, search
+
+    types = [label for label in request.GET.get('types', '').split(',') if label]
+    try:
+        page = search(
+            request.user,
+            request.GET.get('q', ''),
+            sources=types or None,
+            cursor=request.GET.get('cursor') or None,
+            limit=request.GET.get('limit', DEFAULT_PAGE_SIZE),
+        )
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'results': [hit.as_dict() for hit in page['results']],
+        'next_cursor': page['next_cursor'],
+        'has_more': page['has_more'],
+    })
+
+
 # Importar função de diagnóstico
 def template_diagnostics(request):
     """Importar e executar diagnóstico de templates"""
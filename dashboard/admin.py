@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import DailyStatCounter
+
+
+@admin.register(DailyStatCounter)
+class DailyStatCounterAdmin(admin.ModelAdmin):
+    list_display = ['model_label', 'dimension', 'value', 'day', 'count']
+    list_filter = ['model_label', 'dimension']
+    date_hierarchy = 'day'
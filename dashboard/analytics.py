@@ -241,32 +241,24 @@ class DashboardMetrics:
         data = cache.get(cache_key)
         
         if data is None:
-            from members.models import Beneficiary
-            from projects.models import ProjectEnrollment
-            from workshops.models import WorkshopEnrollment
+            from .stats import StatsSnapshot, month_windows
             
-            # Calculate various KPIs
-            total_beneficiaries = Beneficiary.objects.count()
-            active_projects = ProjectEnrollment.objects.filter(
-                status='ATIVO'
-            ).count()
+            # KPIs read from the incremental counters (one grouped query)
+            snapshot = StatsSnapshot(
+                ['members.Beneficiary', 'projects.ProjectEnrollment', 'workshops.SessionAttendance'],
+                month_windows()
+            )
+            total_beneficiaries = snapshot.count('members.Beneficiary')
+            active_projects = snapshot.count('projects.ProjectEnrollment', 'status', 'ATIVO')
             
             # Workshop attendance rate
-            total_enrollments = WorkshopEnrollment.objects.count()
-            attended = WorkshopEnrollment.objects.filter(attended=True).count()
-            attendance_rate = (attended / total_enrollments * 100) if total_enrollments > 0 else 0
+            total_attendances = snapshot.count('workshops.SessionAttendance')
+            attended = snapshot.count('workshops.SessionAttendance', 'attended', True)
+            attendance_rate = (attended / total_attendances * 100) if total_attendances > 0 else 0
             
             # Growth rates (compare to previous month)
-            current_month = timezone.now().replace(day=1)
-            previous_month = (current_month - timedelta(days=1)).replace(day=1)
-            
-            current_beneficiaries = Beneficiary.objects.filter(
-                created_at__gte=current_month
-            ).count()
-            previous_beneficiaries = Beneficiary.objects.filter(
-                created_at__gte=previous_month,
-                created_at__lt=current_month
-            ).count()
+            current_beneficiaries = snapshot.count('members.Beneficiary', window='current_month')
+            previous_beneficiaries = snapshot.count('members.Beneficiary', window='previous_month')
             
             beneficiary_growth = (
                 (current_beneficiaries - previous_beneficiaries) / 
@@ -288,19 +280,16 @@ class DashboardMetrics:
     def _calculate_engagement_score(self):
         """Calculate overall engagement score"""
         from members.models import Beneficiary
-        from projects.models import ProjectEnrollment
-        from workshops.models import WorkshopEnrollment
-        from social.models import SocialAssistance
+        from .stats import StatsSnapshot
         
-        total_beneficiaries = Beneficiary.objects.count()
+        total_beneficiaries = StatsSnapshot(['members.Beneficiary']).count('members.Beneficiary')
         if total_beneficiaries == 0:
             return 0
         
-        # Count beneficiaries with multiple interactions
+        # Count beneficiaries enrolled in at least one project or workshop
         engaged_beneficiaries = Beneficiary.objects.filter(
             Q(project_enrollments__isnull=False) |
-            Q(workshop_enrollments__isnull=False) |
-            Q(social_assistances__isnull=False)
+            Q(workshop_enrollments__isnull=False)
         ).distinct().count()
         
         return round((engaged_beneficiaries / total_beneficiaries * 100), 2)
@@ -0,0 +1,33 @@
+"""
+Comando de reconciliação noturna dos contadores do dashboard.
+
+Recalcula DailyStatCounter a partir das tabelas de origem, corrigindo
+desvios de escritas que não disparam sinais (bulk_create, update()).
+Agendar diariamente, por exemplo via cron:
+
+    0 3 * * * python manage.py reconcile_dashboard_stats
+"""
+from django.core.management.base import BaseCommand
+
+from dashboard.stats import TRACKED_MODELS, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Reconciliar os contadores incrementais do dashboard com as tabelas de origem'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            action='append',
+            choices=sorted(TRACKED_MODELS),
+            help='Reconciliar apenas o modelo informado (pode ser repetido)',
+        )
+
+    def handle(self, *args, **options):
+        changed = rebuild_counters(options['model'])
+        for model_label, drift in changed.items():
+            if drift:
+                self.stdout.write(self.style.WARNING(f'{model_label}: {drift} contadores corrigidos'))
+            else:
+                self.stdout.write(f'{model_label}: ok')
+        self.stdout.write(self.style.SUCCESS('Reconciliação concluída'))
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.13 on 2026-10-17 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=64, verbose_name='Modelo')),
+                ('dimension', models.CharField(max_length=32, verbose_name='Dimensão')),
+                ('value', models.CharField(blank=True, max_length=100, verbose_name='Valor')),
+                ('day', models.DateField(verbose_name='Dia')),
+                ('count', models.IntegerField(default=0, verbose_name='Quantidade')),
+            ],
+            options={
+                'verbose_name': 'Contador Diário do Dashboard',
+                'verbose_name_plural': 'Contadores Diários do Dashboard',
+                'indexes': [models.Index(fields=['model_label', 'dimension', 'day'], name='dashboard_stat_lookup_idx')],
+                'unique_together': {('model_label', 'dimension', 'value', 'day')},
+            },
+        ),
+    ]
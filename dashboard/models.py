@@ -1,3 +1,28 @@
 from django.db import models
 
-# Create your models here.
+
+class DailyStatCounter(models.Model):
+    """
+    Contador pré-agregado do dashboard: quantos registros de ``model_label``
+    criados em ``day`` têm hoje ``dimension`` = ``value``.
+
+    A dimensão ``*`` (valor vazio) conta todos os registros do dia. Mantido
+    pelos sinais de dashboard.stats e reconciliado pelo comando
+    ``reconcile_dashboard_stats``.
+    """
+    model_label = models.CharField('Modelo', max_length=64)
+    dimension = models.CharField('Dimensão', max_length=32)
+    value = models.CharField('Valor', max_length=100, blank=True)
+    day = models.DateField('Dia')
+    count = models.IntegerField('Quantidade', default=0)
+
+    class Meta:
+        verbose_name = 'Contador Diário do Dashboard'
+        verbose_name_plural = 'Contadores Diários do Dashboard'
+        unique_together = ['model_label', 'dimension', 'value', 'day']
+        indexes = [
+            models.Index(fields=['model_label', 'dimension', 'day'], name='dashboard_stat_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label} {self.dimension}={self.value} {self.day}: {self.count}"
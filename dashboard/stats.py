@@ -0,0 +1,329 @@
+"""
+Estatísticas incrementais do dashboard.
+
+Em vez de agregar as tabelas de origem (Beneficiary, Workshop, Task...) a
+cada expiração de cache, o dashboard lê contadores diários pré-agregados em
+DailyStatCounter:
+
+- cada modelo rastreado declara suas dimensões em TRACKED_MODELS
+- post_save/post_delete ajustam os contadores (dimensão ``*`` = total) com
+  UPDATE ... SET count = count + delta, na mesma transação da escrita
+- ``reconcile_dashboard_stats`` recalcula tudo a partir das tabelas de origem
+  (noturno), corrigindo desvios de bulk_create/update() que não disparam sinais
+- StatsSnapshot responde totais, janelas de datas e quebras por valor com uma
+  única consulta agrupada, independentemente do tamanho das tabelas
+"""
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.utils import timezone
+
+from core.background_jobs import register_job
+
+logger = logging.getLogger(__name__)
+
+ALL = '*'
+
+# modelo -> (campo de data usado como dia, dimensões contadas)
+TRACKED_MODELS = {
+    'members.Beneficiary': ('created_at', ('status', 'neighbourhood')),
+    'workshops.Workshop': ('created_at', ('status',)),
+    'workshops.SessionAttendance': ('created_at', ('attended',)),
+    'projects.Project': ('created_at', ('status',)),
+    'projects.ProjectEnrollment': ('created_at', ('status', 'project_id')),
+    'tasks.Task': ('created_at', ('status',)),
+    'social.SocialAnamnesis': ('created_at', ('locked',)),
+    'evolution.EvolutionRecord': ('created_at', ()),
+    'certificates.Certificate': ('created_at', ('status',)),
+    'users.CustomUser': ('date_joined', ('is_active',)),
+}
+
+_SNAPSHOT_ATTR = '_dashboard_stat_keys'
+
+
+def _as_value(value):
+    return '' if value is None else str(value)[:100]
+
+
+def _as_day(value):
+    if value is None:
+        return None
+    if hasattr(value, 'tzinfo'):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def _stat_keys(instance, date_field, dimensions):
+    """Chaves (dimensão, valor, dia) às quais a instância contribui"""
+    day = _as_day(getattr(instance, date_field))
+    if day is None:
+        return None
+    keys = [(ALL, '', day)]
+    keys.extend((dimension, _as_value(getattr(instance, dimension)), day) for dimension in dimensions)
+    return keys
+
+
+def _tracked_fields(date_field, dimensions):
+    # project_id etc. são attnames; o campo diferido é o nome sem _id
+    return {date_field, *(d[:-3] if d.endswith('_id') else d for d in dimensions)}
+
+
+def apply_deltas(model_label, deltas):
+    """Somar ``deltas`` {(dimensão, valor, dia): n} aos contadores"""
+    from .models import DailyStatCounter
+
+    for (dimension, value, day), delta in deltas.items():
+        if not delta:
+            continue
+        lookup = dict(model_label=model_label, dimension=dimension, value=value, day=day)
+        if DailyStatCounter.objects.filter(**lookup).update(count=F('count') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                DailyStatCounter.objects.create(count=delta, **lookup)
+        except IntegrityError:
+            # Criado por outra requisição entre o UPDATE e o INSERT
+            DailyStatCounter.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def record_bulk_change(model_label, instances, dimension, new_value):
+    """
+    Ajustar os contadores para ``instances`` cuja ``dimension`` passará a
+    ``new_value`` por bulk_update/update(), que não disparam sinais.
+
+    Chamar antes de alterar as instâncias em memória.
+    """
+    date_field, dimensions = TRACKED_MODELS[model_label]
+    if dimension not in dimensions:
+        return
+    deltas = Counter()
+    new_value = _as_value(new_value)
+    for instance in instances:
+        day = _as_day(getattr(instance, date_field))
+        old_value = _as_value(getattr(instance, dimension))
+        if day is None or old_value == new_value:
+            continue
+        deltas[(dimension, old_value, day)] -= 1
+        deltas[(dimension, new_value, day)] += 1
+    apply_deltas(model_label, deltas)
+
+
+def record_bulk_create(model_label, instances):
+    """Somar aos contadores ``instances`` inseridas com bulk_create (sem sinais)"""
+    date_field, dimensions = TRACKED_MODELS[model_label]
+    deltas = Counter()
+    for instance in instances:
+        for key in _stat_keys(instance, date_field, dimensions) or ():
+            deltas[key] += 1
+    apply_deltas(model_label, deltas)
+
+
+class _CounterSignals:
+    """Handlers de sinal de um modelo rastreado"""
+
+    def __init__(self, model, model_label, date_field, dimensions):
+        self.model = model
+        self.model_label = model_label
+        self.date_field = date_field
+        self.dimensions = dimensions
+        self.fields = _tracked_fields(date_field, dimensions)
+
+    def connect(self):
+        uid = f'dashboard_stats_{self.model_label}'
+        post_init.connect(self.post_init, sender=self.model, weak=False, dispatch_uid=uid)
+        pre_save.connect(self.pre_save, sender=self.model, weak=False, dispatch_uid=uid)
+        post_save.connect(self.post_save, sender=self.model, weak=False, dispatch_uid=uid)
+        post_delete.connect(self.post_delete, sender=self.model, weak=False, dispatch_uid=uid)
+
+    def keys(self, instance):
+        return _stat_keys(instance, self.date_field, self.dimensions)
+
+    def post_init(self, sender, instance, **kwargs):
+        # Guardar o estado carregado para calcular o delta no save sem consultar o banco
+        if instance.pk is None or self.fields & instance.get_deferred_fields():
+            setattr(instance, _SNAPSHOT_ATTR, None)
+        else:
+            setattr(instance, _SNAPSHOT_ATTR, self.keys(instance))
+
+    def pre_save(self, sender, instance, raw=False, **kwargs):
+        if raw or instance._state.adding or getattr(instance, _SNAPSHOT_ATTR, None) is not None:
+            return
+        # Instância carregada com campos diferidos: buscar o estado anterior
+        previous = sender._default_manager.filter(pk=instance.pk).only(*self.fields).first()
+        setattr(instance, _SNAPSHOT_ATTR, self.keys(previous) if previous else None)
+
+    def post_save(self, sender, instance, created, raw=False, **kwargs):
+        if raw:
+            return
+        deltas = Counter()
+        previous = None if created else getattr(instance, _SNAPSHOT_ATTR, None)
+        current = self.keys(instance)
+        for key in previous or ():
+            deltas[key] -= 1
+        for key in current or ():
+            deltas[key] += 1
+        apply_deltas(self.model_label, deltas)
+        setattr(instance, _SNAPSHOT_ATTR, current)
+
+    def post_delete(self, sender, instance, **kwargs):
+        keys = getattr(instance, _SNAPSHOT_ATTR, None) or self.keys(instance)
+        apply_deltas(self.model_label, Counter({key: -1 for key in keys or ()}))
+
+
+def connect_signals():
+    for model_label, (date_field, dimensions) in TRACKED_MODELS.items():
+        try:
+            model = apps.get_model(model_label)
+        except LookupError:
+            logger.warning(f"Modelo {model_label} não encontrado; estatísticas do dashboard ignoradas")
+            continue
+        _CounterSignals(model, model_label, date_field, dimensions).connect()
+
+
+def rebuild_counters(model_labels=None):
+    """
+    Recalcular os contadores a partir das tabelas de origem.
+
+    Retorna {modelo: número de contadores corrigidos}.
+    """
+    from .models import DailyStatCounter
+
+    changed = {}
+    for model_label, (date_field, dimensions) in TRACKED_MODELS.items():
+        if model_labels and model_label not in model_labels:
+            continue
+        try:
+            model = apps.get_model(model_label)
+        except LookupError:
+            continue
+
+        expected = {}
+        queryset = model._default_manager.order_by().annotate(stat_day=TruncDate(date_field))
+        for day, total in queryset.values_list('stat_day').annotate(total=Count('pk')):
+            if day is not None:
+                expected[(ALL, '', day)] = total
+        for dimension in dimensions:
+            rows = queryset.values_list(dimension, 'stat_day').annotate(total=Count('pk'))
+            for value, day, total in rows:
+                if day is not None:
+                    key = (dimension, _as_value(value), day)
+                    expected[key] = expected.get(key, 0) + total
+
+        with transaction.atomic():
+            current = {
+                (dimension, value, day): count
+                for dimension, value, day, count in DailyStatCounter.objects.filter(
+                    model_label=model_label
+                ).values_list('dimension', 'value', 'day', 'count')
+            }
+            drift = {key for key in expected.keys() | current.keys() if expected.get(key, 0) != current.get(key, 0)}
+            if drift:
+                DailyStatCounter.objects.filter(model_label=model_label).delete()
+                DailyStatCounter.objects.bulk_create([
+                    DailyStatCounter(model_label=model_label, dimension=dimension, value=value, day=day, count=count)
+                    for (dimension, value, day), count in expected.items() if count
+                ], batch_size=1000)
+        changed[model_label] = len(drift)
+    return changed
+
+
+@register_job
+def reconcile_dashboard_stats(model_labels=None):
+    """Job de reconciliação dos contadores do dashboard"""
+    return rebuild_counters(model_labels)
+
+
+def seed_counters(sender, using='default', **kwargs):
+    """post_migrate: popular os contadores na primeira migração (tabela vazia)"""
+    from .models import DailyStatCounter
+
+    if using == 'default' and not DailyStatCounter.objects.exists():
+        rebuild_counters()
+
+
+class StatsSnapshot:
+    """
+    Leitura dos contadores em uma única consulta agrupada.
+
+    ``windows`` mapeia nomes para dia inicial ou (início, fim) inclusivos;
+    cada janela vira um SUM filtrado na mesma consulta.
+    """
+
+    def __init__(self, model_labels, windows=None):
+        from .models import DailyStatCounter
+
+        self.windows = windows or {}
+        aggregates = {'total': Sum('count')}
+        for name, window in self.windows.items():
+            start, end = window if isinstance(window, tuple) else (window, None)
+            condition = Q(day__gte=start)
+            if end is not None:
+                condition &= Q(day__lte=end)
+            aggregates[f'window_{name}'] = Sum('count', filter=condition)
+
+        self._data = defaultdict(dict)
+        rows = DailyStatCounter.objects.filter(model_label__in=model_labels).values(
+            'model_label', 'dimension', 'value'
+        ).annotate(**aggregates).order_by()
+        for row in rows:
+            self._data[row['model_label']][(row['dimension'], row['value'])] = row
+
+    def count(self, model_label, dimension=ALL, value='', window=None):
+        row = self._data[model_label].get((dimension, _as_value(value) if dimension != ALL else ''))
+        if row is None:
+            return 0
+        return row['total' if window is None else f'window_{window}'] or 0
+
+    def breakdown(self, model_label, dimension, window=None):
+        """{valor: quantidade} da dimensão, em ordem decrescente"""
+        key = 'total' if window is None else f'window_{window}'
+        values = {
+            value: row[key] or 0
+            for (row_dimension, value), row in self._data[model_label].items()
+            if row_dimension == dimension
+        }
+        return dict(sorted(((v, c) for v, c in values.items() if c), key=lambda item: -item[1]))
+
+
+def monthly_series(model_label, months=6, dimension=ALL, value=''):
+    """[(primeiro dia do mês, quantidade)] dos últimos ``months`` meses, em uma consulta"""
+    from .models import DailyStatCounter
+
+    today = timezone.localdate()
+    first = today.replace(day=1)
+    for _ in range(months - 1):
+        first = (first - timedelta(days=1)).replace(day=1)
+
+    totals = dict(
+        DailyStatCounter.objects.filter(
+            model_label=model_label, dimension=dimension, value=value, day__gte=first
+        ).annotate(month=TruncMonth('day')).values_list('month').annotate(total=Sum('count')).order_by()
+    )
+    series = []
+    month = first
+    for _ in range(months):
+        series.append((month, totals.get(month, 0)))
+        month = (month + timedelta(days=32)).replace(day=1)
+    return series
+
+
+def month_windows(today=None):
+    """Janelas padrão: 7 e 30 dias, 90 dias, mês corrente e mês anterior"""
+    today = today or timezone.localdate()
+    current_month = today.replace(day=1)
+    previous_month = (current_month - timedelta(days=1)).replace(day=1)
+    return {
+        'week': today - timedelta(days=7),
+        'month': today - timedelta(days=30),
+        'quarter': today - timedelta(days=90),
+        'current_month': current_month,
+        'previous_month': (previous_month, current_month - timedelta(days=1)),
+    }
@@ -1,3 +1,86 @@
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from members.models import Beneficiary
+
+from .models import DailyStatCounter
+from .stats import StatsSnapshot, month_windows, rebuild_counters
+
+
+class DashboardStatsTests(TestCase):
+    """Contadores incrementais do dashboard"""
+
+    def create_beneficiary(self, **kwargs):
+        data = {
+            'full_name': 'Maria Silva',
+            'dob': '1990-01-01',
+            'phone_1': '11987654321',
+            'address': 'Rua A',
+            'neighbourhood': 'Centro',
+        }
+        data.update(kwargs)
+        return Beneficiary.objects.create(**data)
+
+    def snapshot(self):
+        return StatsSnapshot(['members.Beneficiary'], month_windows())
+
+    def test_signals_keep_counters_in_sync(self):
+        first = self.create_beneficiary()
+        self.create_beneficiary(full_name='Ana Souza', neighbourhood='Vila Nova')
+
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot.count('members.Beneficiary'), 2)
+        self.assertEqual(snapshot.count('members.Beneficiary', 'status', 'ATIVA'), 2)
+        self.assertEqual(snapshot.count('members.Beneficiary', window='week'), 2)
+
+        first.status = 'INATIVA'
+        first.save()
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot.count('members.Beneficiary', 'status', 'ATIVA'), 1)
+        self.assertEqual(snapshot.count('members.Beneficiary', 'status', 'INATIVA'), 1)
+
+        first.delete()
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot.count('members.Beneficiary'), 1)
+        self.assertEqual(snapshot.count('members.Beneficiary', 'status', 'INATIVA'), 0)
+        self.assertEqual(snapshot.breakdown('members.Beneficiary', 'neighbourhood'), {'Vila Nova': 1})
+
+    def test_deferred_instance_save_uses_previous_state(self):
+        beneficiary = self.create_beneficiary()
+        deferred = Beneficiary.objects.only('pk', 'full_name').get(pk=beneficiary.pk)
+        deferred.status = 'INATIVA'
+        deferred.save()
+
+        self.assertEqual(self.snapshot().count('members.Beneficiary', 'status', 'ATIVA'), 0)
+
+    def test_reconciliation_fixes_bulk_update_drift(self):
+        self.create_beneficiary()
+        Beneficiary.objects.update(status='INATIVA')  # não dispara sinais
+        self.assertEqual(self.snapshot().count('members.Beneficiary', 'status', 'INATIVA'), 0)
+
+        changed = rebuild_counters(['members.Beneficiary'])
+
+        self.assertEqual(changed['members.Beneficiary'], 2)
+        self.assertEqual(self.snapshot().count('members.Beneficiary', 'status', 'INATIVA'), 1)
+        call_command('reconcile_dashboard_stats', model=['members.Beneficiary'], stdout=open('/dev/null', 'w'))
+        self.assertEqual(rebuild_counters(['members.Beneficiary']), {'members.Beneficiary': 0})
+
+    def test_snapshot_is_a_single_query(self):
+        for index in range(5):
+            self.create_beneficiary(full_name=f'Beneficiária {index}')
+
+        with self.assertNumQueries(1):
+            snapshot = StatsSnapshot(['members.Beneficiary', 'tasks.Task'], month_windows())
+        self.assertEqual(snapshot.count('members.Beneficiary'), 5)
+        self.assertEqual(DailyStatCounter.objects.filter(model_label='members.Beneficiary', dimension='*').count(), 1)
+
+    def test_performance_indicators_read_counters(self):
+        from .analytics import DashboardMetrics
+
+        self.create_beneficiary()
+
+        indicators = DashboardMetrics(cache_timeout=0).get_performance_indicators()
+
+        self.assertEqual(indicators['total_beneficiaries'], 1)
+        self.assertEqual(indicators['active_projects'], 0)
+        self.assertEqual(indicators['engagement_score'], 0)
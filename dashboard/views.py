@@ -1,15 +1,16 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse
 from django.utils import timezone
 from django.db.models import Count, Q
 from django.core.cache import cache
-import csv
 from datetime import timedelta
 from core.optimizers import CacheManager, QueryOptimizer
 from core.permissions import is_technician
 from core.cache_utils import cache_view, CACHE_TIMEOUTS
+from core.export_utils import DataFormatter, ExportManager
+from dashboard.stats import StatsSnapshot, month_windows, monthly_series
 from core.unified_permissions import (
     get_user_permissions,
     is_technician,
@@ -24,7 +25,6 @@ from members.models import Beneficiary
 from members.forms import BeneficiaryForm
 from workshops.models import Workshop
 # Imports moved to top for better performance
-from django.contrib.auth import get_user_model
 from users.models import UserActivity
 from social.models import SocialAnamnesis
 from evolution.models import EvolutionRecord
@@ -32,80 +32,71 @@ from projects.models import ProjectEnrollment, Project
 from coaching.models import ActionPlan, WheelOfLife
 
 
+# Modelos lidos pelo dashboard principal (ver dashboard.stats.TRACKED_MODELS)
+DASHBOARD_MODELS = [
+    'members.Beneficiary', 'workshops.Workshop', 'projects.Project', 'tasks.Task',
+    'social.SocialAnamnesis', 'evolution.EvolutionRecord', 'users.CustomUser',
+]
+
+
 @login_required
 @requires_technician
 def dashboard_home(request):
-    """Dashboard principal com cache inteligente"""
-    
-    # OTIMIZAÇÃO: Cache com diferentes TTLs
-    cache_key = 'dashboard_stats_optimized'
-    stats = cache.get(cache_key)
-    
-    if stats is None:
-        User = get_user_model()
-        now = timezone.now()
-        today = now.date()
-        last_week = today - timedelta(days=7)
-        last_month = today - timedelta(days=30)
-        
-        # OTIMIZAÇÃO: Query única com múltiplas agregações
-        beneficiary_stats = Beneficiary.objects.aggregate(
-            total=Count('id'),
-            active=Count('id', filter=Q(status='ATIVA')),
-            inactive=Count('id', filter=Q(status='INATIVA')),
-            new_week=Count('id', filter=Q(created_at__date__gte=last_week)),
-            new_month=Count('id', filter=Q(created_at__date__gte=last_month))
-        )
-        
-        # OTIMIZAÇÃO: Queries otimizadas com select_related/prefetch_related
-        workshop_stats = Workshop.objects.aggregate(
-            total=Count('id'),
-            active=Count('id', filter=Q(status='ativo')),
-            completed=Count('id', filter=Q(status='concluido')),
-            this_month=Count('id', filter=Q(created_at__date__gte=last_month))
-        )
-        
-        project_stats = Project.objects.aggregate(
-            total=Count('id'),
-            active=Count('id'),  # Todos os projetos são considerados ativos por padrão
-            this_month=Count('id', filter=Q(created_at__gte=last_month))
-        )
-        
-        # Estatísticas de tarefas
-        try:
-            from tasks.models import Task
-            task_stats = Task.objects.aggregate(
-                total=Count('id'),
-                pending=Count('id', filter=Q(status='PENDENTE')),
-                in_progress=Count('id', filter=Q(status='EM_ANDAMENTO')),
-                completed=Count('id', filter=Q(status='CONCLUIDA')),
-                this_month=Count('id', filter=Q(created_at__date__gte=last_month))
-            )
-        except ImportError:
-            task_stats = {
-                'total': 0, 'pending': 0, 'in_progress': 0, 
-                'completed': 0, 'this_month': 0
-            }
-        
+    """Dashboard principal: contadores lidos das estatísticas incrementais"""
+    
+    now = timezone.now()
+    today = timezone.localdate()
+    
+    # Totais e janelas de todos os módulos em uma única consulta aos contadores
+    snapshot = StatsSnapshot(DASHBOARD_MODELS, month_windows(today))
+    
+    beneficiary_stats = {
+        'total': snapshot.count('members.Beneficiary'),
+        'active': snapshot.count('members.Beneficiary', 'status', 'ATIVA'),
+        'inactive': snapshot.count('members.Beneficiary', 'status', 'INATIVA'),
+        'new_week': snapshot.count('members.Beneficiary', window='week'),
+        'new_month': snapshot.count('members.Beneficiary', window='month'),
+    }
+    workshop_stats = {
+        'total': snapshot.count('workshops.Workshop'),
+        'active': snapshot.count('workshops.Workshop', 'status', 'ativo'),
+        'completed': snapshot.count('workshops.Workshop', 'status', 'concluido'),
+        'this_month': snapshot.count('workshops.Workshop', window='month'),
+    }
+    project_stats = {
+        'total': snapshot.count('projects.Project'),
+        'active': snapshot.count('projects.Project', 'status', 'ATIVO'),
+        'this_month': snapshot.count('projects.Project', window='month'),
+    }
+    task_stats = {
+        'total': snapshot.count('tasks.Task'),
+        'pending': snapshot.count('tasks.Task', 'status', 'todo'),
+        'in_progress': snapshot.count('tasks.Task', 'status', 'in_progress'),
+        'completed': snapshot.count('tasks.Task', 'status', 'completed'),
+        'this_month': snapshot.count('tasks.Task', window='month'),
+    }
+    anamnesis_stats = {
+        'total': snapshot.count('social.SocialAnamnesis'),
+        'completed': snapshot.count('social.SocialAnamnesis', 'locked', True),
+        'pending': snapshot.count('social.SocialAnamnesis', 'locked', False),
+    }
+    evolution_stats = {
+        'total': snapshot.count('evolution.EvolutionRecord'),
+        'this_month': snapshot.count('evolution.EvolutionRecord', window='month'),
+    }
+    
+    # Listas curtas (aniversariantes e atividades recentes) em cache por 5 minutos
+    cache_key = 'dashboard_recent_items'
+    recent_items = cache.get(cache_key)
+    
+    if recent_items is None:
         # Aniversariantes do dia
         birthday_beneficiaries = Beneficiary.objects.filter(
             dob__month=today.month,
             dob__day=today.day,
             status='ATIVA'
         ).select_related()
-        
-        # Estatísticas adicionais
-        anamnesis_stats = SocialAnamnesis.objects.aggregate(
-            total=Count('id'),
-            completed=Count('id', filter=Q(locked=True)),
-            pending=Count('id', filter=Q(locked=False))
-        )
-        
-        evolution_stats = EvolutionRecord.objects.aggregate(
-            total=Count('id'),
-            this_month=Count('id', filter=Q(created_at__date__gte=last_month))
-        )
-        
+    
         # Atividades recentes
         recent_activities = []
         try:
@@ -119,7 +110,7 @@ def dashboard_home(request):
                 }
                 for b in Beneficiary.objects.order_by('-created_at')[:3]
             ])
-            
+        
             recent_activities.extend([
                 {
                     'type': 'anamnesis',
@@ -130,7 +121,7 @@ def dashboard_home(request):
                 }
                 for a in SocialAnamnesis.objects.select_related('beneficiary').order_by('-created_at')[:3]
             ])
-            
+        
             recent_activities.extend([
                 {
                     'type': 'evolution',
@@ -141,34 +132,36 @@ def dashboard_home(request):
                 }
                 for e in EvolutionRecord.objects.select_related('beneficiary').order_by('-created_at')[:2]
             ])
-            
+        
             # Ordenar por timestamp
             recent_activities.sort(key=lambda x: x['timestamp'], reverse=True)
             recent_activities = recent_activities[:8]  # Limitar a 8 atividades
-            
+        
         except Exception as e:
             print(f"Erro ao buscar atividades recentes: {e}")
             recent_activities = []
-        
-        stats = {
-            'beneficiary_stats': beneficiary_stats,
-            'workshop_stats': workshop_stats,
-            'project_stats': project_stats,
-            'task_stats': task_stats,
-            'anamnesis_stats': anamnesis_stats,
-            'evolution_stats': evolution_stats,
+    
+        recent_items = {
             'birthday_beneficiaries': list(birthday_beneficiaries),
-            'user_count': User.objects.filter(is_active=True).count(),
             'recent_activities': recent_activities,
-            'updated_at': now.isoformat()
         }
-        
-        # Cache por 5 minutos (dados dinâmicos)
-        cache.set(cache_key, stats, 300)
+        cache.set(cache_key, recent_items, 300)
+    
+    stats = {
+        'beneficiary_stats': beneficiary_stats,
+        'workshop_stats': workshop_stats,
+        'project_stats': project_stats,
+        'task_stats': task_stats,
+        'anamnesis_stats': anamnesis_stats,
+        'evolution_stats': evolution_stats,
+        'user_count': snapshot.count('users.CustomUser', 'is_active', True),
+        'updated_at': now.isoformat(),
+        **recent_items,
+    }
     
     context = {
         'stats': stats,
-        'cache_status': 'hit' if stats else 'miss',
+        'cache_status': 'rollup',
         'user_permissions': get_user_permissions(request.user),
     }
     
@@ -396,151 +389,135 @@ def beneficiary_edit(request, pk):
 @login_required
 @user_passes_test(is_technician)
 def beneficiaries_export(request):
-    """Export beneficiaries list to CSV"""
-    
-    # Get all beneficiaries with optimized query
-    beneficiaries = Beneficiary.objects.select_related().order_by('full_name')
-    
-    # Create HTTP response with CSV content type
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="beneficiarias_movemarias_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    # Create CSV writer
-    writer = csv.writer(response)
-    
-    # Write CSV header
-    writer.writerow([
-        'Nome Completo',
-        'Data de Nascimento', 
-        'NIS',
-        'Telefone 1',
-        'Telefone 2',
-        'Bairro',
-        'Endereço',
-        'Referência',
-        'Data de Cadastro'
-    ])
-    
-    # Write beneficiary data
-    for beneficiary in beneficiaries:
-        writer.writerow([
-            beneficiary.full_name,
-            beneficiary.dob.strftime('%d/%m/%Y') if beneficiary.dob else '',
-            beneficiary.nis or '',
-            beneficiary.phone_1 or '',
-            beneficiary.phone_2 or '',
-            beneficiary.neighbourhood or '',
-            beneficiary.address or '',
-            beneficiary.reference or '',
-            beneficiary.created_at.strftime('%d/%m/%Y %H:%M') if beneficiary.created_at else ''
-        ])
-    
-    return response
+    """Export beneficiaries list to CSV (streamed straight from the database)"""
+    return ExportManager.stream_csv(
+        DataFormatter.iter_rows(
+            Beneficiary.objects.order_by('full_name'), DataFormatter.BENEFICIARY_COLUMNS
+        ),
+        f'beneficiarias_movemarias_{timezone.now().strftime("%Y%m%d_%H%M%S")}',
+        DataFormatter.column_headers(DataFormatter.BENEFICIARY_COLUMNS),
+    )
+
+
+# Modelos lidos pela página de relatórios
+REPORT_MODELS = [
+    'members.Beneficiary', 'projects.Project', 'projects.ProjectEnrollment', 'workshops.Workshop',
+    'tasks.Task', 'certificates.Certificate', 'social.SocialAnamnesis', 'evolution.EvolutionRecord',
+]
 
 
 @login_required
 @user_passes_test(is_technician)
 def reports(request):
-    """Página de relatórios gerais do sistema"""
-    from django.db.models import Count, Avg
-    from datetime import datetime, timedelta
+    """Página de relatórios gerais do sistema (lida das estatísticas incrementais)"""
+    import json
     
-    # Definir período para relatórios
     now = timezone.now()
-    today = now.date()
-    last_30_days = today - timedelta(days=30)
-    last_90_days = today - timedelta(days=90)
+    snapshot = StatsSnapshot(REPORT_MODELS, month_windows())
+    
+    def growth(model_label, dimension='*', value=''):
+        current = snapshot.count(model_label, dimension, value, window='current_month')
+        previous = snapshot.count(model_label, dimension, value, window='previous_month')
+        return round((current - previous) / max(previous, 1) * 100, 1)
+    
+    # Projetos com mais matrículas: contadores por projeto + uma consulta pelos nomes
+    enrollments_by_project = list(snapshot.breakdown('projects.ProjectEnrollment', 'project_id').items())[:10]
+    projects = Project.objects.in_bulk([int(project_id) for project_id, _ in enrollments_by_project if project_id])
+    top_projects = []
+    for project_id, count in enrollments_by_project:
+        project = projects.get(int(project_id)) if project_id else None
+        if project is not None:
+            project.participants_count = count
+            project.enrollment_count = count
+            top_projects.append(project)
+    
+    anamnesis_total = snapshot.count('social.SocialAnamnesis')
+    anamnesis_completed = snapshot.count('social.SocialAnamnesis', 'locked', True)
+    issued_certificates = (
+        snapshot.count('certificates.Certificate', 'status', 'generated') +
+        snapshot.count('certificates.Certificate', 'status', 'delivered')
+    )
     
-    # Estatísticas gerais
     stats = {
+        # Cartões de métricas
+        'total_beneficiaries': snapshot.count('members.Beneficiary'),
+        'beneficiaries_growth': growth('members.Beneficiary'),
+        'active_projects': snapshot.count('projects.Project', 'status', 'ATIVO'),
+        'projects_growth': growth('projects.Project'),
+        'completed_tasks': snapshot.count('tasks.Task', 'status', 'completed'),
+        'tasks_growth': growth('tasks.Task', 'status', 'completed'),
+        'issued_certificates': issued_certificates,
+        'certificates_growth': growth('certificates.Certificate'),
+        # Detalhamento por módulo
         'beneficiaries': {
-            'total': Beneficiary.objects.count(),
-            'new_last_30_days': Beneficiary.objects.filter(created_at__date__gte=last_30_days).count(),
-            'by_neighborhood': Beneficiary.objects.values('neighbourhood').annotate(
-                count=Count('id')
-            ).order_by('-count')[:10]
+            'total': snapshot.count('members.Beneficiary'),
+            'new_last_30_days': snapshot.count('members.Beneficiary', window='month'),
+            'by_neighborhood': [
+                {'neighbourhood': neighbourhood, 'count': count}
+                for neighbourhood, count in list(snapshot.breakdown('members.Beneficiary', 'neighbourhood').items())[:10]
+            ],
         },
         'projects': {
-            'total': Project.objects.count(),
-            'active_enrollments': ProjectEnrollment.objects.filter(status='ATIVO').count(),
-            'by_project': Project.objects.annotate(
-                enrollment_count=Count('enrollments')
-            ).order_by('-enrollment_count')[:10]
+            'total': snapshot.count('projects.Project'),
+            'active_enrollments': snapshot.count('projects.ProjectEnrollment', 'status', 'ATIVO'),
+            'by_project': top_projects,
         },
         'workshops': {
-            'total': Workshop.objects.count(),
-            'active': Workshop.objects.filter(status='ativo').count(),
-            'completed': Workshop.objects.filter(status='concluido').count(),
-            'recent': Workshop.objects.filter(created_at__date__gte=last_30_days).count()
+            'total': snapshot.count('workshops.Workshop'),
+            'active': snapshot.count('workshops.Workshop', 'status', 'ativo'),
+            'completed': snapshot.count('workshops.Workshop', 'status', 'concluido'),
+            'recent': snapshot.count('workshops.Workshop', window='month'),
         },
         'evolution': {
-            'total_records': EvolutionRecord.objects.count(),
-            'last_30_days': EvolutionRecord.objects.filter(created_at__date__gte=last_30_days).count(),
-            'avg_monthly': EvolutionRecord.objects.filter(
-                created_at__date__gte=last_90_days
-            ).count() / 3 if EvolutionRecord.objects.filter(created_at__date__gte=last_90_days).count() > 0 else 0
+            'total_records': snapshot.count('evolution.EvolutionRecord'),
+            'last_30_days': snapshot.count('evolution.EvolutionRecord', window='month'),
+            'avg_monthly': snapshot.count('evolution.EvolutionRecord', window='quarter') / 3,
         },
         'anamnesis': {
-            'total': SocialAnamnesis.objects.count(),
-            'completed': SocialAnamnesis.objects.filter(locked=True).count(),
-            'pending': SocialAnamnesis.objects.filter(locked=False).count(),
-            'completion_rate': 0
-        }
+            'total': anamnesis_total,
+            'completed': anamnesis_completed,
+            'pending': snapshot.count('social.SocialAnamnesis', 'locked', False),
+            'completion_rate': anamnesis_completed / anamnesis_total * 100 if anamnesis_total else 0,
+        },
     }
     
-    # Calcular taxa de conclusão de anamneses
-    if stats['anamnesis']['total'] > 0:
-        stats['anamnesis']['completion_rate'] = (
-            stats['anamnesis']['completed'] / stats['anamnesis']['total'] * 100
-        )
+    # Dados para gráficos (uma consulta por série)
+    beneficiaries_by_month = monthly_series('members.Beneficiary')
+    enrollments_by_month = monthly_series('projects.ProjectEnrollment')
+    project_status = dict(Project.STATUS_CHOICES)
+    projects_by_status = snapshot.breakdown('projects.Project', 'status')
     
-    # Dados para gráficos
     chart_data = {
-        'beneficiaries_by_month': [],
+        'beneficiaries_by_month': [
+            {'month': month.strftime('%b/%y'), 'count': count} for month, count in beneficiaries_by_month
+        ],
         'workshops_by_status': {
             'labels': ['Ativo', 'Concluído', 'Cancelado'],
             'data': [
-                Workshop.objects.filter(status='ativo').count(),
-                Workshop.objects.filter(status='concluido').count(),
-                Workshop.objects.filter(status='cancelado').count()
+                stats['workshops']['active'],
+                stats['workshops']['completed'],
+                snapshot.count('workshops.Workshop', 'status', 'cancelado'),
             ]
         },
-        'enrollments_by_month': []
+        'enrollments_by_month': [
+            {'month': month.strftime('%b/%y'), 'count': count} for month, count in enrollments_by_month
+        ],
     }
     
-    # Dados de beneficiárias por mês (últimos 6 meses)
-    for i in range(6):
-        month_start = (today.replace(day=1) - timedelta(days=i*30)).replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        count = Beneficiary.objects.filter(
-            created_at__date__gte=month_start,
-            created_at__date__lte=month_end
-        ).count()
-        
-        chart_data['beneficiaries_by_month'].insert(0, {
-            'month': month_start.strftime('%b/%y'),
-            'count': count
-        })
-    
-    # Dados de matrículas por mês (últimos 6 meses)
-    for i in range(6):
-        month_start = (today.replace(day=1) - timedelta(days=i*30)).replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        count = ProjectEnrollment.objects.filter(
-            created_at__gte=month_start,
-            created_at__lte=month_end
-        ).count()
-        
-        chart_data['enrollments_by_month'].insert(0, {
-            'month': month_start.strftime('%b/%y'),
-            'count': count
-        })
+    recent_activities = [
+        {'description': activity.description, 'created_at': activity.timestamp}
+        for activity in UserActivity.objects.order_by('-timestamp')[:5]
+    ]
     
     context = {
         'stats': stats,
         'chart_data': chart_data,
+        'top_projects': top_projects,
+        'recent_activities': recent_activities,
+        'beneficiaries_chart_labels': json.dumps([item['month'] for item in chart_data['beneficiaries_by_month']]),
+        'beneficiaries_chart_data': json.dumps([item['count'] for item in chart_data['beneficiaries_by_month']]),
+        'projects_chart_labels': json.dumps([str(project_status.get(status, status)) for status in projects_by_status]),
+        'projects_chart_data': json.dumps(list(projects_by_status.values())),
         'last_updated': now,
         'title': 'Relatórios Gerais'
     }
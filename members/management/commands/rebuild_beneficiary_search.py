@@ -0,0 +1,19 @@
+"""
+Comando de reconstrução do índice de busca de beneficiárias (members.search).
+
+Recria os BeneficiarySearchToken a partir das beneficiárias; necessário após
+importações em lote que não disparam sinais (bulk_create, update()):
+
+    python manage.py rebuild_beneficiary_search
+"""
+from django.core.management.base import BaseCommand
+
+from members.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Reconstruir o índice de busca de beneficiárias'
+
+    def handle(self, *args, **options):
+        total = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'{total} beneficiárias indexadas'))
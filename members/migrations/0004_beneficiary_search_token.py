@@ -0,0 +1,46 @@
+# Generated by Django 4.2.13 on 2026-10-17 01:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_search_tokens(apps, schema_editor):
+    from members.search import beneficiary_tokens
+
+    Beneficiary = apps.get_model('members', 'Beneficiary')
+    BeneficiarySearchToken = apps.get_model('members', 'BeneficiarySearchToken')
+    tokens = []
+    for beneficiary in Beneficiary.objects.iterator(chunk_size=500):
+        tokens.extend(
+            BeneficiarySearchToken(beneficiary_id=beneficiary.pk, kind=kind, token=token)
+            for kind, token in beneficiary_tokens(beneficiary)
+        )
+        if len(tokens) >= 5000:
+            BeneficiarySearchToken.objects.bulk_create(tokens)
+            tokens = []
+    BeneficiarySearchToken.objects.bulk_create(tokens)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0003_alter_beneficiary_managers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BeneficiarySearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('word', 'Palavra'), ('digits', 'Dígitos'), ('trigram', 'Trigrama')], max_length=8, verbose_name='Tipo')),
+                ('token', models.CharField(max_length=40, verbose_name='Termo')),
+                ('beneficiary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='members.beneficiary', verbose_name='Beneficiária')),
+            ],
+            options={
+                'verbose_name': 'Termo de Busca',
+                'verbose_name_plural': 'Termos de Busca',
+                'indexes': [models.Index(fields=['kind', 'token'], name='members_search_token_idx')],
+            },
+        ),
+        migrations.RunPython(populate_search_tokens, migrations.RunPython.noop),
+    ]
@@ -67,6 +67,34 @@ class Beneficiary(models.Model):
         self.save(update_fields=['status'])
 
 
+class BeneficiarySearchToken(models.Model):
+    """Termo normalizado do índice de busca de beneficiárias (members.search)"""
+    KIND_CHOICES = [
+        ('word', 'Palavra'),
+        ('digits', 'Dígitos'),
+        ('trigram', 'Trigrama'),
+    ]
+
+    beneficiary = models.ForeignKey(
+        Beneficiary,
+        on_delete=models.CASCADE,
+        related_name='search_tokens',
+        verbose_name='Beneficiária'
+    )
+    kind = models.CharField('Tipo', max_length=8, choices=KIND_CHOICES)
+    token = models.CharField('Termo', max_length=40)
+
+    class Meta:
+        verbose_name = 'Termo de Busca'
+        verbose_name_plural = 'Termos de Busca'
+        indexes = [
+            models.Index(fields=['kind', 'token'], name='members_search_token_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.token}"
+
+
 class Consent(models.Model):
     beneficiary = models.ForeignKey(Beneficiary, on_delete=models.CASCADE, related_name='consents')
     lgpd_agreement = models.BooleanField('Concordo com LGPD', default=False)
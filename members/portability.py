@@ -0,0 +1,191 @@
+"""
+Portabilidade de dados das beneficiárias (LGPD).
+
+Gera um ZIP com todos os dados ligados a cada beneficiária, montado em
+streaming: o ZipFile escreve num destino não pesquisável (_ZipStream) e os
+bytes comprimidos são entregues à resposta a cada registro ou bloco de
+arquivo, sem arquivo temporário e com memória constante. Por arquivo:
+
+- ``beneficiaria_<id>/beneficiaria.json`` e um JSON por conjunto de
+  ``DATASETS`` (serialização do Django: todos os campos, inclusive M2M)
+- ``beneficiaria_<id>/arquivos/<conjunto>/<pk>_<nome>``: arquivos dos
+  FileFields, lidos do storage em blocos de FILE_CHUNK_SIZE
+- ``manifesto.json``: entradas do ZIP e arquivos ausentes no storage
+
+Como o ZIP é comprimido durante o envio, o tamanho final não é conhecido:
+a resposta não tem Content-Length nem aceita Range.
+"""
+import json
+import logging
+import os
+import zipfile
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+FILE_CHUNK_SIZE = 64 * 1024
+RECORD_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+# Limite de beneficiárias por exportação em lote
+MAX_BULK_EXPORT = getattr(settings, 'BENEFICIARY_MAX_BULK_EXPORT', 200)
+
+# (nome do arquivo, modelo, caminho até a beneficiária)
+DATASETS = (
+    ('consentimentos', 'members.Consent', 'beneficiary'),
+    ('anamneses_sociais', 'social.SocialAnamnesis', 'beneficiary'),
+    ('anamneses_familiares', 'social.FamilyMember', 'anamnesis__beneficiary'),
+    ('anamneses_vulnerabilidades', 'social.IdentifiedVulnerability', 'anamnesis__beneficiary'),
+    ('anamneses_evolucoes', 'social.SocialAnamnesisEvolution', 'anamnesis__beneficiary'),
+    ('evolucoes', 'evolution.EvolutionRecord', 'beneficiary'),
+    ('atividades', 'activities.BeneficiaryActivity', 'beneficiary'),
+    ('atividades_sessoes', 'activities.ActivitySession', 'activity__beneficiary'),
+    ('atividades_presencas', 'activities.ActivityAttendance', 'session__activity__beneficiary'),
+    ('atividades_feedbacks', 'activities.ActivityFeedback', 'activity__beneficiary'),
+    ('atividades_notas', 'activities.ActivityNote', 'activity__beneficiary'),
+    ('oficinas_inscricoes', 'workshops.WorkshopEnrollment', 'beneficiary'),
+    ('oficinas_presencas', 'workshops.SessionAttendance', 'enrollment__beneficiary'),
+    ('oficinas_avaliacoes', 'workshops.WorkshopEvaluation', 'enrollment__beneficiary'),
+    ('projetos_inscricoes', 'projects.ProjectEnrollment', 'beneficiary'),
+    ('planos_de_acao', 'coaching.ActionPlan', 'beneficiary'),
+    ('roda_da_vida', 'coaching.WheelOfLife', 'beneficiary'),
+    ('certificados', 'certificates.Certificate', 'member'),
+    ('certificados_solicitacoes', 'certificates.CertificateRequest', 'member'),
+)
+
+
+class _ZipStream:
+    """
+    Destino do ZipFile sem seek: guarda os bytes escritos até serem
+    retirados com ``drain()``. O ZipFile grava descritores de dados após
+    cada entrada em vez de voltar para corrigir o cabeçalho local.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _entry_info(name):
+    info = zipfile.ZipInfo(name, date_time=timezone.localtime().timetuple()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def _serialize(instance):
+    return json.dumps(
+        serializers.serialize('python', [instance])[0], cls=DjangoJSONEncoder, ensure_ascii=False
+    )
+
+
+def _file_fields(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+
+
+def _write_records(archive, name, queryset, files):
+    """
+    Entrada JSON com um registro por vez; os arquivos dos FileFields são
+    anotados em ``files`` para serem gravados depois (o ZipFile não permite
+    duas entradas abertas). Gerador: produz após cada registro.
+    """
+    file_fields = _file_fields(queryset.model)
+    m2m = [field.name for field in queryset.model._meta.many_to_many]
+    with archive.open(_entry_info(name), 'w') as entry:
+        entry.write(b'[')
+        separator = b'\n'
+        for instance in queryset.prefetch_related(*m2m).iterator(chunk_size=RECORD_CHUNK_SIZE):
+            entry.write(separator + _serialize(instance).encode('utf-8'))
+            separator = b',\n'
+            for field in file_fields:
+                field_file = getattr(instance, field.attname)
+                if field_file:
+                    files.append((instance.pk, field_file.storage, field_file.name))
+            yield
+        entry.write(b'\n]\n')
+    yield
+
+
+def _write_file(archive, name, storage, path):
+    """Copiar um arquivo do storage para o ZIP em blocos; gerador"""
+    with storage.open(path, 'rb') as source:
+        with archive.open(_entry_info(name), 'w', force_zip64=True) as entry:
+            while True:
+                chunk = source.read(FILE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                entry.write(chunk)
+                yield
+
+
+def _write_beneficiary(archive, beneficiary, manifest):
+    from .models import Beneficiary
+
+    folder = f'beneficiaria_{beneficiary.pk}'
+    entries = manifest['entries']
+
+    name = f'{folder}/beneficiaria.json'
+    yield from _write_records(archive, name, Beneficiary.objects.filter(pk=beneficiary.pk), [])
+    entries.append(name)
+
+    for dataset, label, path in DATASETS:
+        model = apps.get_model(label)
+        files = []
+        name = f'{folder}/{dataset}.json'
+        queryset = model._default_manager.filter(**{path: beneficiary.pk}).order_by('pk')
+        yield from _write_records(archive, name, queryset, files)
+        entries.append(name)
+
+        for pk, storage, path_in_storage in files:
+            name = f'{folder}/arquivos/{dataset}/{pk}_{os.path.basename(path_in_storage)}'
+            try:
+                yield from _write_file(archive, name, storage, path_in_storage)
+            except OSError as e:
+                logger.warning(f"Arquivo ausente na exportação da beneficiária {beneficiary.pk}: {path_in_storage} ({e})")
+                manifest['missing_files'].append(path_in_storage)
+                continue
+            entries.append(name)
+
+
+def stream_archive(beneficiaries):
+    """
+    Gerador com os bytes do ZIP de dados das beneficiárias (instâncias ou
+    queryset, percorrido uma vez).
+    """
+    stream = _ZipStream()
+    manifest = {
+        'generated_at': timezone.now().isoformat(),
+        'beneficiaries': [],
+        'entries': [],
+        'missing_files': [],
+    }
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for beneficiary in beneficiaries:
+            manifest['beneficiaries'].append(beneficiary.pk)
+            for _ in _write_beneficiary(archive, beneficiary, manifest):
+                data = stream.drain()
+                if data:
+                    yield data
+        archive.writestr(_entry_info('manifesto.json'), json.dumps(manifest, indent=2, ensure_ascii=False))
+    # Diretório central, gravado no close()
+    yield stream.drain()
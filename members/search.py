@@ -0,0 +1,250 @@
+"""
+Índice de busca de beneficiárias.
+
+BeneficiarySearchToken guarda, por beneficiária, os termos normalizados
+(minúsculos e sem acentos) usados na busca da lista e no autocomplete:
+
+- ``word``: palavras do nome e do bairro, buscadas por prefixo
+- ``digits``: telefone, CPF e NIS só com dígitos (telefones também sem o
+  DDD), buscados por prefixo
+- ``trigram``: trigramas das palavras, para encontrar nomes com grafia
+  aproximada quando o prefixo não encontra ("Conceisao", "Sousa"/"Souza")
+
+Prefixos são consultas por intervalo na coluna indexada ``(kind, token)``,
+portanto usam o índice em qualquer banco. O índice é atualizado no
+post_save da beneficiária; ``rebuild_beneficiary_search`` recria tudo
+(importações com bulk_create/update()).
+"""
+import math
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save
+
+from core.background_jobs import register_job
+
+# Campos que alimentam o índice
+INDEXED_FIELDS = {'full_name', 'neighbourhood', 'phone_1', 'phone_2', 'cpf', 'nis'}
+
+MIN_DIGITS = 3
+MAX_TOKEN_LENGTH = 40
+MAX_QUERY_TERMS = 6
+# Fração mínima dos trigramas da busca presentes no nome
+TRIGRAM_THRESHOLD = 0.5
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 20
+
+# Contagens exibidas na lista: atributo -> relação reversa da beneficiária
+ACTIVITY_COUNTS = {
+    'workshop_count': 'workshop_enrollments',
+    'project_count': 'project_enrollments',
+    'evolution_count': 'evolution_records',
+}
+
+WORD = re.compile(r'[^\W\d_]+')
+PREFIX_END = '\uffff'
+
+
+def normalize(text):
+    """Minúsculas sem acentos"""
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def words(text):
+    return [word[:MAX_TOKEN_LENGTH] for word in WORD.findall(normalize(text))]
+
+
+def digits(text):
+    return re.sub(r'\D', '', text or '')
+
+
+def trigrams(word):
+    """Trigramas da palavra com bordas (como o pg_trgm): 'ana' -> '  a', ' an', 'ana', 'na '"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def beneficiary_tokens(beneficiary):
+    """{(tipo, termo)} de uma beneficiária"""
+    tokens = set()
+    for word in words(beneficiary.full_name) + words(beneficiary.neighbourhood):
+        tokens.add(('word', word))
+    for word in words(beneficiary.full_name):
+        tokens.update(('trigram', trigram) for trigram in trigrams(word))
+
+    for value, is_phone in ((beneficiary.phone_1, True), (beneficiary.phone_2, True),
+                            (beneficiary.cpf, False), (beneficiary.nis, False)):
+        number = digits(value)
+        if len(number) < MIN_DIGITS:
+            continue
+        tokens.add(('digits', number[:MAX_TOKEN_LENGTH]))
+        if is_phone and len(number) >= 10:
+            # Sem o DDD (e o 0 de longa distância)
+            tokens.add(('digits', number.lstrip('0')[2:]))
+    return tokens
+
+
+def index_beneficiaries(beneficiaries):
+    """(Re)indexar beneficiárias; retorna quantos termos foram gravados"""
+    from .models import BeneficiarySearchToken
+
+    beneficiaries = list(beneficiaries)
+    tokens = [
+        BeneficiarySearchToken(beneficiary_id=beneficiary.pk, kind=kind, token=token)
+        for beneficiary in beneficiaries
+        for kind, token in beneficiary_tokens(beneficiary)
+    ]
+    with transaction.atomic():
+        BeneficiarySearchToken.objects.filter(beneficiary__in=[b.pk for b in beneficiaries]).delete()
+        BeneficiarySearchToken.objects.bulk_create(tokens, batch_size=1000)
+    return len(tokens)
+
+
+def rebuild_index(batch_size=500):
+    """Recriar o índice de todas as beneficiárias; retorna quantas foram indexadas"""
+    from .models import Beneficiary
+
+    total = 0
+    batch = []
+    for beneficiary in Beneficiary.objects.only(*INDEXED_FIELDS).iterator(chunk_size=batch_size):
+        batch.append(beneficiary)
+        if len(batch) >= batch_size:
+            index_beneficiaries(batch)
+            total += len(batch)
+            batch = []
+    index_beneficiaries(batch)
+    return total + len(batch)
+
+
+@register_job
+def rebuild_beneficiary_search():
+    """Job de reconstrução do índice de busca de beneficiárias"""
+    return rebuild_index()
+
+
+def _beneficiary_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not INDEXED_FIELDS & set(update_fields)):
+        return
+    index_beneficiaries([instance])
+
+
+def connect_signals():
+    """Conectar a indexação (MembersConfig.ready)"""
+    from .models import Beneficiary
+
+    post_save.connect(_beneficiary_saved, sender=Beneficiary, dispatch_uid='beneficiary_search_index')
+
+
+def _query_terms(query):
+    """(palavras, números) da busca"""
+    terms = words(query)[:MAX_QUERY_TERMS]
+    numbers = [number for number in re.findall(r'\d+', re.sub(r'[\s().\-/]', '', query or ''))
+               if len(number) >= MIN_DIGITS][:MAX_QUERY_TERMS]
+    return terms, numbers
+
+
+def _prefix_ids(kind, prefix):
+    from .models import BeneficiarySearchToken
+
+    return BeneficiarySearchToken.objects.filter(
+        kind=kind, token__gte=prefix, token__lt=prefix + PREFIX_END
+    ).values('beneficiary_id')
+
+
+def prefix_filter(query):
+    """Q das beneficiárias cujas palavras/números começam com todos os termos; None sem termos"""
+    terms, numbers = _query_terms(query)
+    if not terms and not numbers:
+        return None
+    condition = Q()
+    for term in terms:
+        condition &= Q(pk__in=_prefix_ids('word', term))
+    for number in numbers:
+        condition &= Q(pk__in=_prefix_ids('digits', number))
+    return condition
+
+
+def similar_ids(query, limit, exclude=()):
+    """Ids por semelhança de trigramas no nome, do mais semelhante ao menos"""
+    from .models import BeneficiarySearchToken
+
+    terms, _ = _query_terms(query)
+    wanted = set()
+    for term in terms:
+        if len(term) >= 3:
+            wanted |= trigrams(term)
+    if not wanted:
+        return []
+    minimum = max(2, math.ceil(len(wanted) * TRIGRAM_THRESHOLD))
+    rows = BeneficiarySearchToken.objects.filter(
+        kind='trigram', token__in=wanted
+    ).exclude(beneficiary_id__in=list(exclude)).values('beneficiary_id').annotate(
+        hits=Count('id')
+    ).filter(hits__gte=minimum).order_by('-hits', 'beneficiary_id')[:limit]
+    return [row['beneficiary_id'] for row in rows]
+
+
+def search_queryset(queryset, query):
+    """
+    ``queryset`` filtrado pela busca: prefixos de palavras e números; sem
+    resultados por prefixo, nomes semelhantes por trigramas.
+    """
+    condition = prefix_filter(query)
+    if condition is None:
+        return queryset
+    matches = queryset.filter(condition)
+    if matches.exists():
+        return matches
+    return queryset.filter(pk__in=similar_ids(query, limit=MAX_AUTOCOMPLETE_LIMIT * 5))
+
+
+def autocomplete(query, limit=AUTOCOMPLETE_LIMIT):
+    """Sugestões para a busca: prefixos em ordem alfabética, completadas por semelhança"""
+    from .models import Beneficiary
+
+    limit = max(1, min(int(limit), MAX_AUTOCOMPLETE_LIMIT))
+    condition = prefix_filter(query)
+    if condition is None:
+        return []
+    fields = ('id', 'full_name', 'neighbourhood', 'phone_1', 'status')
+    results = list(Beneficiary.objects.filter(condition).order_by('full_name', 'pk').only(*fields)[:limit])
+    if len(results) < limit:
+        similar = similar_ids(query, limit - len(results), exclude=[b.pk for b in results])
+        if similar:
+            found = Beneficiary.objects.only(*fields).in_bulk(similar)
+            results += [found[pk] for pk in similar if pk in found]
+    return results
+
+
+def attach_activity_counts(beneficiaries):
+    """
+    Contagens de ACTIVITY_COUNTS como atributos das beneficiárias da página,
+    em uma consulta com subconsultas correlacionadas pelas ids da página (em
+    vez de agregar JOINs sobre todo o conjunto filtrado).
+    """
+    from .models import Beneficiary
+
+    beneficiaries = list(beneficiaries)
+    if not beneficiaries:
+        return beneficiaries
+    annotations = {}
+    for name, relation in ACTIVITY_COUNTS.items():
+        related = Beneficiary._meta.get_field(relation)
+        field = related.field.name
+        counts = related.related_model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+        annotations[name] = Coalesce(Subquery(counts), Value(0))
+    rows = Beneficiary.objects.filter(pk__in=[b.pk for b in beneficiaries]).annotate(
+        **annotations
+    ).values('pk', *annotations)
+    by_pk = {row['pk']: row for row in rows}
+    for beneficiary in beneficiaries:
+        row = by_pk.get(beneficiary.pk, {})
+        for name in annotations:
+            setattr(beneficiary, name, row.get(name, 0))
+    return beneficiaries
@@ -135,3 +135,246 @@ class BeneficiaryFormValidationTests(TestCase):
                     self.assertNotIn('<iframe>', cleaned_name.lower())
                     self.assertNotIn('javascript:', cleaned_name.lower())
                     self.assertNotIn('onerror=', cleaned_name.lower())
+
+
+class BeneficiaryExportTests(TestCase):
+    """Exportação em streaming da lista de beneficiárias"""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+
+        self.user = get_user_model().objects.create_user(
+            username='exporter', email='exporter@test.com', password='testpass123', is_superuser=True
+        )
+        self.client.force_login(self.user)
+        for index in range(3):
+            Beneficiary.objects.create(
+                full_name=f'Beneficiária {index}',
+                dob='1990-01-01',
+                phone_1='11987654321',
+                address='Rua A',
+                neighbourhood='Centro',
+            )
+
+    def test_csv_export_is_streamed(self):
+        from django.urls import reverse
+
+        response = self.client.get(reverse('members:export'), {'format': 'csv'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith('Nome Completo'))
+        self.assertIn('01/01/1990', lines[1])
+        self.assertIn('Ativa', lines[1])
+
+    def test_export_requires_technician(self):
+        from django.contrib.auth import get_user_model
+        from django.urls import reverse
+
+        user = get_user_model().objects.create_user(
+            username='voluntaria', email='voluntaria@test.com', password='testpass123'
+        )
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('members:export'), {'format': 'csv'})
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_excel_export_uses_write_only_workbook(self):
+        import io
+        import openpyxl
+        from django.urls import reverse
+
+        response = self.client.get(reverse('members:export'), {'format': 'excel'})
+
+        self.assertEqual(response.status_code, 200)
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0][0], 'Nome Completo')
+        self.assertGreater(workbook.active.column_dimensions['A'].width, len('Nome Completo'))
+
+
+class BeneficiaryTimelineTests(TestCase):
+    """Timeline unificado paginado por cursor"""
+
+    def setUp(self):
+        from datetime import date
+        from django.contrib.auth import get_user_model
+        from coaching.models import ActionPlan
+        from evolution.models import EvolutionRecord
+
+        self.user = get_user_model().objects.create_user(
+            username='timeline', email='timeline@test.com', password='testpass123'
+        )
+        self.client.force_login(self.user)
+        self.beneficiary = Beneficiary.objects.create(
+            full_name='Maria Timeline', dob='1990-01-01', phone_1='11987654321',
+            address='Rua A', neighbourhood='Centro',
+        )
+        # Várias evoluções no mesmo dia para exercitar o desempate (tipo, id)
+        for day in (1, 1, 1, 2, 3):
+            EvolutionRecord.objects.create(
+                beneficiary=self.beneficiary, date=date(2024, 5, day),
+                description='x' * 150, author=self.user,
+            )
+        for goal in ('Concluir o ensino médio', 'Abrir um negócio'):
+            ActionPlan.objects.create(
+                beneficiary=self.beneficiary, main_goal=goal, priority_areas='Educação',
+                actions='Estudar', institute_support='Apoio',
+            )
+
+    def test_first_page_is_a_single_query(self):
+        from members.timeline import timeline_page
+
+        with self.assertNumQueries(1):
+            page = timeline_page(self.beneficiary, limit=3)
+
+        self.assertEqual(len(page['results']), 3)
+        self.assertEqual(page['results'][0]['type'], 'coaching')
+        self.assertIsNotNone(page['next_cursor'])
+
+    def test_cursor_pagination_walks_full_history_in_order(self):
+        from django.urls import reverse
+
+        url = reverse('members:timeline', args=[self.beneficiary.pk])
+        items, cursor = [], None
+        while True:
+            params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get(url, params).json()
+            items.extend(data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(len(items), 7)
+        self.assertEqual(len({item['id'] for item in items}), 7)
+        keys = [item['datetime'] for item in items]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        evolution = [item for item in items if item['type'] == 'evolution'][0]
+        self.assertEqual(len(evolution['description']), 103)
+
+    def test_invalid_cursor_returns_400(self):
+        from django.urls import reverse
+
+        response = self.client.get(
+            reverse('members:timeline', args=[self.beneficiary.pk]), {'cursor': 'invalido'}
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+class BeneficiarySearchTests(TestCase):
+    """Índice normalizado de busca e autocomplete"""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+
+        self.user = get_user_model().objects.create_user(
+            username='busca', email='busca@test.com', password='testpass123'
+        )
+        self.client.force_login(self.user)
+        people = (
+            ('Maria da Conceição', '(11) 98765-4321', 'São João'),
+            ('Ana Souza', '21 3333-4444', 'Centro'),
+            ('Mariana Lima', '11912345678', 'Vila Nova'),
+        )
+        self.beneficiaries = [
+            Beneficiary.objects.create(
+                full_name=name, dob='1990-01-01', phone_1=phone, address='Rua A', neighbourhood=neighbourhood,
+            )
+            for name, phone, neighbourhood in people
+        ]
+
+    def search(self, query):
+        from members.search import search_queryset
+
+        return sorted(search_queryset(Beneficiary.objects.all(), query).values_list('full_name', flat=True))
+
+    def test_prefix_ignores_case_and_accents(self):
+        self.assertEqual(self.search('CONCEICAO'), ['Maria da Conceição'])
+        self.assertEqual(self.search('mari'), ['Maria da Conceição', 'Mariana Lima'])
+        self.assertEqual(self.search('mari conc'), ['Maria da Conceição'])
+        self.assertEqual(self.search('sao jo'), ['Maria da Conceição'])
+
+    def test_phone_matches_digits_with_or_without_area_code(self):
+        self.assertEqual(self.search('98765-4321'), ['Maria da Conceição'])
+        self.assertEqual(self.search('(21) 3333'), ['Ana Souza'])
+
+    def test_misspelled_name_falls_back_to_trigrams(self):
+        self.assertEqual(self.search('Sousa'), ['Ana Souza'])
+        self.assertEqual(self.search('Conseicao'), ['Maria da Conceição'])
+
+    def test_index_follows_updates(self):
+        ana = self.beneficiaries[1]
+        ana.full_name = 'Ana Pereira'
+        ana.save()
+
+        self.assertEqual(self.search('pereira'), ['Ana Pereira'])
+        self.assertEqual(self.search('souza'), [])
+
+    def test_autocomplete_returns_json(self):
+        from django.urls import reverse
+
+        response = self.client.get(reverse('members:autocomplete'), {'q': 'mar'})
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([r['full_name'] for r in results], ['Maria da Conceição', 'Mariana Lima'])
+        self.assertEqual(results[0]['url'], reverse('members:detail', args=[self.beneficiaries[0].pk]))
+
+    def test_activity_counts_only_for_page_rows(self):
+        from datetime import date
+        from evolution.models import EvolutionRecord
+        from members.search import attach_activity_counts
+
+        for day in (1, 2):
+            EvolutionRecord.objects.create(
+                beneficiary=self.beneficiaries[0], date=date(2024, 5, day), description='x', author=self.user,
+            )
+        page = list(Beneficiary.objects.order_by('full_name')[:2])
+
+        with self.assertNumQueries(1):
+            attach_activity_counts(page)
+
+        self.assertEqual([(b.evolution_count, b.workshop_count) for b in page], [(0, 0), (2, 0)])
+
+    def test_list_page_has_search_pager_and_counts(self):
+        import copy
+        from django.conf import settings
+        from django.core.cache import cache
+        from django.test import override_settings
+        from django.urls import reverse
+
+        # Papéis do usuário ficam no cache por pk, que outro teste pode reaproveitar
+        self.addCleanup(cache.clear)
+        # Layout base mínimo: só a lista, sem a navegação do site
+        templates = copy.deepcopy(settings.TEMPLATES)
+        templates[0]['APP_DIRS'] = False
+        templates[0]['OPTIONS']['loaders'] = [
+            ('django.template.loaders.locmem.Loader', {'layouts/base.html': '{% block content %}{% endblock %}'}),
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]
+        self.enterContext(override_settings(TEMPLATES=templates))
+
+        for index in range(22):
+            Beneficiary.objects.create(
+                full_name=f'Maria Teste {index:02d}', dob='1990-01-01', phone_1='11987654321',
+                address='Rua A', neighbourhood='Centro',
+            )
+
+        response = self.client.get(reverse('members:list'), {'search': 'maria', 'status': 'ATIVA'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['is_paginated'])
+        self.assertContains(response, '?page=2&search=maria&status=ATIVA')
+        self.assertContains(response, reverse('members:autocomplete'))
+        self.assertContains(response, 'value="ATIVA" selected')
+        self.assertContains(response, 'Evoluções')
+        self.assertEqual(response.context['beneficiaries'][0].evolution_count, 0)
+
+        response = self.client.get(reverse('members:list'), {'search': 'maria', 'status': 'ATIVA', 'page': 2})
+        self.assertEqual(len(response.context['beneficiaries']), 4)
@@ -0,0 +1,196 @@
+"""
+Timeline unificado da beneficiária.
+
+As fontes (evoluções, matrículas em projetos, planos de ação, rodas da vida,
+inscrições em oficinas e anamneses) são combinadas no banco com UNION ALL e
+paginadas por keyset (data, tipo, id): cada página é uma única consulta que
+devolve ``limit + 1`` linhas, independentemente do tamanho do histórico.
+
+Fontes com DateField entram na ordenação como meia-noite UTC, o mesmo valor
+que o CAST para timestamp produz no banco.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.apps import apps
+from django.db.models import CharField, DateTimeField, F, Q, Value
+from django.db.models.functions import Cast, Substr
+from django.urls import reverse
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+TEXT_PREVIEW = 100
+
+TIMELINE_COLUMNS = ('ts', 'kind', 'obj_id', 'ref_id', 'label', 'text')
+
+
+class InvalidCursor(ValueError):
+    """Cursor de paginação malformado"""
+
+
+class TimelineSource:
+    """Uma tabela que alimenta o timeline"""
+
+    def __init__(self, kind, model, date_field, title, icon, color, url_name,
+                 ref=None, label=None, text=None, description=None):
+        self.kind = kind
+        self.model = model
+        self.date_field = date_field
+        self.title = title
+        self.icon = icon
+        self.color = color
+        self.url_name = url_name
+        self.ref = ref
+        self.label = label
+        self.text = text
+        self.description = description
+
+    def get_model(self):
+        return apps.get_model(self.model)
+
+    @property
+    def is_date(self):
+        field = self.get_model()._meta.get_field(self.date_field)
+        return not isinstance(field, DateTimeField)
+
+    def queryset(self, beneficiary_id, cursor=None):
+        if self.is_date:
+            ts = Cast(self.date_field, output_field=DateTimeField())
+        else:
+            ts = F(self.date_field)
+        queryset = self.get_model()._default_manager.filter(beneficiary_id=beneficiary_id)
+        if cursor is not None:
+            queryset = queryset.filter(self.after(cursor))
+        return queryset.annotate(
+            ts=ts,
+            kind=Value(self.kind, output_field=CharField()),
+            obj_id=F('pk'),
+            ref_id=F(self.ref or 'pk'),
+            label=F(self.label) if self.label else Value('', output_field=CharField()),
+            # Um caractere além da prévia para saber se o texto foi cortado
+            text=Substr(self.text, 1, TEXT_PREVIEW + 1) if self.text else Value('', output_field=CharField()),
+        ).order_by().values_list(*TIMELINE_COLUMNS)
+
+    def _ts_lookup(self, lookup, moment):
+        """Condição ``ts <lookup> moment`` expressa no campo original da fonte"""
+        if not self.is_date:
+            suffix = '' if lookup == 'exact' else f'__{lookup}'
+            return Q(**{f'{self.date_field}{suffix}': moment})
+        day = moment.astimezone(dt_timezone.utc)
+        at_midnight = day.time() == time.min
+        day = day.date()
+        if lookup == 'lt':
+            return Q(**{f'{self.date_field}__{"lt" if at_midnight else "lte"}': day})
+        if lookup == 'lte':
+            return Q(**{f'{self.date_field}__lte': day})
+        if at_midnight:
+            return Q(**{self.date_field: day})
+        return Q(pk__in=[])
+
+    def after(self, cursor):
+        """Linhas posteriores ao cursor na ordem (ts, tipo, id) decrescente"""
+        moment, kind, obj_id = cursor
+        if self.kind < kind:
+            return self._ts_lookup('lte', moment)
+        if self.kind > kind:
+            return self._ts_lookup('lt', moment)
+        return self._ts_lookup('lt', moment) | (self._ts_lookup('exact', moment) & Q(pk__lt=obj_id))
+
+    def as_item(self, ts, obj_id, ref_id, label, text):
+        if self.description:
+            description = self.description.format(label=label)
+        elif len(text) > TEXT_PREVIEW:
+            description = text[:TEXT_PREVIEW] + '...'
+        else:
+            description = text
+        return {
+            'id': f'{self.kind}-{obj_id}',
+            'type': self.kind,
+            'datetime': ts.isoformat(),
+            'date': ts.date().isoformat(),
+            'title': self.title.format(label=label),
+            'description': description,
+            'module': self.model.split('.')[0],
+            'icon': self.icon,
+            'color': self.color,
+            'url': reverse(self.url_name, args=[ref_id]),
+        }
+
+
+TIMELINE_SOURCES = [
+    TimelineSource(
+        'evolution', 'evolution.EvolutionRecord', 'date', 'Atendimento/Evolução',
+        'fas fa-user-md', '#3B82F6', 'evolution:detail', text='description',
+    ),
+    TimelineSource(
+        'project', 'projects.ProjectEnrollment', 'created_at', 'Projeto: {label}',
+        'fas fa-project-diagram', '#10B981', 'projects:project-detail',
+        ref='project_id', label='project__name', description='Ingressou no projeto {label}',
+    ),
+    TimelineSource(
+        'coaching', 'coaching.ActionPlan', 'created_at', 'Plano de Ação',
+        'fas fa-target', '#8B5CF6', 'coaching:action-plan-detail', text='main_goal',
+    ),
+    TimelineSource(
+        'wheel', 'coaching.WheelOfLife', 'date', 'Roda da Vida',
+        'fas fa-circle-notch', '#8B5CF6', 'coaching:wheel-detail',
+        description='Avaliação da roda da vida',
+    ),
+    TimelineSource(
+        'workshop', 'workshops.WorkshopEnrollment', 'enrollment_date', 'Workshop: {label}',
+        'fas fa-chalkboard-teacher', '#F59E0B', 'workshops:workshop-detail',
+        ref='workshop_id', label='workshop__name', description='Inscrita no workshop {label}',
+    ),
+    TimelineSource(
+        'anamnesis', 'social.SocialAnamnesis', 'created_at', 'Anamnese Social',
+        'fas fa-clipboard-list', '#EF4444', 'social:detail',
+        description='Anamnese social atualizada',
+    ),
+]
+
+_SOURCES_BY_KIND = {source.kind: source for source in TIMELINE_SOURCES}
+
+
+def encode_cursor(ts, kind, obj_id):
+    raw = json.dumps([ts.isoformat(), kind, obj_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        moment, kind, obj_id = json.loads(raw)
+        moment = datetime.fromisoformat(moment)
+        obj_id = int(obj_id)
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
+    if kind not in _SOURCES_BY_KIND or moment.tzinfo is None:
+        raise InvalidCursor(cursor)
+    return moment, kind, obj_id
+
+
+def timeline_page(beneficiary, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Página do timeline, do mais recente para o mais antigo.
+
+    Retorna {'results': [...], 'next_cursor': str | None}; ``cursor`` é o
+    ``next_cursor`` da página anterior.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    position = decode_cursor(cursor) if cursor else None
+    beneficiary_id = getattr(beneficiary, 'pk', beneficiary)
+
+    first, *others = [source.queryset(beneficiary_id, position) for source in TIMELINE_SOURCES]
+    rows = list(first.union(*others, all=True).order_by('-ts', '-kind', '-obj_id')[:limit + 1])
+
+    results = []
+    for ts, kind, obj_id, ref_id, label, text in rows[:limit]:
+        results.append(_SOURCES_BY_KIND[kind].as_item(ts, obj_id, ref_id, label or '', text or ''))
+
+    next_cursor = None
+    if len(rows) > limit:
+        ts, kind, obj_id = rows[limit - 1][:3]
+        next_cursor = encode_cursor(ts, kind, obj_id)
+    return {'results': results, 'next_cursor': next_cursor}
@@ -2,18 +2,22 @@ from django.urls import path
 from members.views import (
     BeneficiaryListView, BeneficiaryCreateView, BeneficiaryDetailView,
     BeneficiaryUpdateView, BeneficiaryDeleteView, BeneficiaryDashboardView,
-    BeneficiaryImportView, BeneficiaryReportsView
+    BeneficiaryImportView, BeneficiaryReportsView, BeneficiaryExportView,
+    BeneficiaryTimelineView, BeneficiaryAutocompleteView
 )
 
 app_name = 'members'
 
 urlpatterns = [
     path('', BeneficiaryListView.as_view(), name='list'),
+    path('autocomplete/', BeneficiaryAutocompleteView.as_view(), name='autocomplete'),
     path('create/', BeneficiaryCreateView.as_view(), name='create'),
     path('<int:pk>/', BeneficiaryDetailView.as_view(), name='detail'),
     path('<int:pk>/edit/', BeneficiaryUpdateView.as_view(), name='update'),
     path('<int:pk>/delete/', BeneficiaryDeleteView.as_view(), name='delete'),
+    path('<int:pk>/timeline/', BeneficiaryTimelineView.as_view(), name='timeline'),
     path('dashboard/', BeneficiaryDashboardView.as_view(), name='dashboard'),
     path('import/', BeneficiaryImportView.as_view(), name='import'),
     path('reports/', BeneficiaryReportsView.as_view(), name='reports'),
+    path('export/', BeneficiaryExportView.as_view(), name='export'),
 ]
@@ -1,19 +1,62 @@
 
-from django.views.generic import ListView, CreateView, DetailView, UpdateView, DeleteView, TemplateView
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.views.generic import ListView, CreateView, DetailView, UpdateView, DeleteView, TemplateView, View
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.urls import reverse, reverse_lazy
 from django.contrib import messages
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
 
 from members.models import Beneficiary
 from members.forms import BeneficiaryForm
+from members.search import AUTOCOMPLETE_LIMIT, attach_activity_counts, autocomplete, search_queryset
+from members.timeline import DEFAULT_PAGE_SIZE, timeline_page
+from core.export_utils import DataFormatter, export_universal
+from core.permissions import is_technician
 
 class BeneficiaryListView(LoginRequiredMixin, ListView):
     model = Beneficiary
     template_name = 'members/beneficiary_list.html'
     context_object_name = 'beneficiaries'
-    
+    paginate_by = 20
+
     def get_queryset(self):
-        return Beneficiary.objects.all().order_by('-created_at')
+        queryset = Beneficiary.objects.all()
+        status = self.request.GET.get('status', '')
+        if status:
+            queryset = queryset.filter(status=status)
+        search = self.request.GET.get('search', '').strip()
+        if search:
+            return search_queryset(queryset, search).order_by('full_name', 'pk')
+        return queryset.order_by('-created_at')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Contagens só das linhas da página, não de todo o conjunto filtrado
+        attach_activity_counts(context['object_list'])
+        context['status_choices'] = Beneficiary.STATUS_CHOICES
+        context['search_query'] = self.request.GET.get('search', '')
+        context['selected_status'] = self.request.GET.get('status', '')
+        return context
+
+class BeneficiaryAutocompleteView(LoginRequiredMixin, View):
+    """Sugestões de beneficiárias em JSON para o campo de busca"""
+
+    def get(self, request):
+        try:
+            results = autocomplete(request.GET.get('q', ''), request.GET.get('limit', AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            return JsonResponse({'error': 'Limite inválido'}, status=400)
+        return JsonResponse({'results': [
+            {
+                'id': beneficiary.pk,
+                'full_name': beneficiary.full_name,
+                'neighbourhood': beneficiary.neighbourhood,
+                'phone': beneficiary.phone_1,
+                'status': beneficiary.status,
+                'url': reverse('members:detail', args=[beneficiary.pk]),
+            }
+            for beneficiary in results
+        ]})
 
 class BeneficiaryCreateView(LoginRequiredMixin, CreateView):
     model = Beneficiary
@@ -30,6 +73,27 @@ class BeneficiaryDetailView(LoginRequiredMixin, DetailView):
     template_name = 'members/beneficiary_detail.html'
     context_object_name = 'beneficiary'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Primeira página; as seguintes vêm de BeneficiaryTimelineView
+        context['timeline'] = timeline_page(self.object)
+        return context
+
+class BeneficiaryTimelineView(LoginRequiredMixin, View):
+    """Timeline da beneficiária em JSON, paginado por cursor (scroll infinito)"""
+
+    def get(self, request, pk):
+        beneficiary = get_object_or_404(Beneficiary.objects.only('pk'), pk=pk)
+        try:
+            page = timeline_page(
+                beneficiary,
+                cursor=request.GET.get('cursor') or None,
+                limit=request.GET.get('limit', DEFAULT_PAGE_SIZE),
+            )
+        except ValueError:
+            return JsonResponse({'error': 'Cursor ou limite inválido'}, status=400)
+        return JsonResponse(page)
+
 class BeneficiaryUpdateView(LoginRequiredMixin, UpdateView):
     model = Beneficiary
     form_class = BeneficiaryForm
@@ -40,6 +104,24 @@ class BeneficiaryUpdateView(LoginRequiredMixin, UpdateView):
         messages.success(self.request, 'Beneficiária atualizada com sucesso!')
         return super().form_valid(form)
 
+class BeneficiaryExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Exportação da tabela completa de beneficiárias (CSV/Excel em streaming); só técnicas"""
+
+    def test_func(self):
+        return is_technician(self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        return export_universal(
+            request=request,
+            model_class=Beneficiary,
+            formatter_method=None,
+            filename_prefix='beneficiarias',
+            template_name='core/exports/pdf_report.html',
+            extra_context={'report_type': 'Beneficiárias', 'user': request.user},
+            columns=DataFormatter.BENEFICIARY_COLUMNS,
+            search_field='full_name',
+        )
+
 class BeneficiaryDeleteView(LoginRequiredMixin, DeleteView):
     model = Beneficiary
     template_name = 'members/beneficiary_confirm_delete.html'
@@ -179,6 +179,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.user_context.UserContextMiddleware',  # Request-scoped roles and badge counters
     'allauth.account.middleware.AccountMiddleware',
     'django_otp.middleware.OTPMiddleware',
     'django_htmx.middleware.HtmxMiddleware',
@@ -571,6 +572,31 @@ if not DEBUG and os.environ.get('SENTRY_DSN'):
         # Sentry not available, continue without it
         pass
 
+# Real-time notification stream (notifications.realtime.NotificationStreamView)
+NOTIFICATION_STREAM_MAX_CONNECTIONS_PER_USER = 5  # abas/dispositivos simultâneos
+NOTIFICATION_STREAM_BUFFER_SIZE = 50  # eventos recentes por usuário para Last-Event-ID
+NOTIFICATION_STREAM_HEARTBEAT = 25  # segundos
+
+# Background jobs (core.background_jobs) storage backend
+# DatabaseJobBackend lets every gunicorn worker drain the same durable queue;
+# SQLiteJobBackend/MemoryJobBackend are meant for local runs and tests
+BACKGROUND_JOBS_BACKEND = env('BACKGROUND_JOBS_BACKEND', default='core.job_backends.DatabaseJobBackend')
+BACKGROUND_JOBS_BACKEND_OPTIONS = {}
+
+# Sidebar badge counters (core.sidebar_counters), kept up to date by signals;
+# the TTL only bounds drift from writes that bypass them
+SIDEBAR_COUNTERS_TIMEOUT = 3600
+
+# Batch certificate generation (certificates.generation): WeasyPrint runs in a
+# process pool; 0/1 renders in the calling process
+CERTIFICATE_GENERATION_WORKERS = env.int('CERTIFICATE_GENERATION_WORKERS', default=2)
+CERTIFICATE_GENERATION_CHUNK_SIZE = 10
+
+# Chat write-behind buffer (chat.write_behind): WebSocket messages are
+# broadcast at once and persisted in batches every N ms or M messages
+CHAT_WRITE_BEHIND_INTERVAL_MS = 100
+CHAT_WRITE_BEHIND_MAX_BATCH = 200
+
 # Celery Configuration for Background Tasks
 if REDIS_URL:
     CELERY_BROKER_URL = env('CELERY_BROKER_URL', default=f"{REDIS_URL.replace('/0', '/1')}")
@@ -729,6 +755,17 @@ RATELIMIT_SETTINGS = {
     }
 }
 
+# Per-route policies for core.rate_limit (SecurityMiddleware and the
+# core.rate_limit.ratelimit decorator). The middleware applies the first
+# policy whose 'paths'/'methods' match; the others are decorator-only.
+RATE_LIMIT_POLICIES = {
+    'api': {'rate': '60/m', 'paths': ['/api/']},
+    'login': {'rate': '5/5m', 'paths': ['/accounts/login/']},
+    'post': {'rate': '30/m', 'methods': ['POST']},
+    'upload': {'rate': '5/m'},
+    'upload_api': {'rate': '20/m'},
+}
+
 # Specific endpoints with stricter limits
 RATELIMIT_ENDPOINTS = {
     'login': '10/m',  # Login attempts
@@ -0,0 +1,262 @@
+"""
+Entrega de notificações em massa.
+
+Usado por NotificationBatch.send_batch e send_bulk_notification. Em vez de
+criar e enviar uma notificação por destinatário, o envio é feito em blocos:
+
+1. preferências e contagem diária dos destinatários do bloco carregadas em
+   duas consultas e aplicadas em memória (canal, tipo, silêncio, limite)
+2. notificações criadas com bulk_create
+3. entrega agrupada por canal: emails em uma única conexão SMTP reutilizada,
+   in-app publicadas no stream SSE
+4. status atualizado com um UPDATE por resultado e progresso reportado ao
+   chamador a cada bloco
+"""
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Count
+from django.utils import timezone
+
+from core import sidebar_counters
+from core.background_jobs import register_job
+
+logger = logging.getLogger(__name__)
+
+
+class BulkDeliveryResult:
+    """Resultado de um envio em massa"""
+
+    def __init__(self):
+        self.total = 0
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self.sent_user_ids = set()
+
+    @property
+    def processed(self):
+        return self.sent + self.failed + self.skipped
+
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'processed': self.processed,
+            'sent': self.sent,
+            'failed': self.failed,
+            'skipped': self.skipped,
+        }
+
+
+class BulkNotificationSender:
+    """Pipeline de criação e entrega de notificações em blocos"""
+
+    chunk_size = getattr(settings, 'NOTIFICATION_BULK_CHUNK_SIZE', 500)
+
+    def __init__(self, title, message, notification_type='general', channel='in_app',
+                 priority=1, html_message='', related_object=None,
+                 respect_preferences=True, progress_callback=None, metadata=None):
+        self.title = title
+        self.message = message
+        self.html_message = html_message
+        self.notification_type = notification_type
+        self.channel_name = channel
+        self.priority = priority
+        self.related_object = related_object
+        self.respect_preferences = respect_preferences
+        self.progress_callback = progress_callback
+        self.metadata = metadata or {}
+
+    def send(self, recipients):
+        """Criar e entregar a notificação para ``recipients`` (queryset ou lista de usuários)"""
+        from .models import NotificationChannel
+
+        channel, _ = NotificationChannel.objects.get_or_create(
+            name=self.channel_name,
+            defaults={'display_name': self.channel_name.replace('_', ' ').title(), 'is_active': True}
+        )
+        result = BulkDeliveryResult()
+
+        if hasattr(recipients, 'iterator'):
+            result.total = recipients.count()
+            recipients = recipients.iterator(chunk_size=self.chunk_size)
+        else:
+            recipients = list(recipients)
+            result.total = len(recipients)
+
+        self._connection = None
+        try:
+            chunk = []
+            for user in recipients:
+                chunk.append(user)
+                if len(chunk) >= self.chunk_size:
+                    self._process_chunk(chunk, channel, result)
+                    chunk = []
+            if chunk:
+                self._process_chunk(chunk, channel, result)
+        finally:
+            if self._connection is not None:
+                self._connection.close()
+
+        return result
+
+    def _process_chunk(self, users, channel, result):
+        from .models import Notification
+
+        allowed = self._filter_by_preferences(users) if self.respect_preferences else users
+        result.skipped += len(users) - len(allowed)
+
+        content_type = object_id = None
+        if self.related_object is not None:
+            from django.contrib.contenttypes.models import ContentType
+            content_type = ContentType.objects.get_for_model(self.related_object)
+            object_id = self.related_object.pk
+
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                recipient=user,
+                title=self.title,
+                message=self.message,
+                html_message=self.html_message,
+                type=self.notification_type,
+                channel=channel,
+                priority=self.priority,
+                content_type=content_type,
+                object_id=object_id,
+                metadata=dict(self.metadata),
+            )
+            for user in allowed
+        ], batch_size=self.chunk_size)
+
+        sent_ids, failed_ids = self._deliver(notifications, channel.name)
+
+        now = timezone.now()
+        if sent_ids:
+            Notification.objects.filter(pk__in=sent_ids).update(status='sent', sent_at=now)
+        if failed_ids:
+            Notification.objects.filter(pk__in=failed_ids).update(status='failed')
+
+        sent_ids = set(sent_ids)
+        result.sent += len(sent_ids)
+        result.failed += len(failed_ids)
+        delivered_to = [n.recipient_id for n in notifications if n.pk in sent_ids]
+        result.sent_user_ids.update(delivered_to)
+        # bulk_create/update() não disparam sinais: atualizar os badges do sidebar
+        sidebar_counters.adjust(delivered_to, 'notifications', 1)
+
+        if self.progress_callback:
+            self.progress_callback(result)
+
+    def _filter_by_preferences(self, users):
+        """Aplicar preferências, horário de silêncio e limite diário com 2 consultas"""
+        from .models import Notification, NotificationPreference
+
+        user_ids = [user.pk for user in users]
+        preferences = {
+            preference.user_id: preference
+            for preference in NotificationPreference.objects.filter(user_id__in=user_ids)
+        }
+        daily_counts = dict(
+            Notification.objects.filter(
+                recipient_id__in=user_ids,
+                created_at__date=timezone.now().date()
+            ).order_by().values_list('recipient_id').annotate(total=Count('id'))
+        )
+
+        allowed = []
+        for user in users:
+            preference = preferences.get(user.pk)
+            if preference is None:
+                # Sem preferências salvas: valores padrão do modelo
+                preference = NotificationPreference(user_id=user.pk)
+            if not preference.can_receive_notification(self.notification_type, self.channel_name):
+                continue
+            if self.priority < 3 and preference.is_in_quiet_hours():
+                continue
+            if daily_counts.get(user.pk, 0) >= preference.frequency_limit:
+                continue
+            allowed.append(user)
+        return allowed
+
+    def _deliver(self, notifications, channel_name):
+        """Entregar por canal; retorna (ids enviados, ids com falha)"""
+        if channel_name == 'email':
+            return self._deliver_email(notifications)
+        if channel_name == 'in_app':
+            return self._deliver_in_app(notifications)
+        # push/sms ainda não têm integração: equivalentes a Notification.send()
+        return [n.pk for n in notifications], []
+
+    def _deliver_in_app(self, notifications):
+        from .realtime import notification_payload, send_real_time_notification
+
+        for notification in notifications:
+            send_real_time_notification(notification.recipient_id, notification_payload(notification))
+        return [n.pk for n in notifications], []
+
+    def _reopen_connection(self):
+        """Reabrir a conexão SMTP depois de uma falha (o servidor pode tê-la derrubado)"""
+        try:
+            self._connection.close()
+        except Exception:
+            pass
+        try:
+            self._connection.open()
+        except Exception as e:
+            logger.error(f"Erro ao reabrir conexão de email: {e}")
+            self._connection = None
+            return False
+        return True
+
+    def _deliver_email(self, notifications):
+        """Enviar emails pela conexão SMTP do envio (aberta uma única vez)"""
+        sent_ids, failed_ids = [], []
+        messages = []
+        for notification in notifications:
+            if not notification.recipient.email:
+                failed_ids.append(notification.pk)
+                continue
+            email = EmailMultiAlternatives(
+                subject=notification.title,
+                body=notification.message,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[notification.recipient.email],
+            )
+            if notification.html_message:
+                email.attach_alternative(notification.html_message, 'text/html')
+            messages.append((notification.pk, email))
+
+        try:
+            if self._connection is None:
+                self._connection = get_connection(fail_silently=False)
+                self._connection.open()
+        except Exception as e:
+            logger.error(f"Erro ao abrir conexão de email: {e}")
+            self._connection = None
+            return sent_ids, failed_ids + [pk for pk, _ in messages]
+
+        # Uma mensagem por vez na conexão aberta: se uma falhar, sabemos
+        # exatamente quais já foram entregues e nenhuma é enviada duas vezes
+        for index, (pk, email) in enumerate(messages):
+            try:
+                self._connection.send_messages([email])
+                sent_ids.append(pk)
+            except Exception as e:
+                logger.error(f"Erro ao enviar email da notificação {pk}: {e}")
+                failed_ids.append(pk)
+                if not self._reopen_connection():
+                    failed_ids.extend(pk for pk, _ in messages[index + 1:])
+                    break
+
+        return sent_ids, failed_ids
+
+
+@register_job
+def send_notification_batch(batch_id):
+    """Job em background para enviar um NotificationBatch"""
+    from .models import NotificationBatch
+
+    batch = NotificationBatch.objects.get(pk=batch_id)
+    batch.send_batch()
+    return batch.progress()
@@ -0,0 +1,161 @@
+"""
+Hub de pub/sub em processo para o stream de notificações (SSE).
+
+Cada conexão SSE aberta registra uma fila asyncio no hub; publicar uma
+notificação entrega o evento diretamente às filas do destinatário, sem
+consultas ao banco. O hub guarda um buffer curto de eventos recentes por
+usuário para que clientes reconectando com ``Last-Event-ID`` recebam o que
+perderam sem consultar o banco. Buffers sem publicação há mais de
+``buffer_ttl`` segundos são descartados, e no máximo ``max_buffers`` são
+mantidos (os menos recentes saem primeiro); sem buffer, o resume vai ao banco.
+
+O hub vive no processo ASGI: publicações feitas em outros processos só são
+vistas pelos clientes na reconexão (resume via banco em NotificationStreamView).
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TooManyConnections(Exception):
+    """Usuário atingiu o limite de conexões simultâneas do stream"""
+
+
+class Subscription:
+    """Conexão SSE registrada no hub"""
+
+    def __init__(self, hub, user_id, loop, max_queue):
+        self.hub = hub
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_queue)
+
+    def deliver(self, event):
+        """Entregar evento à fila (chamado no loop da conexão)"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Cliente lento: descarta o evento, ele será recuperado no resume
+            logger.warning(f"Fila SSE cheia para usuário {self.user_id}; evento {event.get('id')} descartado")
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class NotificationHub:
+    """
+    Fan-out de eventos de notificação para as conexões SSE do processo.
+
+    ``publish`` pode ser chamado de qualquer thread (views WSGI/sync, jobs);
+    a entrega é agendada no event loop de cada assinante com
+    ``call_soon_threadsafe``.
+    """
+
+    def __init__(self, max_connections_per_user=5, buffer_size=50, max_queue=100,
+                 buffer_ttl=3600, max_buffers=10000):
+        self.max_connections_per_user = max_connections_per_user
+        self.buffer_size = buffer_size
+        self.max_queue = max_queue
+        self.buffer_ttl = buffer_ttl
+        self.max_buffers = max_buffers
+        self._subscribers: Dict[int, List[Subscription]] = defaultdict(list)
+        # user_id -> (última publicação, eventos), do menos para o mais recente
+        self._buffers: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id) -> Subscription:
+        """Registrar conexão do usuário (deve ser chamado dentro do event loop)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if len(self._subscribers[user_id]) >= self.max_connections_per_user:
+                raise TooManyConnections(user_id)
+            subscription = Subscription(self, user_id, loop, self.max_queue)
+            self._subscribers[user_id].append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.user_id, None)
+
+    def publish(self, user_id, data, event='notification') -> int:
+        """
+        Publicar evento para o usuário. ``data['id']`` (id da notificação) é
+        usado como id do evento SSE. Retorna o número de conexões alcançadas.
+        """
+        message = {'id': data.get('id'), 'event': event, 'data': data}
+        with self._lock:
+            if message['id'] is not None:
+                now = time.monotonic()
+                _, buffer = self._buffers.pop(user_id, (None, None))
+                if buffer is None:
+                    buffer = deque(maxlen=self.buffer_size)
+                buffer.append(message)
+                self._buffers[user_id] = (now, buffer)
+                self._prune_buffers(now)
+            subscribers = list(self._subscribers.get(user_id, ()))
+
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # Loop encerrado: conexão morta que ainda não saiu do hub
+                self.unsubscribe(subscription)
+        return len(subscribers)
+
+    def _prune_buffers(self, now):
+        """Descartar buffers expirados ou além de ``max_buffers`` (chamado com o lock)"""
+        while self._buffers:
+            user_id, (published_at, _) = next(iter(self._buffers.items()))
+            if len(self._buffers) <= self.max_buffers and now - published_at <= self.buffer_ttl:
+                break
+            del self._buffers[user_id]
+
+    def buffer_count(self) -> int:
+        with self._lock:
+            return len(self._buffers)
+
+    def replay(self, user_id, last_event_id) -> Optional[list]:
+        """
+        Eventos do buffer posteriores a ``last_event_id``.
+
+        Retorna None quando o buffer não cobre o intervalo pedido (o chamador
+        deve então recuperar do banco).
+        """
+        with self._lock:
+            published_at, buffer = self._buffers.get(user_id, (None, ()))
+            if published_at is not None and time.monotonic() - published_at > self.buffer_ttl:
+                buffer = ()
+            buffer = list(buffer)
+        # Só é seguro responder pelo buffer se o cliente já viu um evento que
+        # ainda está nele; ids de notificação não são consecutivos por usuário
+        if not buffer or last_event_id < buffer[0]['id']:
+            return None
+        return [message for message in buffer if message['id'] > last_event_id]
+
+    def connection_count(self, user_id=None) -> int:
+        with self._lock:
+            if user_id is not None:
+                return len(self._subscribers.get(user_id, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+notification_hub = NotificationHub(
+    max_connections_per_user=getattr(settings, 'NOTIFICATION_STREAM_MAX_CONNECTIONS_PER_USER', 5),
+    buffer_size=getattr(settings, 'NOTIFICATION_STREAM_BUFFER_SIZE', 50),
+    buffer_ttl=getattr(settings, 'NOTIFICATION_STREAM_BUFFER_TTL', 3600),
+    max_buffers=getattr(settings, 'NOTIFICATION_STREAM_MAX_BUFFERS', 10000),
+)
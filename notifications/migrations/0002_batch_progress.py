@@ -0,0 +1,33 @@
+# Generated by Django 4.2.13 on 2026-10-17 00:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationbatch',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fim do Envio'),
+        ),
+        migrations.AddField(
+            model_name='notificationbatch',
+            name='processed_count',
+            field=models.IntegerField(default=0, verbose_name='Processados'),
+        ),
+        migrations.AddField(
+            model_name='notificationbatch',
+            name='skipped_count',
+            field=models.IntegerField(default=0, verbose_name='Ignorados (preferências)'),
+        ),
+        migrations.AddField(
+            model_name='notificationbatch',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Início do Envio'),
+        ),
+    ]
@@ -229,8 +229,9 @@ class Notification(models.Model):
         pass
     
     def _send_in_app(self):
-        """Notificação in-app (já salva no banco)"""
-        pass
+        """Notificação in-app (já salva no banco): publicar no stream SSE"""
+        from .realtime import notification_payload, send_real_time_notification
+        send_real_time_notification(self.recipient_id, notification_payload(self))
 
 
 class NotificationPreference(models.Model):
@@ -376,6 +377,10 @@ class NotificationBatch(models.Model):
     total_recipients = models.IntegerField(default=0, verbose_name="Total de Destinatários")
     sent_count = models.IntegerField(default=0, verbose_name="Enviados")
     failed_count = models.IntegerField(default=0, verbose_name="Falharam")
+    skipped_count = models.IntegerField(default=0, verbose_name="Ignorados (preferências)")
+    processed_count = models.IntegerField(default=0, verbose_name="Processados")
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name="Início do Envio")
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name="Fim do Envio")
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -389,44 +394,81 @@ class NotificationBatch(models.Model):
         return self.name
     
     def send_batch(self):
-        """Enviar lote de notificações"""
+        """
+        Enviar lote de notificações
+
+        Usa o pipeline em blocos de notifications.delivery; o progresso é
+        gravado no lote a cada bloco para que a interface possa acompanhar.
+        """
+        from .delivery import BulkNotificationSender
+
         if self.status != 'scheduled':
             return False
         
         self.status = 'sending'
+        self.started_at = timezone.now()
+        self.finished_at = None
+        self.sent_count = self.failed_count = self.skipped_count = self.processed_count = 0
+        self.total_recipients = self.target_users.count()
         self.save()
+
+        def save_progress(result):
+            NotificationBatch.objects.filter(pk=self.pk).update(
+                sent_count=result.sent,
+                failed_count=result.failed,
+                skipped_count=result.skipped,
+                processed_count=result.processed,
+                updated_at=timezone.now(),
+            )
+
+        sender = BulkNotificationSender(
+            title=self.title,
+            message=self.message,
+            notification_type=self.template.type,
+            channel=self.template.channel.name,
+            priority=self.template.priority,
+            progress_callback=save_progress,
+            metadata={'batch_id': self.pk},
+        )
+        try:
+            result = sender.send(self.target_users.all())
+        except Exception:
+            NotificationBatch.objects.filter(pk=self.pk).update(status='failed', finished_at=timezone.now())
+            raise
         
-        sent_count = 0
-        failed_count = 0
-        
-        for user in self.target_users.all():
-            try:
-                # Criar notificação individual
-                notification = Notification.objects.create(
-                    recipient=user,
-                    title=self.title,
-                    message=self.message,
-                    type=self.template.type,
-                    channel=self.template.channel,
-                    priority=self.template.priority
-                )
-                
-                # Enviar
-                if notification.send():
-                    sent_count += 1
-                else:
-                    failed_count += 1
-                    
-            except Exception as e:
-                failed_count += 1
-        
-        self.sent_count = sent_count
-        self.failed_count = failed_count
-        self.status = 'sent' if failed_count == 0 else 'failed'
+        self.sent_count = result.sent
+        self.failed_count = result.failed
+        self.skipped_count = result.skipped
+        self.processed_count = result.processed
+        self.status = 'sent' if result.failed == 0 else 'failed'
+        self.finished_at = timezone.now()
         self.save()
         
         return True
 
+    def send_batch_async(self):
+        """Agendar o envio do lote no sistema de jobs em background"""
+        from core.background_jobs import schedule_job
+        from .delivery import send_notification_batch
+
+        return schedule_job(f"notification_batch_{self.pk}", send_notification_batch, args=(self.pk,), priority=2)
+
+    def progress(self):
+        """Progresso do envio (para polling pela interface)"""
+        total = self.total_recipients or 0
+        return {
+            'id': self.pk,
+            'status': self.status,
+            'total': total,
+            'processed': self.processed_count,
+            'sent': self.sent_count,
+            'failed': self.failed_count,
+            'skipped': self.skipped_count,
+            'percent': round(self.processed_count * 100 / total, 1) if total else 0,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
 
 # Funções auxiliares
 def create_notification(recipient, title, message, notification_type='general', 
@@ -487,16 +529,15 @@ def send_notification(recipient, title, message, notification_type='general',
 
 def send_bulk_notification(recipients, title, message, notification_type='general',
                           channel='in_app', priority=1):
-    """Enviar notificação em massa"""
-    results = []
-    
-    for recipient in recipients:
-        result = send_notification(
-            recipient, title, message, notification_type, channel, priority
-        )
-        results.append(result)
+    """Enviar notificação em massa (criação e entrega em blocos)"""
+    from .delivery import BulkNotificationSender
+
+    recipients = list(recipients)
+    result = BulkNotificationSender(
+        title, message, notification_type, channel, priority
+    ).send(recipients)
     
-    return results
+    return [recipient.pk in result.sent_user_ids for recipient in recipients]
 
 
 def get_user_notifications(user, unread_only=False, limit=None):
@@ -516,10 +557,14 @@ def get_user_notifications(user, unread_only=False, limit=None):
 
 def mark_all_as_read(user):
     """Marcar todas as notificações como lidas"""
-    return Notification.objects.filter(
+    from core import sidebar_counters
+
+    count = Notification.objects.filter(
         recipient=user,
         status__in=['pending', 'sent', 'delivered']
     ).update(
         status='read',
         read_at=timezone.now()
     )
+    sidebar_counters.invalidate([user.pk], ['notifications'])
+    return count
@@ -1,89 +1,174 @@
 """
 Sistema de notificações em tempo real usando Server-Sent Events (SSE).
 """
+import asyncio
 import json
-import time
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
 from django.http import HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
-from django.utils.decorators import method_decorator
 from django.views import View
 from django.shortcuts import get_object_or_404
-from django.core.cache import cache
 from django.conf import settings
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from datetime import timedelta
 import logging
 
+from core import sidebar_counters
+from core.user_context import get_user_context
+from notifications.hub import TooManyConnections, notification_hub
 from notifications.models import Notification, NotificationChannel
 
 logger = logging.getLogger(__name__)
 
 
+def _sse_message(event, data, event_id=None):
+    """Formatar evento no protocolo Server-Sent Events"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def notification_payload(notification, url=None):
+    """Dados enviados ao cliente para uma notificação"""
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'type': notification.type,
+        'timestamp': notification.created_at.isoformat(),
+        'url': url if url is not None else getattr(notification, 'action_url', None),
+    }
+
+
+def _missed_notifications(user, last_event_id, limit):
+    """Notificações criadas depois de ``last_event_id`` (usado só no resume)"""
+    notifications = Notification.objects.filter(
+        recipient=user,
+        id__gt=last_event_id,
+        status__in=['pending', 'sent', 'delivered']
+    ).order_by('id')[:limit]
+    return [notification_payload(notification) for notification in notifications]
+
+
 class NotificationStreamView(View):
     """
     View para streaming de notificações em tempo real via Server-Sent Events.
+
+    Sob ASGI a conexão fica aberta sem ocupar thread: os eventos chegam pelo
+    hub em processo (notifications.hub) assim que ``send_real_time_notification``
+    publica, sem polling no banco. O id do evento SSE é o id da notificação, de
+    modo que o navegador reenvia ``Last-Event-ID`` ao reconectar e recebe o que
+    perdeu (do buffer do hub ou, se necessário, de uma única consulta).
+
+    Sob WSGI a resposta é curta (eventos perdidos + ``retry``), para não
+    prender uma thread do worker por aba aberta.
     """
-    
-    @method_decorator(login_required)
-    def get(self, request):
+
+    heartbeat_interval = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 25)
+    retry_ms = getattr(settings, 'NOTIFICATION_STREAM_RETRY_MS', 5000)
+    resume_limit = 50
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Views assíncronas não podem rodar dentro de ATOMIC_REQUESTS
+        return transaction.non_atomic_requests(super().as_view(**initkwargs))
+
+    async def get(self, request):
         """
         Estabelece conexão SSE para notificações em tempo real.
         """
-        def event_stream():
-            # Cache key para o usuário
-            cache_key = f"notifications_stream_{request.user.id}"
-            last_check = cache.get(cache_key, timezone.now())
-            
-            # Enviar evento inicial de conexão
-            yield f"event: connected\ndata: {json.dumps({'status': 'connected', 'timestamp': timezone.now().isoformat()})}\n\n"
-            
-            while True:
-                try:
-                    # Verificar novas notificações
-                    new_notifications = Notification.objects.filter(
-                        recipient=request.user,
-                        created_at__gt=last_check,
-                        status__in=['pending', 'sent', 'delivered']
-                    ).order_by('-created_at')
-                    
-                    if new_notifications.exists():
-                        for notification in new_notifications:
-                            data = {
-                                'id': notification.id,
-                                'title': notification.title,
-                                'message': notification.message,
-                                'type': notification.type,
-                                'timestamp': notification.created_at.isoformat(),
-                                'url': notification.action_url if hasattr(notification, 'action_url') else None
-                            }
-                            
-                            yield f"event: notification\ndata: {json.dumps(data)}\n\n"
-                        
-                        # Atualizar timestamp da última verificação
-                        last_check = timezone.now()
-                        cache.set(cache_key, last_check, timeout=3600)  # 1 hora
-                    
-                    # Enviar heartbeat a cada 30 segundos
-                    yield f"event: heartbeat\ndata: {json.dumps({'timestamp': timezone.now().isoformat()})}\n\n"
-                    
-                    # Aguardar antes da próxima verificação
-                    time.sleep(30)
-                    
-                except Exception as e:
-                    logger.error(f"Erro no stream de notificações para usuário {request.user.id}: {e}")
-                    yield f"event: error\ndata: {json.dumps({'error': 'Stream error', 'message': str(e)})}\n\n"
-                    break
-        
+        user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+        if user is None:
+            return HttpResponse(
+                json.dumps({'error': 'Autenticação necessária'}),
+                content_type='application/json',
+                status=401
+            )
+
+        last_event_id = self._last_event_id(request)
+        if not isinstance(request, ASGIRequest):
+            backlog = await self._backlog(user, last_event_id)
+            response = StreamingHttpResponse(
+                self._short_stream(backlog),
+                content_type='text/event-stream'
+            )
+            return self._stream_headers(response)
+
+        try:
+            subscription = notification_hub.subscribe(user.id)
+        except TooManyConnections:
+            logger.warning(f"Limite de conexões SSE atingido para usuário {user.id}")
+            return HttpResponse(
+                json.dumps({'error': 'Muitas conexões abertas'}),
+                content_type='application/json',
+                status=429
+            )
+
+        # Backlog lido depois de assinar: o que for publicado entre os dois
+        # passos chega pelo hub, e os repetidos são descartados no stream
+        backlog = await self._backlog(user, last_event_id)
         response = StreamingHttpResponse(
-            event_stream(),
+            self._event_stream(subscription, backlog),
             content_type='text/event-stream'
         )
+        return self._stream_headers(response)
+
+    def _last_event_id(self, request):
+        raw = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        try:
+            return int(raw) if raw else None
+        except ValueError:
+            return None
+
+    async def _backlog(self, user, last_event_id):
+        """Eventos perdidos desde ``last_event_id`` (buffer do hub, senão banco)"""
+        if last_event_id is None:
+            return []
+        buffered = notification_hub.replay(user.id, last_event_id)
+        if buffered is not None:
+            return [(message['event'], message['data'], message['id']) for message in buffered]
+        missed = await sync_to_async(_missed_notifications)(user, last_event_id, self.resume_limit)
+        return [('notification', data, data['id']) for data in missed]
+
+    def _short_stream(self, backlog):
+        yield f"retry: {self.retry_ms}\n\n"
+        yield _sse_message('connected', {'status': 'connected', 'timestamp': timezone.now().isoformat()})
+        for event, data, event_id in backlog:
+            yield _sse_message(event, data, event_id)
+
+    async def _event_stream(self, subscription, backlog):
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            # Enviar evento inicial de conexão
+            yield _sse_message('connected', {'status': 'connected', 'timestamp': timezone.now().isoformat()})
+            sent_ids = set()
+            for event, data, event_id in backlog:
+                sent_ids.add(event_id)
+                yield _sse_message(event, data, event_id)
+
+            while True:
+                try:
+                    message = await subscription.get(timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    # Heartbeat mantém proxies e o EventSource vivos
+                    yield f": heartbeat {timezone.now().isoformat()}\n\n"
+                    continue
+                if message['id'] in sent_ids:
+                    continue
+                yield _sse_message(message['event'], message['data'], message['id'])
+        finally:
+            subscription.close()
+
+    def _stream_headers(self, response):
         response['Cache-Control'] = 'no-cache'
-        response['Connection'] = 'keep-alive'
-        response['Access-Control-Allow-Origin'] = '*'
-        response['Access-Control-Allow-Headers'] = 'Cache-Control'
-        
+        response['X-Accel-Buffering'] = 'no'  # nginx: não bufferizar o stream
         return response
 
 
@@ -154,6 +239,7 @@ def mark_all_read_api(request):
                 status='read',
                 read_at=timezone.now()
             )
+            sidebar_counters.invalidate([request.user.pk], ['notifications'])
             
             return HttpResponse(
                 json.dumps({
@@ -267,25 +353,15 @@ class NotificationWebSocketConsumer:
 def send_real_time_notification(user, notification_data):
     """
     Função helper para enviar notificação em tempo real.
+
+    Publica no hub de SSE após o commit da transação atual, para que o
+    cliente nunca receba um id que ainda não está visível no banco.
     """
     try:
-        # Cache para notificação
-        cache_key = f"realtime_notification_{user.id}_{int(time.time())}"
-        cache.set(cache_key, notification_data, timeout=300)  # 5 minutos
-        
-        # Se usando Django Channels, enviar via WebSocket
-        # from channels.layers import get_channel_layer
-        # channel_layer = get_channel_layer()
-        # if channel_layer:
-        #     async_to_sync(channel_layer.group_send)(
-        #         f"notifications_{user.id}",
-        #         {
-        #             'type': 'send_notification',
-        #             'notification': notification_data
-        #         }
-        #     )
+        user_id = user.id if hasattr(user, 'id') else user
+        transaction.on_commit(lambda: notification_hub.publish(user_id, notification_data))
         
-        logger.info(f"Notificação em tempo real enviada para usuário {user.id}")
+        logger.info(f"Notificação em tempo real enviada para usuário {user_id}")
         return True
         
     except Exception as e:
@@ -319,14 +395,7 @@ def create_and_send_notification(user, title, message, notification_type='genera
         )
         
         # Preparar dados para tempo real
-        notification_data = {
-            'id': notification.id,
-            'title': notification.title,
-            'message': notification.message,
-            'type': notification.type,
-            'timestamp': notification.created_at.isoformat(),
-            'url': action_url
-        }
+        notification_data = notification_payload(notification, url=action_url)
         
         # Enviar em tempo real
         send_real_time_notification(user, notification_data)
@@ -341,6 +410,10 @@ def create_and_send_notification(user, title, message, notification_type='genera
 class NotificationMiddleware:
     """
     Middleware para adicionar informações de notificação ao contexto.
+    
+    ``request.notifications_data`` é lido do UserContext da requisição
+    (core.user_context): as notificações só são buscadas se usadas, com o
+    mesmo get_many dos papéis e contadores do sidebar.
     """
     
     def __init__(self, get_response):
@@ -353,41 +426,16 @@ class NotificationMiddleware:
     def process_view(self, request, view_func, view_args, view_kwargs):
         """Adicionar dados de notificação ao contexto"""
         if request.user.is_authenticated:
-            # Cache para evitar consultas repetidas
-            cache_key = f"notifications_context_{request.user.id}"
-            cached_data = cache.get(cache_key)
-            
-            if cached_data is None:
-                unread_notifications = Notification.objects.filter(
-                    recipient=request.user,
-                    status__in=['pending', 'sent', 'delivered']
-                ).order_by('-created_at')[:5]  # Últimas 5 não lidas
-                
-                unread_count = Notification.objects.filter(
-                    recipient=request.user,
-                    status__in=['pending', 'sent', 'delivered']
-                ).count()
-                
-                cached_data = {
-                    'unread_notifications': list(unread_notifications.values(
-                        'id', 'title', 'message', 'type', 'created_at'
-                    )),
-                    'unread_notifications_count': unread_count
-                }
-                
-                # Cache por 2 minutos
-                cache.set(cache_key, cached_data, timeout=120)
-            
-            # Adicionar ao contexto da request
-            request.notifications_data = cached_data
+            context = get_user_context(request)
+            request.notifications_data = SimpleLazyObject(lambda: context.notifications_data)
 
 
 def notification_context_processor(request):
     """
     Context processor para notificações.
     """
-    if request.user.is_authenticated and hasattr(request, 'notifications_data'):
-        return request.notifications_data
+    if request.user.is_authenticated:
+        return get_user_context(request).notifications_data
     
     return {
         'unread_notifications': [],
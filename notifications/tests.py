@@ -0,0 +1,159 @@
+"""
+Testes do hub de notificações em tempo real e do envio em massa
+"""
+import asyncio
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import SimpleTestCase, TestCase
+
+from notifications.hub import NotificationHub, TooManyConnections
+from notifications.models import (
+    Notification, NotificationBatch, NotificationChannel, NotificationPreference,
+    NotificationTemplate, send_bulk_notification
+)
+
+User = get_user_model()
+
+
+class NotificationHubTests(SimpleTestCase):
+    """Testes do fan-out em processo usado pelo stream SSE"""
+
+    def test_publish_reaches_all_user_connections(self):
+        """Publicar entrega o evento a todas as conexões do usuário, e só a elas"""
+        hub = NotificationHub()
+
+        async def scenario():
+            first = hub.subscribe(1)
+            second = hub.subscribe(1)
+            other = hub.subscribe(2)
+            self.assertEqual(hub.publish(1, {'id': 10, 'title': 'Olá'}), 2)
+            self.assertEqual((await first.get(timeout=1))['id'], 10)
+            self.assertEqual((await second.get(timeout=1))['data']['title'], 'Olá')
+            with self.assertRaises(asyncio.TimeoutError):
+                await other.get(timeout=0.05)
+
+        asyncio.run(scenario())
+
+    def test_connection_cap_per_user(self):
+        """Conexões além do limite são recusadas até uma ser fechada"""
+        hub = NotificationHub(max_connections_per_user=2)
+
+        async def scenario():
+            first = hub.subscribe(1)
+            hub.subscribe(1)
+            with self.assertRaises(TooManyConnections):
+                hub.subscribe(1)
+            first.close()
+            hub.subscribe(1)
+            self.assertEqual(hub.connection_count(1), 2)
+
+        asyncio.run(scenario())
+
+    def test_replay_from_buffer(self):
+        """Resume por Last-Event-ID usa o buffer quando ele cobre o intervalo"""
+        hub = NotificationHub(buffer_size=3)
+        for notification_id in (5, 9, 12, 20):
+            hub.publish(1, {'id': notification_id})
+
+        self.assertEqual([m['id'] for m in hub.replay(1, 9)], [12, 20])
+        self.assertEqual(hub.replay(1, 20), [])
+        # 5 saiu do buffer: não dá para garantir que nada foi perdido
+        self.assertIsNone(hub.replay(1, 5))
+        self.assertIsNone(hub.replay(2, 0))
+
+    def test_buffers_are_pruned(self):
+        """Buffers expirados ou além do limite saem do hub (o resume vai ao banco)"""
+        hub = NotificationHub(buffer_ttl=60, max_buffers=2)
+        for user_id in (1, 2, 3):
+            hub.publish(user_id, {'id': user_id})
+        self.assertEqual(hub.buffer_count(), 2)
+        self.assertIsNone(hub.replay(1, 0))
+        self.assertEqual([m['id'] for m in hub.replay(3, 3)], [])
+
+        with patch('notifications.hub.time.monotonic', return_value=time.monotonic() + 120):
+            self.assertIsNone(hub.replay(3, 3))
+            hub.publish(4, {'id': 4})
+        self.assertEqual(hub.buffer_count(), 1)
+
+
+class BulkNotificationDeliveryTests(TestCase):
+    """Testes do pipeline de envio em massa"""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f'user{i}', email=f'user{i}@example.com', full_name=f'Usuária {i}'
+            )
+            for i in range(5)
+        ]
+        # Prioridade 3 nos envios abaixo ignora o horário de silêncio
+        for user in self.users:
+            NotificationPreference.objects.get_or_create(user=user)
+        NotificationPreference.objects.filter(user=self.users[0]).update(email_enabled=False)
+
+    def test_bulk_email_respects_preferences(self):
+        """Emails saem em lote e destinatárias que recusaram email são ignoradas"""
+        results = send_bulk_notification(
+            self.users, 'Aviso', 'Mensagem', notification_type='general', channel='email', priority=3
+        )
+
+        self.assertEqual(results, [False, True, True, True, True])
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertEqual(Notification.objects.filter(status='sent').count(), 4)
+        self.assertFalse(Notification.objects.filter(recipient=self.users[0]).exists())
+
+    def test_failed_email_is_not_resent_with_the_others(self):
+        """Uma falha no meio do envio não reenvia os emails já entregues"""
+        class FlakyConnection:
+            def __init__(self):
+                self.delivered = []
+
+            def open(self):
+                return True
+
+            def close(self):
+                pass
+
+            def send_messages(self, messages):
+                for message in messages:
+                    if message.to == ['user2@example.com']:
+                        raise OSError('conexão interrompida')
+                    self.delivered.append(message.to[0])
+                return len(messages)
+
+        connection = FlakyConnection()
+        with patch('notifications.delivery.get_connection', return_value=connection):
+            results = send_bulk_notification(
+                self.users, 'Aviso', 'Mensagem', notification_type='general', channel='email', priority=3
+            )
+
+        self.assertEqual(results, [False, True, False, True, True])
+        self.assertEqual(
+            sorted(connection.delivered), ['user1@example.com', 'user3@example.com', 'user4@example.com']
+        )
+        self.assertEqual(Notification.objects.filter(status='failed').count(), 1)
+
+    def test_send_batch_persists_progress(self):
+        """send_batch grava contadores de progresso no lote"""
+        channel = NotificationChannel.objects.create(name='in_app', display_name='In-App')
+        template = NotificationTemplate.objects.create(
+            name='Geral', type='general', channel=channel,
+            subject_template='Aviso', content_template='Mensagem', priority=3
+        )
+        batch = NotificationBatch.objects.create(
+            name='Lote', template=template, title='Aviso', message='Mensagem', status='scheduled'
+        )
+        batch.target_users.set(self.users)
+
+        self.assertTrue(batch.send_batch())
+        batch.refresh_from_db()
+
+        progress = batch.progress()
+        self.assertEqual(progress['total'], 5)
+        self.assertEqual(progress['processed'], 5)
+        self.assertEqual(progress['sent'], 5)
+        self.assertEqual(progress['percent'], 100.0)
+        self.assertEqual(batch.status, 'sent')
@@ -36,6 +36,9 @@ urlpatterns = [
     path('stats/', views.notification_stats, name='stats'),
     path('test/create/', views.create_test_notifications, name='create_test'),
     
+    # Lotes de notificação
+    path('batches/<int:pk>/progress/', views.batch_progress, name='batch_progress'),
+    
     # Busca
     path('search/', views.NotificationSearchView.as_view(), name='search'),
     
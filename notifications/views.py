@@ -20,6 +20,7 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 
+from core import sidebar_counters
 from core.unified_permissions import (
     
     get_user_permissions,
@@ -28,7 +29,9 @@ from core.unified_permissions import (
     TechnicianRequiredMixin,
     AdminRequiredMixin
 )
-from .models import Notification, NotificationPreference, NotificationTemplate, NotificationChannel
+from .models import (
+    Notification, NotificationBatch, NotificationPreference, NotificationTemplate, NotificationChannel
+)
 from .forms import NotificationForm, NotificationPreferenceForm, NotificationTemplateForm
 
 
@@ -264,6 +267,7 @@ def mark_all_as_read(request):
             recipient=request.user, 
             status='pending'
         ).update(status='read', read_at=timezone.now())
+        sidebar_counters.invalidate([request.user.pk], ['notifications'])
         
         return JsonResponse({
             'success': True, 
@@ -287,6 +291,14 @@ def notification_count(request):
     return JsonResponse({'count': count})
 
 
+@login_required
+@requires_admin
+def batch_progress(request, pk):
+    """Progresso do envio de um lote de notificações (polling via AJAX)"""
+    batch = get_object_or_404(NotificationBatch, pk=pk)
+    return JsonResponse(batch.progress())
+
+
 @login_required
 def notification_popup(request):
     """Retorna notificações recentes para popup"""
@@ -708,6 +720,7 @@ def bulk_mark_as_read(request):
             recipient=request.user,
             status='pending'
         ).update(status='read', read_at=timezone.now())
+        sidebar_counters.invalidate([request.user.pk], ['notifications'])
         
         return JsonResponse({
             'success': True,
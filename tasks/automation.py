@@ -0,0 +1,377 @@
+"""
+Motor das automações dos quadros (TaskAutomation).
+
+Índice de regras: ``rule_index`` guarda, por processo, as automações ativas
+de cada quadro já compiladas e agrupadas por gatilho. Cada quadro tem uma
+geração no cache; salvar ou excluir uma automação troca a geração e os
+processos recarregam o quadro (uma consulta) no próximo evento.
+
+Eventos: os sinais de Task chamam ``dispatch`` para ``task_created``,
+``task_moved`` e ``task_completed``. As condições são avaliadas sobre os
+campos da instância já carregada, sem consultas; as regras que casam em uma
+operação (``dispatch_many`` agrupa as tarefas de uma reordenação) formam um
+lote, enviado ao job ``run_automations`` depois do commit.
+
+Gatilhos por prazo: o job ``sweep_due_dates`` (comando
+``run_task_automations``) faz uma consulta indexada por (due_date, status)
+cobrindo só os dias desde a última varredura: ``overdue`` dispara no dia
+seguinte ao prazo e ``due_date_approaching`` quando o prazo entra na janela
+de ``days`` dias (condição, padrão 1).
+
+Condições (JSON): ``{"priority": "high"}`` (igualdade), com sufixos
+``__ne``, ``__in``, ``__icontains`` e ``__isnull``, sobre priority, status,
+column, assignee, title e from_column (coluna de origem, em movimentações).
+
+Ações executadas por automações não disparam outras automações. Cada
+execução soma em ``execution_count``/``failure_count`` e registra a
+latência entre o evento e o fim da ação.
+"""
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, timedelta
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.background_jobs import register_job, report_progress, schedule_job
+
+logger = logging.getLogger(__name__)
+
+TIME_TRIGGERS = ('due_date_approaching', 'overdue')
+OPEN_STATUSES = ('todo', 'in_progress', 'review')
+BATCH_SIZE = 100
+DEFAULT_APPROACHING_DAYS = 1
+
+GENERATION_KEY = 'task_automation_rules_{}'
+LAST_SWEEP_KEY = 'task_automation_last_sweep'
+
+# Campo da condição -> chave do contexto do evento
+CONDITION_FIELDS = {
+    'priority': 'priority',
+    'status': 'status',
+    'column': 'column_id',
+    'assignee': 'assignee_id',
+    'title': 'title',
+    'from_column': 'from_column',
+}
+OPERATORS = {
+    'eq': lambda value, expected: value == expected,
+    'ne': lambda value, expected: value != expected,
+    'in': lambda value, expected: value in expected,
+    'icontains': lambda value, expected: str(expected).lower() in (value or '').lower(),
+    'isnull': lambda value, expected: (value is None) == bool(expected),
+}
+# Chaves das condições que configuram a regra em vez de filtrar
+OPTION_KEYS = {'days'}
+
+_executing = contextvars.ContextVar('task_automation_executing', default=False)
+
+
+class CompiledRule:
+    """Automação pronta para avaliação: verificações pré-resolvidas"""
+
+    __slots__ = ('pk', 'board_id', 'trigger', 'checks', 'days')
+
+    def __init__(self, automation):
+        self.pk = automation.pk
+        self.board_id = automation.board_id
+        self.trigger = automation.trigger
+        self.checks = compile_conditions(automation.conditions or {})
+        self.days = int((automation.conditions or {}).get('days', DEFAULT_APPROACHING_DAYS))
+
+    def matches(self, context):
+        return all(operator(context.get(key), expected) for key, operator, expected in self.checks)
+
+
+def compile_conditions(conditions):
+    """[(chave do contexto, operador, valor)]; ValueError para condições desconhecidas"""
+    checks = []
+    for name, expected in conditions.items():
+        if name in OPTION_KEYS:
+            continue
+        field, _, operator = name.partition('__')
+        if field not in CONDITION_FIELDS or (operator or 'eq') not in OPERATORS:
+            raise ValueError(f"Unknown automation condition: {name!r}")
+        checks.append((CONDITION_FIELDS[field], OPERATORS[operator or 'eq'], expected))
+    return checks
+
+
+def compile_rules(automations):
+    """CompiledRule das automações válidas (as inválidas são ignoradas com aviso)"""
+    rules = []
+    for automation in automations:
+        try:
+            rules.append(CompiledRule(automation))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Skipping task automation {automation.pk}: {e}")
+    return rules
+
+
+class RuleIndex:
+    """Regras ativas por (quadro, gatilho), invalidadas pela geração no cache"""
+
+    def __init__(self):
+        self._boards = {}
+        self._lock = threading.Lock()
+
+    def rules(self, board_id, trigger):
+        generation = cache.get(GENERATION_KEY.format(board_id))
+        entry = self._boards.get(board_id)
+        if entry is None or generation is None or entry[0] != generation:
+            entry = self._load(board_id, generation)
+        return entry[1].get(trigger, ())
+
+    def _load(self, board_id, generation):
+        from .models import TaskAutomation
+
+        if generation is None:
+            key = GENERATION_KEY.format(board_id)
+            cache.add(key, uuid.uuid4().hex, None)
+            generation = cache.get(key)
+        # Geração lida antes das regras: uma invalidação no meio força nova carga
+        automations = TaskAutomation.objects.filter(board_id=board_id, is_active=True).only(
+            'pk', 'board_id', 'trigger', 'conditions'
+        )
+        by_trigger = defaultdict(list)
+        for rule in compile_rules(automations):
+            by_trigger[rule.trigger].append(rule)
+        entry = (generation, dict(by_trigger))
+        with self._lock:
+            self._boards[board_id] = entry
+        return entry
+
+    def invalidate(self, board_id):
+        cache.set(GENERATION_KEY.format(board_id), uuid.uuid4().hex, None)
+        with self._lock:
+            self._boards.pop(board_id, None)
+
+
+rule_index = RuleIndex()
+
+
+def task_context(task, **extra):
+    """Campos da tarefa usados pelas condições (sem consultas)"""
+    context = {key: getattr(task, key) for key in ('priority', 'status', 'column_id', 'assignee_id', 'title')}
+    context.update(extra)
+    return context
+
+
+def dispatch(trigger, task, **extra):
+    """Avaliar as regras do gatilho para ``task``; retorna quantas casaram"""
+    return dispatch_many(trigger, [(task, extra)])
+
+
+def dispatch_many(trigger, events):
+    """
+    ``dispatch`` para vários ``(tarefa, extra)`` de uma mesma operação: as
+    regras casadas vão num só lote, agendado no on_commit (um rollback
+    descarta o lote junto com a transação ou o savepoint).
+    """
+    if _executing.get():
+        return 0
+    matches = []
+    for task, extra in events:
+        rules = rule_index.rules(task.board_id, trigger)
+        if rules:
+            context = task_context(task, **extra)
+            matches.extend([rule.pk, str(task.pk), time.time()] for rule in rules if rule.matches(context))
+    for start in range(0, len(matches), BATCH_SIZE):
+        transaction.on_commit(partial(enqueue, matches[start:start + BATCH_SIZE]))
+    return len(matches)
+
+
+def enqueue(matches):
+    """Agendar a execução de ``matches`` ([id da regra, id da tarefa, instante do evento])"""
+    schedule_job(f'task_automations_{uuid.uuid4().hex[:12]}', run_automations, args=(matches,), priority=2)
+
+
+def _render(template, task):
+    return (template or '').replace('{task}', task.title)
+
+
+def _create_task(rule, task):
+    from .models import Task, TaskColumn
+
+    data = rule.action_data
+    column = task.column
+    if data.get('column_id'):
+        column = TaskColumn.objects.get(pk=data['column_id'], board_id=task.board_id)
+    Task.objects.create(
+        title=_render(data.get('title'), task) or task.title,
+        description=_render(data.get('description'), task),
+        board_id=task.board_id,
+        column=column,
+        priority=data.get('priority', 'medium'),
+        assignee_id=data.get('assignee_id'),
+        reporter=rule.created_by,
+    )
+
+
+def _assign_user(rule, task):
+    task.assignee_id = rule.action_data['user_id']
+    task.save(update_fields=['assignee', 'updated_at'])
+
+
+def _change_priority(rule, task):
+    task.priority = rule.action_data['priority']
+    task.save(update_fields=['priority', 'updated_at'])
+
+
+def _move_to_column(rule, task):
+    from .models import TaskColumn
+    from .ranking import move_task
+
+    column = TaskColumn.objects.get(pk=rule.action_data['column_id'], board_id=task.board_id)
+    if column.pk != task.column_id:
+        move_task(task, column)
+
+
+def _add_comment(rule, task):
+    from .models import TaskComment
+
+    TaskComment.objects.create(task=task, author=rule.created_by, content=_render(rule.action_data.get('content'), task))
+
+
+def _send_notification(rule, task):
+    from notifications.delivery import BulkNotificationSender
+
+    data = rule.action_data
+    recipients = set()
+    for recipient in data.get('recipients', ['assignee']):
+        if recipient == 'assignee':
+            recipients.add(task.assignee)
+        elif recipient == 'reporter':
+            recipients.add(task.reporter)
+    recipients.discard(None)
+    user_ids = [pk for pk in data.get('recipients', []) if isinstance(pk, int)]
+    if user_ids:
+        from django.contrib.auth import get_user_model
+
+        recipients.update(get_user_model().objects.filter(pk__in=user_ids))
+    BulkNotificationSender(
+        title=_render(data.get('title'), task) or rule.name,
+        message=_render(data.get('message'), task) or task.title,
+        metadata={'task_id': str(task.pk), 'automation_id': rule.pk},
+    ).send(list(recipients))
+
+
+ACTIONS = {
+    'create_task': _create_task,
+    'assign_user': _assign_user,
+    'send_notification': _send_notification,
+    'change_priority': _change_priority,
+    'move_to_column': _move_to_column,
+    'add_comment': _add_comment,
+}
+
+
+def execute(matches):
+    """Executar as ações de ``matches``; retorna quantas executaram sem erro"""
+    from .models import Task, TaskAutomation
+
+    rules = TaskAutomation.objects.select_related('created_by').in_bulk({match[0] for match in matches})
+    tasks = Task.objects.select_related('column', 'assignee', 'reporter').in_bulk(
+        {uuid.UUID(match[1]) for match in matches}
+    )
+    stats = defaultdict(lambda: {'executions': 0, 'failures': 0, 'latency': 0, 'last': 0})
+    succeeded = 0
+    token = _executing.set(True)
+    try:
+        for index, (rule_id, task_id, fired_at) in enumerate(matches, start=1):
+            rule, task = rules.get(rule_id), tasks.get(uuid.UUID(task_id))
+            if rule is None or task is None or not rule.is_active:
+                continue
+            rule_stats = stats[rule_id]
+            try:
+                with transaction.atomic():
+                    ACTIONS[rule.action](rule, task)
+                succeeded += 1
+            except Exception as e:
+                logger.error(f"Task automation {rule_id} failed for task {task_id}: {e}")
+                rule_stats['failures'] += 1
+            latency = max(int((time.time() - fired_at) * 1000), 0)
+            rule_stats['executions'] += 1
+            rule_stats['latency'] += latency
+            rule_stats['last'] = latency
+            report_progress(index, len(matches))
+    finally:
+        _executing.reset(token)
+
+    now = timezone.now()
+    for rule_id, rule_stats in stats.items():
+        TaskAutomation.objects.filter(pk=rule_id).update(
+            execution_count=F('execution_count') + rule_stats['executions'],
+            failure_count=F('failure_count') + rule_stats['failures'],
+            total_latency_ms=F('total_latency_ms') + rule_stats['latency'],
+            last_latency_ms=rule_stats['last'],
+            last_executed_at=now,
+        )
+    return succeeded
+
+
+@register_job
+def run_automations(matches):
+    """Job: executar um lote de automações casadas"""
+    return execute(matches)
+
+
+@register_job
+def sweep_due_dates(today=None):
+    """
+    Gatilhos por prazo desde a última varredura: uma consulta das regras e
+    uma das tarefas; retorna quantas execuções foram agendadas.
+    """
+    from .models import Task, TaskAutomation
+
+    today = date.fromisoformat(today) if isinstance(today, str) else today or timezone.localdate()
+    last = cache.get(LAST_SWEEP_KEY)
+    last = date.fromisoformat(last) if last else today - timedelta(days=1)
+    if last >= today:
+        return 0
+
+    rules = compile_rules(TaskAutomation.objects.filter(is_active=True, trigger__in=TIME_TRIGGERS).only(
+        'pk', 'board_id', 'trigger', 'conditions'
+    ))
+    window = Q()
+    for rule in rules:
+        if rule.trigger == 'overdue':
+            # Venceram entre a última varredura e ontem
+            window |= Q(board_id=rule.board_id, due_date__gte=last, due_date__lt=today)
+        else:
+            window |= Q(
+                board_id=rule.board_id, due_date__gte=today,
+                due_date__gt=last + timedelta(days=rule.days), due_date__lte=today + timedelta(days=rule.days),
+            )
+
+    matches = []
+    if window:
+        by_board = defaultdict(list)
+        for rule in rules:
+            by_board[rule.board_id].append(rule)
+        fired_at = time.time()
+        candidates = Task.objects.filter(window, status__in=OPEN_STATUSES).order_by().only(
+            'pk', 'board_id', 'due_date', 'priority', 'status', 'column_id', 'assignee_id', 'title'
+        )
+        for task in candidates.iterator(chunk_size=2000):
+            context = task_context(task)
+            for rule in by_board[task.board_id]:
+                if _in_window(rule, task.due_date, last, today) and rule.matches(context):
+                    matches.append([rule.pk, str(task.pk), fired_at])
+
+    for start in range(0, len(matches), BATCH_SIZE):
+        enqueue(matches[start:start + BATCH_SIZE])
+    cache.set(LAST_SWEEP_KEY, today.isoformat(), None)
+    return len(matches)
+
+
+def _in_window(rule, due_date, last, today):
+    if rule.trigger == 'overdue':
+        return last <= due_date < today
+    return today <= due_date and last + timedelta(days=rule.days) < due_date <= today + timedelta(days=rule.days)
@@ -0,0 +1,159 @@
+"""
+Estado do quadro Kanban: snapshot e deltas versionados.
+
+``snapshot(board)`` monta colunas, cartões, labels, resumo por responsável
+e contagens em quatro consultas, independente do número de tarefas (as
+contagens saem das próprias linhas dos cartões, em Python).
+
+Cada criação, alteração, movimentação ou exclusão de tarefa incrementa
+``TaskBoard.version`` no banco (um UPDATE atômico) e gera um delta pequeno
+com a linha do cartão: ``{'version': n, 'type': 'task.moved', 'task':
+{...}}``. Depois do commit, o delta é gravado no cache sob a própria versão
+e publicado no hub em processo (``board_hub``), que alimenta o stream SSE do
+quadro. Os deltas são idempotentes (trazem o cartão inteiro), então aplicar
+um delta já refletido no snapshot não tem efeito.
+
+Re-sincronização: o cliente guarda a versão do snapshot (ou do último
+delta) e, ao reconectar, pede os deltas posteriores; ``deltas_since``
+responde com um ``get_many`` no cache, ou None quando algum delta expirou ou
+a diferença passa de MAX_RESYNC_DELTAS (o cliente busca um novo snapshot).
+Como no stream de notificações, o hub só entrega o que foi publicado no
+próprio processo ASGI; alterações de outros processos chegam pelo cache, na
+reconexão ou no endpoint de deltas.
+"""
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from notifications.hub import NotificationHub
+
+DELTA_CACHE_KEY = 'task_board_delta_{}_{}'
+DELTA_CACHE_TIMEOUT = getattr(settings, 'TASK_BOARD_DELTA_TIMEOUT', 3600)
+MAX_RESYNC_DELTAS = getattr(settings, 'TASK_BOARD_MAX_RESYNC_DELTAS', 500)
+
+COLUMN_FIELDS = ['id', 'name', 'order', 'color', 'wip_limit']
+TASK_FIELDS = ['id', 'column_id', 'rank', 'title', 'priority', 'status', 'due_date', 'assignee_id', 'updated_at']
+LABEL_FIELDS = ['id', 'name', 'color']
+OPEN_STATUSES = ('todo', 'in_progress', 'review')
+
+# Conexões SSE por quadro (o hub é o mesmo das notificações, com chave = id do quadro)
+board_hub = NotificationHub(
+    max_connections_per_user=getattr(settings, 'TASK_BOARD_STREAM_MAX_CONNECTIONS', 200),
+    buffer_size=getattr(settings, 'TASK_BOARD_STREAM_BUFFER_SIZE', 100),
+)
+
+
+def task_payload(task):
+    """Linha do cartão (dict de values() ou instância de Task) em tipos JSON"""
+    if not isinstance(task, dict):
+        task = {field: getattr(task, field) for field in TASK_FIELDS}
+    payload = dict(task)
+    payload['id'] = str(payload['id'])
+    for field in ('due_date', 'updated_at'):
+        if payload[field] is not None:
+            payload[field] = payload[field].isoformat()
+    return payload
+
+
+def snapshot(board):
+    """
+    Estado completo do quadro. ``board`` deve ter sido carregado na
+    requisição: a versão lida antes das consultas garante que nenhum delta
+    posterior a ela fique de fora.
+    """
+    today = date.today()
+    columns = list(board.columns.order_by('order').values(*COLUMN_FIELDS))
+    rows = list(board.tasks.order_by('column_id', 'rank', '-created_at').values(*TASK_FIELDS))
+    labels = list(board.labels.order_by('name').values(*LABEL_FIELDS))
+
+    per_column = dict.fromkeys((column['id'] for column in columns), 0)
+    per_status = {}
+    per_assignee = {}
+    overdue = 0
+    for row in rows:
+        per_column[row['column_id']] = per_column.get(row['column_id'], 0) + 1
+        per_status[row['status']] = per_status.get(row['status'], 0) + 1
+        is_open = row['status'] in OPEN_STATUSES
+        if is_open and row['due_date'] and row['due_date'] < today:
+            overdue += 1
+        if row['assignee_id']:
+            summary = per_assignee.setdefault(row['assignee_id'], {'total': 0, 'open': 0})
+            summary['total'] += 1
+            summary['open'] += is_open
+
+    assignees = []
+    users = get_user_model().objects.filter(pk__in=per_assignee).values('id', 'username', 'first_name', 'last_name')
+    for user in users.order_by('first_name', 'username'):
+        name = f"{user['first_name']} {user['last_name']}".strip() or user['username']
+        assignees.append({'id': user['id'], 'name': name, **per_assignee[user['id']]})
+
+    for column in columns:
+        column['task_count'] = per_column[column['id']]
+        column['over_wip_limit'] = bool(column['wip_limit']) and column['task_count'] > column['wip_limit']
+
+    return {
+        'board': {'id': board.pk, 'name': board.name, 'version': board.version},
+        'version': board.version,
+        'columns': columns,
+        'tasks': [task_payload(row) for row in rows],
+        'labels': labels,
+        'assignees': assignees,
+        'counts': {'total': len(rows), 'overdue': overdue, 'by_status': per_status},
+    }
+
+
+def publish(board_id, event, task):
+    """
+    Registrar uma alteração de tarefa do quadro: incrementa a versão e,
+    depois do commit, grava e publica o delta. Retorna a nova versão (None
+    se o quadro não existe mais).
+    """
+    return publish_many(board_id, event, [task])
+
+
+def publish_many(board_id, event, tasks):
+    """``publish`` para várias tarefas, com um único UPDATE da versão (um delta por tarefa)"""
+    from .models import TaskBoard
+
+    boards = TaskBoard.objects.filter(pk=board_id)
+    with transaction.atomic():
+        if not tasks or not boards.update(version=F('version') + len(tasks), updated_at=timezone.now()):
+            return None
+        version = boards.values_list('version', flat=True).get()
+
+    first = version - len(tasks) + 1
+    deltas = [
+        {'id': number, 'version': number, 'type': event, 'task': task_payload(task)}
+        for number, task in enumerate(tasks, start=first)
+    ]
+    transaction.on_commit(lambda: _dispatch(board_id, deltas))
+    return version
+
+
+def _dispatch(board_id, deltas):
+    cache.set_many(
+        {DELTA_CACHE_KEY.format(board_id, delta['version']): delta for delta in deltas}, DELTA_CACHE_TIMEOUT
+    )
+    for delta in deltas:
+        board_hub.publish(board_id, delta, event='delta')
+
+
+def deltas_since(board_id, since, current):
+    """
+    Deltas de ``since`` (exclusive) até ``current``, em ordem; None quando
+    não é possível cobrir o intervalo e o cliente deve buscar um snapshot.
+    """
+    if since == current:
+        return []
+    if since > current or current - since > MAX_RESYNC_DELTAS:
+        return None
+    keys = [DELTA_CACHE_KEY.format(board_id, version) for version in range(since + 1, current + 1)]
+    found = cache.get_many(keys)
+    if len(found) != len(keys):
+        return None
+    return [found[key] for key in keys]
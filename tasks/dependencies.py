@@ -0,0 +1,234 @@
+"""
+Grafo de dependências entre tarefas (TaskDependency).
+
+As arestas são normalizadas como (bloqueadora, bloqueada): ``depends_on``
+significa que ``depends_on`` bloqueia ``task``; ``blocks``, que ``task``
+bloqueia ``depends_on``; ``related`` não entra no grafo.
+
+- ``board_graph(board_id)``: arestas do quadro (inclusive as que ligam a
+  outros quadros) em uma consulta, guardadas no cache como lista de
+  adjacência e invalidadas quando uma dependência de uma das pontas muda.
+- ``chain(task_id, direction)``: bloqueadoras (ou dependentes) transitivas
+  atravessando quadros, com uma CTE recursiva no banco.
+- ``TaskDependency.save`` chama ``validate_edge``, que rejeita a aresta se a
+  bloqueada já alcança a bloqueadora (ciclo), também por CTE.
+
+``DependencyGraph`` responde bloqueadoras transitivas, impacto a jusante,
+tarefas bloqueadas, ordem topológica e caminho crítico (maior soma de
+``estimated_hours``) em tempo linear no número de arestas. Status e horas
+não ficam no cache: são lidos em uma consulta quando necessários.
+"""
+import heapq
+import uuid
+from collections import defaultdict, deque
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+
+GRAPH_CACHE_KEY = 'task_dependency_graph_{}'
+GRAPH_CACHE_TIMEOUT = 3600
+DONE_STATUSES = ('completed', 'cancelled')
+
+
+class CycleError(ValueError):
+    """O grafo de dependências contém um ciclo"""
+
+
+def normalize(task_id, depends_on_id, dependency_type):
+    """(bloqueadora, bloqueada) da dependência, ou None para ``related``"""
+    if dependency_type == 'depends_on':
+        return depends_on_id, task_id
+    if dependency_type == 'blocks':
+        return task_id, depends_on_id
+    return None
+
+
+class DependencyGraph:
+    """Grafo em listas de adjacência nos dois sentidos"""
+
+    def __init__(self, edges=()):
+        self.blockers = defaultdict(set)
+        self.dependents = defaultdict(set)
+        for blocker, blocked in edges:
+            self.add_edge(blocker, blocked)
+
+    def add_edge(self, blocker, blocked):
+        self.blockers[blocked].add(blocker)
+        self.dependents[blocker].add(blocked)
+
+    @property
+    def nodes(self):
+        return set(self.blockers) | set(self.dependents)
+
+    @property
+    def edges(self):
+        return [(blocker, blocked) for blocker, targets in self.dependents.items() for blocked in targets]
+
+    def _walk(self, start, adjacency):
+        seen = set()
+        queue = deque(adjacency.get(start, ()))
+        while queue:
+            node = queue.popleft()
+            if node in seen:
+                continue
+            seen.add(node)
+            queue.extend(adjacency.get(node, ()))
+        return seen
+
+    def transitive_blockers(self, task_id):
+        """Todas as tarefas que precisam terminar antes de ``task_id``"""
+        return self._walk(task_id, self.blockers)
+
+    def downstream(self, task_id):
+        """Todas as tarefas que dependem, direta ou indiretamente, de ``task_id``"""
+        return self._walk(task_id, self.dependents)
+
+    def would_cycle(self, blocker, blocked):
+        return blocker == blocked or blocker in self.downstream(blocked)
+
+    def blocked(self, statuses):
+        """Tarefas com alguma bloqueadora direta não concluída (``statuses``: {id: status})"""
+        return {
+            node for node, blockers in self.blockers.items()
+            if any(statuses.get(blocker) not in DONE_STATUSES for blocker in blockers)
+        }
+
+    def topological_order(self):
+        """Bloqueadoras antes das bloqueadas (empates pela ordem dos ids); CycleError se houver ciclo"""
+        remaining = {node: len(self.blockers.get(node, ())) for node in self.nodes}
+        ready = [(str(node), node) for node, count in remaining.items() if count == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            _, node = heapq.heappop(ready)
+            order.append(node)
+            for blocked in self.dependents.get(node, ()):
+                remaining[blocked] -= 1
+                if remaining[blocked] == 0:
+                    heapq.heappush(ready, (str(blocked), blocked))
+        if len(order) != len(remaining):
+            raise CycleError('Dependency graph has a cycle')
+        return order
+
+    def critical_path(self, hours):
+        """(total de horas, [tarefas]) da cadeia mais longa; ``hours``: {id: horas}"""
+        best, previous = {}, {}
+        for node in self.topological_order():
+            start, via = 0.0, None
+            for blocker in self.blockers.get(node, ()):
+                if best[blocker] > start:
+                    start, via = best[blocker], blocker
+            best[node] = start + float(hours.get(node) or 0)
+            previous[node] = via
+        if not best:
+            return 0.0, []
+        node = max(best, key=lambda key: (best[key], str(key)))
+        total, path = best[node], []
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        return total, path[::-1]
+
+
+def board_graph(board_id):
+    """Grafo das dependências do quadro (cache, senão uma consulta)"""
+    from .models import TaskDependency
+
+    key = GRAPH_CACHE_KEY.format(board_id)
+    edges = cache.get(key)
+    if edges is None:
+        rows = TaskDependency.objects.filter(
+            Q(task__board_id=board_id) | Q(depends_on__board_id=board_id)
+        ).values_list('task_id', 'depends_on_id', 'dependency_type')
+        # Ids como texto: o cache de produção serializa em JSON
+        edges = [[str(blocker), str(blocked)] for blocker, blocked in filter(None, (normalize(*row) for row in rows))]
+        cache.set(key, edges, GRAPH_CACHE_TIMEOUT)
+    return DependencyGraph((uuid.UUID(blocker), uuid.UUID(blocked)) for blocker, blocked in edges)
+
+
+def invalidate(*board_ids):
+    cache.delete_many([GRAPH_CACHE_KEY.format(board_id) for board_id in board_ids])
+
+
+def task_attributes(task_ids):
+    """{id: (status, estimated_hours)} das tarefas, em uma consulta"""
+    from .models import Task
+
+    rows = Task.objects.filter(pk__in=list(task_ids)).values_list('pk', 'status', 'estimated_hours')
+    return {pk: (status, hours) for pk, status, hours in rows}
+
+
+def direct_blockers(task_id):
+    """Bloqueadoras diretas de ``task_id`` em qualquer quadro, em uma consulta"""
+    from .models import TaskDependency
+
+    rows = TaskDependency.objects.filter(
+        Q(task_id=task_id) | Q(depends_on_id=task_id)
+    ).values_list('task_id', 'depends_on_id', 'dependency_type')
+    return {edge[0] for edge in (normalize(*row) for row in rows) if edge and edge[1] == task_id}
+
+
+def _chain_sql(direction):
+    from .models import TaskDependency
+
+    opts = TaskDependency._meta
+    qn = connection.ops.quote_name
+    table = qn(opts.db_table)
+    task, depends_on = qn(opts.get_field('task').column), qn(opts.get_field('depends_on').column)
+    kind = qn(opts.get_field('dependency_type').column)
+    pk = qn(opts.pk.column)
+    source, target = ('blocked', 'blocker') if direction == 'blockers' else ('blocker', 'blocked')
+    return f"""
+        WITH RECURSIVE edges (blocker, blocked) AS (
+            SELECT {depends_on}, {task} FROM {table} WHERE {kind} = 'depends_on' AND {pk} <> %s
+            UNION ALL
+            SELECT {task}, {depends_on} FROM {table} WHERE {kind} = 'blocks' AND {pk} <> %s
+        ),
+        chain (node) AS (
+            SELECT {target} FROM edges WHERE {source} = %s
+            UNION
+            SELECT edges.{target} FROM edges JOIN chain ON edges.{source} = chain.node
+        )
+        SELECT node FROM chain
+    """
+
+
+def chain(task_id, direction='blockers', exclude=None):
+    """
+    Bloqueadoras (``blockers``) ou dependentes (``downstream``) transitivas
+    de ``task_id`` em qualquer quadro, com uma consulta recursiva (ignorando
+    a dependência de id ``exclude``).
+    """
+    from .models import Task
+
+    pk = Task._meta.pk
+    task_id = task_id if isinstance(task_id, uuid.UUID) else uuid.UUID(str(task_id))
+    with connection.cursor() as cursor:
+        exclude = -1 if exclude is None else exclude
+        cursor.execute(_chain_sql(direction), [exclude, exclude, pk.get_db_prep_value(task_id, connection)])
+        return {pk.to_python(row[0]) for row in cursor.fetchall()}
+
+
+def validate_edge(task_id, depends_on_id, dependency_type, exclude=None):
+    """ValidationError se a dependência fechar um ciclo (``exclude``: a própria, ao alterar)"""
+    edge = normalize(task_id, depends_on_id, dependency_type)
+    if edge is None:
+        return
+    blocker, blocked = edge
+    if blocker == blocked or blocker in chain(blocked, 'downstream', exclude):
+        raise ValidationError('Esta dependência criaria um ciclo entre as tarefas.')
+
+
+def board_summary(board_id):
+    """Ordem topológica, caminho crítico e tarefas bloqueadas do quadro"""
+    graph = board_graph(board_id)
+    attributes = task_attributes(graph.nodes)
+    statuses = {pk: status for pk, (status, _) in attributes.items()}
+    hours, path = graph.critical_path({pk: hours for pk, (_, hours) in attributes.items()})
+    return {
+        'order': [str(pk) for pk in graph.topological_order()],
+        'critical_path': {'hours': hours, 'tasks': [str(pk) for pk in path]},
+        'blocked': sorted(str(pk) for pk in graph.blocked(statuses)),
+    }
@@ -0,0 +1,20 @@
+"""
+Comando dos gatilhos por prazo das automações (tasks.automation).
+
+Varre as tarefas cujo prazo entrou na janela de ``due_date_approaching`` ou
+venceu (``overdue``) desde a última execução e agenda as ações. Agendar
+periodicamente, por exemplo via cron:
+
+    */30 * * * * python manage.py run_task_automations
+"""
+from django.core.management.base import BaseCommand
+
+from tasks.automation import sweep_due_dates
+
+
+class Command(BaseCommand):
+    help = 'Disparar as automações de tarefas por prazo (próximo do vencimento e atrasadas)'
+
+    def handle(self, *args, **options):
+        total = sweep_due_dates()
+        self.stdout.write(self.style.SUCCESS(f'{total} execuções de automação agendadas'))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-17 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskboard',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Versão'),
+        ),
+    ]
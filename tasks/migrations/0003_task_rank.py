@@ -0,0 +1,39 @@
+# Generated by Django 4.2.13 on 2026-10-17 02:05
+
+from django.db import migrations, models
+
+
+def populate_ranks(apps, schema_editor):
+    from tasks.ranking import spread_keys
+
+    Task = apps.get_model('tasks', 'Task')
+    column_ids = Task.objects.order_by().values_list('column_id', flat=True).distinct()
+    for column_id in list(column_ids):
+        tasks = list(Task.objects.filter(column_id=column_id).order_by('order', '-created_at').only('pk'))
+        for task, key in zip(tasks, spread_keys(len(tasks))):
+            task.rank = key
+        Task.objects.bulk_update(tasks, ['rank'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_taskboard_version'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='task',
+            options={'ordering': ['column', 'rank', '-created_at'], 'verbose_name': 'Tarefa', 'verbose_name_plural': 'Tarefas'},
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='rank',
+            field=models.CharField(default='', editable=False, max_length=128, verbose_name='Posição'),
+        ),
+        migrations.RunPython(populate_ranks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['column', 'rank'], name='tasks_task_column_rank_idx'),
+        ),
+    ]
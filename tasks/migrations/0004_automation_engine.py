@@ -0,0 +1,46 @@
+# Generated by Django 4.2.13 on 2026-10-17 02:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_task_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskautomation',
+            name='execution_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Execuções'),
+        ),
+        migrations.AddField(
+            model_name='taskautomation',
+            name='failure_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Falhas'),
+        ),
+        migrations.AddField(
+            model_name='taskautomation',
+            name='last_executed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Última Execução'),
+        ),
+        migrations.AddField(
+            model_name='taskautomation',
+            name='last_latency_ms',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Última Latência (ms)'),
+        ),
+        migrations.AddField(
+            model_name='taskautomation',
+            name='total_latency_ms',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Latência Total (ms)'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['due_date', 'status'], name='tasks_task_due_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskautomation',
+            index=models.Index(fields=['board', 'trigger'], name='tasks_automation_trigger_idx'),
+        ),
+    ]
@@ -32,6 +32,8 @@ class TaskBoard(models.Model):
     is_active = models.BooleanField('Ativo', default=True)
     is_template = models.BooleanField('É Template', default=False)
     background_color = models.CharField('Cor de Fundo', max_length=7, default='#FFFFFF')
+    # Incrementada a cada alteração de tarefa do quadro (tasks.board_state)
+    version = models.PositiveBigIntegerField('Versão', default=0, editable=False)
     created_at = models.DateTimeField('Criado em', auto_now_add=True)
     updated_at = models.DateTimeField('Atualizado em', auto_now=True)
 
@@ -173,14 +175,30 @@ class TaskAutomation(models.Model):
         verbose_name='Criado por'
     )
 
+    # Execução (tasks.automation)
+    execution_count = models.PositiveIntegerField('Execuções', default=0, editable=False)
+    failure_count = models.PositiveIntegerField('Falhas', default=0, editable=False)
+    total_latency_ms = models.PositiveBigIntegerField('Latência Total (ms)', default=0, editable=False)
+    last_latency_ms = models.PositiveIntegerField('Última Latência (ms)', null=True, blank=True, editable=False)
+    last_executed_at = models.DateTimeField('Última Execução', null=True, blank=True, editable=False)
+
     class Meta:
         verbose_name = 'Automação'
         verbose_name_plural = 'Automações'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['board', 'trigger'], name='tasks_automation_trigger_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.board.name}"
 
+    @property
+    def average_latency_ms(self):
+        if not self.execution_count:
+            return None
+        return self.total_latency_ms / self.execution_count
+
 class Task(models.Model):
     """Tarefas individuais"""
     PRIORITY_CHOICES = [
@@ -247,6 +265,8 @@ class Task(models.Model):
     
     # Posicionamento
     order = models.IntegerField('Ordem na Coluna', default=0)
+    # Chave fracionária da posição na coluna (tasks.ranking)
+    rank = models.CharField('Posição', max_length=128, default='', editable=False)
     
     # Timestamps
     created_at = models.DateTimeField('Criado em', auto_now_add=True)
@@ -257,7 +277,11 @@ class Task(models.Model):
     class Meta:
         verbose_name = 'Tarefa'
         verbose_name_plural = 'Tarefas'
-        ordering = ['column', 'order', '-created_at']
+        ordering = ['column', 'rank', '-created_at']
+        indexes = [
+            models.Index(fields=['column', 'rank'], name='tasks_task_column_rank_idx'),
+            models.Index(fields=['due_date', 'status'], name='tasks_task_due_status_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -268,6 +292,10 @@ class Task(models.Model):
             self.started_at = timezone.now()
         elif self.status == 'completed' and not self.completed_at:
             self.completed_at = timezone.now()
+        if not self.rank:
+            # Nova tarefa: fim da coluna
+            from .ranking import rank_for
+            self.rank = rank_for(self.column_id)
         super().save(*args, **kwargs)
 
     def is_overdue(self):
@@ -464,6 +492,12 @@ class TaskDependency(models.Model):
     def __str__(self):
         return f"{self.task.title} → {self.depends_on.title}"
 
+    def save(self, *args, **kwargs):
+        # Dependências circulares são rejeitadas (tasks.dependencies)
+        from .dependencies import validate_edge
+        validate_edge(self.task_id, self.depends_on_id, self.dependency_type, exclude=self.pk)
+        super().save(*args, **kwargs)
+
 
 class TaskLabel(models.Model):
     """Labels/Tags para categorização de tarefas"""
@@ -0,0 +1,235 @@
+"""
+Ordenação dos cartões por rank fracionário.
+
+``Task.rank`` é uma chave em base 36 (``0-9a-z``) lida como a parte
+fracionária de um número: a ordem lexicográfica das chaves é a ordem dos
+cartões na coluna, e sempre existe uma chave entre duas outras. Mover um
+cartão é então um UPDATE de uma linha, com uma chave entre as dos vizinhos
+(``key_between``), sem renumerar a coluna.
+
+Cada chave gerada recebe JITTER_DIGITS dígitos aleatórios no fim, de modo
+que duas usuárias soltando cartões entre os mesmos vizinhos ao mesmo tempo
+recebem chaves diferentes. As chaves crescem quando muitos cartões caem no
+mesmo ponto; passando de REBALANCE_LENGTH, o job ``rebalance_task_ranks``
+redistribui as chaves da coluna (``spread_keys``) em background.
+
+Só dígitos e minúsculas: a ordem é a mesma em qualquer collation do banco.
+"""
+import random
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.background_jobs import register_job, report_progress, schedule_job
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+JITTER_DIGITS = 2
+REBALANCE_LENGTH = getattr(settings, 'TASK_RANK_REBALANCE_LENGTH', 24)
+REBALANCE_COOLDOWN = 60
+REBALANCE_LOCK_KEY = 'task_rank_rebalance_{}'
+
+
+def _digit(key, index):
+    return DIGITS.index(key[index]) if index < len(key) else 0
+
+
+def key_between(before=None, after=None, jitter=True):
+    """
+    Chave estritamente entre ``before`` e ``after`` (None: início/fim da
+    coluna). Nunca termina em '0', então continua havendo espaço dos dois
+    lados.
+    """
+    before = before or ''
+    if after is not None and after <= before:
+        raise ValueError(f"Rank {before!r} is not before {after!r}")
+
+    key = []
+    bounded = after is not None
+    index = 0
+    while True:
+        low = _digit(before, index)
+        high = _digit(after, index) if bounded else BASE
+        if high - low > 1:
+            # Sem limite superior, avançar um dígito deixa espaço para os próximos
+            key.append(DIGITS[(low + high) // 2 if bounded else low + 1])
+            break
+        key.append(DIGITS[low])
+        if high - low == 1:
+            # Já abaixo de ``after``: basta ficar acima do restante de ``before``
+            bounded = False
+        index += 1
+
+    if jitter:
+        key.extend(random.choice(DIGITS[1:]) for _ in range(JITTER_DIGITS))
+    return ''.join(key)
+
+
+def keys_between(before, after, count):
+    """``count`` chaves crescentes entre ``before`` e ``after``"""
+    keys = []
+    for _ in range(count):
+        before = key_between(before, after)
+        keys.append(before)
+    return keys
+
+
+def spread_keys(count):
+    """``count`` chaves curtas e igualmente espaçadas (rebalanceamento)"""
+    width = 1
+    while BASE ** width < 2 * (count + 1):
+        width += 1
+    step = BASE ** width // (count + 1)
+    keys = []
+    for position in range(1, count + 1):
+        value = step * position
+        digits = []
+        for _ in range(width):
+            value, remainder = divmod(value, BASE)
+            digits.append(DIGITS[remainder])
+        keys.append(''.join(reversed(digits)).rstrip('0'))
+    return keys
+
+
+def neighbour_ranks(column_id, before_id=None, after_id=None, position=None, exclude=()):
+    """
+    Ranks dos vizinhos do ponto de inserção, em uma consulta: pelos ids dos
+    cartões acima (``before_id``) e abaixo (``after_id``), ou pela posição
+    (índice na coluna, sem contar os cartões de ``exclude``). Sem nenhum
+    deles, o fim da coluna.
+    """
+    from .models import Task
+
+    tasks = Task.objects.filter(column_id=column_id).exclude(pk__in=list(exclude)).order_by('rank', 'pk')
+    if before_id or after_id:
+        ids = {key: _uuid(pk) for key, pk in (('before', before_id), ('after', after_id)) if pk}
+        ranks = dict(tasks.filter(pk__in=ids.values()).values_list('pk', 'rank'))
+        return ranks.get(ids.get('before')), ranks.get(ids.get('after'))
+    if position is None:
+        return tasks.reverse().values_list('rank', flat=True).first(), None
+
+    position = max(int(position), 0)
+    if position == 0:
+        return None, tasks.values_list('rank', flat=True).first()
+    ranks = list(tasks.values_list('rank', flat=True)[position - 1:position + 1])
+    return (ranks[0] if ranks else None), (ranks[1] if len(ranks) > 1 else None)
+
+
+def _uuid(value):
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def clean_neighbours(before_id=None, after_id=None, position=None):
+    """Vizinhos vindos do cliente validados; ValueError se malformados"""
+    try:
+        position = None if position in (None, '') else int(position)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid position: {position!r}")
+    if position is not None and position < 0:
+        raise ValueError(f"Invalid position: {position!r}")
+    try:
+        before_id = _uuid(before_id) if before_id else None
+        after_id = _uuid(after_id) if after_id else None
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError('Invalid neighbour task id')
+    if before_id and before_id == after_id:
+        raise ValueError('Neighbour tasks must be different')
+    return {'before_id': before_id, 'after_id': after_id, 'position': position}
+
+
+def insertion_bounds(column_id, exclude=(), **neighbours):
+    """
+    (rank anterior, rank posterior) do ponto de inserção. Vizinhos com a
+    mesma chave (rank duplicado) disparam um rebalanceamento da coluna;
+    vizinhos fora de ordem são erro do cliente (ValueError).
+    """
+    neighbours = clean_neighbours(**neighbours)
+    before, after = neighbour_ranks(column_id, exclude=exclude, **neighbours)
+    if before is not None and before == after:
+        rebalance_column(column_id)
+        before, after = neighbour_ranks(column_id, exclude=exclude, **neighbours)
+    if before is not None and after is not None and after < before:
+        raise ValueError(f"Rank {before!r} is not before {after!r}")
+    return before, after
+
+
+def rank_for(column_id, **neighbours):
+    """Nova chave para um cartão inserido na coluna (ver ``insertion_bounds``)"""
+    key = key_between(*insertion_bounds(column_id, **neighbours))
+    if len(key) > REBALANCE_LENGTH:
+        schedule_rebalance(column_id)
+    return key
+
+
+def move_task(task, column, **neighbours):
+    """Mover ``task`` para ``column`` entre os vizinhos indicados (um UPDATE)"""
+    task.rank = rank_for(column.pk, exclude=[task.pk], **neighbours)
+    task.column = column
+    task.save(update_fields=['column', 'rank', 'updated_at'])
+    return task
+
+
+def reorder_tasks(tasks, column, **neighbours):
+    """
+    Colocar ``tasks`` (na ordem dada) juntos em ``column`` entre os vizinhos
+    indicados: um bulk_update com chaves consecutivas. bulk_update não
+    dispara sinais, então os deltas do quadro e o gatilho ``task_moved`` das
+    tarefas que mudaram de coluna são emitidos aqui.
+    """
+    from . import automation, board_state
+    from .models import Task
+
+    before, after = insertion_bounds(column.pk, exclude=[task.pk for task in tasks], **neighbours)
+    keys = keys_between(before, after, len(tasks))
+    from_columns = {task.pk: task.column_id for task in tasks}
+    for task, key in zip(tasks, keys):
+        task.column = column
+        task.rank = key
+    Task.objects.bulk_update(tasks, ['column', 'rank'])
+    board_state.publish_many(column.board_id, 'task.moved', tasks)
+    automation.dispatch_many('task_moved', [
+        (task, {'from_column': from_columns[task.pk]}) for task in tasks if from_columns[task.pk] != column.pk
+    ])
+    if keys and len(keys[-1]) > REBALANCE_LENGTH:
+        schedule_rebalance(column.pk)
+    return keys
+
+
+def rebalance_column(column_id):
+    """
+    Redistribuir as chaves da coluna mantendo a ordem; retorna quantos
+    cartões. Os cartões mudam de chave, então cada um vira um delta
+    ``task.moved`` (os quadros conectados posicionam os cartões pelo rank).
+    """
+    from . import board_state
+    from .models import Task
+
+    with transaction.atomic():
+        tasks = list(
+            Task.objects.select_for_update().filter(column_id=column_id).order_by('rank', 'pk').only(
+                'board', 'column', 'rank', 'title', 'priority', 'status', 'due_date', 'assignee', 'updated_at'
+            )
+        )
+        for task, key in zip(tasks, spread_keys(len(tasks))):
+            task.rank = key
+        Task.objects.bulk_update(tasks, ['rank'], batch_size=500)
+        if tasks:
+            board_state.publish_many(tasks[0].board_id, 'task.moved', tasks)
+    return len(tasks)
+
+
+@register_job
+def rebalance_task_ranks(column_id):
+    """Job de rebalanceamento das chaves de uma coluna"""
+    count = rebalance_column(column_id)
+    report_progress(count, count)
+    return count
+
+
+def schedule_rebalance(column_id):
+    """Agendar o rebalanceamento (no máximo um por coluna a cada REBALANCE_COOLDOWN)"""
+    if cache.add(REBALANCE_LOCK_KEY.format(column_id), True, REBALANCE_COOLDOWN):
+        job_id = f'task_rank_rebalance_{column_id}_{uuid.uuid4().hex[:8]}'
+        schedule_job(job_id, rebalance_task_ranks, args=(column_id,), priority=0)
@@ -0,0 +1,137 @@
+"""
+Stream SSE dos deltas de um quadro Kanban (tasks.board_state).
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
+
+from notifications.hub import TooManyConnections
+from notifications.realtime import _sse_message
+
+from . import board_state
+from .models import TaskBoard
+
+logger = logging.getLogger(__name__)
+
+
+def board_for_user(user, board_id):
+    """Quadro ``board_id`` se a usuária for dona ou membro, senão None"""
+    return TaskBoard.objects.filter(
+        Q(owner=user) | Q(members=user), pk=board_id
+    ).distinct().first()
+
+
+def _json_error(message, status):
+    return HttpResponse(json.dumps({'error': message}), content_type='application/json', status=status)
+
+
+class BoardStreamView(View):
+    """
+    Deltas do quadro via Server-Sent Events.
+
+    O id de cada evento é a versão do quadro: o navegador reenvia
+    ``Last-Event-ID`` ao reconectar (na primeira conexão, ``?since=`` com a
+    versão do snapshot) e recebe os deltas perdidos do cache. Se não for
+    possível cobrir o intervalo, o stream envia ``resync`` com a versão atual
+    e o cliente busca um novo snapshot.
+
+    Sob WSGI a resposta é curta (deltas perdidos + ``retry``), como no stream
+    de notificações.
+    """
+
+    heartbeat_interval = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 25)
+    retry_ms = getattr(settings, 'NOTIFICATION_STREAM_RETRY_MS', 5000)
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Views assíncronas não podem rodar dentro de ATOMIC_REQUESTS
+        return transaction.non_atomic_requests(super().as_view(**initkwargs))
+
+    async def get(self, request, board_id):
+        user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+        if user is None:
+            return _json_error('Autenticação necessária', 401)
+        board = await sync_to_async(board_for_user)(user, board_id)
+        if board is None:
+            return _json_error('Acesso negado', 403)
+
+        since = self._since(request)
+        if not isinstance(request, ASGIRequest):
+            backlog = await self._backlog(board, since)
+            response = StreamingHttpResponse(self._short_stream(board, backlog), content_type='text/event-stream')
+            return self._stream_headers(response)
+
+        try:
+            subscription = board_state.board_hub.subscribe(board.pk)
+        except TooManyConnections:
+            logger.warning(f"SSE connection limit reached for task board {board.pk}")
+            return _json_error('Muitas conexões abertas', 429)
+
+        # Versão relida depois de assinar: o que vier depois dela chega pelo hub
+        board.version = await sync_to_async(
+            lambda: TaskBoard.objects.values_list('version', flat=True).get(pk=board.pk)
+        )()
+        backlog = await self._backlog(board, since)
+        response = StreamingHttpResponse(
+            self._event_stream(subscription, board, backlog), content_type='text/event-stream'
+        )
+        return self._stream_headers(response)
+
+    def _since(self, request):
+        raw = request.headers.get('Last-Event-ID') or request.GET.get('since')
+        try:
+            return int(raw) if raw else None
+        except ValueError:
+            return None
+
+    async def _backlog(self, board, since):
+        """Deltas perdidos desde ``since`` (None: o cliente deve re-sincronizar)"""
+        if since is None:
+            return []
+        return await sync_to_async(board_state.deltas_since)(board.pk, since, board.version)
+
+    def _backlog_messages(self, board, backlog):
+        if backlog is None:
+            yield _sse_message('resync', {'version': board.version})
+            return
+        for delta in backlog:
+            yield _sse_message('delta', delta, delta['version'])
+
+    def _short_stream(self, board, backlog):
+        yield f"retry: {self.retry_ms}\n\n"
+        yield _sse_message('connected', {'version': board.version, 'timestamp': timezone.now().isoformat()})
+        yield from self._backlog_messages(board, backlog)
+
+    async def _event_stream(self, subscription, board, backlog):
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            yield _sse_message('connected', {'version': board.version, 'timestamp': timezone.now().isoformat()})
+            for message in self._backlog_messages(board, backlog):
+                yield message
+
+            while True:
+                try:
+                    message = await subscription.get(timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield f": heartbeat {timezone.now().isoformat()}\n\n"
+                    continue
+                # Deltas já cobertos pelo backlog
+                if message['id'] <= board.version:
+                    continue
+                yield _sse_message(message['event'], message['data'], message['id'])
+        finally:
+            subscription.close()
+
+    def _stream_headers(self, response):
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
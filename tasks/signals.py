@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import Task, TaskActivity, TaskBoard, TaskColumn
+from . import automation, board_state, dependencies
+from .models import Task, TaskActivity, TaskAutomation, TaskBoard, TaskColumn, TaskDependency
 
 User = get_user_model()
 
@@ -57,3 +59,58 @@ def log_task_deletion(sender, instance, **kwargs):
         activity_type='deleted',
         description=f'Tarefa "{instance.title}" foi excluída'
     )
+
+
+@receiver(post_init, sender=Task)
+def remember_task_state(sender, instance, **kwargs):
+    """Guardar coluna, posição e status carregados (deltas do quadro e automações)"""
+    # __dict__: campos adiados (only/defer) não devem disparar consultas
+    instance._loaded_state = {field: instance.__dict__.get(field) for field in ('column_id', 'rank', 'status')}
+
+
+@receiver(post_save, sender=Task)
+def publish_task_saved(sender, instance, created, raw=False, **kwargs):
+    """Delta do quadro e gatilhos de automação para tarefa criada, movida ou alterada"""
+    if raw:
+        return
+    loaded = instance._loaded_state
+    moved = not created and instance.column_id != loaded['column_id']
+    if created:
+        event = 'task.created'
+    elif moved or instance.rank != loaded['rank']:
+        event = 'task.moved'
+    else:
+        event = 'task.updated'
+    board_state.publish(instance.board_id, event, instance)
+
+    if created:
+        automation.dispatch('task_created', instance)
+    elif moved:
+        automation.dispatch('task_moved', instance, from_column=loaded['column_id'])
+    if instance.status == 'completed' and (created or loaded['status'] != 'completed'):
+        automation.dispatch('task_completed', instance)
+    remember_task_state(sender, instance)
+
+
+@receiver(post_delete, sender=Task)
+def publish_task_deleted(sender, instance, **kwargs):
+    """Delta do quadro para tarefa excluída"""
+    board_state.publish(instance.board_id, 'task.deleted', instance)
+
+
+@receiver(post_save, sender=TaskAutomation)
+@receiver(post_delete, sender=TaskAutomation)
+def invalidate_automation_rules(sender, instance, **kwargs):
+    """Recompilar as regras do quadro no próximo evento (depois do commit)"""
+    board_id = instance.board_id
+    transaction.on_commit(lambda: automation.rule_index.invalidate(board_id))
+
+
+@receiver(post_save, sender=TaskDependency)
+@receiver(post_delete, sender=TaskDependency)
+def invalidate_dependency_graph(sender, instance, **kwargs):
+    """Descartar os grafos em cache dos quadros das duas pontas (depois do commit)"""
+    board_ids = set(Task.objects.filter(
+        pk__in=[instance.task_id, instance.depends_on_id]
+    ).values_list('board_id', flat=True))
+    transaction.on_commit(lambda: dependencies.invalidate(*board_ids))
@@ -0,0 +1,513 @@
+import json
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from tasks import automation, board_state, dependencies, ranking
+from tasks.models import Task, TaskAutomation, TaskBoard, TaskDependency, TaskLabel
+
+
+class BoardStateTests(TestCase):
+    """Snapshot do quadro e deltas versionados"""
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user(
+            username='dona', email='dona@example.com', password='senha-segura-123', first_name='Ana'
+        )
+        self.outsider = User.objects.create_user(
+            username='outra', email='outra@example.com', password='senha-segura-123'
+        )
+        self.board = TaskBoard.objects.create(name='Projeto', owner=self.owner)
+        self.todo, self.doing = self.board.columns.order_by('order')[:2]
+        TaskLabel.objects.create(name='Urgente', color='#FF0000', board=self.board)
+
+    def _task(self, title='Tarefa', **fields):
+        fields.setdefault('column', self.todo)
+        return Task.objects.create(title=title, board=self.board, reporter=self.owner, **fields)
+
+    def _fresh_board(self):
+        return TaskBoard.objects.get(pk=self.board.pk)
+
+    def test_snapshot_query_count_independent_of_task_count(self):
+        for index in range(3):
+            self._task(f'T{index}', assignee=self.owner)
+        board = self._fresh_board()
+        with self.assertNumQueries(4):
+            board_state.snapshot(board)
+
+        for index in range(30):
+            self._task(f'U{index}', column=self.doing, due_date=date.today() - timedelta(days=1))
+        board = self._fresh_board()
+        with self.assertNumQueries(4):
+            state = board_state.snapshot(board)
+
+        self.assertEqual(state['version'], 33)
+        self.assertEqual(state['counts']['total'], 33)
+        self.assertEqual(state['counts']['overdue'], 30)
+        self.assertEqual(len(state['tasks']), 33)
+        self.assertEqual([label['name'] for label in state['labels']], ['Urgente'])
+        self.assertEqual(state['assignees'], [{'id': self.owner.pk, 'name': 'Ana', 'total': 3, 'open': 3}])
+        counts = {column['id']: column['task_count'] for column in state['columns']}
+        self.assertEqual(counts[self.todo.pk], 3)
+        self.assertEqual(counts[self.doing.pk], 30)
+
+    def test_task_changes_publish_versioned_deltas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = self._task()
+        with self.captureOnCommitCallbacks(execute=True):
+            task.column = self.doing
+            task.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            task.title = 'Renomeada'
+            task.save()
+
+        board = self._fresh_board()
+        self.assertEqual(board.version, 3)
+        deltas = board_state.deltas_since(board.pk, 0, board.version)
+        self.assertEqual([delta['type'] for delta in deltas], ['task.created', 'task.moved', 'task.updated'])
+        self.assertEqual(deltas[1]['task']['column_id'], self.doing.pk)
+        self.assertEqual(deltas[2]['task']['title'], 'Renomeada')
+        self.assertEqual(board_state.deltas_since(board.pk, 2, 3), deltas[2:])
+        self.assertEqual(board_state.deltas_since(board.pk, 3, 3), [])
+
+    def test_deltas_since_requires_resync_when_history_is_missing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._task()
+            self._task()
+        self.assertIsNone(board_state.deltas_since(self.board.pk, 0, 5))
+        self.assertIsNone(board_state.deltas_since(self.board.pk, 0, board_state.MAX_RESYNC_DELTAS + 1))
+
+        cache.clear()
+        self.assertIsNone(board_state.deltas_since(self.board.pk, 0, 2))
+
+    def test_snapshot_and_deltas_views(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._task()
+
+        self.client.force_login(self.outsider)
+        response = self.client.get(reverse('tasks:board_snapshot', args=[self.board.pk]))
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('tasks:board_snapshot', args=[self.board.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 1)
+
+        response = self.client.get(reverse('tasks:board_deltas', args=[self.board.pk]), {'since': 0})
+        self.assertEqual(response.json()['deltas'][0]['type'], 'task.created')
+
+        cache.clear()
+        response = self.client.get(reverse('tasks:board_deltas', args=[self.board.pk]), {'since': 0})
+        self.assertEqual(response.json(), {'version': 1, 'resync': True})
+
+    def test_stream_replays_missed_deltas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._task('Primeira')
+            self._task('Segunda')
+
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('tasks:board_stream', args=[self.board.pk]), HTTP_LAST_EVENT_ID='1')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('id: 2\nevent: delta', body)
+        self.assertIn('Segunda', body)
+        self.assertNotIn('Primeira', body)
+
+
+class TaskRankingTests(TestCase):
+    """Ordenação por rank fracionário"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = get_user_model().objects.create_user(
+            username='dona', email='dona@example.com', password='senha-segura-123'
+        )
+        self.board = TaskBoard.objects.create(name='Projeto', owner=self.owner)
+        self.todo, self.doing = self.board.columns.order_by('order')[:2]
+
+    def _tasks(self, count, column=None):
+        return [
+            Task.objects.create(title=f'T{index}', board=self.board, column=column or self.todo, reporter=self.owner)
+            for index in range(count)
+        ]
+
+    def _titles(self, column):
+        return list(column.tasks.order_by('rank', 'pk').values_list('title', flat=True))
+
+    def test_key_between_keeps_order_under_repeated_inserts(self):
+        keys = [ranking.key_between()]
+        for step in range(300):
+            # Sempre no mesmo ponto, no início e no fim
+            index = [1, 0, len(keys)][step % 3]
+            before = keys[index - 1] if index else None
+            after = keys[index] if index < len(keys) else None
+            keys.insert(index, ranking.key_between(before, after))
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+        self.assertTrue(all(key and not key.endswith('0') for key in keys))
+
+        spread = ranking.spread_keys(1000)
+        self.assertEqual(spread, sorted(spread))
+        self.assertEqual(len(set(spread)), 1000)
+        self.assertLessEqual(max(map(len, spread)), 3)
+        with self.assertRaises(ValueError):
+            ranking.key_between('b', 'a')
+
+    def test_new_tasks_go_to_column_end(self):
+        self._tasks(3)
+        self.assertEqual(self._titles(self.todo), ['T0', 'T1', 'T2'])
+
+    def test_move_updates_only_the_moved_row(self):
+        first, second, third = self._tasks(3)
+        with CaptureQueriesContext(connection) as queries:
+            ranking.move_task(third, self.todo, before_id=first.pk, after_id=second.pk)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "tasks_task"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self._titles(self.todo), ['T0', 'T2', 'T1'])
+
+        ranking.move_task(first, self.doing, position=0)
+        ranking.move_task(second, self.doing, position=0)
+        self.assertEqual(self._titles(self.doing), ['T1', 'T0'])
+        self.assertEqual(self._titles(self.todo), ['T2'])
+
+    def test_long_keys_schedule_rebalance(self):
+        first, second = self._tasks(2)
+        with patch.object(ranking, 'REBALANCE_LENGTH', 6), \
+                patch.object(ranking, 'schedule_job') as schedule_job:
+            moving = self._tasks(1, column=self.doing)[0]
+            for _ in range(5):
+                ranking.move_task(moving, self.todo, before_id=first.pk, after_id=second.pk)
+                second, moving = moving, second
+        self.assertEqual(schedule_job.call_count, 1)
+
+        order = self._titles(self.todo)
+        self.assertEqual(ranking.rebalance_task_ranks(self.todo.pk), 3)
+        self.assertEqual(self._titles(self.todo), order)
+        self.assertTrue(all(len(rank) == 1 for rank in self.todo.tasks.values_list('rank', flat=True)))
+
+    def test_duplicate_neighbour_ranks_are_rebalanced(self):
+        first, second, third = self._tasks(3)
+        Task.objects.filter(pk__in=[first.pk, second.pk]).update(rank='i')
+        before, after = sorted([first, second], key=lambda task: task.pk)
+        ranking.move_task(third, self.todo, before_id=before.pk, after_id=after.pk)
+        self.assertEqual(self._titles(self.todo), [before.title, 'T2', after.title])
+
+    def test_rebalance_publishes_new_ranks(self):
+        self._tasks(3)
+        version = TaskBoard.objects.get(pk=self.board.pk).version
+        with self.captureOnCommitCallbacks(execute=True):
+            # Sem carregar campos adiados por cartão ao montar os deltas
+            with self.assertNumQueries(8):
+                self.assertEqual(ranking.rebalance_column(self.todo.pk), 3)
+
+        board = TaskBoard.objects.get(pk=self.board.pk)
+        self.assertEqual(board.version, version + 3)
+        deltas = board_state.deltas_since(board.pk, version, board.version)
+        ranks = dict(self.todo.tasks.values_list('title', 'rank'))
+        self.assertEqual({delta['task']['title']: delta['task']['rank'] for delta in deltas}, ranks)
+
+    def test_invalid_neighbours_are_rejected_without_rebalancing(self):
+        first, second, third = self._tasks(3)
+        with patch.object(ranking, 'rebalance_column') as rebalance:
+            for neighbours in (
+                {'position': 'topo'}, {'position': -1}, {'before_id': 'nao-e-uuid'},
+                {'before_id': second.pk, 'after_id': first.pk},
+            ):
+                with self.assertRaises(ValueError):
+                    ranking.move_task(third, self.todo, **neighbours)
+        rebalance.assert_not_called()
+
+        self.client.force_login(self.owner)
+        for body in ('{', json.dumps({'column_id': self.todo.pk, 'task_ids': [str(third.pk)], 'position': 'x'})):
+            response = self.client.post(reverse('tasks:task_reorder'), body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._titles(self.todo), ['T0', 'T1', 'T2'])
+
+    def test_bulk_reorder_api(self):
+        tasks = self._tasks(4)
+        anchor = self._tasks(1, column=self.doing)[0]
+        self.client.force_login(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('tasks:task_reorder'),
+                json.dumps({
+                    'column_id': self.doing.pk,
+                    'task_ids': [str(tasks[3].pk), str(tasks[1].pk)],
+                    'after_id': str(anchor.pk),
+                }),
+                content_type='application/json',
+            )
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(self._titles(self.doing), ['T3', 'T1', 'T0'])
+        self.assertEqual(self._titles(self.todo), ['T0', 'T2'])
+
+        board = TaskBoard.objects.get(pk=self.board.pk)
+        deltas = board_state.deltas_since(board.pk, board.version - 2, board.version)
+        self.assertEqual([delta['task']['title'] for delta in deltas], ['T3', 'T1'])
+        self.assertEqual({delta['type'] for delta in deltas}, {'task.moved'})
+
+
+class TaskAutomationTests(TestCase):
+    """Motor de automações por quadro"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = get_user_model().objects.create_user(
+            username='dona', email='dona@example.com', password='senha-segura-123'
+        )
+        self.board = TaskBoard.objects.create(name='Projeto', owner=self.owner)
+        self.todo, self.doing, self.review, self.done = self.board.columns.order_by('order')
+        scheduler = patch.object(automation, 'schedule_job')
+        self.schedule_job = scheduler.start()
+        self.addCleanup(scheduler.stop)
+
+    def _rule(self, trigger, action, conditions=None, **action_data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return TaskAutomation.objects.create(
+                name=f'{trigger} {action}', board=self.board, trigger=trigger, action=action,
+                conditions=conditions or {}, action_data=action_data, created_by=self.owner,
+            )
+
+    def _task(self, title='Tarefa', **fields):
+        fields.setdefault('column', self.todo)
+        return Task.objects.create(title=title, board=self.board, reporter=self.owner, **fields)
+
+    def _scheduled(self):
+        return [match for call in self.schedule_job.call_args_list for match in call.kwargs['args'][0]]
+
+    def test_events_are_enqueued_after_commit(self):
+        rule = self._rule('task_created', 'add_comment', {'priority__in': ['high', 'urgent']}, content='Urgente')
+        with self.captureOnCommitCallbacks(execute=True):
+            urgent = self._task(priority='urgent')
+            try:
+                with transaction.atomic():
+                    self._task(priority='high')
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+            self._task(priority='low')
+            self.assertFalse(self.schedule_job.called)
+
+        self.assertEqual(self.schedule_job.call_count, 1)
+        self.assertEqual([match[:2] for match in self._scheduled()], [[rule.pk, str(urgent.pk)]])
+
+    def test_bulk_reorder_is_one_batch(self):
+        rule = self._rule('task_moved', 'add_comment', {'from_column': self.todo.pk}, content='Movida')
+        first, second = self._task('A'), self._task('B')
+        self.schedule_job.reset_mock()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ranking.reorder_tasks([first, second], self.doing, position=0)
+
+        self.assertEqual(self.schedule_job.call_count, 1)
+        self.assertEqual([match[:2] for match in self._scheduled()], [[rule.pk, str(first.pk)], [rule.pk, str(second.pk)]])
+
+    def test_bulk_reorder_dispatches_task_moved(self):
+        rule = self._rule('task_moved', 'add_comment', {'from_column': self.todo.pk}, content='Movida')
+        staying, moving = self._task('Fica', column=self.doing), self._task('Vai')
+        self.schedule_job.reset_mock()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ranking.reorder_tasks([moving, staying], self.doing, position=0)
+
+        self.assertEqual([match[:2] for match in self._scheduled()], [[rule.pk, str(moving.pk)]])
+
+    def test_conditions_evaluate_without_queries(self):
+        rule = self._rule('task_moved', 'change_priority', {'from_column': self.todo.pk, 'column': self.doing.pk})
+        task = self._task()
+        automation.rule_index.rules(self.board.pk, 'task_moved')
+
+        task.column = self.doing
+        with self.assertNumQueries(0):
+            self.assertEqual(automation.dispatch('task_moved', task, from_column=self.todo.pk), 1)
+            self.assertEqual(automation.dispatch('task_moved', task, from_column=self.review.pk), 0)
+
+        rule.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        self.assertEqual(automation.dispatch('task_moved', task, from_column=self.todo.pk), 0)
+
+    def test_execute_runs_actions_and_records_counters(self):
+        move = self._rule('task_completed', 'move_to_column', column_id=self.done.pk)
+        # Não deve disparar: ações de automações não geram novos eventos
+        self._rule('task_moved', 'change_priority', priority='urgent')
+        task = self._task()
+        with self.captureOnCommitCallbacks(execute=True):
+            task.status = 'completed'
+            task.save()
+
+        matches = self._scheduled()
+        self.assertEqual([match[0] for match in matches], [move.pk])
+        self.assertEqual(automation.execute(matches), 1)
+
+        task.refresh_from_db()
+        self.assertEqual(task.column, self.done)
+        self.assertEqual(task.priority, 'medium')
+        move.refresh_from_db()
+        self.assertEqual((move.execution_count, move.failure_count), (1, 0))
+        self.assertIsNotNone(move.last_latency_ms)
+        self.assertIsNotNone(move.last_executed_at)
+
+        missing = self._rule('task_completed', 'move_to_column', column_id=0)
+        automation.execute([[missing.pk, str(task.pk), 0]])
+        missing.refresh_from_db()
+        self.assertEqual((missing.execution_count, missing.failure_count), (1, 1))
+
+    def test_due_date_sweep_uses_one_task_query_per_tick(self):
+        approaching = self._rule('due_date_approaching', 'add_comment', {'days': 2}, content='Prazo')
+        overdue = self._rule('overdue', 'add_comment', content='Atrasada')
+        today = date(2024, 5, 10)
+        soon = self._task('Em breve', due_date=date(2024, 5, 12))
+        late = self._task('Atrasada', due_date=date(2024, 5, 9))
+        self._task('Longe', due_date=date(2024, 5, 20))
+        self._task('Concluída', due_date=date(2024, 5, 9), status='completed')
+        self.schedule_job.reset_mock()
+
+        with self.assertNumQueries(2):
+            self.assertEqual(automation.sweep_due_dates(today), 2)
+        self.assertEqual(
+            sorted(match[:2] for match in self._scheduled()),
+            sorted([[approaching.pk, str(soon.pk)], [overdue.pk, str(late.pk)]]),
+        )
+        # Mesmo dia: nada novo
+        self.assertEqual(automation.sweep_due_dates(today), 0)
+        self.assertEqual(automation.sweep_due_dates(today + timedelta(days=1)), 0)
+
+
+class TaskDependencyGraphTests(TestCase):
+    """Grafo de dependências: ciclos, bloqueios e caminho crítico"""
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user(
+            username='dona', email='dona@example.com', password='senha-segura-123'
+        )
+        self.board = TaskBoard.objects.create(name='Projeto', owner=self.owner)
+        self.other_board = TaskBoard.objects.create(name='Outro', owner=self.owner)
+
+    def _task(self, title, hours=None, board=None, **fields):
+        board = board or self.board
+        return Task.objects.create(
+            title=title, board=board, column=board.columns.first(), reporter=self.owner,
+            estimated_hours=hours, **fields
+        )
+
+    def _depends(self, task, depends_on, dependency_type='depends_on'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return TaskDependency.objects.create(
+                task=task, depends_on=depends_on, dependency_type=dependency_type, created_by=self.owner
+            )
+
+    def test_cycles_are_rejected_across_boards_and_types(self):
+        a, b, c = self._task('A'), self._task('B'), self._task('C', board=self.other_board)
+        self._depends(b, a)
+        self._depends(c, b)
+
+        with self.assertRaises(ValidationError):
+            self._depends(a, c)
+        # ``blocks`` é o sentido inverso: C bloquear A fecha o mesmo ciclo
+        with self.assertRaises(ValidationError):
+            self._depends(c, a, 'blocks')
+        with self.assertRaises(ValidationError):
+            self._depends(a, a)
+        self._depends(c, a, 'related')
+        self._depends(a, c, 'blocks')
+        self.assertEqual(dependencies.chain(c.pk, 'blockers'), {a.pk, b.pk})
+
+    def test_graph_is_loaded_in_one_query_and_invalidated_on_change(self):
+        a, b = self._task('A'), self._task('B')
+        self._depends(b, a)
+        with self.assertNumQueries(1):
+            dependencies.board_graph(self.board.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(dependencies.board_graph(self.board.pk).blockers[b.pk], {a.pk})
+
+        c = self._task('C', board=self.other_board)
+        self._depends(c, b)
+        self.assertEqual(dependencies.board_graph(self.board.pk).downstream(a.pk), {b.pk, c.pk})
+        self.assertEqual(dependencies.board_graph(self.other_board.pk).transitive_blockers(c.pk), {b.pk})
+
+    def test_cached_graph_survives_json_serialization(self):
+        a, b = self._task('A', hours=2), self._task('B', hours=3)
+        self._depends(b, a)
+        dependencies.board_graph(self.board.pk)
+        key = dependencies.GRAPH_CACHE_KEY.format(self.board.pk)
+        # Como o JSONSerializer do django_redis em produção
+        cache.set(key, json.loads(json.dumps(cache.get(key), cls=DjangoJSONEncoder)))
+
+        graph = dependencies.board_graph(self.board.pk)
+        self.assertEqual(graph.transitive_blockers(b.pk), {a.pk})
+        summary = dependencies.board_summary(self.board.pk)
+        self.assertEqual(summary['blocked'], [str(b.pk)])
+        self.assertEqual(summary['critical_path']['hours'], 5.0)
+
+    def test_topological_order_critical_path_and_blocked(self):
+        design = self._task('Design', hours=3)
+        api = self._task('API', hours=8)
+        ui = self._task('UI', hours=2)
+        release = self._task('Release', hours=1)
+        docs = self._task('Docs', hours=1, status='completed')
+        self._depends(api, design)
+        self._depends(ui, design)
+        self._depends(release, api)
+        self._depends(release, ui)
+        self._depends(release, docs)
+
+        summary = dependencies.board_summary(self.board.pk)
+        order = summary['order']
+        self.assertLess(order.index(str(design.pk)), order.index(str(api.pk)))
+        self.assertEqual(order[-1], str(release.pk))
+        self.assertEqual(summary['critical_path']['hours'], 12.0)
+        self.assertEqual(summary['critical_path']['tasks'], [str(design.pk), str(api.pk), str(release.pk)])
+        self.assertEqual(sorted(summary['blocked']), sorted(str(t.pk) for t in (api, ui, release)))
+
+    def test_cycle_detection_scales_to_long_chains(self):
+        tasks = Task.objects.bulk_create([
+            Task(title=f'T{index}', board=self.board, column=self.board.columns.first(), reporter=self.owner,
+                 rank=f'{index:04d}')
+            for index in range(1500)
+        ])
+        TaskDependency.objects.bulk_create([
+            TaskDependency(task=later, depends_on=earlier, created_by=self.owner)
+            for earlier, later in zip(tasks, tasks[1:])
+        ])
+        graph = dependencies.board_graph(self.board.pk)
+        self.assertEqual(len(graph.topological_order()), 1500)
+        self.assertEqual(len(graph.downstream(tasks[0].pk)), 1499)
+        self.assertTrue(graph.would_cycle(tasks[-1].pk, tasks[0].pk))
+        with self.assertNumQueries(1):
+            with self.assertRaises(ValidationError):
+                dependencies.validate_edge(tasks[0].pk, tasks[-1].pk, 'depends_on')
+
+    def test_dependency_views(self):
+        a, b = self._task('A'), self._task('B')
+        self._depends(b, a)
+        self.client.force_login(self.owner)
+
+        response = self.client.get(reverse('tasks:task_dependencies', args=[b.pk]))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['blocked'])
+        self.assertEqual(data['open_blockers'], [str(a.pk)])
+        response = self.client.get(reverse('tasks:task_dependencies', args=[b.pk]), {'cross_board': 1})
+        self.assertEqual(response.json()['blockers'], [str(a.pk)])
+
+        response = self.client.get(reverse('tasks:board_dependencies', args=[self.board.pk]))
+        self.assertEqual(response.json()['order'], [str(a.pk), str(b.pk)])
+
+        outsider = get_user_model().objects.create_user(
+            username='outra', email='outra@example.com', password='senha-segura-123'
+        )
+        self.client.force_login(outsider)
+        response = self.client.get(reverse('tasks:board_dependencies', args=[self.board.pk]))
+        self.assertEqual(response.status_code, 403)
@@ -1,5 +1,6 @@
 from django.urls import path
 from . import views
+from .realtime import BoardStreamView
 
 app_name = 'tasks'
 
@@ -12,6 +13,10 @@ urlpatterns = [
     path('boards/create/', views.board_create, name='board_create'),
     path('boards/<int:board_id>/', views.board_detail, name='board_detail'),
     path('boards/<int:board_id>/edit/', views.board_edit, name='board_edit'),
+    path('boards/<int:board_id>/snapshot/', views.board_snapshot, name='board_snapshot'),
+    path('boards/<int:board_id>/deltas/', views.board_deltas, name='board_deltas'),
+    path('boards/<int:board_id>/stream/', BoardStreamView.as_view(), name='board_stream'),
+    path('boards/<int:board_id>/dependencies/', views.board_dependencies, name='board_dependencies'),
     
     # Tarefas
     path('tasks/', views.task_list, name='task_list'),
@@ -32,9 +37,11 @@ urlpatterns = [
     # AJAX Endpoints
     path('api/task/create/', views.task_create_ajax, name='task_create_ajax'),
     path('api/task/update-column/', views.task_update_column, name='task_update_column'),
+    path('api/task/reorder/', views.task_reorder, name='task_reorder'),
     path('api/task/<uuid:task_id>/detail/', views.task_detail_ajax, name='task_detail_ajax'),
     path('api/task/<uuid:task_id>/update/', views.task_update_ajax, name='task_update_ajax'),
     path('api/task/<uuid:task_id>/delete/', views.task_delete_ajax, name='task_delete_ajax'),
+    path('api/task/<uuid:task_id>/dependencies/', views.task_dependencies, name='task_dependencies'),
     path('api/task/<uuid:task_id>/comment/', views.task_comment_add, name='task_comment_add'),
     path('api/task/<uuid:task_id>/label/add/', views.task_label_add, name='task_label_add'),
     path('api/task/<uuid:task_id>/label/remove/', views.task_label_remove, name='task_label_remove'),
@@ -5,12 +5,16 @@ from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Prefetch
 from django.utils import timezone
 from core.export_utils import export_universal, DataFormatter, ExportManager
+from core.search import search
 from .models import TaskBoard, Task, TaskColumn, TaskComment, TaskActivity
 from .forms import TaskBoardForm, TaskForm, TaskCommentForm
+from . import board_state, dependencies, ranking
+from .realtime import board_for_user
 import json
+import uuid
 
 
 @login_required
@@ -37,8 +41,10 @@ def board_detail(request, board_id):
         messages.error(request, 'Você não tem acesso a este quadro.')
         return redirect('tasks:board_list')
     
-    # Buscar colunas e tarefas
-    columns = board.columns.all().order_by('order')
+    # Buscar colunas e tarefas (tarefas e responsáveis em uma consulta)
+    columns = board.columns.all().order_by('order').prefetch_related(
+        Prefetch('tasks', queryset=Task.objects.select_related('assignee'))
+    )
     
     # Filtros
     assignee_filter = request.GET.get('assignee')
@@ -54,10 +60,37 @@ def board_detail(request, board_id):
         'priority_choices': Task.PRIORITY_CHOICES,
         'assignee_filter': assignee_filter,
         'priority_filter': priority_filter,
+        'board_version': board.version,
     }
     return render(request, 'tasks/board_kanban.html', context)
 
 
+@login_required
+def board_snapshot(request, board_id):
+    """Estado completo do quadro (colunas, tarefas, labels, responsáveis e contagens)"""
+    board = board_for_user(request.user, board_id)
+    if board is None:
+        return JsonResponse({'success': False, 'message': 'Acesso negado'}, status=403)
+    return JsonResponse(board_state.snapshot(board))
+
+
+@login_required
+def board_deltas(request, board_id):
+    """Deltas do quadro desde ``?since=<versão>``; ``resync`` quando é preciso um novo snapshot"""
+    board = board_for_user(request.user, board_id)
+    if board is None:
+        return JsonResponse({'success': False, 'message': 'Acesso negado'}, status=403)
+    try:
+        since = int(request.GET.get('since', ''))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Parâmetro since inválido'}, status=400)
+
+    deltas = board_state.deltas_since(board.pk, since, board.version)
+    if deltas is None:
+        return JsonResponse({'version': board.version, 'resync': True})
+    return JsonResponse({'version': board.version, 'resync': False, 'deltas': deltas})
+
+
 @login_required
 def board_create(request):
     """Criar novo quadro"""
@@ -206,18 +239,19 @@ def move_task(request):
         
         try:
             task = Task.objects.get(id=task_id)
-            new_column = TaskColumn.objects.get(id=column_id)
+            new_column = TaskColumn.objects.get(id=column_id, board_id=task.board_id)
             
             # Verificar se o usuário tem acesso
             if not (task.board.owner == request.user or 
                     task.board.members.filter(id=request.user.id).exists()):
                 return JsonResponse({'success': False, 'message': 'Acesso negado'})
             
-            # Mover tarefa
+            # Mover tarefa (uma linha: chave entre os vizinhos)
             old_column = task.column
-            task.column = new_column
-            task.order = new_order
-            task.save()
+            ranking.move_task(
+                task, new_column,
+                before_id=data.get('before_id'), after_id=data.get('after_id'), position=new_order,
+            )
             
             # Criar atividade
             TaskActivity.objects.create(
@@ -231,6 +265,8 @@ def move_task(request):
             
         except (Task.DoesNotExist, TaskColumn.DoesNotExist):
             return JsonResponse({'success': False, 'message': 'Tarefa ou coluna não encontrada'})
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'Posição inválida'}, status=400)
     
     return JsonResponse({'success': False, 'message': 'Método não permitido'})
 
@@ -277,35 +313,28 @@ def dashboard(request):
 
 @login_required
 def task_search(request):
-    """Buscar tarefas"""
+    """Buscar tarefas no índice textual (core.search), por relevância"""
     query = request.GET.get('q', '')
     board_id = request.GET.get('board')
     
-    tasks = Task.objects.all()
-    
-    if query:
-        tasks = tasks.filter(
-            Q(title__icontains=query) | 
-            Q(description__icontains=query)
-        )
-    
-    if board_id:
-        tasks = tasks.filter(board_id=board_id)
-    
     # Filtrar por acesso do usuário
     user_boards = TaskBoard.objects.filter(
         Q(owner=request.user) | Q(members=request.user)
     ).distinct()
     
-    tasks = tasks.filter(board__in=user_boards)
-    
-    # Paginação
-    paginator = Paginator(tasks, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # A busca aplica a mesma regra de acesso aos quadros
+    scope = {'tasks.Task': Q(board_id=board_id)} if board_id else None
+    try:
+        page = search(
+            request.user, query, sources=['tasks.Task'],
+            cursor=request.GET.get('cursor') or None, scope=scope
+        )
+    except ValueError:
+        page = {'results': [], 'next_cursor': None, 'has_more': False}
     
     context = {
-        'tasks': page_obj,
+        'tasks': page['results'],
+        'next_cursor': page['next_cursor'],
         'query': query,
         'board_id': board_id,
         'user_boards': user_boards,
@@ -380,21 +409,23 @@ def task_update_column(request):
     
     try:
         task = get_object_or_404(Task, id=data.get('task_id'))
-        column = get_object_or_404(TaskColumn, id=data.get('column_id'))
+        column = get_object_or_404(TaskColumn, id=data.get('column_id'), board_id=task.board_id)
         
         # Verificar se o usuário tem acesso
         if task.board.owner != request.user and not task.board.members.filter(id=request.user.id).exists():
             return JsonResponse({'success': False, 'message': 'Acesso negado'})
         
         old_column = task.column
-        task.column = column
-        task.save()
+        ranking.move_task(
+            task, column,
+            before_id=data.get('before_id'), after_id=data.get('after_id'), position=data.get('position'),
+        )
         
         # Registrar atividade
         TaskActivity.objects.create(
             task=task,
             user=request.user,
-            action='moved',
+            activity_type='moved',
             description=f'Tarefa movida de {old_column.name} para {column.name}'
         )
         
@@ -404,6 +435,79 @@ def task_update_column(request):
         return JsonResponse({'success': False, 'message': str(e)})
 
 
+@login_required
+def board_dependencies(request, board_id):
+    """Ordem topológica, caminho crítico e tarefas bloqueadas do quadro"""
+    board = board_for_user(request.user, board_id)
+    if board is None:
+        return JsonResponse({'success': False, 'message': 'Acesso negado'}, status=403)
+    try:
+        return JsonResponse(dependencies.board_summary(board.pk))
+    except dependencies.CycleError:
+        return JsonResponse({'success': False, 'message': 'Dependências circulares no quadro'}, status=409)
+
+
+@login_required
+def task_dependencies(request, task_id):
+    """Bloqueadoras transitivas, impacto a jusante e bloqueio da tarefa (``?cross_board=1`` atravessa quadros)"""
+    task = get_object_or_404(Task, id=task_id)
+    if not board_for_user(request.user, task.board_id):
+        return JsonResponse({'success': False, 'message': 'Acesso negado'}, status=403)
+
+    if request.GET.get('cross_board'):
+        blockers = dependencies.chain(task.pk, 'blockers')
+        downstream = dependencies.chain(task.pk, 'downstream')
+        direct = dependencies.direct_blockers(task.pk)
+    else:
+        graph = dependencies.board_graph(task.board_id)
+        blockers, downstream = graph.transitive_blockers(task.pk), graph.downstream(task.pk)
+        direct = graph.blockers.get(task.pk, set())
+
+    statuses = {pk: status for pk, (status, _) in dependencies.task_attributes(blockers).items()}
+    open_blockers = sorted(str(pk) for pk in blockers if statuses.get(pk) not in dependencies.DONE_STATUSES)
+    return JsonResponse({
+        'task_id': str(task.pk),
+        'blocked': any(statuses.get(pk) not in dependencies.DONE_STATUSES for pk in direct),
+        'blockers': sorted(str(pk) for pk in blockers),
+        'open_blockers': open_blockers,
+        'downstream': sorted(str(pk) for pk in downstream),
+    })
+
+
+@login_required
+@require_http_methods(["POST"])
+def task_reorder(request):
+    """Mover várias tarefas juntas (seleção múltipla) para uma coluna via AJAX"""
+    try:
+        data = json.loads(request.body)
+        column_id = int(data.get('column_id'))
+    except (TypeError, ValueError, AttributeError):
+        return JsonResponse({'success': False, 'message': 'Requisição inválida'}, status=400)
+    column = get_object_or_404(TaskColumn.objects.select_related('board'), id=column_id)
+    if not board_for_user(request.user, column.board_id):
+        return JsonResponse({'success': False, 'message': 'Acesso negado'}, status=403)
+
+    try:
+        task_ids = list(dict.fromkeys(uuid.UUID(str(pk)) for pk in data.get('task_ids') or []))
+    except ValueError:
+        task_ids = None
+    tasks = Task.objects.in_bulk(task_ids or [])
+    if not task_ids or len(tasks) != len(task_ids) or any(
+        task.board_id != column.board_id for task in tasks.values()
+    ):
+        return JsonResponse({'success': False, 'message': 'Tarefas inválidas'}, status=400)
+
+    ordered = [tasks[pk] for pk in task_ids]
+    try:
+        ranking.reorder_tasks(
+            ordered, column,
+            before_id=data.get('before_id'), after_id=data.get('after_id'), position=data.get('position'),
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Posição inválida'}, status=400)
+    return JsonResponse({'success': True, 'ranks': {str(task.pk): task.rank for task in ordered}})
+
+
 @login_required
 def task_detail_ajax(request, task_id):
     """Detalhes da tarefa via AJAX"""
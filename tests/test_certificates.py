@@ -0,0 +1,101 @@
+import shutil
+import tempfile
+from datetime import date, time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from certificates import generation
+from certificates.models import Certificate, CertificateTemplate
+from core import job_backends
+from core.background_jobs import JobScheduler, get_job_progress
+from members.models import Beneficiary
+from workshops.models import SessionAttendance, Workshop, WorkshopEnrollment, WorkshopSession
+
+
+class CertificateBatchGenerationTests(TestCase):
+    """Geração de certificados em lote (certificates.generation)"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        # WeasyPrint substituído: o teste cobre o pipeline, não o layout do PDF
+        patcher = mock.patch('certificates.pdf_rendering.write_pdf', return_value=b'%PDF-1.7 teste')
+        self.write_pdf = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.workshop = Workshop.objects.create(
+            name='Costura Básica', description='Oficina', workshop_type='costura',
+            facilitator='Ana', location='Sala 1', start_date=date(2024, 1, 8),
+            status='concluido', objectives='Aprender costura',
+        )
+        self.template = CertificateTemplate.objects.create(name='Padrão', type='workshop')
+        session = WorkshopSession.objects.create(
+            workshop=self.workshop, session_date=date(2024, 1, 8),
+            start_time=time(9), end_time=time(11), topic='Aula 1',
+        )
+        for index, attended in enumerate((True, True, True, False)):
+            beneficiary = Beneficiary.objects.create(
+                full_name=f'Participante {index}', dob='1990-01-01', phone_1='11987654321',
+                address='Rua A', neighbourhood='Centro',
+            )
+            enrollment = WorkshopEnrollment.objects.create(
+                workshop=self.workshop, beneficiary=beneficiary,
+                enrollment_date=date(2024, 1, 1), status='concluido',
+            )
+            SessionAttendance.objects.create(session=session, enrollment=enrollment, attended=attended)
+
+    def test_pending_certificates_created_for_eligible_enrollments(self):
+        pending = generation.pending_certificates(self.workshop)
+
+        self.assertEqual(pending.count(), 3)
+        self.assertEqual(pending.first().instructor, 'Ana')
+        # Chamadas repetidas não duplicam certificados
+        self.assertEqual(generation.pending_certificates(self.workshop).count(), 3)
+
+    def test_batch_generation_stores_pdfs_and_updates_status(self):
+        progress = []
+        result = generation.generate_certificates(
+            generation.pending_certificates(self.workshop), workers=0, chunk_size=2,
+            progress_callback=lambda r: progress.append(r.processed),
+        )
+
+        self.assertEqual((result.generated, result.failed), (3, 0))
+        # Um relatório por bloco concluído
+        self.assertEqual(len(progress), 2)
+        self.assertEqual(progress[-1], 3)
+        certificates = Certificate.objects.filter(workshop=self.workshop)
+        self.assertEqual(set(certificates.values_list('status', flat=True)), {'generated'})
+        with certificates.first().pdf_file.open('rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.7 teste')
+
+        # CSS estático separado do HTML e repassado ao renderizador
+        key, css_sources, _, html = self.write_pdf.call_args[0]
+        self.assertEqual(key, generation.template_key(self.template))
+        self.assertIn('@page', css_sources[0])
+        self.assertNotIn('<style', html)
+        self.assertIn('Participante', html)
+
+    def test_failed_certificate_stays_pending(self):
+        self.write_pdf.side_effect = [b'%PDF', RuntimeError('fonte ausente'), b'%PDF']
+
+        result = generation.generate_certificates(generation.pending_certificates(self.workshop), workers=0)
+
+        self.assertEqual((result.generated, result.failed), (2, 1))
+        self.assertEqual(list(result.errors.values()), ['fonte ausente'])
+        self.assertEqual(Certificate.objects.filter(status='pending').count(), 1)
+
+    @override_settings(CERTIFICATE_GENERATION_WORKERS=0)
+    def test_workshop_job_reports_progress(self):
+        scheduler = JobScheduler(max_workers=1, backend=job_backends.MemoryJobBackend())
+        scheduler.add_job('certificados', generation.generate_workshop_certificates, args=(self.workshop.pk,))
+
+        scheduler.run_pending()
+
+        self.assertEqual(scheduler.get_job_status('certificados')['status'], 'completed')
+        progress = get_job_progress('certificados')
+        self.assertEqual((progress['processed'], progress['total'], progress['generated']), (3, 3, 3))
@@ -8,6 +8,26 @@ class WorkshopAdmin(admin.ModelAdmin):
     list_filter = ['workshop_type', 'status', 'start_date']
     search_fields = ['name', 'facilitator', 'description']
     readonly_fields = ['created_at', 'updated_at']
+
+    actions = ['generate_certificates']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_counts()
+
+    def generate_certificates(self, request, queryset):
+        """Enfileirar a geração dos certificados pendentes dos workshops selecionados"""
+        from certificates.generation import schedule_workshop_certificates
+
+        for workshop in queryset:
+            job_id = schedule_workshop_certificates(workshop)
+            self.message_user(
+                request,
+                f"Geração de certificados de {workshop.name} enfileirada (job {job_id}).",
+                level='SUCCESS'
+            )
+
+    generate_certificates.short_description = "Gerar todos os certificados pendentes"
+
     fieldsets = (
         ('Informações Básicas', {
             'fields': ('name', 'description', 'workshop_type', 'facilitator')
@@ -39,6 +59,10 @@ class WorkshopEnrollmentAdmin(admin.ModelAdmin):
     list_filter = ['workshop', 'status', 'enrollment_date']
     search_fields = ['beneficiary__full_name', 'workshop__name']
     readonly_fields = ['created_at']
+    list_select_related = ['beneficiary', 'workshop']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_attendance()
 
 
 @admin.register(SessionAttendance)
@@ -300,9 +300,16 @@ class BulkAttendanceForm(forms.Form):
                 status='ativo'
             ).select_related('beneficiary').order_by('beneficiary__full_name')
             
+            # Presenças já registradas na sessão, em uma consulta
+            recorded = dict(
+                SessionAttendance.objects.filter(session=session).values_list('enrollment_id', 'attended')
+            )
+            
             # Criar um campo de checkbox para cada matrícula
+            self.enrollment_ids = []
             for enrollment in enrollments:
                 field_name = f'attendance_{enrollment.id}'
+                self.enrollment_ids.append(enrollment.id)
                 self.fields[field_name] = forms.BooleanField(
                     required=False,
                     label=enrollment.beneficiary.full_name,
@@ -310,10 +317,5 @@ class BulkAttendanceForm(forms.Form):
                 )
                 
                 # Marcar como presente se já existe registro
-                existing_attendance = SessionAttendance.objects.filter(
-                    session=session,
-                    enrollment=enrollment
-                ).first()
-                
-                if existing_attendance:
-                    self.fields[field_name].initial = existing_attendance.attended
+                if enrollment.id in recorded:
+                    self.fields[field_name].initial = recorded[enrollment.id]
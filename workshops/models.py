@@ -1,12 +1,30 @@
 from django.db import models
+from django.db.models import Count, Q
 from django.core.validators import MinValueValidator, MaxValueValidator
 from members.models import Beneficiary
-from core.optimized_managers import WorkshopManager
+from core.optimized_managers import (
+    WorkshopEnrollmentQuerySet, WorkshopManager, WorkshopQuerySet, WorkshopSessionQuerySet
+)
+
+
+def attendance_percentage(present, total):
+    return (present / total * 100) if total > 0 else 0
+
+
+def _attendance_counts(instance, attendances):
+    """
+    (presentes, total) anotados por ``with_attendance()`` ou, sem a anotação,
+    calculados com uma única consulta agregada
+    """
+    if hasattr(instance, 'attendance_total'):
+        return instance.attendance_present, instance.attendance_total
+    counts = attendances.aggregate(total=Count('pk'), present=Count('pk', filter=Q(attended=True)))
+    return counts['present'], counts['total']
 
 
 class Workshop(models.Model):
 
-    objects = models.Manager()  # Manager padrão
+    objects = WorkshopQuerySet.as_manager()  # Manager padrão
     optimized_objects = WorkshopManager()
 
     WORKSHOP_TYPES = [
@@ -50,23 +68,25 @@ class Workshop(models.Model):
     def __str__(self):
         return f"{self.name} - {self.facilitator}"
 
+    # As propriedades usam as anotações de Workshop.objects.with_counts() /
+    # with_attendance() quando presentes
+
     @property
     def total_sessions(self):
+        if hasattr(self, 'session_count'):
+            return self.session_count
         return self.sessions.count()
 
     @property
     def total_participants(self):
+        if hasattr(self, 'participant_count'):
+            return self.participant_count
         return self.enrollments.filter(status='ativo').count()
 
     @property
     def attendance_rate(self):
-        total_possible = 0
-        total_present = 0
-        for session in self.sessions.all():
-            session_attendances = session.attendances.all()
-            total_possible += session_attendances.count()
-            total_present += session_attendances.filter(attended=True).count()
-        return (total_present / total_possible * 100) if total_possible > 0 else 0
+        present, total = _attendance_counts(self, SessionAttendance.objects.filter(session__workshop=self))
+        return attendance_percentage(present, total)
 
 
 class WorkshopSession(models.Model):
@@ -78,6 +98,8 @@ class WorkshopSession(models.Model):
     notes = models.TextField('Observações', blank=True)
     created_at = models.DateTimeField('Criado em', auto_now_add=True)
 
+    objects = WorkshopSessionQuerySet.as_manager()
+
     class Meta:
         ordering = ['session_date', 'start_time']
         verbose_name = 'Sessão da Oficina'
@@ -88,13 +110,13 @@ class WorkshopSession(models.Model):
 
     @property
     def attendance_count(self):
+        if hasattr(self, 'attendance_present'):
+            return self.attendance_present
         return self.attendances.filter(attended=True).count()
 
     @property
     def attendance_percentage(self):
-        total = self.attendances.count()
-        present = self.attendances.filter(attended=True).count()
-        return (present / total * 100) if total > 0 else 0
+        return attendance_percentage(*_attendance_counts(self, self.attendances.all()))
 
 
 class WorkshopEnrollment(models.Model):
@@ -112,6 +134,8 @@ class WorkshopEnrollment(models.Model):
     notes = models.TextField('Observações', blank=True)
     created_at = models.DateTimeField('Criado em', auto_now_add=True)
 
+    objects = WorkshopEnrollmentQuerySet.as_manager()
+
     class Meta:
         ordering = ['-enrollment_date']
         verbose_name = 'Inscrição em Oficina'
@@ -123,9 +147,7 @@ class WorkshopEnrollment(models.Model):
 
     @property
     def attendance_rate(self):
-        total_sessions = self.attendances.count()
-        present_sessions = self.attendances.filter(attended=True).count()
-        return (present_sessions / total_sessions * 100) if total_sessions > 0 else 0
+        return attendance_percentage(*_attendance_counts(self, self.attendances.all()))
 
 
 class SessionAttendance(models.Model):
@@ -1,3 +1,166 @@
+from datetime import date, time
+
 from django.test import TestCase
 
-# Create your tests here.
+from members.models import Beneficiary
+from workshops.models import SessionAttendance, Workshop, WorkshopEnrollment, WorkshopSession
+
+
+class WorkshopAttendanceAnnotationTests(TestCase):
+    """Taxas de presença anotadas com with_attendance()"""
+
+    def setUp(self):
+        self.workshop = Workshop.objects.create(
+            name='Costura Básica', description='Oficina', workshop_type='costura',
+            facilitator='Ana', location='Sala 1', start_date=date(2024, 1, 8),
+            status='ativo', objectives='Aprender costura',
+        )
+        sessions = [
+            WorkshopSession.objects.create(
+                workshop=self.workshop, session_date=date(2024, 1, day),
+                start_time=time(9), end_time=time(11), topic=f'Aula {day}',
+            )
+            for day in (8, 15, 22, 29)
+        ]
+        for index, present in enumerate((4, 3, 1)):
+            beneficiary = Beneficiary.objects.create(
+                full_name=f'Participante {index}', dob='1990-01-01', phone_1='11987654321',
+                address='Rua A', neighbourhood='Centro',
+            )
+            enrollment = WorkshopEnrollment.objects.create(
+                workshop=self.workshop, beneficiary=beneficiary,
+                enrollment_date=date(2024, 1, 1), status='concluido',
+            )
+            for position, session in enumerate(sessions):
+                SessionAttendance.objects.create(
+                    session=session, enrollment=enrollment, attended=position < present
+                )
+
+    def test_enrollment_rates_in_single_query(self):
+        with self.assertNumQueries(1):
+            rates = sorted(e.attendance_rate for e in WorkshopEnrollment.objects.with_attendance())
+
+        self.assertEqual(rates, [25.0, 75.0, 100.0])
+
+    def test_annotated_values_match_unannotated_properties(self):
+        workshop = Workshop.objects.get(pk=self.workshop.pk)
+        annotated = Workshop.objects.with_counts().with_attendance().get(pk=self.workshop.pk)
+
+        with self.assertNumQueries(0):
+            self.assertAlmostEqual(annotated.attendance_rate, 8 / 12 * 100)
+            self.assertEqual(annotated.total_sessions, 4)
+        self.assertAlmostEqual(workshop.attendance_rate, annotated.attendance_rate)
+
+        sessions = list(self.workshop.sessions.with_attendance())
+        with self.assertNumQueries(0):
+            self.assertEqual([s.attendance_count for s in sessions], [3, 2, 2, 1])
+            self.assertEqual(sessions[0].attendance_percentage, 100.0)
+
+    def test_with_statistics_combines_annotations_without_row_multiplication(self):
+        workshop = Workshop.optimized_objects.with_statistics().get(pk=self.workshop.pk)
+
+        self.assertEqual(workshop.enrollment_count, 3)
+        self.assertEqual(workshop.attendance_total, 12)
+        self.assertEqual(workshop.completed_sessions, 4)
+
+    def test_min_attendance_filter(self):
+        eligible = WorkshopEnrollment.objects.with_min_attendance(75)
+
+        self.assertEqual(
+            sorted(e.beneficiary.full_name for e in eligible),
+            ['Participante 0', 'Participante 1'],
+        )
+
+
+class BulkAttendanceTests(TestCase):
+    """Chamada em lote com core.attendance"""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+
+        self.user = get_user_model().objects.create_superuser(
+            username='chamada', email='chamada@test.com', password='testpass123'
+        )
+        self.workshop = Workshop.objects.create(
+            name='Informática', description='Oficina', workshop_type='informatica',
+            facilitator='Ana', location='Sala 2', start_date=date(2024, 1, 8),
+            status='ativo', objectives='Aprender informática',
+        )
+        self.session = WorkshopSession.objects.create(
+            workshop=self.workshop, session_date=date(2024, 1, 8),
+            start_time=time(9), end_time=time(11), topic='Aula 1',
+        )
+        self.enrollments = []
+        for index in range(12):
+            beneficiary = Beneficiary.objects.create(
+                full_name=f'Aluna {index}', dob='1990-01-01', phone_1='11987654321',
+                address='Rua A', neighbourhood='Centro',
+            )
+            self.enrollments.append(WorkshopEnrollment.objects.create(
+                workshop=self.workshop, beneficiary=beneficiary, enrollment_date=date(2024, 1, 1),
+            ))
+
+    def rows(self, enrollments, attended=True):
+        return [{'enrollment_id': e.pk, 'attended': attended} for e in enrollments]
+
+    def test_query_count_does_not_grow_with_roll_size(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from core.attendance import record_workshop_attendance
+
+        first, second = [
+            WorkshopSession.objects.create(
+                workshop=self.workshop, session_date=date(2024, 1, day),
+                start_time=time(9), end_time=time(11), topic=f'Aula {day}',
+            )
+            for day in (15, 22)
+        ]
+        # Contadores do dashboard já existentes nas duas medições
+        record_workshop_attendance(self.session, self.rows(self.enrollments[:1]))
+        with CaptureQueriesContext(connection) as small:
+            record_workshop_attendance(first, self.rows(self.enrollments[:2]))
+        with CaptureQueriesContext(connection) as large:
+            record_workshop_attendance(second, self.rows(self.enrollments))
+        self.assertEqual(len(large), len(small))
+
+        # Atualiza as duas já registradas e cria as demais
+        result = record_workshop_attendance(first, self.rows(self.enrollments, attended=False))
+        self.assertEqual((result['created'], result['updated']), (10, 2))
+        self.assertEqual(SessionAttendance.objects.filter(session=first, attended=False).count(), 12)
+        self.assertEqual(result['attendance_rates'][str(self.enrollments[1].pk)], 50.0)
+
+    def test_dashboard_counters_follow_bulk_writes(self):
+        from core.attendance import record_workshop_attendance
+        from dashboard.stats import rebuild_counters
+
+        record_workshop_attendance(self.session, self.rows(self.enrollments[:5]))
+        record_workshop_attendance(self.session, self.rows(self.enrollments[:2], attended=False))
+
+        self.assertEqual(rebuild_counters(['workshops.SessionAttendance']), {'workshops.SessionAttendance': 0})
+
+    def test_json_endpoint_reports_foreign_enrollments(self):
+        import json
+        from django.urls import reverse
+
+        other = Workshop.objects.create(
+            name='Outra', description='Oficina', workshop_type='outros', facilitator='Bia',
+            location='Sala 3', start_date=date(2024, 1, 8), status='ativo', objectives='Outra',
+        )
+        foreign = WorkshopEnrollment.objects.create(
+            workshop=other, beneficiary=self.enrollments[0].beneficiary, enrollment_date=date(2024, 1, 1),
+        )
+        self.client.force_login(self.user)
+        url = reverse('workshops:bulk-attendance-api', args=[self.session.pk])
+
+        response = self.client.post(url, json.dumps({'attendances': [
+            {'enrollment_id': self.enrollments[0].pk, 'attended': True, 'notes': 'Chegou cedo'},
+            {'enrollment_id': foreign.pk, 'attended': True},
+            {'enrollment_id': 'x'},
+        ]}), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['created'], 1)
+        self.assertEqual(sorted(data['invalid']), sorted(['x', str(foreign.pk)]))
+        self.assertEqual(SessionAttendance.objects.get(enrollment=self.enrollments[0]).notes, 'Chegou cedo')
+        self.assertEqual(self.client.post(url, '{"attendances": 1}', content_type='application/json').status_code, 400)
@@ -26,6 +26,7 @@ urlpatterns = [
     
     # Attendance Management
     path('sessions/<int:session_id>/attendance/', views.bulk_attendance, name='bulk-attendance'),
+    path('sessions/<int:session_id>/attendance/api/', views.bulk_attendance_api, name='bulk-attendance-api'),
     
     # Workshop Evaluation CRUD
     path('evaluations/', views.WorkshopEvaluationListView.as_view(), name='evaluation-list'),
@@ -6,13 +6,16 @@ from django.contrib import messages
 from django.urls import reverse_lazy
 from django.core.cache import cache
 from django.conf import settings
-from django.db.models import Q, Count, Avg, Prefetch
+from django.db.models import Q, Avg, Prefetch
 from django.utils import timezone
 from django.http import JsonResponse, HttpResponse
+from django.views.decorators.http import require_POST
+import json
 from core.unified_permissions import (
     is_technician, TechnicianRequiredMixin, requires_technician
 )
 from core.decorators import CreateConfirmationMixin, EditConfirmationMixin, DeleteConfirmationMixin
+from core.attendance import AttendanceError, record_workshop_attendance
 from core.export_utils import export_universal, DataFormatter, ExportManager
 from .models import Workshop, WorkshopSession, WorkshopEnrollment, SessionAttendance, WorkshopEvaluation
 from .forms import (
@@ -34,15 +37,8 @@ class WorkshopListView(LoginRequiredMixin, TechnicianRequiredMixin, ListView):
         return is_technician(self.request.user)
 
     def get_queryset(self):
-        # OTIMIZAÇÃO: prefetch_related para evitar N+1 queries
-        queryset = Workshop.objects.prefetch_related(
-            'enrollments__beneficiary',
-            'sessions',
-            'enrollments'
-        ).annotate(
-            participant_count=Count('enrollments', filter=Q(enrollments__status='ativo')),
-            session_count=Count('sessions', distinct=True)
-        )
+        # Contagens e presença em subconsultas correlacionadas (sem N+1 nem JOINs multiplicados)
+        queryset = Workshop.objects.with_counts().with_attendance()
         
         search = self.request.GET.get('search', '')
         status = self.request.GET.get('status', '')
@@ -211,7 +207,7 @@ class WorkshopEnrollmentListView(LoginRequiredMixin, TechnicianRequiredMixin, Li
         workshop_filter = self.request.GET.get('workshop', '')
         status = self.request.GET.get('status', '')
         
-        queryset = WorkshopEnrollment.objects.select_related('beneficiary', 'workshop')
+        queryset = WorkshopEnrollment.objects.with_attendance().select_related('beneficiary', 'workshop')
         
         if search:
             queryset = queryset.filter(
@@ -408,26 +404,10 @@ def bulk_attendance(request, session_id):
     if request.method == 'POST':
         form = BulkAttendanceForm(request.POST, session=session)
         if form.is_valid():
-            # Processar presenças
-            enrollments = WorkshopEnrollment.objects.filter(
-                workshop=session.workshop,
-                status='ativo'
-            )
-            
-            for enrollment in enrollments:
-                field_name = f'attendance_{enrollment.id}'
-                attended = form.cleaned_data.get(field_name, False)
-                
-                # Atualizar ou criar registro de presença
-                attendance, created = SessionAttendance.objects.get_or_create(
-                    session=session,
-                    enrollment=enrollment,
-                    defaults={'attended': attended}
-                )
-                
-                if not created:
-                    attendance.attended = attended
-                    attendance.save()
+            record_workshop_attendance(session, [
+                {'enrollment_id': pk, 'attended': form.cleaned_data.get(f'attendance_{pk}', False)}
+                for pk in form.enrollment_ids
+            ])
             
             messages.success(request, f'Presenças da sessão "{session.topic}" registradas com sucesso!')
             return redirect('workshops:session-list')
@@ -440,6 +420,25 @@ def bulk_attendance(request, session_id):
     })
 
 
+@login_required
+@requires_technician
+@require_POST
+def bulk_attendance_api(request, session_id):
+    """Chamada da sessão em JSON (tablet): {"attendances": [{"enrollment_id", "attended", "notes"}]}"""
+    session = get_object_or_404(WorkshopSession, id=session_id)
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    try:
+        result = record_workshop_attendance(
+            session, payload.get('attendances') if isinstance(payload, dict) else None
+        )
+    except AttendanceError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(result)
+
+
 # CRUD Views for WorkshopEvaluation Model
 
 class WorkshopEvaluationListView(LoginRequiredMixin, TechnicianRequiredMixin, ListView):
@@ -517,16 +516,12 @@ def workshop_report(request, pk):
     
     # Dados de presença
     attendance_data = []
-    for session in workshop.sessions.all():
-        session_attendance = SessionAttendance.objects.filter(session=session)
-        present_count = session_attendance.filter(attended=True).count()
-        total_enrolled = session_attendance.count()
-        
+    for session in workshop.sessions.with_attendance():
         attendance_data.append({
             'session': session,
-            'present': present_count,
-            'total': total_enrolled,
-            'percentage': (present_count / total_enrolled * 100) if total_enrolled > 0 else 0
+            'present': session.attendance_count,
+            'total': session.attendance_total,
+            'percentage': session.attendance_percentage
         })
     
     # Avaliações